@@ -3,10 +3,59 @@ import glob
 import os
 import numpy as np
 
+import event_trace
+from results_writer import result_files
+
+
+def load_rtts(prefix):
+    """Önekin en son koşusundaki RTT'ler: iz dosyalarında ACK olaylarının gecikmesi, yoksa eski CSV sütunu."""
+    paths = event_trace.trace_files(prefix)
+    if paths:
+        return pd.Series(event_trace.load(paths).latencies(direction='rx', msg_type='ack'), dtype=float)
+
+    df = pd.concat([pd.read_csv(p) for p in result_files(prefix)], ignore_index=True)
+    col_name = next((col for col in df.columns if "Latency" in col), None)
+    return df[col_name].dropna() if col_name else None
+
+
+def load_one_way(prefix):
+    """ACK olaylarındaki tek yönlü gecikmeler (downlink, uplink); sadece iz dosyalarında ve saat senkronluysa vardır."""
+    paths = event_trace.trace_files(prefix)
+    if not paths:
+        return None, None
+    trace = event_trace.load(paths)
+    return tuple(pd.Series(trace.latencies(column, direction='rx', msg_type='ack'), dtype=float)
+                 for column in ('downlink', 'uplink'))
+
+
+def print_one_way(files):
+    """RTT'nin komut (sunucu -> scooter) ve ACK (scooter -> sunucu) yönlerine ayrılmış hali."""
+    rows = []
+    for file in files:
+        downlink, uplink = load_one_way(file)
+        if downlink is not None and not downlink.empty:
+            rows.append((file.replace("results_", "").replace("_server", "").upper(), downlink, uplink))
+    if not rows:
+        return
+
+    print("\nTEK YÖNLÜ GECİKMELER (register sırasında ölçülen saat farkıyla, bkz. clock.py)")
+    print("-" * 85)
+    print(f"{'PROTOKOL':<15} | {'YÖN':<8} | {'ORTALAMA (s)':<12} | {'p50 (s)':<10} | {'p99 (s)':<10} | {'VERİ ADEDİ':<10}")
+    print("-" * 85)
+    for protocol_name, downlink, uplink in rows:
+        for direction, data in (('downlink', downlink), ('uplink', uplink)):
+            if data.empty:
+                continue
+            print(f"{protocol_name:<15} | {direction:<8} | {data.mean():.6f}     | {data.quantile(0.5):.6f}   | "
+                  f"{data.quantile(0.99):.6f}   | {len(data):<10}")
+    print("-" * 85)
+
+
 def analyze_server_rtt():
-    # Klasördeki 'results_*_server.csv' formatındaki tüm dosyaları bul
-    # Örn: results_websocket_server.csv, results_tcp_server.csv
-    files = glob.glob("results_*_server.csv")
+    # Klasördeki 'results_*_server' öneklerini bul (koşu kimlikli iz parçaları veya eski tek CSV)
+    # Örn: results_tcp_server.20261018-103640-4242.000.trace, results_websocket_server.csv
+    files = sorted({os.path.basename(p).split('.')[0]
+                    for p in glob.glob("results_*_server.*trace") + glob.glob("results_*_server.*csv")})
 
     if not files:
         print("UYARI: Hiçbir sunucu sonuç dosyası (results_..._server.csv) bulunamadı.")
@@ -23,17 +72,12 @@ def analyze_server_rtt():
     for file in files:
         try:
             # Dosya adı formatı
-            protocol_name = file.replace("results_", "").replace("_server.csv", "").upper()
+            protocol_name = file.replace("results_", "").replace("_server", "").upper()
 
-            df = pd.read_csv(file)
-            col_name = None
-            for col in df.columns:
-                if "Latency" in col:
-                    col_name = col
-                    break
+            # Her önek için en son koşunun tüm parçaları birleştirilir
+            rtt_data = load_rtts(file)
 
-            if col_name and not df[col_name].isnull().all():
-                rtt_data = df[col_name].dropna()  # Boş verileri at
+            if rtt_data is not None and not rtt_data.empty:
 
                 avg_rtt = rtt_data.mean()
                 min_rtt = rtt_data.min()
@@ -59,6 +103,7 @@ def analyze_server_rtt():
             print(f"Hata ({file}): {e}")
 
     print("-" * 85)
+    print_one_way(files)
 
     # --- SONUÇ YORUMU ---
     if results_summary:
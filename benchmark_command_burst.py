@@ -0,0 +1,176 @@
+"""
+Art arda gelen komutlarda (burst) istemci tarafı kuyruklanma gecikmesini ölçer.
+
+Bu proses minimal bir TCP/UDP sunucusu açar ve tcp_client.py / udp_client.py
+istemcisini ayrı bir proseste '--command-workers' değerleriyle başlatır.
+Her turda N komut arka arkaya gönderilir ve tüm ACK'ler beklenir. ACK'teki
+damgalar (bkz. clock.py) ile her komut için:
+  * RTT
+  * downlink: komutun istemcinin alım döngüsüne ulaşması; alım yolu yürütme
+    tarafından tıkanıyorsa burada görülür
+  * işlem: komutun alınmasından ACK'in gönderilmesine kadar (bekleme + yürütme)
+  * bekleme: işlem süresinden ortalama yürütme süresinin çıkarılması
+
+--command-workers 0 komutların alım thread'inde yürütüldüğü eski davranıştır.
+
+Örnek:
+    python benchmark_command_burst.py --protocols tcp udp --workers 0 1 4 16 --burst 10 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+import clock
+import command_exec
+from framing import LineFramer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class BurstBench:
+    """Sunucu tarafı: register'a saat damgalı onay verir, ACK gecikmelerini toplar."""
+
+    def __init__(self):
+        self.reply = None
+        self.registered = asyncio.Event()
+        self.burst_done = asyncio.Event()
+        self.pending = 0
+        self.delays = []
+
+    def on_message(self, msg, ts_ns, reply):
+        if msg.get('type') == 'register':
+            self.reply = reply
+            reply(clock.stamp_register_ack(msg, ts_ns))
+            self.registered.set()
+        elif msg.get('type') == 'ack':
+            self.delays.append(clock.ack_delays(msg, ts_ns))
+            self.pending -= 1
+            if self.pending <= 0:
+                self.burst_done.set()
+
+
+class TCPBenchProtocol(asyncio.Protocol):
+    def __init__(self, bench):
+        self.bench = bench
+        self.transport = None
+        self.framer = LineFramer()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def reply(self, msg):
+        self.transport.write((json.dumps(msg) + '\n').encode())
+
+    def data_received(self, data):
+        ts_ns = clock.now_ns()
+        for frame in self.framer.feed(data):
+            self.bench.on_message(json.loads(frame), ts_ns, self.reply)
+
+
+class UDPBenchProtocol(asyncio.DatagramProtocol):
+    def __init__(self, bench):
+        self.bench = bench
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        ts_ns = clock.now_ns()
+        try:
+            msg = json.loads(data)
+        except ValueError:
+            return
+        self.bench.on_message(msg, ts_ns, lambda m: self.transport.sendto(json.dumps(m).encode(), addr))
+
+
+async def run_case(protocol, workers, args):
+    loop = asyncio.get_running_loop()
+    bench = BurstBench()
+    if protocol == 'tcp':
+        server = await loop.create_server(lambda: TCPBenchProtocol(bench), '127.0.0.1', args.port)
+    else:
+        server, _ = await loop.create_datagram_endpoint(lambda: UDPBenchProtocol(bench),
+                                                        local_addr=('127.0.0.1', args.port))
+
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, f"{protocol}_client.py"), '--scenario', 'command',
+         '--host', '127.0.0.1', '--port', str(args.port), '--command-workers', str(workers),
+         '--exec-time', str(args.exec_time), '--log-profile', 'quiet'],
+        cwd=tempfile.mkdtemp(prefix="bench_cmd_"), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timeouts = 0
+    try:
+        await asyncio.wait_for(bench.registered.wait(), timeout=10)
+        await asyncio.sleep(0.2)
+        for _ in range(args.rounds):
+            bench.burst_done.clear()
+            bench.pending = args.burst
+            for _ in range(args.burst):
+                bench.reply({'command': 'unlock', 'scooter_id': 'broadcast', 'send_ns': clock.now_ns()})
+            try:
+                await asyncio.wait_for(bench.burst_done.wait(), timeout=args.burst * args.exec_time.mean() + 5)
+            except asyncio.TimeoutError:
+                timeouts += 1
+            await asyncio.sleep(args.gap)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        server.close()
+
+    rtt, downlink, uplink = (np.array([d[i] for d in bench.delays if d[i] is not None]) for i in range(3))
+    process = rtt - downlink - uplink if len(downlink) == len(rtt) and len(uplink) == len(rtt) else np.array([])
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'protocol': protocol,
+        'workers': workers,
+        'acks': len(rtt),
+        'expected': args.rounds * args.burst,
+        'timeouts': timeouts,
+        'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'down_p99': pct(downlink, 99),
+        'proc_p50': pct(process, 50), 'proc_p99': pct(process, 99),
+        'wait_ms': (process.mean() - args.exec_time.mean()) * 1000 if len(process) else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Komut burst'ünde istemci kuyruklanma benchmark'ı")
+    parser.add_argument('--protocols', nargs='+', choices=['tcp', 'udp'], default=['tcp', 'udp'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, 4, 16],
+                        help="İstemcinin --command-workers değerleri (0: alım thread'inde)")
+    parser.add_argument('--burst', type=int, default=10, help="Tur başına art arda gönderilen komut")
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--gap', type=float, default=0.3, help="Turlar arası bekleme (sn)")
+    parser.add_argument('--exec-time', type=command_exec.exec_time_arg, default='fixed:0.05')
+    parser.add_argument('--port', type=int, default=9871)
+    args = parser.parse_args()
+
+    rows = [asyncio.run(run_case(p, w, args)) for p in args.protocols for w in args.workers]
+
+    print(f"Burst: {args.burst} komut x {args.rounds} tur | yürütme süresi: {args.exec_time}")
+    print("-" * 112)
+    print(f"{'PROTOKOL':<8} | {'WORKER':>6} | {'ACK':>9} | {'RTT p50 (ms)':>12} | {'RTT p99 (ms)':>12} | "
+          f"{'DOWN p99 (ms)':>13} | {'İŞLEM p50':>9} | {'İŞLEM p99':>9} | {'BEKLEME ort (ms)':>16}")
+    print("-" * 112)
+    for r in rows:
+        workers = 'inline' if r['workers'] == 0 else r['workers']
+        print(f"{r['protocol']:<8} | {workers:>6} | {r['acks']:>4}/{r['expected']:<4} | {r['rtt_p50']:>12.1f} | "
+              f"{r['rtt_p99']:>12.1f} | {r['down_p99']:>13.1f} | {r['proc_p50']:>9.1f} | {r['proc_p99']:>9.1f} | "
+              f"{r['wait_ms']:>16.1f}")
+    print("-" * 112)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Komut dağıtım motorunun (command_dispatch.py) kayıplı bağlantıda başarı oranını ve ACK süresini ölçer.
+
+Ağ yerine süreç içi bir bağlantı benzetimi kullanılır: send() ile çıkan her
+komut ve ona dönen ACK, yön başına --loss olasılıkla kaybolur; kaybolmayanlar
+tek yön --delay-ms (üstel dağılımlı jitter ile) sonra karşıya ulaşır. N scooter'a
+tur başına birer komut verilir; her kayıp oranı ve yeniden deneme sayısı için:
+  * BAŞARI: son tarihe kadar ACK'lenen komut oranı
+  * TTA p50 / p99: komutun verilişinden ilk ACK'e (kuyruk ve yeniden gönderimler dahil)
+  * yeniden gönderim ve tekrar ACK sayıları
+Ayrıca kayıpsız, anında ACK'lenen komutlarla motorun submit + acknowledge hızı (komut/sn) ölçülür.
+
+Örnek:
+    python benchmark_command_dispatch.py --scooters 1000 --loss 0 0.05 0.2 --retries 0 2
+    python benchmark_command_dispatch.py --rounds 5 --deadline 2   # scooter başına 5 komutluk kuyruk
+"""
+import argparse
+import heapq
+import random
+import time
+
+import clock
+import command_dispatch
+from metrics import MetricsRegistry
+
+
+def simulate(args, loss, retries, rng):
+    registry = MetricsRegistry()
+    policy = command_dispatch.RetryPolicy(args.ack_timeout, retries, args.backoff, args.deadline)
+    in_flight = []  # (varış anı ns, sıra, scooter id, mesaj)
+    order = iter(range(1 << 62))
+    delay_ns = int(args.delay_ms * 1e6)
+
+    def arrival():
+        return clock.now_ns() + delay_ns + int(rng.expovariate(1 / args.jitter_ms) * 1e6 if args.jitter_ms else 0)
+
+    def send(scooter_id, cmd):
+        if rng.random() >= loss:  # Komut scooter'a ulaştı
+            heapq.heappush(in_flight, (arrival(), next(order), scooter_id, cmd))
+
+    dispatcher = command_dispatch.Dispatcher(registry, policy=policy, send=send, tick=args.tick)
+    ids = [f"scooter_{i}" for i in range(args.scooters)]
+    for _ in range(args.rounds):
+        dispatcher.submit_many(ids, "unlock")
+    started = time.perf_counter()
+    while dispatcher.pending:
+        now = clock.now_ns()
+        while in_flight and in_flight[0][0] <= now:
+            _, _, scooter_id, msg = heapq.heappop(in_flight)
+            if 'ack' in msg:
+                dispatcher.acknowledge(scooter_id, msg)
+            elif rng.random() >= loss:  # ACK sunucuya ulaştı
+                ack = {'ack': msg['command'], 'cmd_id': msg['cmd_id'], 'send_ns': msg['send_ns']}
+                heapq.heappush(in_flight, (arrival(), next(order), scooter_id, ack))
+        dispatcher.poll()
+        time.sleep(args.tick / 2)
+    return registry, dispatcher, time.perf_counter() - started
+
+
+def hot_path(count):
+    """Kayıpsız, anında ACK: submit + acknowledge hızı (komut/sn)."""
+    sent = []
+    dispatcher = command_dispatch.Dispatcher(MetricsRegistry(), send=lambda sid, cmd: sent.append((sid, cmd)))
+    started = time.perf_counter()
+    for i in range(count):
+        sid = f"scooter_{i % 1000}"
+        dispatcher.submit(sid, "unlock")
+        while sent:
+            scooter_id, cmd = sent.pop()
+            dispatcher.acknowledge(scooter_id, cmd)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Komut dağıtım motoru başarı oranı ve ACK süresi benchmark'ı")
+    parser.add_argument('--scooters', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=1,
+                        help="Scooter başına aynı anda kuyruğa alınan komut sayısı (son tarih kuyrukta geçen süreyi de sayar)")
+    parser.add_argument('--loss', type=float, nargs='+', default=[0.0, 0.05, 0.2], help="Yön başına kayıp olasılığı")
+    parser.add_argument('--retries', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--ack-timeout', type=float, default=0.2, help="İlk denemenin ACK süresi (sn)")
+    parser.add_argument('--backoff', type=float, default=command_dispatch.DEFAULT_BACKOFF)
+    parser.add_argument('--deadline', type=float, default=None,
+                        help="Komutun kuyruk dahil son tarihi (sn; varsayılan: tüm denemelerin süreleri toplamı)")
+    parser.add_argument('--delay-ms', type=float, default=20.0, help="Tek yön gecikme (ms)")
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help="Üstel jitter ortalaması (ms)")
+    parser.add_argument('--tick', type=float, default=command_dispatch.DEFAULT_TICK)
+    parser.add_argument('--hot-path', type=int, default=200_000, help="Hız ölçümündeki komut sayısı (0 = atla)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.scooters:,} scooter x {args.rounds} komut | tek yön {args.delay_ms:g} ms + jitter "
+          f"{args.jitter_ms:g} ms | ACK süresi {args.ack_timeout:g} sn (x{args.backoff:g})")
+    print("-" * 104)
+    print(f"{'KAYIP':>6} | {'YENİDEN':>7} | {'BAŞARI':>7} | {'TTA p50 (ms)':>12} | {'TTA p99 (ms)':>12} | "
+          f"{'YENİDEN GÖND.':>13} | {'TEKRAR ACK':>10} | {'GEÇ ACK':>7} | {'SÜRE (s)':>8}")
+    print("-" * 104)
+    ms = lambda v: v * 1000 if v is not None else float('nan')
+    for loss in args.loss:
+        for retries in args.retries:
+            registry, dispatcher, elapsed = simulate(args, loss, retries, random.Random(args.seed))
+            tta = dispatcher.time_to_ack
+            print(f"{loss:>6.0%} | {retries:>7} | {dispatcher.success_rate() or 0:>6.2f}% | "
+                  f"{ms(tta.percentile(50)):>12.1f} | {ms(tta.percentile(99)):>12.1f} | "
+                  f"{dispatcher.retries.value:>13,} | {dispatcher.duplicates.value:>10,} | "
+                  f"{dispatcher.late.value:>7,} | {elapsed:>8.2f}")
+    print("-" * 104)
+    print("KAYIP komut ve ACK için ayrı ayrı uygulanır. Scooter başına pencere 1: sıradaki komut ACK'ten sonra gider.")
+    if args.hot_path:
+        print(f"Kayıpsız submit + acknowledge: {hot_path(args.hot_path):,.0f} komut/sn")
+
+
+if __name__ == "__main__":
+    main()
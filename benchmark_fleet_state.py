@@ -0,0 +1,146 @@
+"""
+Sütunlu filo durumu deposunun (fleet_state.py) bellek kullanımını, güncelleme hızını ve sorgu süresini ölçer.
+
+Karşılaştırma için aynı veriyi scooter başına sözlükte tutan düz yapı
+({scooter_id: {'lat': .., 'lon': .., ...}}) da ölçülür. Ölçülenler:
+  * bellek: depo için ayrılan toplam bellek (tracemalloc; scooter id
+    metinleri iki yapıda da ortak olduğu için hariç) ve scooter başına bayt
+  * ilk kayıt: N scooter'ın ilk konum mesajı (slot ataması dahil), mesaj/sn
+  * güncelleme: rastgele scooterlara konum ve durum güncellemesi
+    (update_location/update_status ve sunucuların kullandığı update(msg)), mesaj/sn
+  * sorgu: 'batarya %15'in altında' ve 'son 60 sn'de görülen ve kilitli' sorguları (ms)
+
+Örnek:
+    python benchmark_fleet_state.py --scooters 1000000 --updates 2000000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+import clock
+import fleet_state
+
+
+def measure(fn):
+    """(sonuç, tracemalloc ile ölçülen kalıcı bellek artışı bayt, süre sn)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before, elapsed
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    ids = [f"scooter_{i}" for i in range(args.scooters)]
+    lats = [41.0 + rng.random() * 0.1 for _ in range(args.scooters)]
+    lons = [28.9 + rng.random() * 0.1 for _ in range(args.scooters)]
+    batteries = [rng.uniform(0, 100) for _ in range(args.scooters)]
+    now = clock.now_ns()
+    order = [rng.randrange(args.scooters) for _ in range(args.updates)]
+    msgs = [{'type': 'status', 'scooter_id': ids[i],
+             'status': {'battery_level': batteries[i], 'is_locked': i % 2 == 0, 'speed': i % 25}}
+            for i in order[:args.message_updates]]
+    rows = []
+
+    # --- Sütunlu depo ---
+    def build_state():
+        state = fleet_state.FleetState(capacity=args.scooters if args.preallocate else fleet_state.DEFAULT_CAPACITY)
+        for i, sid in enumerate(ids):
+            state.update_location(sid, lats[i], lons[i], batteries[i], now)
+        return state
+
+    state, mem, elapsed = measure(build_state)
+    started = time.perf_counter()
+    for i in order:
+        state.update_location(ids[i], lats[i], lons[i], batteries[i], now)
+    update_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for msg in msgs:
+        state.update(msg, now)
+    message_s = time.perf_counter() - started
+    started = time.perf_counter()
+    low = state.query(battery_below=15)
+    query_s = time.perf_counter() - started
+    started = time.perf_counter()
+    recent_locked = state.count(seen_within=60, locked=True)
+    count_s = time.perf_counter() - started
+    rows.append(('FleetState', mem, args.scooters / elapsed, args.updates / update_s,
+                 len(msgs) / message_s if msgs else float('nan'), query_s, count_s, len(low), recent_locked))
+    del state
+    gc.collect()
+
+    # --- Scooter başına sözlük ---
+    def build_dicts():
+        table = {}
+        for i, sid in enumerate(ids):
+            table[sid] = {'lat': lats[i], 'lon': lons[i], 'battery': batteries[i], 'speed': None, 'locked': None,
+                          'last_seen_ns': now, 'location_ns': now, 'status_ns': 0}
+        return table
+
+    table, mem, elapsed = measure(build_dicts)
+    started = time.perf_counter()
+    for i in order:
+        entry = table[ids[i]]
+        entry['lat'] = lats[i]
+        entry['lon'] = lons[i]
+        entry['battery'] = batteries[i]
+        entry['location_ns'] = entry['last_seen_ns'] = now
+    update_s = time.perf_counter() - started
+    started = time.perf_counter()
+    for msg in msgs:
+        entry = table[msg['scooter_id']]
+        status = msg['status']
+        entry['battery'] = status['battery_level']
+        entry['locked'] = status['is_locked']
+        entry['speed'] = status['speed']
+        entry['status_ns'] = entry['last_seen_ns'] = now
+    message_s = time.perf_counter() - started
+    started = time.perf_counter()
+    low = [sid for sid, e in table.items() if e['battery'] is not None and e['battery'] < 15]
+    query_s = time.perf_counter() - started
+    limit = clock.now_ns() - 60 * 10 ** 9
+    started = time.perf_counter()
+    recent_locked = sum(1 for e in table.values() if e['locked'] and e['last_seen_ns'] >= limit)
+    count_s = time.perf_counter() - started
+    rows.append(('dict', mem, args.scooters / elapsed, args.updates / update_s,
+                 len(msgs) / message_s if msgs else float('nan'), query_s, count_s, len(low), recent_locked))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filo durumu deposu bellek ve güncelleme benchmark'ı")
+    parser.add_argument('--scooters', type=int, default=1_000_000)
+    parser.add_argument('--updates', type=int, default=2_000_000, help="Konum güncellemesi sayısı")
+    parser.add_argument('--message-updates', type=int, default=1_000_000,
+                        help="update(msg) ile uygulanan durum mesajı sayısı")
+    parser.add_argument('--no-preallocate', dest='preallocate', action='store_false',
+                        help="Kapasiteyi baştan ayırma, iki katına büyüterek ilerle")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rows = run(args)
+    print(f"{args.scooters:,} scooter | {args.updates:,} konum + {args.message_updates:,} durum güncellemesi | "
+          f"kapasite {'baştan ayrılmış' if args.preallocate else 'büyüyen'} | numpy {np.__version__}")
+    print("-" * 128)
+    print(f"{'YAPI':<10} | {'BELLEK (MB)':>11} | {'B/SCOOTER':>9} | {'İLK KAYIT/s':>11} | {'GÜNCELLEME/s':>12} | "
+          f"{'update(msg)/s':>13} | {'BATARYA<15 (ms)':>15} | {'GÖRÜLEN+KİLİTLİ (ms)':>20} | {'SONUÇ':>7}")
+    print("-" * 128)
+    for name, mem, insert, update, message, query_s, count_s, low, recent in rows:
+        print(f"{name:<10} | {mem / 2 ** 20:>11.1f} | {mem / args.scooters:>9.1f} | {insert:>11,.0f} | "
+              f"{update:>12,.0f} | {message:>13,.0f} | {query_s * 1000:>15.2f} | {count_s * 1000:>20.2f} | "
+              f"{low:>7,}")
+    print("-" * 128)
+    print("BELLEK: yapı için ayrılan bellek (scooter id metinleri hariç). SONUÇ: bataryası %15'in altındaki scooter sayısı.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Eski str tabanlı satır ayırma yolu ile framing.LineFramer'ı karşılaştırır.
+
+Çok megabaytlık, arka arkaya gönderilmiş (pipelined) konum/durum satırları
+farklı okuma parça boyutlarında her iki yoldan geçirilir. JSON çözümleme
+ölçüme dahil edilmez; sadece çerçeveleme maliyeti ölçülür.
+
+Örnek:
+    python benchmark_framing.py --mb 8 --chunks 4096 65536 1048576
+"""
+import argparse
+import json
+import random
+import time
+
+from framing import LineFramer
+
+
+def build_burst(total_bytes):
+    """Konum ve durum mesajlarından oluşan, yaklaşık total_bytes boyutunda bir akış üretir."""
+    lines = []
+    size = 0
+    i = 0
+    while size < total_bytes:
+        if i % 2 == 0:
+            msg = {
+                'type': 'location',
+                'scooter_id': f"scooter_tcp_{i % 1000}",
+                'location': {'lat': 41.0082 + random.uniform(-0.01, 0.01),
+                             'lon': 28.9784 + random.uniform(-0.01, 0.01)},
+                'battery': round(random.uniform(0, 100), 1)
+            }
+        else:
+            is_locked = random.choice([True, False])
+            msg = {
+                'type': 'status',
+                'scooter_id': f"scooter_tcp_{i % 1000}",
+                'status': {'battery_level': round(random.uniform(0, 100), 1),
+                           'is_locked': is_locked,
+                           'speed': 0 if is_locked else random.randint(0, 25)}
+            }
+        line = (json.dumps(msg) + '\n').encode()
+        lines.append(line)
+        size += len(line)
+        i += 1
+    return b"".join(lines), len(lines)
+
+
+def legacy_path(chunks):
+    """tcp_server/tcp_client'ın önceki yolu: buffer += data.decode(); buffer.split('\\n', 1)."""
+    count = 0
+    buffer = ""
+    for data in chunks:
+        buffer += data.decode()
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            if not line.strip(): continue
+            count += 1
+    return count
+
+
+def framer_path(chunks):
+    count = 0
+    framer = LineFramer()
+    for data in chunks:
+        count += len(framer.feed(data))
+    return count
+
+
+def measure(fn, chunks, repeat):
+    best = float('inf')
+    result = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(chunks)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Satır çerçeveleme mikro benchmark'ı")
+    parser.add_argument('--mb', type=float, default=4.0, help="Akış boyutu (MB)")
+    parser.add_argument('--chunks', type=int, nargs='+', default=[4096, 65536, 1048576],
+                        help="recv() parça boyutları (byte)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(1)
+    stream, n_lines = build_burst(int(args.mb * 1024 * 1024))
+    print(f"Akış: {len(stream) / 1024 / 1024:.1f} MB, {n_lines} satır")
+
+    print("-" * 78)
+    print(f"{'PARÇA (B)':>10} | {'YOL':<10} | {'SÜRE (s)':>9} | {'MB/s':>9} | {'SATIR/s':>11} | {'HIZLANMA':>8}")
+    print("-" * 78)
+    for chunk_size in args.chunks:
+        chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+        legacy_s, legacy_n = measure(legacy_path, chunks, args.repeat)
+        framer_s, framer_n = measure(framer_path, chunks, args.repeat)
+        assert legacy_n == framer_n == n_lines, (legacy_n, framer_n, n_lines)
+
+        mb = len(stream) / 1024 / 1024
+        for name, elapsed in (("eski (str)", legacy_s), ("LineFramer", framer_s)):
+            speedup = legacy_s / elapsed
+            print(f"{chunk_size:>10} | {name:<10} | {elapsed:>9.4f} | {mb / elapsed:>9.1f} | "
+                  f"{n_lines / elapsed:>11.0f} | {speedup:>7.1f}x")
+    print("-" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Mekânsal indeksin (geo_index.py) güncelleme maliyetini ve yakın scooter sorgularının süresini ölçer.
+
+N scooter bir şehir alanına (varsayılan ~33 x 34 km) rastgele yerleştirilir;
+ardından rastgele scooterlar birkaç on metre hareket ettirilir (çoğu aynı
+hücrede kalır, bir kısmı hücre değiştirir). Ölçülenler:
+  * konum güncellemesi: update_location indekssiz ve indeks bağlıyken, mesaj/sn
+  * sorgular: rastgele merkezlerde yarıçap, dikdörtgen ve en yakın k (isteğe
+    bağlı 'kilitli' koşuluyla) sorgularının süresi p50 / p99 (ms); en yakın k
+    ayrıca filonun --far-km uzağındaki merkezlerden (süre uzaklıkla büyümemeli)
+Karşılaştırma için aynı sorgular tüm sütun üzerinde vektörel tarama
+(FleetState.mask / tüm mesafeler) ile de yapılır; iki yolun sonuçları
+her sorguda karşılaştırılır ve farklıysa benchmark hata verir.
+
+--threads N verilirse ayrıca eşzamanlılık denemesi yapılır: N thread kendi
+scooterlarını (hücre değiştirecek kadar) hareket ettirirken bir thread
+sürekli yarıçap / dikdörtgen / en yakın k sorgusu yapar. Hiçbir thread'de
+hata çıkmamalı ve sonunda indeks, depodan baştan kurulan indeksle aynı
+olmalıdır; değilse benchmark hata verir.
+
+Örnek:
+    python benchmark_geo_index.py --scooters 100000 --queries 2000
+    python benchmark_geo_index.py --scooters 20000 --queries 200 --threads 16
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+import clock
+import fleet_state
+import geo_index
+
+CENTER = (41.0082, 28.9784)  # İstanbul
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def brute_radius(state, lat, lon, meters, **conditions):
+    n = len(state)
+    dist = geo_index.distances_m(lat, lon, state.lat[:n], state.lon[:n])
+    m = (dist <= meters) & state.mask(**conditions)
+    return set(state.ids[:n][m].tolist())
+
+
+def brute_nearest(state, lat, lon, k, **conditions):
+    rows = np.flatnonzero(state.mask(**conditions))
+    dist = geo_index.distances_m(lat, lon, state.lat[rows], state.lon[rows])
+    best = np.argpartition(dist, min(k, len(dist) - 1))[:k]
+    return state.ids[rows[best[np.argsort(dist[best], kind='stable')]]].tolist()
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    half_lat = args.extent_km * 500 / geo_index.M_PER_DEG
+    half_lon = half_lat / np.cos(np.radians(CENTER[0]))
+    ids = [f"scooter_{i}" for i in range(args.scooters)]
+    lats = [CENTER[0] + rng.uniform(-half_lat, half_lat) for _ in range(args.scooters)]
+    lons = [CENTER[1] + rng.uniform(-half_lon, half_lon) for _ in range(args.scooters)]
+    now = clock.now_ns()
+
+    plain = fleet_state.FleetState(capacity=args.scooters)
+    state = fleet_state.FleetState(capacity=args.scooters)
+    geo = geo_index.GridIndex(state, cell_m=args.cell_m, ref_lat=CENTER[0])
+    for i, sid in enumerate(ids):
+        plain.update_location(sid, lats[i], lons[i], None, now)
+        state.update_location(sid, lats[i], lons[i], None, now)
+        locked = rng.random() < 0.7
+        plain.update_status(sid, locked=locked, ts_ns=now)
+        state.update_status(sid, locked=locked, ts_ns=now)
+
+    # --- Hareket: scooter başına ~step_m metre rastgele adım ---
+    step = args.step_m / geo_index.M_PER_DEG
+    moves = []
+    for _ in range(args.updates):
+        i = rng.randrange(args.scooters)
+        lats[i] += rng.uniform(-step, step)
+        lons[i] += rng.uniform(-step, step)
+        moves.append((ids[i], lats[i], lons[i]))
+    cells_before = dict(geo.slot_cell)
+    rates = {}
+    for name, target in (('indekssiz', plain), ('indeksli', state)):
+        started = time.perf_counter()
+        for sid, lat, lon in moves:
+            target.update_location(sid, lat, lon, None, now)
+        rates[name] = len(moves) / (time.perf_counter() - started)
+    changed = sum(1 for slot, cell in geo.slot_cell.items() if cells_before.get(slot) != cell)
+
+    # --- Sorgular ---
+    centers = [(CENTER[0] + rng.uniform(-half_lat, half_lat), CENTER[1] + rng.uniform(-half_lon, half_lon))
+               for _ in range(args.queries)]
+    conditions = {'locked': True} if args.locked else {}
+    box_lat = args.box_m / 2 / geo_index.M_PER_DEG
+    box_lon = box_lat / np.cos(np.radians(CENTER[0]))
+    times = {key: ([], []) for key in ('radius', 'bbox', 'nearest', 'far')}
+    found = {key: 0 for key in times}
+    for lat, lon in centers:
+        result, indexed = timed(geo.radius, lat, lon, args.radius_m, **conditions)
+        expected, brute = timed(brute_radius, state, lat, lon, args.radius_m, **conditions)
+        assert {sid for sid, _ in result} == expected, "yarıçap sorgusu tarama sonucundan farklı"
+        times['radius'][0].append(indexed)
+        times['radius'][1].append(brute)
+        found['radius'] += len(result)
+
+        box = (lat - box_lat, lon - box_lon, lat + box_lat, lon + box_lon)
+        result, indexed = timed(geo.bbox, *box, **conditions)
+        expected, brute = timed(state.query, bbox=box, **conditions)
+        assert sorted(result) == sorted(expected), "dikdörtgen sorgusu tarama sonucundan farklı"
+        times['bbox'][0].append(indexed)
+        times['bbox'][1].append(brute)
+        found['bbox'] += len(result)
+
+        result, indexed = timed(geo.nearest, lat, lon, args.k, **conditions)
+        expected, brute = timed(brute_nearest, state, lat, lon, args.k, **conditions)
+        assert [sid for sid, _ in result] == expected, "en yakın k sorgusu tarama sonucundan farklı"
+        times['nearest'][0].append(indexed)
+        times['nearest'][1].append(brute)
+        found['nearest'] += len(result)
+
+        # Filonun dışından: merkez rastgele yönde --far-km uzağa taşınır
+        angle = rng.uniform(0, 2 * np.pi)
+        far_lat = lat + np.sin(angle) * args.far_km * 1000 / geo_index.M_PER_DEG
+        far_lon = lon + np.cos(angle) * args.far_km * 1000 / geo_index.M_PER_DEG / np.cos(np.radians(CENTER[0]))
+        result, indexed = timed(geo.nearest, far_lat, far_lon, args.k, **conditions)
+        expected, brute = timed(brute_nearest, state, far_lat, far_lon, args.k, **conditions)
+        assert [sid for sid, _ in result] == expected, "uzak en yakın k sorgusu tarama sonucundan farklı"
+        times['far'][0].append(indexed)
+        times['far'][1].append(brute)
+        found['far'] += len(result)
+    return geo, rates, changed, times, found
+
+
+def stress(args):
+    """N yazıcı thread hareket ettirirken sorgular; (hareket/s, sorgu sayısı). İndeks tutarsızsa AssertionError."""
+    rng = random.Random(args.seed)
+    state = fleet_state.FleetState(capacity=args.scooters)
+    geo = geo_index.GridIndex(state, cell_m=args.cell_m, ref_lat=CENTER[0])
+    ids = [f"scooter_{i}" for i in range(args.scooters)]
+    for sid in ids:
+        state.update_location(sid, CENTER[0] + rng.uniform(-0.02, 0.02), CENTER[1] + rng.uniform(-0.02, 0.02))
+    errors = []
+    done = threading.Event()
+    step = 2 * args.cell_m / geo_index.M_PER_DEG  # Çoğu hareket hücre değiştirir
+
+    def writer(t):
+        r = random.Random(args.seed + t + 1)
+        mine = ids[t::args.threads]
+        try:
+            for _ in range(args.stress_moves):
+                sid = r.choice(mine)
+                row = state.slots[sid]
+                state.update_location(sid, state.lat[row] + r.uniform(-step, step),
+                                      state.lon[row] + r.uniform(-step, step))
+        except Exception as e:
+            errors.append(e)
+
+    queries = 0
+
+    def reader():
+        nonlocal queries
+        r = random.Random(args.seed)
+        try:
+            while not done.is_set():
+                lat, lon = CENTER[0] + r.uniform(-0.02, 0.02), CENTER[1] + r.uniform(-0.02, 0.02)
+                geo.radius(lat, lon, args.radius_m)
+                geo.bbox(lat - 0.005, lon - 0.005, lat + 0.005, lon + 0.005, locked=False)
+                geo.nearest(lat, lon, args.k)
+                geo.describe()
+                queries += 1
+        except Exception as e:
+            errors.append(e)
+
+    writers = [threading.Thread(target=writer, args=(t,)) for t in range(args.threads)]
+    query_thread = threading.Thread(target=reader)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Sık thread değişimi: yarış durumları görünür hale gelir
+    try:
+        started = time.perf_counter()
+        query_thread.start()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        query_thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not errors, f"eşzamanlı kullanımda hata: {errors[0]!r}"
+    cells = {key: set(slots) for key, slots in geo.cells.items()}
+    slot_cell = dict(geo.slot_cell)
+    geo.rebuild()
+    assert slot_cell == geo.slot_cell and cells == geo.cells, "eşzamanlı güncellemeler sonrası indeks depodan farklı"
+    return args.threads * args.stress_moves / elapsed, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mekânsal indeks güncelleme ve sorgu benchmark'ı")
+    parser.add_argument('--scooters', type=int, default=100_000)
+    parser.add_argument('--extent-km', type=float, default=33.0, help="Filonun yayıldığı kare alanın kenarı (km)")
+    parser.add_argument('--cell-m', type=float, default=geo_index.DEFAULT_CELL_M, help="Izgara hücre boyu (m)")
+    parser.add_argument('--updates', type=int, default=500_000, help="Konum güncellemesi sayısı")
+    parser.add_argument('--step-m', type=float, default=30.0, help="Güncelleme başına en fazla hareket (m)")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--radius-m', type=float, default=500.0)
+    parser.add_argument('--box-m', type=float, default=1000.0, help="Dikdörtgen sorgunun kenarı (m)")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--far-km', type=float, default=200.0, help="Uzak en yakın k sorgularının filoya uzaklığı (km)")
+    parser.add_argument('--locked', action='store_true', help="Sorgulara 'kilitli' koşulunu ekle")
+    parser.add_argument('--threads', type=int, default=0,
+                        help="Eşzamanlılık denemesi: hareket ettiren thread sayısı (0 = atla)")
+    parser.add_argument('--stress-moves', type=int, default=20_000, help="Thread başına hareket sayısı")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    geo, rates, changed, times, found = run(args)
+    ms = lambda values, p: np.percentile(values, p) * 1000
+    print(f"{args.scooters:,} scooter, {args.extent_km:g} km kare alan | {geo.describe()}")
+    print(f"Konum güncellemesi/s: indekssiz {rates['indekssiz']:,.0f} | indeksli {rates['indeksli']:,.0f} | "
+          f"{args.updates:,} güncellemede hücre değiştiren scooter: {changed:,}")
+    print("-" * 96)
+    print(f"{'SORGU':<30} | {'ORT. SONUÇ':>10} | {'İNDEKS p50':>10} | {'İNDEKS p99':>10} | "
+          f"{'TARAMA p50':>10} | {'TARAMA p99':>10}")
+    print("-" * 96)
+    labels = {'radius': f"yarıçap {args.radius_m:g} m", 'bbox': f"dikdörtgen {args.box_m:g} m",
+              'nearest': f"en yakın {args.k}", 'far': f"en yakın {args.k}, {args.far_km:g} km uzaktan"}
+    for key, (indexed, brute) in times.items():
+        label = labels[key] + (" (kilitli)" if args.locked else "")
+        print(f"{label:<30} | {found[key] / args.queries:>10.1f} | {ms(indexed, 50):>10.3f} | "
+              f"{ms(indexed, 99):>10.3f} | {ms(brute, 50):>10.3f} | {ms(brute, 99):>10.3f}")
+    print("-" * 96)
+    print("Süreler ms cinsindendir. TARAMA: aynı sorgunun tüm filo üzerinde vektörel taraması (sonuçlar aynı).")
+    if args.threads:
+        rate, queries = stress(args)
+        print(f"Eşzamanlılık: {args.threads} thread x {args.stress_moves:,} hareket ({rate:,.0f}/s) sırasında "
+              f"{queries:,} sorgu turu; hata yok, indeks depoyla tutarlı.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Log profillerinin sunucu verimi ve RTT üzerindeki etkisini ölçer.
+
+Her profil (bkz. log_config.py) için asenkron TCP sunucusu ayrı bir proseste
+SCOOTER_LOG_PROFILE ile başlatılır; log çıktısı gerçek bir dosyaya yazılır.
+Bu proses N bağlantı açar, süre boyunca konum mesajlarını olabildiğince hızlı
+basar ve sunucunun her komutuna anında ACK döner. Ölçülenler:
+  * sunucunun işlediği konum mesajı / saniye (sunucu iz dosyasından)
+  * ACK RTT p50 / p99 (sunucunun kendi hesapladığı)
+  * mesaj başına sunucu CPU süresi ve yazılan log miktarı
+
+Örnek:
+    python benchmark_logging.py --profiles verbose async sampled quiet --connections 50 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import log_config
+from benchmark_tcp_server import open_fleet, proc_cpu_seconds
+
+
+async def flood(transports, duration, max_buffer=64 * 1024):
+    """Süre boyunca her bağlantıya sırayla konum mesajı yazar; tamponu dolan bağlantı atlanır."""
+    payloads = [(json.dumps({'type': 'location', 'scooter_id': f"bench_{i}",
+                             'location': {'lat': 41.0082, 'lon': 28.9784}, 'battery': 87.5}) + '\n').encode()
+                for i in range(len(transports))]
+    sent = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for transport, payload in zip(transports, payloads):
+            if not transport.is_closing() and transport.get_write_buffer_size() < max_buffer:
+                transport.write(payload)
+                sent += 1
+        await asyncio.sleep(0)
+    return sent
+
+
+async def run_case(profile, args):
+    workdir = tempfile.mkdtemp(prefix="bench_log_")
+    results_file = os.path.join(workdir, "server")
+    log_path = os.path.join(workdir, "server.log")
+    env = dict(os.environ, **{log_config.PROFILE_ENV: profile})
+    if args.sample_rate is not None:
+        env[log_config.SAMPLE_ENV] = str(args.sample_rate)
+    with open(log_path, 'w') as log_file:
+        proc = subprocess.Popen(
+            [sys.executable, "tcp_server.py", "--mode", "async", "--port", str(args.port),
+             "--command-interval", str(args.command_interval), "--results-file", results_file],
+            stdout=subprocess.DEVNULL, stderr=log_file, env=env)
+        await asyncio.sleep(1.5)
+
+        stats = {'held': 0, 'closed': 0, 'failed': 0, 'command_seen': asyncio.Event()}
+        transports = await open_fleet(args.port, args.connections, stats)
+        await asyncio.sleep(0.5)
+
+        cpu_start = proc_cpu_seconds(proc.pid)
+        sent = await flood(transports, args.duration)
+        await asyncio.sleep(1.0)  # Sunucunun tamponda kalanları işlemesi için
+        cpu = proc_cpu_seconds(proc.pid) - cpu_start
+
+        for t in transports:
+            t.close()
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    location_ts = trace.select(direction='rx', msg_type='location')['ts_ns']
+    span = (location_ts.max() - location_ts.min()) / 1e9 if len(location_ts) > 1 else float('nan')
+    rtts = trace.latencies(direction='rx', msg_type='ack')
+    return {
+        'profile': profile,
+        'sent': sent,
+        'processed': len(location_ts),
+        'rate': len(location_ts) / span if span else float('nan'),
+        'rtt_p50_ms': np.percentile(rtts, 50) * 1000 if len(rtts) else float('nan'),
+        'rtt_p99_ms': np.percentile(rtts, 99) * 1000 if len(rtts) else float('nan'),
+        'cpu_us_per_msg': cpu / len(location_ts) * 1e6 if len(location_ts) else float('nan'),
+        'log_mb': os.path.getsize(log_path) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Log profili verim/RTT benchmark'ı")
+    parser.add_argument('--profiles', nargs='+', choices=list(log_config.PROFILES),
+                        default=['verbose', 'async', 'sampled', 'quiet'])
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--command-interval', type=float, default=0.2, help="Sunucu komut periyodu (sn)")
+    parser.add_argument('--sample-rate', type=float, default=None, help="'sampled' profilinin oranını değiştirir")
+    parser.add_argument('--port', type=int, default=9867)
+    args = parser.parse_args()
+
+    rows = [asyncio.run(run_case(p, args)) for p in args.profiles]
+
+    print("-" * 96)
+    print(f"{'PROFİL':<8} | {'GÖNDERİLEN':>10} | {'İŞLENEN':>9} | {'MSG/s':>9} | {'RTT p50 (ms)':>12} | "
+          f"{'RTT p99 (ms)':>12} | {'CPU µs/msg':>10} | {'LOG (MB)':>8}")
+    print("-" * 96)
+    for r in rows:
+        print(f"{r['profile']:<8} | {r['sent']:>10} | {r['processed']:>9} | {r['rate']:>9,.0f} | "
+              f"{r['rtt_p50_ms']:>12.2f} | {r['rtt_p99_ms']:>12.2f} | {r['cpu_us_per_msg']:>10.1f} | "
+              f"{r['log_mb']:>8.1f}")
+    print("-" * 96)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Metrik kaydı için çekişme (contention) benchmark'ı.
+
+Aynı histograma çok sayıda thread'in eşzamanlı kayıt yaptığı durumu ölçer:
+  * sharded: metrics.Histogram (thread başına parça, kayıt yolunda kilit yok)
+  * locked:  tüm thread'lerin tek bir ortak kilit altında ortak kovalara yazması
+  * shared:  kilitsiz ortak kovalar (GIL'e güvenen eski yaklaşım); free-threaded
+             Python'da kayıp sayımlar burada görülür
+
+Her thread sayısı için saniyede kayıt ve beklenen ile sayılan kayıt farkı
+(KAYIP) raporlanır.
+
+Örnek:
+    python benchmark_metrics.py --threads 1 4 16 64 --records 200000
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+
+import metrics
+
+
+class LockedHistogram(metrics.Histogram):
+    """Tek ortak kilit: her kayıt tüm thread'lerle aynı kilidi yarışarak alır."""
+
+    def record(self, value):
+        raw = int(value * self._scale)
+        raw = 0 if raw < 0 else (self._max_raw if raw > self._max_raw else raw)
+        idx = self._index(raw)
+        with self._lock:
+            base = self._base
+            base.counts[idx] = base.counts.get(idx, 0) + 1
+            base.count += 1
+            base.total += value
+
+
+class SharedHistogram(metrics.Histogram):
+    """Kilitsiz ortak kovalar: sayımın doğruluğu GIL'e bağlıdır."""
+
+    def record(self, value):
+        raw = int(value * self._scale)
+        raw = 0 if raw < 0 else (self._max_raw if raw > self._max_raw else raw)
+        idx = self._index(raw)
+        base = self._base
+        base.counts[idx] = base.counts.get(idx, 0) + 1
+        base.count += 1
+        base.total += value
+
+
+VARIANTS = {
+    'sharded': metrics.latency_histogram,
+    'locked': lambda name: LockedHistogram(name, unit='s', resolution=1e-6),
+    'shared': lambda name: SharedHistogram(name, unit='s', resolution=1e-6),
+}
+
+
+def run_case(variant, threads, records):
+    hist = VARIANTS[variant](variant)
+    values = [random.expovariate(100) for _ in range(4096)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        record = hist.record
+        barrier.wait()
+        for i in range(records):
+            record(values[i & 4095])
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    expected = threads * records
+    counted = sum(hist._snapshot().counts.values())
+    return {
+        'variant': variant,
+        'threads': threads,
+        'rate': expected / elapsed,
+        'elapsed': elapsed,
+        'lost': expected - counted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrik kaydı çekişme benchmark'ı")
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--records', type=int, default=200_000, help="Thread başına kayıt sayısı")
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    args = parser.parse_args()
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]} | GIL: {'açık' if gil else 'kapalı (free-threaded)'}")
+
+    rows = [run_case(v, n, args.records) for n in args.threads for v in args.variants]
+
+    print("-" * 62)
+    print(f"{'VARYANT':<8} | {'THREAD':>6} | {'KAYIT/s':>12} | {'SÜRE (s)':>9} | {'KAYIP':>10}")
+    print("-" * 62)
+    for r in rows:
+        print(f"{r['variant']:<8} | {r['threads']:>6} | {r['rate']:>12,.0f} | {r['elapsed']:>9.3f} | {r['lost']:>10}")
+    print("-" * 62)
+
+
+if __name__ == "__main__":
+    main()
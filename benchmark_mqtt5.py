@@ -0,0 +1,114 @@
+"""
+MQTT 3.1.1 ile MQTT 5'in (topic alias, komut ömrü, user property damgaları) kablodaki bayt maliyetini karşılaştırır.
+
+Gömülü broker (mqtt_broker.py) bu proseste çalışır; mqtt_server.py ve
+fleet.py --protocol mqtt --scenario all ayrı proseslerde aynı --mqtt-version
+ve --encoding ile başlatılır. Broker'ın bayt sayaçlarından ölçülenler:
+  * GİRİŞ: istemcilerden broker'a gelen tüm bayt / gelen PUBLISH sayısı
+    (CONNECT, SUBSCRIBE, PINGREQ gibi kontrol paketleri de dahil)
+  * ÇIKIŞ: broker'dan abonelere iletilen PUBLISH başına bayt
+  * her iki yönün MQTT 3.1.1'e göre azalması (aynı format için)
+  * komut RTT p50 / p99 (MQTT 5'te damgalar user property'lerde taşınır)
+
+Örnek:
+    python benchmark_mqtt5.py --scooters 500 --duration 15
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt5
+import mqtt_broker
+import wire_format
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_case(version, encoding, args):
+    broker = mqtt_broker.start_in_thread(port=0)
+    workdir = tempfile.mkdtemp(prefix="bench_mqtt5_")
+    results_file = os.path.join(workdir, "server")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(broker.port),
+         "--mqtt-version", str(version), "--command-interval", str(args.command_interval),
+         "--results-file", results_file, "--log-profile", "quiet"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5)
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", "mqtt", "--host", "127.0.0.1",
+             "--port", str(broker.port), "--scooters", str(args.scooters), "--scenario", "all",
+             "--encoding", encoding, "--mqtt-version", str(version),
+             "--location-interval", str(args.interval), "--status-interval", str(args.interval),
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", "0"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 60)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        broker.stop()
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    registry = broker.registry
+    pub_in = registry.get('BrokerPublishIn').value
+    pub_out = registry.get('BrokerPublishOut').value
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'version': version, 'encoding': encoding, 'pub_in': pub_in,
+        'in_per_msg': registry.get('BrokerBytesIn').value / pub_in if pub_in else float('nan'),
+        'out_per_msg': registry.get('BrokerBytesOut').value / pub_out if pub_out else float('nan'),
+        'acks': len(rtt), 'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT 3.1.1 / 5 kablodaki bayt benchmark'ı")
+    parser.add_argument('--versions', type=int, nargs='+', choices=mqtt5.MQTT_VERSIONS, default=list(mqtt5.MQTT_VERSIONS))
+    parser.add_argument('--encodings', nargs='+', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY])
+    parser.add_argument('--scooters', type=int, default=500)
+    parser.add_argument('--interval', type=float, default=1.0, help="Konum ve durum periyodu (sn)")
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = [run_case(v, e, args) for e in args.encodings for v in args.versions]
+    baseline = {r['encoding']: r for r in rows if r['version'] == mqtt5.MQTT_311}
+
+    def reduction(r, key):
+        base = baseline.get(r['encoding'])
+        return (1 - r[key] / base[key]) * 100 if base else float('nan')
+
+    print(f"{args.scooters} scooter, {args.interval:g} sn'de bir konum ve durum, "
+          f"{args.command_interval:g} sn'de bir filo komutu | süre: {args.duration:g} sn")
+    print("-" * 100)
+    print(f"{'MQTT':>5} | {'FORMAT':<6} | {'PUB IN':>7} | {'GİRİŞ B/msg':>11} | {'AZALMA %':>8} | "
+          f"{'ÇIKIŞ B/msg':>11} | {'AZALMA %':>8} | {'ACK':>6} | {'RTT p50':>8} | {'RTT p99':>8}")
+    print("-" * 100)
+    for r in rows:
+        name = '5' if r['version'] == mqtt5.MQTT_5 else '3.1.1'
+        print(f"{name:>5} | {r['encoding']:<6} | {r['pub_in']:>7} | {r['in_per_msg']:>11.1f} | "
+              f"{reduction(r, 'in_per_msg'):>8.1f} | {r['out_per_msg']:>11.1f} | {reduction(r, 'out_per_msg'):>8.1f} | "
+              f"{r['acks']:>6} | {r['rtt_p50']:>8.2f} | {r['rtt_p99']:>8.2f}")
+    print("-" * 100)
+    print("AZALMA: aynı formatta MQTT 3.1.1'e göre. Süreler ms cinsindendir.")
+
+
+if __name__ == "__main__":
+    main()
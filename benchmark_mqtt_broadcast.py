@@ -0,0 +1,112 @@
+"""
+Filo geneli komutta scooter başına yayın ile grup topic'ine tek yayını karşılaştırır.
+
+Gömülü broker (mqtt_broker.py) bu proseste çalışır; mqtt_server.py
+--broadcast per-scooter|group ve fleet.py --protocol mqtt --scenario command
+ayrı proseslerde başlatılır. Sunucu her --command-interval'da tüm filoya
+'unlock' komutu gönderir. Filo boyutuna göre ölçülenler:
+  * yayın süresi: komut turunun tamamının sunucuda paho'ya teslimi
+    (iz dosyasındaki 'broadcast' olayları)
+  * ACK sayısı ve komut RTT p50 / p99
+  * sunucu ve broker CPU süresi, broker'a gelen / broker'dan çıkan PUBLISH
+    sayısı ve broker içi bekleme p99 (BrokerQueueDelay)
+Broker CPU'su bu prosesin CPU süresidir; prosesin geri kalanı ölçüm boyunca boştadır.
+
+Örnek:
+    python benchmark_mqtt_broadcast.py --scooters 100 1000 5000 --duration 15
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt_broker
+from benchmark_tcp_server import proc_cpu_seconds
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_case(scooters, mode, args):
+    broker = mqtt_broker.start_in_thread(port=0)
+    workdir = tempfile.mkdtemp(prefix="bench_bcast_")
+    results_file = os.path.join(workdir, "server")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(broker.port),
+         "--broadcast", mode, "--command-interval", str(args.command_interval), "--results-file", results_file,
+         "--max-queued", "0", "--log-profile", "quiet"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5)
+        server_cpu = proc_cpu_seconds(server.pid)
+        broker_cpu = time.process_time()
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", "mqtt", "--host", "127.0.0.1",
+             "--port", str(broker.port), "--scooters", str(scooters), "--scenario", "command",
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", "0"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 120)
+        broker_cpu = time.process_time() - broker_cpu
+        server_cpu = proc_cpu_seconds(server.pid) - server_cpu
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        broker.stop()
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    dispatch = trace.latencies(direction='tx', msg_type='broadcast')
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    registry = broker.registry
+    queue_delay = registry.get('BrokerQueueDelay')
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'scooters': scooters, 'mode': mode,
+        'dispatch_p50': pct(dispatch, 50), 'dispatch_max': dispatch.max() * 1000 if len(dispatch) else float('nan'),
+        'acks': len(rtt),
+        'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'server_cpu': server_cpu, 'broker_cpu': broker_cpu,
+        'pub_in': registry.get('BrokerPublishIn').value,
+        'pub_out': registry.get('BrokerPublishOut').value,
+        'broker_p99': queue_delay.percentile(99) * 1000 if len(queue_delay) else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT grup topic'i ile filo geneli komut benchmark'ı")
+    parser.add_argument('--scooters', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--modes', nargs='+', choices=['per-scooter', 'group'], default=['per-scooter', 'group'])
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--ramp-up', type=float, default=3.0)
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = [run_case(n, m, args) for n in args.scooters for m in args.modes]
+
+    print(f"Her {args.command_interval:g} sn'de filo geneli komut | süre: {args.duration:g} sn")
+    print("-" * 128)
+    print(f"{'SCOOTER':>7} | {'MOD':<11} | {'YAYIN p50':>9} | {'YAYIN maks':>10} | {'ACK':>7} | {'RTT p50':>8} | "
+          f"{'RTT p99':>8} | {'SUNUCU CPU':>10} | {'BROKER CPU':>10} | {'PUB IN':>7} | {'PUB OUT':>8} | "
+          f"{'BROKER p99':>10}")
+    print("-" * 128)
+    for r in rows:
+        print(f"{r['scooters']:>7} | {r['mode']:<11} | {r['dispatch_p50']:>9.2f} | {r['dispatch_max']:>10.2f} | "
+              f"{r['acks']:>7} | {r['rtt_p50']:>8.2f} | {r['rtt_p99']:>8.2f} | {r['server_cpu']:>9.2f}s | "
+              f"{r['broker_cpu']:>9.2f}s | {r['pub_in']:>7} | {r['pub_out']:>8} | {r['broker_p99']:>10.2f}")
+    print("-" * 128)
+    print("Süreler ms cinsindendir. YAYIN: bir komut turunun sunucuda yayınlanma süresi.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Gömülü broker (mqtt_broker.py) ile harici bağımlılıksız MQTT benchmark'ı.
+
+Broker bu proseste bir arka plan thread'inde çalışır; mqtt_server.py ve
+fleet.py --protocol mqtt ayrı proseslerde ona bağlanır. Her filo boyutu
+için ayrı bir broker açılır ve ölçülenler:
+  * komut ACK'lerinin RTT p50 / p99 ve downlink p99 değerleri (sunucu iz dosyasından)
+  * broker içi bekleme: PUBLISH'in alınmasından aboneye yazılmasına kadar (BrokerQueueDelay)
+  * broker'a gelen / broker'dan çıkan / atılan PUBLISH sayıları
+
+RTT'den broker beklemesi çıkarıldığında kalan kısım ağ, istemci ve sunucu
+tarafındaki süredir.
+
+Örnek:
+    python benchmark_mqtt_broker.py --scooters 50 200 1000 --duration 10
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt_broker
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_case(scooters, args):
+    broker = mqtt_broker.start_in_thread(port=0, max_queued=args.max_queued)
+    workdir = tempfile.mkdtemp(prefix="bench_mqtt_")
+    results_file = os.path.join(workdir, "server")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(broker.port),
+         "--command-interval", str(args.command_interval), "--results-file", results_file, "--log-profile", "quiet"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5)
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", "mqtt", "--host", "127.0.0.1",
+             "--port", str(broker.port), "--scooters", str(scooters), "--scenario", "all",
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", str(args.exec_time)],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 60)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        broker.stop()
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    downlink = trace.latencies('downlink', direction='rx', msg_type='ack')
+    registry = broker.registry
+    queue_delay = registry.get('BrokerQueueDelay')
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'scooters': scooters,
+        'acks': len(rtt),
+        'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'down_p99': pct(downlink, 99),
+        'broker_p50': queue_delay.percentile(50) * 1000 if len(queue_delay) else float('nan'),
+        'broker_p99': queue_delay.percentile(99) * 1000 if len(queue_delay) else float('nan'),
+        'pub_in': registry.get('BrokerPublishIn').value,
+        'pub_out': registry.get('BrokerPublishOut').value,
+        'dropped': registry.get('BrokerDropped').value,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Gömülü MQTT broker ile uçtan uca benchmark")
+    parser.add_argument('--scooters', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    parser.add_argument('--exec-time', default='0.01', help="Scooter tarafı komut yürütme süresi")
+    parser.add_argument('--max-queued', type=int, default=mqtt_broker.DEFAULT_MAX_QUEUED)
+    args = parser.parse_args()
+
+    rows = [run_case(n, args) for n in args.scooters]
+
+    print("-" * 112)
+    print(f"{'SCOOTER':>7} | {'ACK':>6} | {'RTT p50 (ms)':>12} | {'RTT p99 (ms)':>12} | {'DOWN p99 (ms)':>13} | "
+          f"{'BROKER p50':>10} | {'BROKER p99':>10} | {'PUB IN':>8} | {'PUB OUT':>8} | {'ATILAN':>6}")
+    print("-" * 112)
+    for r in rows:
+        print(f"{r['scooters']:>7} | {r['acks']:>6} | {r['rtt_p50']:>12.2f} | {r['rtt_p99']:>12.2f} | "
+              f"{r['down_p99']:>13.2f} | {r['broker_p50']:>10.3f} | {r['broker_p99']:>10.3f} | "
+              f"{r['pub_in']:>8} | {r['pub_out']:>8} | {r['dropped']:>6}")
+    print("-" * 112)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+MQTT 5 paylaşımlı abonelikle worker sayısına göre sunucunun telemetri alım hızını ölçer.
+
+Gömülü broker (mqtt_broker.py) bu proseste çalışır; mqtt_server.py --workers N
+ve fleet.py --protocol mqtt --scenario all ayrı proseslerde başlatılır. Filo
+kısa konum/durum periyotlarıyla telemetri basar; broker telemetriyi
+$share/<grup>/scooter/+/<tür> aboneliğindeki worker'lara sırayla dağıtır.
+Worker sayısına göre ölçülenler (birleştirilmiş iz dosyalarından):
+  * sunucuya ulaşan telemetri ve alım hızı (ilk ve son mesaj arası, mesaj/sn)
+  * filonun yayınladığına göre alınan oran (broker'a gelen PUBLISH'ler ile)
+  * en çok ve en az mesaj alan worker'ın payı (dağıtımın dengesi)
+  * komut RTT p50 / p99 (kontrol düzlemi worker 0'dadır)
+  * broker içi bekleme p99 (BrokerQueueDelay)
+Alım hızı ancak prosesler ayrı çekirdeklerde çalışabiliyorsa worker sayısıyla artar.
+
+Örnek:
+    python benchmark_mqtt_ingest.py --workers 1 2 4 --scooters 1000 --interval 0.2 --duration 15
+"""
+import argparse
+import collections
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt_broker
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TELEMETRY = ('location', 'status')
+
+
+def run_case(workers, args):
+    broker = mqtt_broker.start_in_thread(port=0)
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    results_file = os.path.join(workdir, "server")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(broker.port),
+         "--workers", str(workers), "--command-interval", str(args.command_interval),
+         "--results-file", results_file, "--max-queued", "0", "--log-profile", "quiet"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5 + 0.3 * workers)
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", "mqtt", "--host", "127.0.0.1",
+             "--port", str(broker.port), "--scooters", str(args.scooters), "--scenario", "all",
+             "--location-interval", str(args.interval), "--status-interval", str(args.interval),
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", "0"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 120)
+        time.sleep(1.0)  # Broker ve worker kuyruklarında kalanlar işlensin
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        broker.stop()
+
+    files = event_trace.trace_files(results_file)
+    trace = event_trace.load(files)
+    rx = trace.select(direction='rx', msg_type=TELEMETRY)['ts_ns']
+    span = (rx.max() - rx.min()) / 1e9 if len(rx) > 1 else float('nan')
+    per_worker = collections.Counter()
+    for path in files:
+        part = event_trace.load([path])
+        per_worker[path] = len(part.select(direction='rx', msg_type=TELEMETRY))
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    registry = broker.registry
+    queue_delay = registry.get('BrokerQueueDelay')
+    # Filonun yayınları: broker'a gelen tüm PUBLISH'lerden sunucunun komut ve register_ack'leri çıkarılır
+    server_tx = len(trace.select(direction='tx', msg_type=('command', 'register_ack')))
+    fleet_tx = registry.get('BrokerPublishIn').value - server_tx
+    fleet_telemetry = fleet_tx - len(trace.select(direction='rx', msg_type=('register', 'ack')))
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    total = sum(per_worker.values())
+    return {
+        'workers': workers, 'received': len(rx),
+        'rate': (len(rx) - 1) / span if span else float('nan'),
+        'ratio': len(rx) / fleet_telemetry * 100 if fleet_telemetry > 0 else float('nan'),
+        'share_max': max(per_worker.values()) / total * 100 if total else float('nan'),
+        'share_min': min(per_worker.values()) / total * 100 if total else float('nan'),
+        'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'broker_p99': queue_delay.percentile(99) * 1000 if len(queue_delay) else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT paylaşımlı abonelik alım hızı benchmark'ı")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--scooters', type=int, default=1000)
+    parser.add_argument('--interval', type=float, default=0.2, help="Konum ve durum periyodu (sn)")
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--ramp-up', type=float, default=3.0)
+    parser.add_argument('--command-interval', type=float, default=2.0, help="Sunucu komut periyodu (sn)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = [run_case(w, args) for w in args.workers]
+
+    print(f"{args.scooters} scooter, {args.interval:g} sn'de bir konum ve durum | süre: {args.duration:g} sn")
+    print("-" * 96)
+    print(f"{'WORKER':>6} | {'ALINAN':>8} | {'MESAJ/s':>8} | {'ALINAN %':>8} | {'EN ÇOK %':>8} | {'EN AZ %':>7} | "
+          f"{'RTT p50':>8} | {'RTT p99':>8} | {'BROKER p99':>10}")
+    print("-" * 96)
+    for r in rows:
+        print(f"{r['workers']:>6} | {r['received']:>8} | {r['rate']:>8,.0f} | {r['ratio']:>8.2f} | "
+              f"{r['share_max']:>8.1f} | {r['share_min']:>7.1f} | {r['rtt_p50']:>8.2f} | {r['rtt_p99']:>8.2f} | "
+              f"{r['broker_p99']:>10.2f}")
+    print("-" * 96)
+    print("Süreler ms cinsindendir. EN ÇOK / EN AZ: worker'ların aldığı telemetri payı.")
+
+
+if __name__ == "__main__":
+    main()
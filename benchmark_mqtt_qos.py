@@ -0,0 +1,115 @@
+"""
+Komutlar için MQTT QoS seviyesinin verim ve gecikme maliyetini ölçer.
+
+Gömülü broker (mqtt_broker.py) bu proseste çalışır; mqtt_server.py ve
+fleet.py --protocol mqtt --scenario command ayrı proseslerde aynı
+--qos-command ve --max-inflight değerleriyle başlatılır. Sunucu her
+--command-interval'da tüm filoya 'unlock' komutu yayınlar. Sunucu iz
+dosyasından ölçülenler:
+  * ACK'lenen komut / saniye ve teslim oranı (ACK'lenen / gönderilen); filo
+    kapanmadan --grace saniye öncesine kadar gönderilen komutlar sayılır
+  * komut RTT p50 / p99 (yayın çağrısından ACK'in alınmasına kadar; paho
+    penceresinde bekleme dahil)
+  * yayın tamamlanma süresi p50 / p99: publish() çağrısından on_publish'e
+    (QoS 0: sokete yazılma, QoS 1: PUBACK, QoS 2: PUBCOMP)
+
+Örnek:
+    python benchmark_mqtt_qos.py --qos 0 1 2 --max-inflight 20 --scooters 500 --duration 15
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import clock
+import event_trace
+import mqtt_broker
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_case(qos, inflight, args):
+    broker = mqtt_broker.start_in_thread(port=0)
+    workdir = tempfile.mkdtemp(prefix="bench_qos_")
+    results_file = os.path.join(workdir, "server")
+    qos_args = ["--qos-command", str(qos), "--max-inflight", str(inflight), "--max-queued", str(args.max_queued)]
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(broker.port),
+         "--command-interval", str(args.command_interval), "--results-file", results_file,
+         "--log-profile", "quiet", *qos_args],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1.5)
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", "mqtt", "--host", "127.0.0.1",
+             "--port", str(broker.port), "--scooters", str(args.scooters), "--scenario", "command",
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", "0", *qos_args],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 60)
+        # Monotonik saat prosesler arasında ortaktır; kapanış anında yoldaki komutlar sayılmaz
+        cutoff_ns = clock.now_ns() - int(args.grace * 1e9)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        broker.stop()
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    sent = trace.select(direction='tx', msg_type='command')['ts_ns']
+    sent = sent[sent < cutoff_ns]
+    acks = trace.select(direction='rx', msg_type='ack')
+    has_rtt = ~np.isnan(acks['latency'])  # Tekrar ACK'lerde RTT yoktur
+    acked = acks['ts_ns'][has_rtt]
+    rtt = acks['latency'][has_rtt].astype(float)
+    in_window = acked - rtt * 1e9 < cutoff_ns  # ACK'in komutu kesimden önce gönderilmiş mi
+    done = trace.latencies(direction='tx', msg_type='publish_done')
+    span = (acked.max() - acked.min()) / 1e9 if len(acked) > 1 else float('nan')
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'qos': qos, 'inflight': inflight,
+        'sent': len(sent), 'acks': int(in_window.sum()),
+        'rate': len(rtt) / span if span else float('nan'),
+        'delivery': in_window.sum() / len(sent) * 100 if len(sent) else float('nan'),
+        'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'done_p50': pct(done, 50), 'done_p99': pct(done, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT komut QoS maliyeti benchmark'ı")
+    parser.add_argument('--qos', type=int, nargs='+', choices=[0, 1, 2], default=[0, 1, 2])
+    parser.add_argument('--max-inflight', type=int, nargs='+', default=[20])
+    parser.add_argument('--max-queued', type=int, default=0, help="Sunucu/filo yayın kuyruğu sınırı (0: sınırsız)")
+    parser.add_argument('--scooters', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    parser.add_argument('--grace', type=float, default=2.0, help="Teslim oranında sayılmayan son süre (sn)")
+    args = parser.parse_args()
+
+    rows = [run_case(q, w, args) for q in args.qos for w in args.max_inflight]
+
+    print(f"{args.scooters} scooter, {args.command_interval:g} sn'de bir tüm filoya komut")
+    print("-" * 108)
+    print(f"{'QoS':>3} | {'IN-FLIGHT':>9} | {'GÖNDERİLEN':>10} | {'ACK':>7} | {'TESLİM %':>8} | {'ACK/s':>7} | "
+          f"{'RTT p50':>8} | {'RTT p99':>8} | {'YAYIN p50':>9} | {'YAYIN p99':>9}")
+    print("-" * 108)
+    for r in rows:
+        print(f"{r['qos']:>3} | {r['inflight']:>9} | {r['sent']:>10} | {r['acks']:>7} | {r['delivery']:>8.2f} | "
+              f"{r['rate']:>7,.0f} | {r['rtt_p50']:>8.2f} | {r['rtt_p99']:>8.2f} | {r['done_p50']:>9.2f} | "
+              f"{r['done_p99']:>9.2f}")
+    print("-" * 108)
+    print("Süreler ms cinsindendir. YAYIN: publish() çağrısından broker onayına (on_publish) kadar.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Hücresel ağ profilleri altında TCP, UDP ve MQTT'nin komut RTT'sini ve telemetri teslimini karşılaştırır.
+
+Ağ bozma proxy'si (netem_proxy.py) bu proseste çalışır ve filo ile sunucu
+arasına girer; sunucu (MQTT'de broker) bozulmamış "veri merkezi" tarafıdır:
+    tcp   tcp_server.py --mode async   <- proxy (tcp) <- fleet.py --protocol tcp
+    udp   udp_server.py                <- proxy (udp) <- fleet.py --protocol udp
+    mqtt  mqtt_broker.py (bu proseste) <- proxy (tcp) <- fleet.py --protocol mqtt
+          mqtt_server.py broker'a doğrudan bağlanır
+WebSocket de TCP üzerinde çalıştığı için aynı tcp proxy'siyle bozulabilir
+(netem_proxy.py --mode tcp --target 127.0.0.1:8765); main.py'nin portu ve
+komut periyodu sabit olduğu için bu benchmark'a dahil değildir.
+Profil ve protokole göre ölçülenler (sunucu iz dosyasından ve proxy sayaçlarından):
+  * sunucuya ulaşan telemetri; 'none' profiline göre oranı
+  * ACK sayısı ve komut RTT p50 / p99 (sunucu -> scooter -> sunucu)
+  * proxy'nin düşürdüğü paket, TCP yeniden iletimi, kopma ve kapatılan bağlantı sayısı
+
+Örnek:
+    python benchmark_netem.py --profiles none 3g lte-urban tunnel-dropout --scooters 200 --duration 20
+"""
+import argparse
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt_broker
+import netem_proxy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROTOCOLS = ('tcp', 'udp', 'mqtt')
+TELEMETRY = ('location', 'status')
+
+
+def start_server(protocol, port, results_file, args, workdir):
+    """(sunucu prosesi, proxy hedefi, gömülü broker ya da None)"""
+    broker = None
+    if protocol == 'tcp':
+        cmd = [os.path.join(HERE, "tcp_server.py"), "--mode", "async", "--port", str(port)]
+    elif protocol == 'udp':
+        cmd = [os.path.join(HERE, "udp_server.py"), "--port", str(port)]
+    else:
+        broker = mqtt_broker.start_in_thread(port=0)
+        port = broker.port
+        cmd = [os.path.join(HERE, "mqtt_server.py"), "--broker", "127.0.0.1", "--port", str(port)]
+    server = subprocess.Popen(
+        [sys.executable, *cmd, "--command-interval", str(args.command_interval), "--results-file", results_file,
+         "--log-profile", "quiet"],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return server, ('127.0.0.1', port), broker
+
+
+def run_case(profile, protocol, args):
+    workdir = tempfile.mkdtemp(prefix="bench_netem_")
+    results_file = os.path.join(workdir, "server")
+    server, target, broker = start_server(protocol, args.port, results_file, args, workdir)
+    mode = 'udp' if protocol == 'udp' else 'tcp'
+    proxy = netem_proxy.start_in_thread(mode, target, profile, seed=args.seed)
+    try:
+        time.sleep(1.5)
+        subprocess.run(
+            [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", protocol, "--host", "127.0.0.1",
+             "--port", str(proxy.port), "--scooters", str(args.scooters), "--scenario", "all",
+             "--location-interval", str(args.interval), "--status-interval", str(args.interval),
+             "--ramp-up", str(args.ramp_up), "--duration", str(args.duration), "--exec-time", "0"],
+            cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=args.duration + 120)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        proxy.stop()
+        if broker is not None:
+            broker.stop()
+
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    registry = proxy.registry
+
+    def pct(values, p):
+        return np.percentile(values, p) * 1000 if len(values) else float('nan')
+
+    return {
+        'profile': profile.name, 'protocol': protocol,
+        'telemetry': len(trace.select(direction='rx', msg_type=TELEMETRY)),
+        'acks': len(rtt), 'rtt_p50': pct(rtt, 50), 'rtt_p99': pct(rtt, 99),
+        'dropped': registry.get('ProxyDropped').value, 'retransmits': registry.get('ProxyRetransmits').value,
+        'flaps': registry.get('ProxyFlaps').value, 'resets': registry.get('ProxyResets').value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hücresel ağ profilleri altında protokol benchmark'ı")
+    parser.add_argument('--profiles', type=netem_proxy.profile_arg, nargs='+',
+                        default=[netem_proxy.PROFILES[p] for p in ('none', '3g', 'lte-urban', 'tunnel-dropout')])
+    parser.add_argument('--protocols', nargs='+', choices=PROTOCOLS, default=list(PROTOCOLS))
+    parser.add_argument('--scooters', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=1.0, help="Konum ve durum periyodu (sn)")
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    parser.add_argument('--port', type=int, default=9881, help="TCP/UDP sunucu portu")
+    parser.add_argument('--seed', type=int, default=1, help="Proxy rastgele tohumu (tüm koşularda aynı)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rows = [run_case(p, proto, args) for proto in args.protocols for p in args.profiles]
+    baseline = {r['protocol']: r for r in rows if r['profile'] == 'none'}
+
+    def delivered(r):
+        base = baseline.get(r['protocol'])
+        return r['telemetry'] / base['telemetry'] * 100 if base and base['telemetry'] else float('nan')
+
+    print(f"{args.scooters} scooter, {args.interval:g} sn'de bir konum ve durum, "
+          f"{args.command_interval:g} sn'de bir komut | süre: {args.duration:g} sn")
+    for p in args.profiles:
+        print(f"  {p.describe()}")
+    print("-" * 112)
+    print(f"{'PROTOKOL':<8} | {'PROFİL':<14} | {'TELEMETRİ':>9} | {'TESLİM %':>8} | {'ACK':>6} | {'RTT p50':>8} | "
+          f"{'RTT p99':>8} | {'DÜŞEN':>6} | {'YENİDEN':>7} | {'KOPMA':>5} | {'RESET':>5}")
+    print("-" * 112)
+    for r in rows:
+        print(f"{r['protocol']:<8} | {r['profile']:<14} | {r['telemetry']:>9} | {delivered(r):>8.1f} | "
+              f"{r['acks']:>6} | {r['rtt_p50']:>8.2f} | {r['rtt_p99']:>8.2f} | {r['dropped']:>6} | "
+              f"{r['retransmits']:>7} | {r['flaps']:>5} | {r['resets']:>5}")
+    print("-" * 112)
+    print("TESLİM: aynı protokolün 'none' profiline göre. Süreler ms cinsindendir. "
+          "YENİDEN: TCP'de kayıp yerine yeniden iletim gecikmesi uygulanan segment.")
+
+
+if __name__ == "__main__":
+    main()
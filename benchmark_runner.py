@@ -0,0 +1,285 @@
+"""
+Tüm protokolleri uçtan uca, aynı koşullarda ve tek bir koşu kimliğiyle çalıştıran benchmark düzenleyicisi.
+
+Her (protokol, senaryo) çifti için:
+  1. sunucu ayrı proseste başlatılır ve portu dinlemeye başlayana kadar beklenir
+        tcp        tcp_server.py --mode async
+        udp        udp_server.py
+        websocket  main.py server
+        mqtt       mqtt_broker.py (bu proseste, gömülü) + mqtt_server.py
+  2. fleet.py --scooters N aynı senaryoyla sabit süre (--duration) ya da
+     sabit mesaj sayısı (--messages; süre üst sınır olarak kalır) çalışır;
+     --rate ile filo açık döngüde sabit toplam hızda gönderir (bkz. fleet.py)
+  3. sunucu SIGTERM ile düzgünce kapatılır, iz dosyası ve filo sayaçları okunur
+Tüm prosesler SCOOTER_RUN_ID ile aynı koşu kimliğini kullanır; dosyalar
+<çıktı dizini>/<koşu kimliği>/<protokol>-<senaryo>/ altına yazılır (sunucu izi,
+filo sayaçları ve her iki prosesin logları). Koşunun makine tarafından
+okunabilir özeti <çıktı dizini>/<koşu kimliği>/summary.json'dadır: ortam,
+parametreler ve her durum için filo sayaçları, sunucunun aldığı telemetri,
+ACK RTT yüzdelikleri, açık döngüde planlanan andan ölçülen telemetri
+gecikmesi, sunucu CPU süresi ve (MQTT'de) broker metrikleri.
+
+Örnek:
+    python benchmark_runner.py --scooters 200 --duration 30
+    python benchmark_runner.py --protocols tcp mqtt --scenarios command --messages 50000 --duration 120
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import event_trace
+import mqtt_broker
+import results_writer
+import wire_format
+from benchmark_tcp_server import proc_cpu_seconds
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROTOCOLS = ('tcp', 'udp', 'websocket', 'mqtt')
+SCENARIOS = ('status', 'location', 'command', 'all')
+TELEMETRY = ('location', 'status')
+PORT_OFFSETS = {'tcp': 0, 'udp': 1, 'websocket': 2}
+
+
+def server_command(protocol, port, args):
+    if protocol == 'tcp':
+        cmd = ["tcp_server.py", "--mode", "async", "--port", str(port)]
+    elif protocol == 'udp':
+        cmd = ["udp_server.py", "--port", str(port)]
+    elif protocol == 'websocket':
+        cmd = ["main.py", "server", "--port", str(port)]
+    else:
+        cmd = ["mqtt_server.py", "--broker", "127.0.0.1", "--port", str(port)]
+    return [sys.executable, os.path.join(HERE, cmd[0]), *cmd[1:], "--command-interval", str(args.command_interval),
+            "--max-scooters", str(args.scooters), "--log-profile", "quiet"]
+
+
+def wait_until_listening(protocol, port, proc, timeout):
+    """TCP tabanlı sunucu portu kabul edene kadar bekler; UDP'de sadece prosesin ayakta kaldığına bakılır."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Sunucu başlatılamadı ({protocol}), çıkış kodu {proc.returncode}")
+        if protocol == 'udp':
+            time.sleep(1.0)
+            return
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Sunucu {timeout:g} sn içinde {port} portunu dinlemedi ({protocol})")
+
+
+def stop(proc, timeout=30):
+    if proc.poll() is None:
+        proc.send_signal(signal.SIGTERM)
+    try:
+        return proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        return proc.wait()
+
+
+def metric_summary(registry):
+    """Registry'yi JSON'a yazılabilir sözlüğe çevirir (histogramlar için sayı, ortalama ve yüzdelikler)."""
+    result = {}
+    for metric in registry:
+        if hasattr(metric, 'percentile'):
+            result[metric.name] = {'count': len(metric), 'mean': metric.mean() if len(metric) else None,
+                                   **{f'p{p:g}': metric.percentile(p) for p in (50, 90, 99)}}
+        else:
+            result[metric.name] = metric.value
+    return result
+
+
+def percentiles(values):
+    return {f'p{p:g}': float(np.percentile(values, p)) if len(values) else None for p in (50, 90, 99, 99.9)}
+
+
+def run_case(protocol, scenario, args, run_dir, case=None):
+    case = case or f"{protocol}-{scenario}"
+    case_dir = os.path.join(run_dir, case)
+    os.makedirs(case_dir, exist_ok=True)
+    results_file = os.path.join(case_dir, "server")
+    broker = None
+    if protocol == 'mqtt':
+        broker = mqtt_broker.start_in_thread(port=0)
+        port = broker.port
+    else:
+        port = args.port + PORT_OFFSETS[protocol]
+
+    logging.info(f"[{case}] sunucu başlatılıyor (port {port})")
+    with open(os.path.join(case_dir, "server.log"), 'w') as server_log, \
+            open(os.path.join(case_dir, "fleet.log"), 'w') as fleet_log:
+        server = subprocess.Popen(server_command(protocol, port, args) + ["--results-file", results_file],
+                                  cwd=case_dir, stdout=server_log, stderr=subprocess.STDOUT)
+        fleet_rc = None
+        started = time.time()
+        try:
+            wait_until_listening(protocol, port, server, args.startup_timeout)
+            cpu_before = proc_cpu_seconds(server.pid)
+            fleet_cmd = [sys.executable, os.path.join(HERE, "fleet.py"), "--protocol", protocol,
+                         "--host", "127.0.0.1", "--port", str(port), "--scooters", str(args.scooters),
+                         "--scenario", scenario, "--encoding", args.encoding,
+                         "--location-interval", str(args.interval), "--status-interval", str(args.interval),
+                         "--ramp-up", str(args.ramp_up), "--duration", str(args.duration),
+                         "--max-messages", str(args.messages), "--exec-time", str(args.exec_time),
+                         "--rate", str(args.rate), "--arrival", args.arrival,
+                         "--summary-file", os.path.join(case_dir, "fleet.json")]
+            logging.info(f"[{case}] {args.scooters} scooter çalışıyor")
+            try:
+                fleet_rc = subprocess.run(fleet_cmd, cwd=case_dir, stdout=fleet_log, stderr=subprocess.STDOUT,
+                                          timeout=args.duration + args.ramp_up + 120).returncode
+            except subprocess.TimeoutExpired:
+                logging.warning(f"[{case}] filo zaman aşımına uğradı")
+            time.sleep(args.drain)  # Yolda kalan mesajlar sunucuya ulaşsın
+            server_cpu = proc_cpu_seconds(server.pid) - cpu_before
+        finally:
+            server_rc = stop(server)
+            if broker is not None:
+                broker.stop()
+        elapsed = time.time() - started
+
+    fleet_file = os.path.join(case_dir, "fleet.json")
+    fleet = None
+    if os.path.exists(fleet_file):
+        with open(fleet_file) as f:
+            fleet = json.load(f)
+    trace = event_trace.load(event_trace.trace_files(results_file))
+    rtt = trace.latencies(direction='rx', msg_type='ack')
+    telemetry_ts = trace.select(direction='rx', msg_type=TELEMETRY)['ts_ns']
+    telemetry = len(telemetry_ts)
+    span = (telemetry_ts.max() - telemetry_ts.min()) / 1e9 if telemetry > 1 else 0
+    time_to_ack = trace.latencies(direction='tx', msg_type='command_done')  # Komutun oluşturulmasından ilk ACK'e
+    failed = len(trace.select(direction='tx', msg_type='command_failed'))
+    finished = len(time_to_ack) + failed
+    result = {
+        'protocol': protocol, 'scenario': scenario, 'port': port, 'dir': case_dir,
+        'wall_time': elapsed, 'fleet_exit_code': fleet_rc, 'server_exit_code': server_rc,
+        'fleet': fleet,
+        'server': {
+            'telemetry_rx': telemetry,
+            'telemetry_rate': (telemetry - 1) / span if span else None,  # İlk ve son telemetri arası, mesaj/sn
+            'telemetry_latency': percentiles(trace.latencies(direction='rx', msg_type=TELEMETRY)),
+            'commands_tx': len(trace.select(direction='tx', msg_type='command')),
+            'acks_rx': len(rtt),
+            'rtt': percentiles(rtt),
+            'commands_done': len(time_to_ack),
+            'commands_failed': failed,
+            'command_success_rate': len(time_to_ack) / finished if finished else None,
+            'time_to_ack': percentiles(time_to_ack),
+            'cpu_seconds': server_cpu,
+        },
+    }
+    if broker is not None:
+        result['broker'] = metric_summary(broker.registry)
+    return result
+
+
+def print_table(summary):
+    print(f"Koşu: {summary['run_id']} | {summary['params']['scooters']} scooter | "
+          f"süre: {summary['params']['duration']:g} sn | mesaj sınırı: {summary['params']['messages'] or '-'}")
+    print("-" * 143)
+    print(f"{'PROTOKOL':<9} | {'SENARYO':<8} | {'BAĞLI':>6} | {'FİLO TX':>8} | {'TELEMETRİ':>9} | {'TEL p99':>8} | "
+          f"{'KOMUT':>6} | {'ACK':>6} | {'RTT p50':>8} | {'RTT p99':>8} | {'BAŞARI':>7} | {'TTA p99':>8} | "
+          f"{'CPU (s)':>7} | {'SÜRE':>6}")
+    print("-" * 143)
+    ms = lambda v: v * 1000 if v is not None else float('nan')
+    pct = lambda v: f"{v:.1%}" if v is not None else '-'
+    for r in summary['cases']:
+        if 'error' in r:
+            print(f"{r['protocol']:<9} | {r['scenario']:<8} | HATA: {r['error']}")
+            continue
+        fleet = r['fleet'] or {}
+        server = r['server']
+        print(f"{r['protocol']:<9} | {r['scenario']:<8} | {fleet.get('connected', 0):>6} | "
+              f"{fleet.get('tx_messages', 0):>8} | {server['telemetry_rx']:>9} | "
+              f"{ms(server['telemetry_latency']['p99']):>8.2f} | {server['commands_tx']:>6} | "
+              f"{server['acks_rx']:>6} | {ms(server['rtt']['p50']):>8.2f} | {ms(server['rtt']['p99']):>8.2f} | "
+              f"{pct(server['command_success_rate']):>7} | {ms(server['time_to_ack']['p99']):>8.2f} | "
+              f"{server['cpu_seconds']:>7.2f} | {fleet.get('elapsed', float('nan')):>6.1f}")
+    print("-" * 143)
+    print("TELEMETRİ / ACK: sunucunun aldığı. TEL p99: açık döngüde (--rate) planlanan gönderimden alışa. KOMUT: "
+          "sunucunun yazdığı komut olayları (MQTT grup yayınında tur başına bir). Süreler ms, SÜRE filonun çalıştığı "
+          "saniyedir. BAŞARI: süresi içinde ACK'lenen komut oranı, TTA: komutun oluşturulmasından ilk ACK'e "
+          "(kuyruk ve yeniden gönderimler dahil).")
+
+
+def build_parser(description="Tüm protokoller için uçtan uca benchmark düzenleyicisi"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--protocols', nargs='+', choices=PROTOCOLS, default=list(PROTOCOLS))
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=['all'])
+    parser.add_argument('--scooters', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30.0,
+                        help="Filo çalışma süresi (sn); --messages verilirse üst sınır")
+    parser.add_argument('--messages', type=int, default=0, help="Filo bu kadar mesaj gönderince durur (0 = sınırsız)")
+    parser.add_argument('--ramp-up', type=float, default=2.0)
+    parser.add_argument('--interval', type=float, default=1.0, help="Konum ve durum periyodu (sn)")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Açık döngü: filo geneli telemetri hızı (mesaj/sn); 0 = scooter başına --interval")
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='constant')
+    parser.add_argument('--command-interval', type=float, default=1.0, help="Sunucu komut periyodu (sn)")
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON)
+    parser.add_argument('--exec-time', default='0', help="Scooter komut işleme süresi (fleet.py --exec-time)")
+    parser.add_argument('--port', type=int, default=9891, help="Taban port (tcp +0, udp +1, websocket +2)")
+    parser.add_argument('--startup-timeout', type=float, default=15.0)
+    parser.add_argument('--drain', type=float, default=1.0, help="Filo durduktan sonra sunucuyu kapatmadan önce bekleme (sn)")
+    parser.add_argument('--output-dir', default="runs")
+    parser.add_argument('--run-id', default=None, help="Varsayılan: SCOOTER_RUN_ID ya da zaman damgası")
+    return parser
+
+
+def open_run(args):
+    """Koşu kimliğini alt proseslere aktarır, koşu dizinini açar: (koşu dizini, özet sözlüğü)."""
+    run_id = args.run_id or results_writer.make_run_id()
+    os.environ[results_writer.RUN_ID_ENV] = run_id  # Alt prosesler aynı koşu kimliğini kullanır
+    run_dir = os.path.abspath(os.path.join(args.output_dir, run_id))
+    os.makedirs(run_dir, exist_ok=True)
+    summary = {
+        'run_id': run_id,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'params': vars(args),
+        'cases': [],
+    }
+    return run_dir, summary
+
+
+def run_and_record(protocol, scenario, args, run_dir, summary, case=None):
+    """Durumu çalıştırıp özete ekler; özet her durumdan sonra yazılır, yarıda kesilen koşu da okunabilir kalır."""
+    try:
+        result = run_case(protocol, scenario, args, run_dir, case)
+    except (RuntimeError, TimeoutError) as e:
+        logging.error(f"[{case or f'{protocol}-{scenario}'}] {e}")
+        result = {'protocol': protocol, 'scenario': scenario, 'error': str(e)}
+    summary['cases'].append(result)
+    with open(os.path.join(run_dir, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return result
+
+
+def main():
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
+
+    run_dir, summary = open_run(args)
+    for protocol in args.protocols:
+        for scenario in args.scenarios:
+            run_and_record(protocol, scenario, args, run_dir, summary)
+
+    print_table(summary)
+    print(f"Özet: {os.path.join(run_dir, 'summary.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Açık döngü yükte hedef hızı artırarak her sunucunun doyma noktasını ve aşırı yükteki kuyruk gecikmesini bulur.
+
+Her protokol ve her --rates değeri için benchmark_runner.py'nin bir durumu
+çalıştırılır: sunucu başlatılır, fleet.py --rate R filo geneli sabit (ya da
+Poisson) hızda telemetri gönderir, gönderimler hiçbir yanıtı beklemez.
+Telemetri gecikmesi sunucuda mesajın planlandığı andan ölçülür (bkz.
+clock.py, coordinated omission); sunucu ya da filo geride kalırsa birikmiş
+bekleme de gecikmeye dahildir. Ölçülenler:
+  * sunucuya ulaşan telemetri hızı ve hedefe oranı
+  * planlanan andan ölçülen telemetri gecikmesi p50 / p99 / p99.9
+  * filonun planlanan an ile gerçek gönderim arasındaki gecikmesi p99
+    (yük üreticisinin kendisi doyduysa burada görünür)
+  * sunucu CPU süresi
+Ulaşan hız hedefin %95'inin altına düşen ya da p99 gecikmesi --slo-ms'i aşan
+ilk hız doyma noktası olarak işaretlenir. Tüm koşu benchmark_runner.py gibi
+runs/<koşu kimliği>/ altına yazılır (summary.json).
+
+Örnek:
+    python benchmark_saturation.py --protocols tcp udp mqtt --rates 1000 2000 4000 8000 --scooters 500 --duration 15
+"""
+import logging
+
+import benchmark_runner
+
+
+def main():
+    parser = benchmark_runner.build_parser("Açık döngü yükte doyma noktası benchmark'ı")
+    parser.add_argument('--rates', type=float, nargs='+', default=[1000, 2000, 4000, 8000],
+                        help="Denenecek filo geneli telemetri hızları (mesaj/sn)")
+    parser.add_argument('--slo-ms', type=float, default=100.0, help="Kabul edilen telemetri gecikmesi p99 (ms)")
+    parser.set_defaults(scenarios=['location'], command_interval=5.0, duration=15.0, scooters=500)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%H:%M:%S')
+
+    run_dir, summary = benchmark_runner.open_run(args)
+    rows = []
+    for protocol in args.protocols:
+        for scenario in args.scenarios:
+            for rate in args.rates:
+                args.rate = rate
+                result = benchmark_runner.run_and_record(protocol, scenario, args, run_dir, summary,
+                                                         case=f"{protocol}-{scenario}-r{rate:g}")
+                rows.append((rate, result))
+
+    ms = lambda v: v * 1000 if v is not None else float('nan')
+    print(f"Koşu: {summary['run_id']} | {args.scooters} scooter | açık döngü ({args.arrival}) | "
+          f"süre: {args.duration:g} sn | SLO p99: {args.slo_ms:g} ms")
+    print("-" * 110)
+    print(f"{'PROTOKOL':<9} | {'SENARYO':<8} | {'HEDEF/s':>8} | {'ULAŞAN/s':>8} | {'ORAN %':>6} | {'p50':>8} | "
+          f"{'p99':>8} | {'p99.9':>8} | {'FİLO GECİKME p99':>16} | {'CPU (s)':>7} |")
+    print("-" * 110)
+    saturated = set()
+    for rate, r in rows:
+        if 'error' in r:
+            print(f"{r['protocol']:<9} | {r['scenario']:<8} | {rate:>8,.0f} | HATA: {r['error']}")
+            continue
+        server = r['server']
+        latency = server['telemetry_latency']
+        achieved = server['telemetry_rate'] or 0.0
+        lag = ((r['fleet'] or {}).get('open_loop') or {}).get('lag', {})
+        key = (r['protocol'], r['scenario'])
+        mark = ''
+        if key not in saturated and (achieved < 0.95 * rate or ms(latency['p99']) > args.slo_ms):
+            saturated.add(key)
+            mark = ' <- DOYMA'
+        print(f"{r['protocol']:<9} | {r['scenario']:<8} | {rate:>8,.0f} | {achieved:>8,.0f} | "
+              f"{achieved / rate * 100:>6.1f} | {ms(latency['p50']):>8.2f} | {ms(latency['p99']):>8.2f} | "
+              f"{ms(latency['p99.9']):>8.2f} | {ms(lag.get('p99')):>16.2f} | {server['cpu_seconds']:>7.2f} |{mark}")
+    print("-" * 110)
+    print("Gecikmeler ms cinsinden, mesajın planlandığı andan sunucuya ulaşmasına kadardır.")
+
+
+if __name__ == "__main__":
+    main()
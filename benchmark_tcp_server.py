@@ -0,0 +1,200 @@
+"""
+TCP sunucu modlarını karşılaştırır: thread-per-connection (threaded) ve asyncio (async).
+
+Her mod için sunucu ayrı bir proseste başlatılır, bu proses tek bir event loop
+üzerinden N adet scooter bağlantısı açar ve şunları ölçer:
+  * Tutulan bağlantı sayısı (RTT fazında komut alabilen bağlantılar)
+  * Boşta bağlantı başına sunucu CPU süresi (/proc/<pid>/stat)
+  * Sunucu thread sayısı
+  * ACK RTT (sunucunun kendi hesapladığı, sonuç iz dosyasından okunur)
+
+Örnek:
+    python benchmark_tcp_server.py --connections 1000 5000 --idle 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import event_trace
+from sys_limits import raise_nofile_limit
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+def proc_cpu_seconds(pid):
+    """Prosesin toplam (user + system) CPU süresi."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    # utime ve stime alanları, ')' sonrasındaki 12. ve 13. alanlardır
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def proc_threads(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+
+def proc_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class ProbeScooter(asyncio.Protocol):
+    """Sadece kayıt olur, komut gelince anında ACK döner (işlem gecikmesi yok)."""
+
+    def __init__(self, scooter_id, stats):
+        self.scooter_id = scooter_id
+        self.stats = stats
+        self.transport = None
+        self.buffer = b""
+        self.commands = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write((json.dumps({'type': 'register', 'scooter_id': self.scooter_id}) + '\n').encode())
+
+    def data_received(self, data):
+        self.buffer += data
+        while b'\n' in self.buffer:
+            line, self.buffer = self.buffer.split(b'\n', 1)
+            msg = json.loads(line)
+            if msg.get('command'):
+                if self.commands == 0:
+                    self.stats['held'] += 1
+                    self.stats['command_seen'].set()
+                self.commands += 1
+                self.transport.write((json.dumps({
+                    'type': 'ack',
+                    'ack': f"command '{msg['command']}' received",
+                    'send_ns': msg.get('send_ns')
+                }) + '\n').encode())
+
+    def connection_lost(self, exc):
+        self.stats['closed'] += 1
+
+
+async def open_fleet(port, count, stats, concurrency=256):
+    """count adet bağlantı açar; kaynak port tükenmesini önlemek için 127.0.0.x adreslerine dağıtır."""
+    loop = asyncio.get_running_loop()
+    sem = asyncio.Semaphore(concurrency)
+    transports = []
+
+    async def one(i):
+        async with sem:
+            try:
+                transport, _ = await loop.create_connection(
+                    lambda: ProbeScooter(f"bench_{i}", stats), '127.0.0.1', port,
+                    local_addr=(f"127.0.{(i // 250) % 250}.{1 + i % 250}", 0))
+                transports.append(transport)
+            except OSError:
+                stats['failed'] += 1
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return transports
+
+
+def read_rtts(base):
+    return event_trace.load(event_trace.trace_files(base)).latencies(direction='rx', msg_type='ack').tolist()
+
+
+async def run_case(mode, count, port, idle_s, command_interval):
+    results_file = os.path.join(tempfile.mkdtemp(prefix="bench_tcp_"), "server")
+    proc = subprocess.Popen(
+        [sys.executable, "tcp_server.py", "--mode", mode, "--port", str(port),
+         "--command-interval", str(command_interval), "--results-file", results_file],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    await asyncio.sleep(1.0)
+
+    stats = {'held': 0, 'closed': 0, 'failed': 0, 'command_seen': asyncio.Event()}
+    ramp_start = time.perf_counter()
+    transports = await open_fleet(port, count, stats)
+    ramp_s = time.perf_counter() - ramp_start
+
+    # Boşta CPU penceresi iki komut yayını arasına yerleştirilir: ilk yayını bekle,
+    # yayın/ACK trafiğinin bitmesi için 1 sn ver, sonra ölç.
+    try:
+        await asyncio.wait_for(stats['command_seen'].wait(), timeout=command_interval * 2 + 10)
+    except asyncio.TimeoutError:
+        pass
+    await asyncio.sleep(1.0)
+    cpu_start = proc_cpu_seconds(proc.pid)
+    await asyncio.sleep(idle_s)
+    idle_cpu = proc_cpu_seconds(proc.pid) - cpu_start
+    threads = proc_threads(proc.pid)
+    rss = proc_rss_mb(proc.pid)
+
+    # RTT fazı: bir sonraki yayının da ACK'lerini topla
+    await asyncio.sleep(max(command_interval - idle_s, 0) + 2.0)
+
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+    for t in transports:
+        t.close()
+
+    rtts = read_rtts(results_file)
+    open_conns = max(len(transports), 1)
+    return {
+        'mode': mode,
+        'requested': count,
+        'opened': len(transports),
+        'held': stats['held'],
+        'ramp_s': ramp_s,
+        'threads': threads,
+        'rss_mb': rss,
+        'idle_cpu_us_per_conn_s': idle_cpu / idle_s / open_conns * 1e6,
+        'rtt_p50_ms': statistics.median(rtts) * 1000 if rtts else float('nan'),
+        'rtt_max_ms': max(rtts) * 1000 if rtts else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded vs asyncio TCP sunucu karşılaştırması")
+    parser.add_argument('--connections', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--modes', nargs='+', choices=['threaded', 'async'], default=['threaded', 'async'])
+    parser.add_argument('--port', type=int, default=9765)
+    parser.add_argument('--idle', type=float, default=10.0, help="Boşta CPU ölçüm penceresi (sn)")
+    parser.add_argument('--command-interval', type=float, default=None,
+                        help="Sunucu komut periyodu (varsayılan: boşta penceresi + 5 sn)")
+    args = parser.parse_args()
+    if args.command_interval is None:
+        args.command_interval = args.idle + 5.0
+    elif args.command_interval < args.idle + 2.0:
+        parser.error("--command-interval, boşta penceresinden en az 2 sn uzun olmalı")
+
+    limit = raise_nofile_limit()
+    print(f"Soket limiti (RLIMIT_NOFILE): {limit}")
+
+    rows = []
+    for count in args.connections:
+        for i, mode in enumerate(args.modes):
+            rows.append(asyncio.run(run_case(mode, count, args.port + i, args.idle, args.command_interval)))
+
+    print("-" * 112)
+    print(f"{'MOD':<9} | {'İSTENEN':>7} | {'AÇILAN':>7} | {'TUTULAN':>7} | {'RAMP (s)':>8} | {'THREAD':>6} | "
+          f"{'RSS (MB)':>8} | {'CPU µs/bağl/s':>13} | {'RTT p50 ms':>10} | {'RTT max ms':>10}")
+    print("-" * 112)
+    for r in rows:
+        print(f"{r['mode']:<9} | {r['requested']:>7} | {r['opened']:>7} | {r['held']:>7} | {r['ramp_s']:>8.2f} | "
+              f"{r['threads']:>6} | {r['rss_mb']:>8.1f} | {r['idle_cpu_us_per_conn_s']:>13.2f} | "
+              f"{r['rtt_p50_ms']:>10.2f} | {r['rtt_max_ms']:>10.2f}")
+    print("-" * 112)
+
+
+if __name__ == "__main__":
+    main()
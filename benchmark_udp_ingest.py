@@ -0,0 +1,145 @@
+"""
+UDP alım (ingest) kapasitesini worker sayısına göre ölçer.
+
+Sunucu udp_server.UDPWorkerPool ile bu proseste başlatılır; ayrı gönderici
+prosesleri birden çok soketten (farklı kaynak portları, böylece SO_REUSEPORT
+dağıtımı tüm worker'lara yayılır) verilen süre boyunca konum datagramı basar.
+Her worker sayısı için:
+  * gönderilen ve worker'ların işlediği datagram sayısı / saniye
+  * çekirdek sayaçlarından düşen datagramlar: /proc/net/snmp (Udp RcvbufErrors,
+    InErrors) farkı ve /proc/net/udp içindeki soket başına 'drops' sütunu
+  * ortalama batch boyutu (uyanış başına okunan datagram)
+
+Örnek:
+    python benchmark_udp_ingest.py --workers 1 2 4 --senders 2 --duration 5
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import socket
+import time
+
+import udp_server
+
+
+def read_udp_snmp():
+    """/proc/net/snmp içindeki Udp satırını {alan: değer} olarak döndürür."""
+    with open('/proc/net/snmp') as f:
+        rows = [line.split() for line in f if line.startswith('Udp:')]
+    return dict(zip(rows[0][1:], map(int, rows[1][1:])))
+
+
+def read_socket_drops(port):
+    """Verilen portu dinleyen tüm UDP soketlerinin 'drops' sütunu toplamı."""
+    total = 0
+    with open('/proc/net/udp') as f:
+        next(f)
+        for line in f:
+            cols = line.split()
+            if int(cols[1].rsplit(':', 1)[1], 16) == port:
+                total += int(cols[-1])
+    return total
+
+
+def sender(idx, port, sockets, duration, counter):
+    """Süre dolana kadar elindeki soketlerden sırayla datagram gönderir."""
+    socks = []
+    payloads = []
+    for i in range(sockets):
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.connect(('127.0.0.1', port))
+        socks.append(s)
+        payloads.append(json.dumps({
+            "scooter_id": f"bench_udp_{idx}_{i}",
+            "location": {"lat": 41.0082, "lon": 28.9784},
+            "battery": 87.5
+        }).encode())
+
+    sent = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for s, payload in zip(socks, payloads):
+            try:
+                s.send(payload)
+                sent += 1
+            except OSError:
+                pass
+    with counter.get_lock():
+        counter.value += sent
+    for s in socks:
+        s.close()
+
+
+def run_case(workers, args):
+    udp_server.latency_data.reset()
+    udp_server.bandwidth_data.reset()
+
+    pool = udp_server.UDPWorkerPool(args.port, workers, args.batch_size, log_level=logging.WARNING,
+                                    rcvbuf=args.rcvbuf)
+    pool.start()
+    time.sleep(0.5)
+
+    counter = multiprocessing.Value('q', 0)
+    snmp_before = read_udp_snmp()
+    drops_before = read_socket_drops(args.port)
+    start = time.perf_counter()
+    senders = [multiprocessing.Process(target=sender, args=(i, args.port, args.sockets, args.duration, counter))
+               for i in range(args.senders)]
+    for p in senders:
+        p.start()
+    for p in senders:
+        p.join()
+    # Tamponda kalanların işlenmesi için kısa bir süre tanınır
+    time.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    drops_after = read_socket_drops(args.port)
+    snmp_after = read_udp_snmp()
+
+    stats = pool.stop()
+    processed = sum(st['datagrams'] for st in stats)
+    batches = sum(st['batches'] for st in stats)
+    sent = counter.value
+    rcvbuf_errors = snmp_after['RcvbufErrors'] - snmp_before['RcvbufErrors']
+    return {
+        'workers': workers,
+        'sent_rate': sent / args.duration,
+        'processed_rate': processed / elapsed,
+        'drop_rate': rcvbuf_errors / sent * 100 if sent else 0.0,
+        'rcvbuf_errors': rcvbuf_errors,
+        'in_errors': snmp_after['InErrors'] - snmp_before['InErrors'],
+        'socket_drops': drops_after - drops_before,
+        'avg_batch': processed / batches if batches else 0.0,
+        'scooters': len(pool.known_clients),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SO_REUSEPORT UDP alım benchmark'ı")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--senders', type=int, default=2, help="Gönderici proses sayısı")
+    parser.add_argument('--sockets', type=int, default=16, help="Gönderici başına soket (kaynak port) sayısı")
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--rcvbuf', type=int, default=None)
+    parser.add_argument('--port', type=int, default=9866)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"CPU sayısı: {multiprocessing.cpu_count()}")
+
+    rows = [run_case(w, args) for w in args.workers]
+
+    print("-" * 104)
+    print(f"{'WORKER':>6} | {'GÖNDERİLEN/s':>12} | {'İŞLENEN/s':>10} | {'KAYIP %':>7} | {'RcvbufErr':>9} | "
+          f"{'InErr':>7} | {'SOKET DROP':>10} | {'BATCH':>6} | {'SCOOTER':>7}")
+    print("-" * 104)
+    for r in rows:
+        print(f"{r['workers']:>6} | {r['sent_rate']:>12,.0f} | {r['processed_rate']:>10,.0f} | "
+              f"{r['drop_rate']:>7.2f} | {r['rcvbuf_errors']:>9} | {r['in_errors']:>7} | "
+              f"{r['socket_drops']:>10} | {r['avg_batch']:>6.1f} | {r['scooters']:>7}")
+    print("-" * 104)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+WebSocket yayın (broadcast) tamamlanma süresini filo boyutuna göre ölçer.
+
+Sunucu bu proseste main.server_handler ile çalışır; scooter'lar ayrı bir alt
+proseste açılır. Her filo boyutu için iki yol karşılaştırılır:
+  * sequential: eski send_periodic_commands döngüsü (her sokete sırayla await send)
+  * fanout:     main.broadcast_command (bağlantı başına kuyruk, bloklamayan yayın)
+
+--stalled ile hiç okuma yapmayan (takılmış) bağlantılar eklenebilir; bu
+bağlantıların tamponu dolduğunda sıralı yol tüm filoyu bekletir.
+
+Örnek:
+    python benchmark_ws_broadcast.py --scooters 100 1000 5000 --stalled 5 --payload-bytes 8192
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import websockets
+
+import main as ws_app
+from sys_limits import raise_nofile_limit
+
+
+# --- İstemci prosesi ---
+
+async def healthy_scooter(idx, port, counter):
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{port}", open_timeout=30, max_queue=None,
+                                      local_addr=(f"127.0.{(idx // 250) % 250}.{1 + idx % 250}", 0)) as ws:
+            await ws.send(json.dumps({'type': 'register', 'scooter_id': f"bench_ws_{idx}"}))
+            async for _ in ws:
+                counter[0] += 1
+    except Exception:
+        pass
+
+
+async def stalled_scooter(idx, port):
+    """El sıkışmayı yapar, register gönderir ve bir daha hiç okumaz."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET / HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    await reader.readuntil(b"\r\n\r\n")
+
+    payload = json.dumps({'type': 'register', 'scooter_id': f"bench_stalled_{idx}"}).encode()
+    mask = os.urandom(4)
+    masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    writer.write(bytes([0x81, 0x80 | len(payload)]) + mask + masked)
+    # StreamReader tamponu dolunca okuma durur; sunucunun yazma tamponu dolmaya başlar
+    writer.transport.pause_reading()
+    await asyncio.Future()
+
+
+async def run_clients(port, count, stalled):
+    counter = [0]
+    tasks = [asyncio.create_task(stalled_scooter(i, port)) for i in range(stalled)]
+    sem = asyncio.Semaphore(200)
+
+    async def start(i):
+        async with sem:
+            tasks.append(asyncio.create_task(healthy_scooter(i, port, counter)))
+            await asyncio.sleep(0.002)
+
+    await asyncio.gather(*(start(i) for i in range(count)))
+    await asyncio.Future()
+
+
+# --- Sunucu tarafı ölçüm ---
+
+async def sequential_broadcast(message):
+    """Eski send_periodic_commands davranışı."""
+    start = time.perf_counter()
+    for scooter_ws in list(ws_app.connected_scooters):
+        try:
+            await scooter_ws.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+    return time.perf_counter() - start
+
+
+async def fanout_broadcast(command):
+    ticket = ws_app.broadcast_command(command)
+    await ticket.done
+    return ticket.elapsed
+
+
+async def wait_registered(expected, timeout):
+    deadline = time.perf_counter() + timeout
+    while len(ws_app.scooter_registry) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.2)
+    return len(ws_app.scooter_registry)
+
+
+async def run_case(mode, count, stalled, port, rounds, payload_bytes, round_timeout):
+    ws_app.connected_scooters.clear()
+    ws_app.scooter_registry.clear()
+    server = await websockets.serve(ws_app.server_handler, '127.0.0.1', port, max_queue=None)
+    proc = subprocess.Popen([sys.executable, __file__, '--role', 'clients', '--port', str(port),
+                             '--scooters', str(count), '--stalled', str(stalled)])
+    registered = await wait_registered(count + stalled, timeout=60 + count / 200)
+
+    command = {"command": "unlock", "scooter_id": "broadcast", "pad": "x" * payload_bytes}
+    times = []
+    timeouts = 0
+    for _ in range(rounds):
+        command["send_ns"] = ws_app.clock.now_ns()
+        coro = (sequential_broadcast(json.dumps(command)) if mode == 'sequential'
+                else fanout_broadcast(command))
+        try:
+            times.append(await asyncio.wait_for(coro, timeout=round_timeout))
+        except asyncio.TimeoutError:
+            timeouts += 1
+            times.append(round_timeout)
+
+    dropped = sum(o.dropped for o in ws_app.connected_scooters.values())
+    proc.kill()
+    proc.wait()
+    server.close()
+    for outbox in list(ws_app.connected_scooters.values()):
+        outbox.close()
+    await asyncio.wait_for(server.wait_closed(), timeout=10)
+    return {
+        'mode': mode, 'scooters': count, 'stalled': stalled, 'registered': registered,
+        'p50_ms': statistics.median(times) * 1000, 'max_ms': max(times) * 1000,
+        'timeouts': timeouts, 'dropped': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket yayın tamamlanma süresi benchmark'ı")
+    parser.add_argument('--role', choices=['server', 'clients'], default='server', help=argparse.SUPPRESS)
+    parser.add_argument('--scooters', type=int, nargs='+', default=[100, 1000, 3000])
+    parser.add_argument('--stalled', type=int, default=0, help="Hiç okuma yapmayan bağlantı sayısı")
+    parser.add_argument('--modes', nargs='+', choices=['sequential', 'fanout'], default=['sequential', 'fanout'])
+    parser.add_argument('--rounds', type=int, default=20, help="Filo boyutu başına yayın sayısı")
+    parser.add_argument('--payload-bytes', type=int, default=0, help="Komuta eklenecek dolgu boyutu")
+    parser.add_argument('--round-timeout', type=float, default=10.0)
+    parser.add_argument('--port', type=int, default=9865)
+    args = parser.parse_args()
+
+    raise_nofile_limit()
+    if args.role == 'clients':
+        asyncio.run(run_clients(args.port, args.scooters[0], args.stalled))
+        return
+
+    ws_app.logging.getLogger().setLevel(ws_app.logging.WARNING)
+    ws_app.logging.getLogger("websockets").setLevel(ws_app.logging.ERROR)
+
+    rows = []
+    for count in args.scooters:
+        for i, mode in enumerate(args.modes):
+            rows.append(asyncio.run(run_case(mode, count, args.stalled, args.port + i, args.rounds,
+                                             args.payload_bytes, args.round_timeout)))
+
+    print("-" * 92)
+    print(f"{'MOD':<10} | {'SCOOTER':>7} | {'TAKILI':>6} | {'KAYITLI':>7} | {'p50 (ms)':>9} | "
+          f"{'max (ms)':>9} | {'ZAMAN AŞIMI':>11} | {'ATLANAN':>7}")
+    print("-" * 92)
+    for r in rows:
+        print(f"{r['mode']:<10} | {r['scooters']:>7} | {r['stalled']:>6} | {r['registered']:>7} | "
+              f"{r['p50_ms']:>9.2f} | {r['max_ms']:>9.2f} | {r['timeouts']:>11} | {r['dropped']:>7}")
+    print("-" * 92)
+
+
+if __name__ == "__main__":
+    main()
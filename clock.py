@@ -0,0 +1,123 @@
+"""
+Monotonik nanosaniye zaman damgaları ve NTP benzeri saat farkı (offset) tahmini.
+
+Tüm ölçümler time.monotonic_ns() ile yapılır; duvar saati (time.time) NTP
+düzeltmelerinde ileri/geri atlayabildiği için gecikme hesabında kullanılmaz.
+
+Komutlar sunucunun monotonik saatiyle 'send_ns' taşır, scooter ACK'te aynen
+geri döner; RTT sadece sunucu saatiyle hesaplandığı için iki uç farklı
+makinelerde olsa da doğrudur.
+
+Tek yönlü (uplink/downlink) gecikmeler için register/register_ack üzerinden
+NTP'deki dört damgalı değişim yapılır:
+
+    scooter  register      'clock': t0                    (scooter saati)
+    sunucu   register_ack  'clock': [t0, t1, t2]          (t1 alış, t2 gönderiş; sunucu saati)
+    scooter  t3 = alış anı
+
+    offset = ((t1 - t0) + (t2 - t3)) / 2     sunucu saati - scooter saati
+    delay  = (t3 - t0) - (t2 - t1)           ağdaki gidiş-dönüş süresi
+
+Scooter bundan sonra ACK'e komutu aldığı (rx_ns) ve ACK'i gönderdiği (tx_ns)
+anları sunucu saat düzlemine çevirerek ekler; sunucu downlink = rx_ns - send_ns,
+uplink = alış - tx_ns olarak ayırır. Offset hatası en fazla delay/2'dir
+(yol asimetrisi) ve downlink'e eklenip uplink'ten düşer; toplam RTT etkilenmez.
+Offset her bağlantıda yeniden ölçülür, iki saatin sürüklenmesi (drift) ihmal edilir.
+
+Açık döngü yük üreticisi (fleet.py --rate) telemetriye mesajın planlandığı
+anı sunucu saatinde 'sched_ns' olarak ekler; sunucu gecikmeyi gerçek gönderim
+yerine bu andan ölçer (coordinated omission düzeltmesi): istemci geride
+kalırsa bekleyen süre de gecikmeye dahil olur.
+"""
+import time
+
+now_ns = time.monotonic_ns
+
+NO_DELAYS = (None, None, None)
+
+
+class ClockSync:
+    """Scooter tarafı: register_ack'teki damgalardan sunucu saatine olan farkı tutar."""
+
+    __slots__ = ('offset_ns', 'delay_ns')
+
+    def __init__(self):
+        self.offset_ns = None
+        self.delay_ns = None
+
+    def request(self):
+        """Register mesajına eklenecek t0; önceki bağlantının ölçümü geçersiz sayılır."""
+        self.offset_ns = self.delay_ns = None
+        return now_ns()
+
+    def update(self, stamps, t3_ns=None):
+        """register_ack'teki [t0, t1, t2] ile offset ve gecikmeyi hesaplar."""
+        t0, t1, t2 = stamps
+        t3 = now_ns() if t3_ns is None else t3_ns
+        self.delay_ns = (t3 - t0) - (t2 - t1)
+        self.offset_ns = ((t1 - t0) + (t2 - t3)) // 2
+        return self.offset_ns, self.delay_ns
+
+    @property
+    def synced(self):
+        return self.offset_ns is not None
+
+    def ack_fields(self, command, rx_ns):
+        """
+        Komut ACK'ine eklenecek alanlar: komuttaki send_ns (ve varsa korelasyon
+        kimliği cmd_id, bkz. command_dispatch.py) aynen, senkronsa komutun
+        alındığı ve ACK'in gönderildiği anlar sunucu saatinde.
+        """
+        fields = {'send_ns': command.get('send_ns')}
+        if command.get('cmd_id') is not None:
+            fields['cmd_id'] = command['cmd_id']
+        if self.offset_ns is not None:
+            fields['rx_ns'] = rx_ns + self.offset_ns
+            fields['tx_ns'] = now_ns() + self.offset_ns
+        return fields
+
+    def describe(self):
+        if self.offset_ns is None:
+            return "senkron değil"
+        return f"offset={self.offset_ns / 1e6:+.3f} ms, gecikme={self.delay_ns / 1e6:.3f} ms"
+
+
+def stamp_register_ack(msg, rx_ns, reg_ack=None):
+    """
+    Sunucu tarafı: register saat isteği ('clock') taşıyorsa register_ack'e
+    [t0, t1, t2] ekler (gerekirse register_ack'i oluşturur). İstek yoksa
+    reg_ack aynen döner; eski istemciler etkilenmez.
+    """
+    t0 = msg.get('clock')
+    if t0 is None:
+        return reg_ack
+    reg_ack = dict(reg_ack) if reg_ack else {'type': 'register_ack'}
+    reg_ack['clock'] = [t0, rx_ns, now_ns()]
+    return reg_ack
+
+
+def ack_delays(msg, rx_ns):
+    """
+    ACK'in sunucuya ulaştığı andaki (rtt, downlink, uplink) saniye cinsinden;
+    damgası olmayan değerler None.
+    """
+    send_ns = msg.get('send_ns')
+    if not send_ns:
+        return NO_DELAYS
+    rx = msg.get('rx_ns')
+    tx = msg.get('tx_ns')
+    return ((rx_ns - send_ns) / 1e9,
+            None if rx is None else (rx - send_ns) / 1e9,
+            None if tx is None else (rx_ns - tx) / 1e9)
+
+
+def telemetry_delay(msg, rx_ns):
+    """Telemetrinin planlanan gönderim anından ('sched_ns') alınmasına kadar geçen süre (sn); damga yoksa None."""
+    sched_ns = msg.get('sched_ns')
+    return (rx_ns - sched_ns) / 1e9 if sched_ns else None
+
+
+def describe_delays(rtt, downlink, uplink):
+    """Log satırı için 'RTT: ... | Downlink: ... | Uplink: ...' (bilinmeyenler '-')."""
+    return " | ".join(f"{name}: {'-' if value is None else f'{value * 1000:.3f} ms'}"
+                      for name, value in (('RTT', rtt), ('Downlink', downlink), ('Uplink', uplink)))
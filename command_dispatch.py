@@ -0,0 +1,442 @@
+"""
+Sunucu tarafı komut dağıtım motoru: scooter başına kuyruk, korelasyon
+kimliği, zaman çarkıyla ACK bekleme tablosu, yeniden deneme ve tamamlanma future'ı.
+
+Her komut benzersiz bir 'cmd_id' taşır; scooter ACK'te aynen geri döner
+(bkz. clock.ClockSync.ack_fields). Kimliği taşımayan ACK'ler (ikili format,
+eski istemciler) o denemenin 'send_ns' damgasıyla eşlenir; her deneme yeni
+bir send_ns alır, geç gelen eski deneme ACK'i de aynı komuta bağlanır.
+Aynı anda aynı scooter'a giden denemelerin (pencere > 1) damgaları 1 ns
+kaydırılarak tekilleştirilir.
+
+Komutlar scooter başına kuyruğa girer; bir scooter'a aynı anda en fazla
+'window' komut ACK bekler, sıradaki komut ACK gelince (ya da bekleyen komut
+düşünce) gönderilir. Kuyruk 'max_queue'yu aşarsa yeni komut düşürülür.
+Her denemenin ACK süresi dolunca (RetryPolicy.timeout, denemeyle üstel
+büyür) komut yeniden gönderilir; deneme hakkı ya da komutun son tarihi
+(deadline, kuyrukta geçen süre dahil) bitince komut başarısız sayılır.
+Zaman aşımları tek tek timer yerine karma zaman çarkında (hashed timer
+wheel) tutulur: ekleme O(1), ACK'lenen komutun zamanlayıcısı silinmez,
+tetiklendiğinde geçersiz olduğu görülüp atlanır.
+
+Sonuçlanan komut için:
+    ACK         CommandTimeToAck histogramı (komutun verilişinden ilk ACK'e), iz dosyasına 'command_done'
+    başarısız   iz dosyasına 'command_failed' (gecikme: komutun verilişinden düşüşüne)
+Aynı komutun ikinci ACK'i tekrar, süresi dolmuş komutun ACK'i geç ACK
+sayılır; ikisi de RTT'ye yazılmaz. Başarı oranı ACK'lenen / sonuçlanan.
+
+Motor kendi thread'ini açmaz: sunucu ACK'leri acknowledge() ile bildirir ve
+zaman çarkını poll() ile (run() / run_async() döngüleri) ilerletir. Gönderim
+'send(scooter_id, komut sözlüğü)' ile sunucunun kendi transport'una yapılır;
+kilit dışında çağrılır. Future'lar concurrent.futures.Future'dır
+(asyncio'da asyncio.wrap_future ile beklenir).
+
+Örnek:
+    dispatcher = Dispatcher(registry, tracer, send=server.send_command)
+    cmd = dispatcher.submit('scooter_1', 'lock')
+    cmd.future.result(timeout=10)   # ACK gelmezse CommandFailed
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+import clock
+
+QUEUED = 'queued'
+INFLIGHT = 'inflight'
+ACKED = 'acked'
+EXPIRED = 'expired'
+DROPPED = 'dropped'
+
+DEFAULT_ACK_TIMEOUT = 5.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 2.0
+DEFAULT_WINDOW = 1
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_TICK = 0.01
+
+_future_lock = threading.Lock()
+
+
+class CommandFailed(Exception):
+    """Komutun ACK'i son tarihe kadar gelmedi ya da komut kuyruğa alınamadı."""
+
+    def __init__(self, command):
+        super().__init__(f"Komut {command.id} ({command.command} -> {command.scooter_id}): {command.state}")
+        self.command = command
+
+
+class RetryPolicy:
+    """
+    Deneme başına ACK süresi ack_timeout * backoff^(deneme - 1); en fazla
+    max_retries yeniden gönderim. deadline verilmezse tüm denemelerin
+    süreleri toplamıdır.
+    """
+
+    def __init__(self, ack_timeout=DEFAULT_ACK_TIMEOUT, max_retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 deadline=None):
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.deadline = deadline if deadline is not None else sum(self.timeout(a) for a in range(1, max_retries + 2))
+
+    def timeout(self, attempt):
+        return self.ack_timeout * self.backoff ** (attempt - 1)
+
+    def describe(self):
+        return (f"ACK süresi {self.ack_timeout:g} sn (x{self.backoff:g}), en fazla {self.max_retries} yeniden "
+                f"gönderim, son tarih {self.deadline:g} sn")
+
+
+class Command:
+    __slots__ = ('id', 'scooter_id', 'command', 'fields', 'created_ns', 'deadline_ns', 'attempts', 'send_ns',
+                 'sends', 'state', 'done_ns', '_future', '_resolved')
+
+    def __init__(self, cmd_id, scooter_id, command, fields, created_ns, deadline_ns):
+        self.id = cmd_id
+        self.scooter_id = scooter_id
+        self.command = command
+        self.fields = fields
+        self.created_ns = created_ns
+        self.deadline_ns = deadline_ns
+        self.attempts = 0
+        self.send_ns = None  # Son denemenin damgası
+        self.sends = []  # Tüm denemelerin damgaları (send_ns ile eşleme için)
+        self.state = QUEUED
+        self.done_ns = None
+        self._future = None
+        self._resolved = False
+
+    def payload(self):
+        return dict(self.fields, command=self.command, cmd_id=self.id, send_ns=self.send_ns)
+
+    @property
+    def done(self):
+        return self.state in (ACKED, EXPIRED, DROPPED)
+
+    @property
+    def future(self):
+        """Komut sonuçlanınca Command ile tamamlanır; başarısızsa CommandFailed (ilk erişimde oluşturulur)."""
+        with _future_lock:
+            future = self._future
+            created = future is None
+            if created:
+                future = self._future = Future()
+            resolved = self._resolved
+        if created and resolved:
+            _complete(future, self)
+        return future
+
+    def _resolve(self):
+        # Future'ı ya burada ya da sonuçlanmadan sonra oluşturan erişim tamamlar (bir kez)
+        with _future_lock:
+            self._resolved = True
+            future = self._future
+        if future is not None:
+            _complete(future, self)
+
+
+def _complete(future, command):
+    if command.state == ACKED:
+        future.set_result(command)
+    else:
+        future.set_exception(CommandFailed(command))
+
+
+class TimerWheel:
+    """
+    Karma zaman çarkı: 'slots' kovalı, kova başına 'tick' sn. Kovaya mutlak
+    tick numarasıyla eklenir; çark turundan uzak zamanlayıcılar kovada
+    bekler ve kendi tick'i gelince tetiklenir.
+    """
+
+    def __init__(self, tick=DEFAULT_TICK, slots=1024, now_ns=None):
+        self.tick_ns = int(tick * 1e9)
+        self.slots = [[] for _ in range(slots)]
+        self.current = (now_ns or clock.now_ns()) // self.tick_ns  # Henüz işlenmemiş ilk tick
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, when_ns, item):
+        tick = max(when_ns // self.tick_ns, self.current)
+        self.slots[tick % len(self.slots)].append((tick, item))
+        self.count += 1
+
+    def advance(self, now_ns):
+        """'now_ns'e kadar süresi dolan öğeler (tetiklenme sırasında)."""
+        target = now_ns // self.tick_ns
+        if target < self.current:
+            return []
+        fired = []
+        n = len(self.slots)
+        for tick in range(self.current, self.current + min(target - self.current + 1, n)):
+            bucket = self.slots[tick % n]
+            if not bucket:
+                continue
+            keep = [entry for entry in bucket if entry[0] > target]
+            if len(keep) != len(bucket):
+                fired.extend(sorted((entry for entry in bucket if entry[0] <= target), key=lambda e: e[0]))
+                self.slots[tick % n] = keep
+        self.count -= len(fired)
+        self.current = target + 1
+        return [item for _, item in fired]
+
+
+class Dispatcher:
+    def __init__(self, registry, tracer=None, policy=None, send=None, window=DEFAULT_WINDOW,
+                 max_queue=DEFAULT_MAX_QUEUE, tick=DEFAULT_TICK):
+        self.tracer = tracer
+        self.policy = policy or RetryPolicy()
+        self.send = send  # send(scooter_id, komut sözlüğü); sunucu kendi transport'unu bağlar
+        self.window = DEFAULT_WINDOW
+        self.max_queue = DEFAULT_MAX_QUEUE
+        self.configure(window=window, max_queue=max_queue)  # Pencere doğrulaması configure'da
+        self.tick = tick
+        self.issued = registry.counter('CommandsIssued')
+        self.acked = registry.counter('CommandsAcked')
+        self.expired = registry.counter('CommandsExpired')
+        self.dropped = registry.counter('CommandsDropped')
+        self.retries = registry.counter('CommandRetries')
+        self.duplicates = registry.counter('CommandAckDuplicates')
+        self.late = registry.counter('CommandAckLate')
+        self.unknown = registry.counter('CommandAckUnknown')
+        self.time_to_ack = registry.latency('CommandTimeToAck')
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wheel = TimerWheel(tick)
+        self._queues = {}  # {scooter_id: deque[Command]} gönderilmeyi bekleyenler
+        self._inflight = collections.Counter()  # {scooter_id: ACK bekleyen komut sayısı}
+        self._by_id = {}  # {(scooter_id, cmd_id): Command} ACK'lenebilir ve yakın zamanda sonuçlanmış komutlar
+        self._by_send = {}  # {(scooter_id, send_ns): Command} kimliksiz ACK'ler için
+
+    def configure(self, policy=None, window=None, max_queue=None):
+        """Komut satırı ayarlarını uygular (bkz. settings_from_args); verilmeyenler değişmez."""
+        if policy is not None:
+            self.policy = policy
+        if window is not None:
+            if window < 1:
+                raise ValueError(f"Komut penceresi en az 1 olmalı: {window}")
+            self.window = window
+        if max_queue is not None:
+            self.max_queue = max_queue
+        return self
+
+    # --- Komut verme ---
+    def submit(self, scooter_id, command, deadline=None, **fields):
+        """Komutu scooter'ın kuyruğuna ekler (pencere boşsa hemen gönderir); Command döner."""
+        return self.submit_many([scooter_id], command, deadline, **fields)[0]
+
+    def submit_many(self, scooter_ids, command, deadline=None, **fields):
+        """Aynı komutu (ortak cmd_id ile) her scooter'ın kendi kuyruğuna ekler."""
+        outgoing, finished = [], []
+        now = clock.now_ns()
+        with self._lock:
+            cmd_id = next(self._ids)
+            commands = [self._new(cmd_id, sid, command, fields, now, deadline) for sid in scooter_ids]
+            for cmd in commands:
+                queue = self._queues.get(cmd.scooter_id)
+                if queue is None:
+                    queue = self._queues[cmd.scooter_id] = collections.deque()
+                if len(queue) >= self.max_queue:
+                    self._finish(cmd, DROPPED, now, finished)
+                    continue
+                queue.append(cmd)
+                self._wheel.schedule(cmd.deadline_ns, (cmd, 0))
+                self._pump(cmd.scooter_id, now, outgoing)
+        self._flush(outgoing, finished)
+        return commands
+
+    def fanout(self, scooter_ids, command, publish, deadline=None, **fields):
+        """
+        Tek yayınla birden çok scooter'a giden komut (MQTT grup topic'i, WebSocket
+        yayını): 'publish(komut sözlüğü)' bir kez çağrılır, komutlar kuyruğu
+        beklemeden ACK beklemeye alınır; yeniden gönderimler scooter başına send() ile yapılır.
+        """
+        now = clock.now_ns()
+        with self._lock:
+            cmd_id = next(self._ids)
+            commands = [self._new(cmd_id, sid, command, fields, now, deadline) for sid in scooter_ids]
+            for cmd in commands:
+                self._attempt(cmd, now)
+        if commands:
+            publish(commands[0].payload())
+        return commands
+
+    def _new(self, cmd_id, scooter_id, command, fields, now, deadline):
+        self.issued.add()
+        cmd = Command(cmd_id, scooter_id, command, fields, now,
+                      now + int((self.policy.deadline if deadline is None else deadline) * 1e9))
+        self._by_id[(scooter_id, cmd_id)] = cmd
+        return cmd
+
+    def _pump(self, scooter_id, now, outgoing):
+        """Pencere elverdiği kadar kuyruktaki komutu gönderime alır."""
+        queue = self._queues.get(scooter_id)
+        while queue and self._inflight[scooter_id] < self.window:
+            cmd = queue.popleft()
+            self._attempt(cmd, now)
+            outgoing.append((cmd, cmd.payload()))
+        if queue is not None and not queue:
+            del self._queues[scooter_id]
+
+    def _attempt(self, cmd, now):
+        if cmd.state == QUEUED:
+            cmd.state = INFLIGHT
+            self._inflight[cmd.scooter_id] += 1
+        cmd.attempts += 1
+        # Kimliksiz ACK'ler send_ns ile eşlenir: aynı tur/pompalamada aynı scooter'a giden
+        # denemeler aynı 'now'u paylaşmasın
+        stamp = now
+        while (cmd.scooter_id, stamp) in self._by_send:
+            stamp += 1
+        cmd.send_ns = stamp
+        cmd.sends.append(stamp)
+        self._by_send[(cmd.scooter_id, stamp)] = cmd
+        self._wheel.schedule(min(now + int(self.policy.timeout(cmd.attempts) * 1e9), cmd.deadline_ns),
+                             (cmd, cmd.attempts))
+
+    # --- Sonuçlar ---
+    def acknowledge(self, scooter_id, msg, now_ns=None):
+        """
+        ACK'i komutuna bağlar. Komutun ilk ACK'i ise Command, tekrar, geç ya da
+        bilinmeyen ACK ise None döner (bu durumda RTT kaydedilmemelidir).
+        """
+        now = now_ns or clock.now_ns()
+        cmd_id = msg.get('cmd_id')
+        outgoing, finished = [], []
+        with self._lock:
+            if cmd_id is not None:
+                cmd = self._by_id.get((scooter_id, cmd_id))
+            else:
+                cmd = self._by_send.get((scooter_id, msg.get('send_ns')))
+            if cmd is None or cmd.state != INFLIGHT:
+                counter = self.unknown if cmd is None else self.duplicates if cmd.state == ACKED else self.late
+                counter.add()
+                return None
+            self._finish(cmd, ACKED, now, finished)
+            self._pump(scooter_id, now, outgoing)
+        self._flush(outgoing, finished)
+        return cmd
+
+    def _finish(self, cmd, state, now, finished):
+        if cmd.state == INFLIGHT:
+            self._inflight[cmd.scooter_id] -= 1
+            if not self._inflight[cmd.scooter_id]:
+                del self._inflight[cmd.scooter_id]
+        cmd.state = state
+        cmd.done_ns = now
+        (self.acked if state == ACKED else self.expired if state == EXPIRED else self.dropped).add()
+        if state == ACKED:
+            self.time_to_ack.record((now - cmd.created_ns) / 1e9)
+        # Tekrar / geç ACK'leri ayırt etmek için en uzun deneme süresi kadar tutulur, sonra unutulur
+        self._wheel.schedule(now + int(self.policy.timeout(self.policy.max_retries + 1) * 1e9), (cmd, None))
+        finished.append(cmd)
+
+    def _forget(self, cmd):
+        self._by_id.pop((cmd.scooter_id, cmd.id), None)
+        for send_ns in cmd.sends:
+            self._by_send.pop((cmd.scooter_id, send_ns), None)
+
+    def poll(self, now_ns=None):
+        """Süresi dolan denemeleri yeniden gönderir ya da komutu düşürür."""
+        now = now_ns or clock.now_ns()
+        outgoing, finished = [], []
+        with self._lock:
+            for cmd, attempt in self._wheel.advance(now):
+                if attempt is None:
+                    if cmd.done:
+                        self._forget(cmd)
+                elif attempt == 0:
+                    # Son tarih: kuyrukta bekleyen komut hiç gönderilmeden düşer
+                    if cmd.state == QUEUED:
+                        self._queues[cmd.scooter_id].remove(cmd)
+                        self._finish(cmd, EXPIRED, now, finished)
+                        self._pump(cmd.scooter_id, now, outgoing)
+                elif cmd.state == INFLIGHT and cmd.attempts == attempt:
+                    if attempt > self.policy.max_retries or now >= cmd.deadline_ns:
+                        self._finish(cmd, EXPIRED, now, finished)
+                        self._pump(cmd.scooter_id, now, outgoing)
+                    else:
+                        self.retries.add()
+                        self._attempt(cmd, now)
+                        outgoing.append((cmd, cmd.payload()))
+        self._flush(outgoing, finished)
+
+    def _flush(self, outgoing, finished):
+        """Gönderimler ve future'lar kilit dışında (send bloklayabilir, callback'ler motoru çağırabilir)."""
+        for cmd, payload in outgoing:
+            try:
+                self.send(cmd.scooter_id, payload)
+            except Exception:
+                pass  # Bağlantı kopmuş olabilir; deneme süresi dolunca yeniden denenir ya da düşer
+        tracer = self.tracer
+        for cmd in finished:
+            if tracer is not None:
+                tracer.tx('command_done' if cmd.state == ACKED else 'command_failed', 0, cmd.scooter_id,
+                          (cmd.done_ns - cmd.created_ns) / 1e9)
+            cmd._resolve()
+
+    def run(self, running=lambda: True):
+        """Thread'li sunucular için zaman çarkı döngüsü."""
+        while running():
+            time.sleep(self.tick)
+            self.poll()
+
+    async def run_async(self):
+        """asyncio sunucuları için zaman çarkı döngüsü (gönderimler event loop'ta yapılır)."""
+        while True:
+            await asyncio.sleep(self.tick)
+            self.poll()
+
+    # --- Rapor ---
+    @property
+    def pending(self):
+        """Sonuçlanmamış komutlar; sayaçlardan hesaplanır, worker metrikleri birleşince de doğrudur."""
+        return self.issued.value - self.acked.value - self.expired.value - self.dropped.value
+
+    def success_rate(self):
+        """ACK'lenen / sonuçlanan komutlar (yüzde); sonuçlanan yoksa None."""
+        done = self.acked.value + self.expired.value + self.dropped.value
+        return self.acked.value / done * 100 if done else None
+
+    def summary_line(self):
+        rate = self.success_rate()
+        p99 = self.time_to_ack.percentile(99)
+        return (f"Komut teslimi: verilen {self.issued.value} | ACK'lenen {self.acked.value} "
+                f"(%{rate or 0:.2f}) | süresi dolan {self.expired.value} | düşürülen {self.dropped.value} | "
+                f"yeniden gönderim {self.retries.value} | tekrar ACK {self.duplicates.value} | "
+                f"geç ACK {self.late.value} | bekleyen {self.pending} | ACK süresi p99: "
+                f"{'-' if p99 is None else f'{p99 * 1000:.1f} ms'}")
+
+
+def window_arg(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"Komut penceresi en az 1 olmalı: {text}")
+    return value
+
+
+def add_arguments(parser):
+    parser.add_argument('--ack-timeout', type=float, default=DEFAULT_ACK_TIMEOUT,
+                        help="Komut denemesi başına ACK bekleme süresi (sn; yeniden denemelerde --retry-backoff ile büyür)")
+    parser.add_argument('--command-retries', type=int, default=DEFAULT_RETRIES,
+                        help="ACK gelmeyen komutun en fazla yeniden gönderim sayısı")
+    parser.add_argument('--retry-backoff', type=float, default=DEFAULT_BACKOFF)
+    parser.add_argument('--command-deadline', type=float, default=None,
+                        help="Komutun kuyruk dahil son tarihi (sn; varsayılan: tüm denemelerin süreleri toplamı)")
+    parser.add_argument('--command-window', type=window_arg, default=DEFAULT_WINDOW,
+                        help="Scooter başına aynı anda ACK bekleyen en fazla komut")
+    parser.add_argument('--command-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Scooter başına kuyrukta bekleyebilecek en fazla komut")
+
+
+def settings_from_args(args):
+    """Dispatcher.configure() parametreleri (worker proseslerine aktarılabilir sözlük)."""
+    return {'policy': RetryPolicy(args.ack_timeout, args.command_retries, args.retry_backoff, args.command_deadline),
+            'window': args.command_window, 'max_queue': args.command_queue}
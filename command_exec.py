@@ -0,0 +1,136 @@
+"""
+Scooter tarafında komut yürütme.
+
+Komut, alındığı thread'de (TCP/UDP dinleme thread'i, paho'nun ağ döngüsü)
+çalıştırılmaz; sabit sayıda worker thread'ine bırakılır ve ACK yürütme
+bitince worker'dan gönderilir. Böylece art arda gelen komutlar alım yolunu
+tıkamaz (head-of-line blocking), MQTT keepalive'ları gecikmez. Komutun
+kuyrukta beklediği ve yürütüldüğü süreler ayrı histogramlara yazılır.
+
+Yürütme süresi dağılımları (--exec-time):
+    0.1 veya fixed:0.1     sabit 0.1 sn
+    uniform:0.05,0.2       [0.05, 0.2) aralığında düzgün
+    exp:0.1                ortalaması 0.1 sn üstel
+    lognormal:0.1,0.5      medyanı 0.1 sn, sigma 0.5 log-normal
+
+--command-workers 0 eski davranıştır: komut alım thread'inde çalışır.
+"""
+import argparse
+import logging
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import clock
+
+DEFAULT_EXEC_TIME = 'fixed:0.1'
+DEFAULT_WORKERS = 4
+
+
+class ExecTime:
+    """Simüle yürütme süresi dağılımı (saniye)."""
+
+    KINDS = {
+        'fixed': (1, lambda v: v),
+        'uniform': (2, random.uniform),
+        'exp': (1, lambda mean: random.expovariate(1 / mean) if mean > 0 else 0.0),
+        'lognormal': (2, lambda median, sigma: random.lognormvariate(math.log(median), sigma)),
+    }
+
+    def __init__(self, kind, params):
+        if kind not in self.KINDS:
+            raise ValueError(f"Bilinmeyen yürütme süresi dağılımı: {kind} (seçenekler: {', '.join(self.KINDS)})")
+        arity, fn = self.KINDS[kind]
+        if len(params) != arity or any(p < 0 for p in params):
+            raise ValueError(f"'{kind}' için {arity} adet negatif olmayan parametre gerekir: {params}")
+        self.kind = kind
+        self.params = tuple(params)
+        self._fn = fn
+
+    @classmethod
+    def parse(cls, spec):
+        """'0.1', 'fixed:0.1', 'uniform:0.05,0.2' gibi bir tanımı çözer."""
+        if isinstance(spec, ExecTime):
+            return spec
+        kind, _, params = str(spec).partition(':')
+        if not params:
+            kind, params = 'fixed', kind
+        return cls(kind, [float(p) for p in params.split(',')])
+
+    def sample(self):
+        return max(self._fn(*self.params), 0.0)
+
+    def mean(self):
+        """Dağılımın beklenen değeri (benchmark'ta bekleme süresini yürütmeden ayırmak için)."""
+        p = self.params
+        if self.kind == 'uniform':
+            return (p[0] + p[1]) / 2
+        if self.kind == 'lognormal':
+            return p[0] * math.exp(p[1] ** 2 / 2)
+        return p[0]
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+def exec_time_arg(spec):
+    """argparse 'type' olarak: hatalı tanımı kullanıcıya okunur bir hata ile döndürür."""
+    try:
+        return ExecTime.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+class CommandExecutor:
+    """
+    Komutları 'workers' adet thread'de yürütür. submit() hiçbir zaman
+    bloklamaz; yürütme bitince done(msg, rx_ns) worker thread'inde çağrılır.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, exec_time=DEFAULT_EXEC_TIME, queue_delay=None, exec_hist=None):
+        self.workers = workers
+        self.exec_time = ExecTime.parse(exec_time)
+        self.queue_delay = queue_delay  # Komutun alınmasından yürütmeye başlanmasına kadar (histogram)
+        self.exec_hist = exec_hist  # Yürütme süresi (histogram)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='command') if workers > 0 else None
+
+    def submit(self, msg, rx_ns, done):
+        if self._pool is None:
+            self._run(msg, rx_ns, done)
+        else:
+            self._pool.submit(self._run, msg, rx_ns, done)
+
+    def _run(self, msg, rx_ns, done):
+        start_ns = clock.now_ns()
+        if self.queue_delay is not None:
+            self.queue_delay.record((start_ns - rx_ns) / 1e9)
+        time.sleep(self.exec_time.sample())
+        if self.exec_hist is not None:
+            self.exec_hist.record((clock.now_ns() - start_ns) / 1e9)
+        try:
+            done(msg, rx_ns)
+        except Exception as e:
+            logging.error(f"Komut tamamlama hatası: {e}")
+
+    def shutdown(self, wait=False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def describe(self):
+        mode = f"{self.workers} worker" if self._pool is not None else "alım thread'inde (inline)"
+        return f"Komut yürütme: {mode}, süre={self.exec_time}"
+
+
+def add_arguments(parser):
+    parser.add_argument('--command-workers', type=int, default=DEFAULT_WORKERS,
+                        help="Komut yürüten worker thread sayısı (0: alım thread'inde, eski davranış)")
+    parser.add_argument('--exec-time', type=exec_time_arg, default=DEFAULT_EXEC_TIME,
+                        help="Simüle yürütme süresi: 0.1 | fixed:S | uniform:A,B | exp:ORT | lognormal:MEDYAN,SIGMA")
+
+
+def from_args(args, registry=None):
+    """Argümanlardan yürütücü; registry verilirse kuyruk/yürütme histogramları ona eklenir."""
+    return CommandExecutor(args.command_workers, args.exec_time,
+                           queue_delay=registry.latency('CommandQueueDelay') if registry is not None else None,
+                           exec_hist=registry.latency('CommandExecTime') if registry is not None else None)
@@ -0,0 +1,270 @@
+"""
+Olay başına iz (trace) kaydı ve sütunlu (columnar) iz dosyaları.
+
+Her gönderilen/alınan mesaj tek bir olay olarak kaydedilir:
+
+    ts_ns      int64    time.monotonic_ns() (dosya başlığındaki duvar saati ile eşlenir)
+    scooter    uint32   dosyadaki scooter id tablosunda indeks
+    protocol   uint8    PROTOCOLS indeksi
+    direction  uint8    0 = rx (alınan), 1 = tx (gönderilen)
+    msg_type   uint8    MSG_TYPES indeksi ('connect' olayının gecikmesi bağlanma süresidir;
+                        STAT_TYPES mesaj değildir: 'publish_done' MQTT yayınının broker onayına,
+                        'broadcast' bir komut yayınının tamamının gönderilmesine kadar geçen süre,
+                        'command_done' / 'command_failed' komutun verilişinden ilk ACK'ine / düşmesine
+                        kadar geçen süre, bkz. command_dispatch.py)
+    wire_bytes uint32   hattaki mesaj boyutu
+    latency    float32  saniye; uygulanmıyorsa NaN (ACK'lerde RTT; açık döngü yükte (fleet.py --rate)
+                        telemetride planlanan gönderim anından sunucuya ulaşana kadar geçen süre)
+    downlink   float32  ACK'lerde komutun sunucudan scooter'a tek yönlü gecikmesi (bkz. clock.py)
+    uplink     float32  ACK'lerde ACK'in scooter'dan sunucuya tek yönlü gecikmesi
+
+Dosya, art arda np.save ile yazılmış dizilerden oluşur: önce başlık
+[sürüm, duvar saati ns, monotonic ns], ardından her blok için o blokta ilk kez
+görülen scooter id'leri ve sütun dizileri (sürüm 1 dosyalarında downlink/uplink
+yoktur, okunurken NaN ile doldurulur). Böylece okuma tarafı dosyayı
+sütun sütun birleştirip numpy maskeleriyle filtreler; milyonlarca olay
+saniyeler içinde analiz edilir.
+
+Yazma results_writer.ResultsWriter'ın kuyruk/rotasyon/koşu kimliği
+mekanizmasını kullanır (results_tcp.<koşu>.<parça>.trace).
+"""
+import atexit
+import time
+
+import numpy as np
+
+from results_writer import ResultsWriter, result_files
+
+VERSION = 2
+EXTENSION = 'trace'
+
+PROTOCOLS = ('tcp', 'udp', 'mqtt', 'websocket')
+DIRECTIONS = ('rx', 'tx')
+MSG_TYPES = ('other', 'connect', 'register', 'register_ack', 'location', 'status', 'command', 'ack', 'publish_done',
+             'broadcast', 'command_done', 'command_failed')
+STAT_TYPES = ('publish_done', 'broadcast', 'command_done', 'command_failed')  # Gecikmeleri mesaj gecikmesi histogramına yazılmaz
+TELEMETRY_TYPES = ('location', 'status')  # Gecikmeleri ayrı (telemetry) histograma yazılır
+
+RX, TX = 0, 1
+_MSG_CODES = {name: i for i, name in enumerate(MSG_TYPES)}
+
+COLUMNS = (
+    ('ts_ns', np.int64),
+    ('scooter', np.uint32),
+    ('protocol', np.uint8),
+    ('direction', np.uint8),
+    ('msg_type', np.uint8),
+    ('wire_bytes', np.uint32),
+    ('latency', np.float32),
+    ('downlink', np.float32),
+    ('uplink', np.float32),
+)
+_V1_COLUMNS = 7
+_NAN = float('nan')
+
+
+class TraceWriter(ResultsWriter):
+    """Olay kayıtlarını blok blok sütunlu iz dosyasına yazar."""
+
+    extension = EXTENSION
+    binary = True
+
+    def __init__(self, base, protocol, batch_size=8192, **kwargs):
+        super().__init__(base, [name for name, _ in COLUMNS], batch_size=batch_size, **kwargs)
+        self.protocol = PROTOCOLS.index(protocol)
+        self._scooters = {}
+
+    def _begin(self):
+        # Scooter tablosu her parça dosyasında baştan başlar; dosyalar tek başına okunabilir
+        self._scooters = {}
+        np.save(self._file, np.array([VERSION, time.time_ns(), time.monotonic_ns()], dtype=np.int64))
+
+    def _write_rows(self, batch):
+        ts, scooters, directions, msg_types, sizes, latencies, downlinks, uplinks = zip(*batch)
+        table = self._scooters
+        new_ids = []
+        indices = []
+        for sid in scooters:
+            idx = table.get(sid)
+            if idx is None:
+                idx = table[sid] = len(table)
+                new_ids.append(sid)
+            indices.append(idx)
+
+        np.save(self._file, np.array(new_ids, dtype=str))
+        np.save(self._file, np.array(ts, dtype=np.int64))
+        np.save(self._file, np.array(indices, dtype=np.uint32))
+        np.save(self._file, np.full(len(batch), self.protocol, dtype=np.uint8))
+        np.save(self._file, np.array(directions, dtype=np.uint8))
+        np.save(self._file, np.array(msg_types, dtype=np.uint8))
+        np.save(self._file, np.array(sizes, dtype=np.uint32))
+        np.save(self._file, np.array(latencies, dtype=np.float32))
+        np.save(self._file, np.array(downlinks, dtype=np.float32))
+        np.save(self._file, np.array(uplinks, dtype=np.float32))
+
+
+class Tracer:
+    """
+    Bir scriptin ölçüm noktası: olayı ilgili histograma (metrics) kaydeder ve
+    yazıcı açıksa iz dosyasına bırakır. Yazıcı yokken (ör. benchmark'lar
+    modülü import ettiğinde) sadece histogramlar güncellenir.
+    """
+
+    def __init__(self, protocol, bandwidth=None, latency=None, reconnect=None, json_bandwidth=None,
+                 downlink=None, uplink=None, telemetry=None):
+        self.protocol = protocol
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.reconnect = reconnect
+        self.telemetry = telemetry
+        self.json_bandwidth = json_bandwidth
+        self.downlink = downlink
+        self.uplink = uplink
+        self.writer = None
+
+    def open(self, base, **kwargs):
+        """İz dosyasını başlatır; çıkışta kapatılmasını sağlar."""
+        self.writer = TraceWriter(base, self.protocol, **kwargs).start()
+        atexit.register(self.writer.close)
+        return self.writer
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def event(self, direction, msg_type, nbytes, scooter_id=None, latency=None, json_equiv=None, ts_ns=None,
+              downlink=None, uplink=None):
+        if nbytes:
+            if self.bandwidth is not None:
+                self.bandwidth.record(nbytes)
+            if self.json_bandwidth is not None:
+                self.json_bandwidth.record(json_equiv or nbytes)
+        if latency is not None and msg_type not in STAT_TYPES:
+            if msg_type == 'connect':
+                hist = self.reconnect
+            elif msg_type in TELEMETRY_TYPES:
+                hist = self.telemetry
+            else:
+                hist = self.latency
+            if hist is not None:
+                hist.record(latency)
+        if downlink is not None and self.downlink is not None:
+            self.downlink.record(downlink)
+        if uplink is not None and self.uplink is not None:
+            self.uplink.record(uplink)
+
+        writer = self.writer
+        if writer is not None:
+            writer.write((ts_ns or time.monotonic_ns(), scooter_id or '', direction, _MSG_CODES.get(msg_type, 0), nbytes,
+                          _NAN if latency is None else latency, _NAN if downlink is None else downlink,
+                          _NAN if uplink is None else uplink))
+
+    def rx(self, msg_type, nbytes, scooter_id=None, latency=None, json_equiv=None, ts_ns=None,
+           downlink=None, uplink=None):
+        self.event(RX, msg_type, nbytes, scooter_id, latency, json_equiv, ts_ns, downlink, uplink)
+
+    def tx(self, msg_type, nbytes, scooter_id=None, latency=None, json_equiv=None, ts_ns=None):
+        self.event(TX, msg_type, nbytes, scooter_id, latency, json_equiv, ts_ns)
+
+    def connected(self, scooter_id, seconds):
+        """Bağlantı kurulma (yeniden bağlanma) süresi."""
+        self.event(TX, 'connect', 0, scooter_id, seconds)
+
+
+class Trace:
+    """Birleştirilmiş iz: sütunlar numpy dizileri, scooter id'leri ortak tabloda."""
+
+    def __init__(self, columns, scooter_ids):
+        self.columns = columns
+        self.scooter_ids = scooter_ids
+
+    def __len__(self):
+        return len(self.columns['ts_ns'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def mask(self, protocol=None, direction=None, msg_type=None, scooter_id=None):
+        """Verilen koşullara uyan olayların boolean maskesi (değerler tekil veya liste olabilir)."""
+        m = np.ones(len(self), dtype=bool)
+        for column, names, value in (('protocol', PROTOCOLS, protocol), ('direction', DIRECTIONS, direction),
+                                     ('msg_type', MSG_TYPES, msg_type)):
+            if value is not None:
+                values = [value] if isinstance(value, str) else value
+                m &= np.isin(self.columns[column], [names.index(v) for v in values])
+        if scooter_id is not None:
+            ids = [scooter_id] if isinstance(scooter_id, str) else scooter_id
+            m &= np.isin(self.columns['scooter'], np.flatnonzero(np.isin(self.scooter_ids, ids)))
+        return m
+
+    def select(self, **conditions):
+        m = self.mask(**conditions)
+        return Trace({name: col[m] for name, col in self.columns.items()}, self.scooter_ids)
+
+    def latencies(self, column='latency', **conditions):
+        """Koşullara uyan ve gecikme taşıyan olayların gecikmeleri (saniye; 'downlink'/'uplink' de seçilebilir)."""
+        values = self.select(**conditions)[column]
+        return values[~np.isnan(values)]
+
+    def to_frame(self):
+        """Kategorik sütunlu pandas DataFrame (kod dizileri kopyalanmadan)."""
+        import pandas as pd
+        return pd.DataFrame({
+            'ts_ns': self.columns['ts_ns'],
+            'scooter': pd.Categorical.from_codes(self.columns['scooter'].astype(np.int64),
+                                                 categories=pd.Index(self.scooter_ids)),
+            'protocol': pd.Categorical.from_codes(self.columns['protocol'], categories=PROTOCOLS),
+            'direction': pd.Categorical.from_codes(self.columns['direction'], categories=DIRECTIONS),
+            'msg_type': pd.Categorical.from_codes(self.columns['msg_type'], categories=MSG_TYPES),
+            'wire_bytes': self.columns['wire_bytes'],
+            'latency': self.columns['latency'],
+            'downlink': self.columns['downlink'],
+            'uplink': self.columns['uplink'],
+        })
+
+
+def read_trace_file(path):
+    """
+    Tek iz dosyasını (sütun sözlüğü, scooter id listesi, başlık) olarak okur.
+    Yarım kalmış son blok (proses yazarken öldüyse) atlanır.
+    """
+    blocks = {name: [] for name, _ in COLUMNS}
+    scooter_ids = []
+    with open(path, 'rb') as f:
+        header = np.load(f)
+        stored = len(COLUMNS) if header[0] >= 2 else _V1_COLUMNS
+        while True:
+            try:
+                new_ids = np.load(f)
+                block = [np.load(f) for _ in range(stored)]
+            except (EOFError, ValueError, OSError):
+                break
+            if len({len(col) for col in block}) != 1:
+                break
+            scooter_ids.extend(new_ids.tolist())
+            block += [np.full(len(block[0]), np.nan, dtype=dtype) for _, dtype in COLUMNS[stored:]]
+            for (name, _), col in zip(COLUMNS, block):
+                blocks[name].append(col)
+    columns = {name: np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+               for (name, dtype), parts in zip(COLUMNS, blocks.values())}
+    return columns, scooter_ids, header
+
+
+def load(paths):
+    """Birden çok iz dosyasını tek bir Trace olarak birleştirir."""
+    table = {}
+    parts = {name: [] for name, _ in COLUMNS}
+    for path in paths:
+        columns, scooter_ids, _ = read_trace_file(path)
+        remap = np.array([table.setdefault(sid, len(table)) for sid in scooter_ids], dtype=np.uint32)
+        columns['scooter'] = remap[columns['scooter']]
+        for name, _ in COLUMNS:
+            parts[name].append(columns[name])
+    columns = {name: np.concatenate(cols) if cols else np.empty(0, dtype=dtype)
+               for (name, dtype), cols in zip(COLUMNS, parts.values())}
+    return Trace(columns, np.array(list(table), dtype=str))
+
+
+def trace_files(base, run_id=None):
+    """'base' öneki için verilen ya da en son koşunun iz parçaları."""
+    return result_files(base, run_id, extension=EXTENSION)
@@ -0,0 +1,767 @@
+"""
+Tek proseste N adet sanal scooter çalıştıran filo yük üreticisi.
+
+Her scooter için thread veya proses açılmaz: tüm bağlantılar tek bir asyncio
+event loop üzerinde yaşar, periyodik konum/durum gönderimleri loop.call_later
+zamanlayıcıları ile yapılır ve scooter durumu __slots__ kullanan küçük bir
+nesnede tutulur. Desteklenen protokoller: tcp, udp, websocket, mqtt.
+
+Varsayılan olarak her scooter kendi periyoduyla gönderir. --rate ile açık
+döngü (open-loop) moda geçilir: tüm filo için hedef toplam hız (mesaj/sn)
+sabit aralıklı ya da Poisson planlanır ve mesajlar gönderimin tamamlanmasını
+beklemeden, scooterlara sırayla dağıtılır. Loop veya sunucu geride kalırsa
+planlanan mesajlar atlanmaz, gecikmeli olarak hemen gönderilir. Her mesaj
+planlandığı anı sunucu saatinde ('sched_ns', bkz. clock.py) taşır; sunucu
+gecikmeyi bu andan ölçer, böylece aşırı yükteki bekleme kuyruk gecikmesi
+olarak görünür (coordinated omission). 'sched_ns' sadece JSON formatında taşınır.
+
+Örnek:
+    python fleet.py --protocol tcp --scooters 10000 --ramp-up 30 --jitter 0.2
+    python fleet.py --protocol mqtt --scooters 2000 --duration 120
+    python fleet.py --protocol udp --scooters 1000 --rate 20000 --arrival poisson --duration 60
+"""
+import argparse
+import asyncio
+import collections
+import ipaddress
+import itertools
+import json
+import logging
+import random
+import time
+
+import clock
+import command_exec
+import metrics
+import mqtt5
+import mqtt_codec
+import mqtt_qos
+import mqtt_topics
+import udp_reliability
+import wire_format
+from framing import LineFramer, FrameTooLarge
+from sys_limits import raise_nofile_limit
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+DEFAULT_PORTS = {'tcp': 8765, 'udp': 8766, 'websocket': 8765, 'mqtt': 1883}
+
+
+class FleetStats:
+    """Filo geneli sayaçlar (tek thread'den güncellenir, kilit gerekmez)."""
+
+    def __init__(self):
+        self.connected = 0
+        self.connect_failed = 0
+        self.disconnected = 0
+        self.tx_messages = 0
+        self.tx_bytes = 0
+        self.rx_messages = 0
+        self.rx_bytes = 0
+        self.commands = 0
+        self.acks = 0
+        self.connect_time_total = 0.0
+        self.connect_time_max = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def record_connect(self, elapsed):
+        self.connected += 1
+        self.connect_time_total += elapsed
+        self.connect_time_max = max(self.connect_time_max, elapsed)
+
+
+class FleetConfig:
+    def __init__(self, args):
+        self.protocol = args.protocol
+        self.host = args.host
+        self.port = args.port or DEFAULT_PORTS[args.protocol]
+        self.scenario = args.scenario
+        self.encoding = args.encoding
+        self.status_interval = args.status_interval
+        self.location_interval = args.location_interval
+        self.jitter = args.jitter
+        self.exec_time = args.exec_time
+        self.qos = mqtt_qos.from_args(args)  # Sadece MQTT'de kullanılır
+        self.mqtt_version = args.mqtt_version
+        self.zones = args.zones
+        self.models = args.models
+        self.rate = args.rate  # Açık döngü toplam hız (mesaj/sn), 0 = scooter başına periyot
+        self.arrival = args.arrival
+        self.id_prefix = args.id_prefix
+        # Loopback'te on binlerce bağlantı için kaynak adresleri 127.0.x.y'ye dağıtılır
+        self.spread_source = is_loopback(args.host)
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class VirtualScooter:
+    """Tek bir sanal scooter'ın kompakt durumu ve protokolden bağımsız davranışı."""
+
+    __slots__ = ('fleet', 'idx', 'id', 'zone', 'model', 'lat', 'lon', 'battery', 'sid', 'clock', 'link', 'timers')
+
+    def __init__(self, fleet, idx):
+        self.fleet = fleet
+        self.idx = idx
+        self.id = f"{fleet.config.id_prefix}{idx}"
+        # Grup komutları için bölge ve model (bkz. mqtt_topics.py), filoya sırayla dağıtılır
+        self.zone = str(idx % fleet.config.zones)
+        self.model = fleet.config.models[idx % len(fleet.config.models)]
+        self.lat = 41.0082 + random.uniform(-0.05, 0.05)
+        self.lon = 28.9784 + random.uniform(-0.05, 0.05)
+        self.battery = random.uniform(20, 100)
+        self.sid = None
+        self.clock = clock.ClockSync()  # register_ack'teki damgalarla sunucu saatine olan fark
+        self.link = None  # Protokole özel bağlantı nesnesi
+        self.timers = []
+
+    # --- Mesaj üretimi (istemci scriptleriyle aynı şema) ---
+    def location_msg(self):
+        self.lat += random.uniform(-0.0001, 0.0001)
+        self.lon += random.uniform(-0.0001, 0.0001)
+        self.battery = max(self.battery - 0.5, 0)
+        return {
+            'type': 'location',
+            'scooter_id': self.id,
+            'location': {'lat': self.lat, 'lon': self.lon},
+            'battery': round(self.battery, 1)
+        }
+
+    def status_msg(self):
+        is_locked = random.random() < 0.5
+        return {
+            'type': 'status',
+            'scooter_id': self.id,
+            'status': {
+                'battery_level': round(self.battery, 1),
+                'is_locked': is_locked,
+                'speed': 0 if is_locked else random.randint(0, 25)
+            }
+        }
+
+    # --- Zamanlayıcılar ---
+    def start(self):
+        cfg = self.fleet.config
+        if cfg.rate:
+            return  # Telemetriyi filo geneli OpenLoopGenerator planlar
+        if cfg.scenario in ('location', 'all'):
+            self._schedule(self.send_location, cfg.location_interval, first=True)
+        if cfg.scenario in ('status', 'all'):
+            self._schedule(self.send_status, cfg.status_interval, first=True)
+
+    def stop(self):
+        for handle in self.timers:
+            handle.cancel()
+        self.timers = []
+
+    def _schedule(self, fn, interval, first=False):
+        # İlk gönderim [0, interval) içinde rastgele: tüm filonun aynı anda göndermesini önler
+        delay = random.uniform(0, interval) if first else interval * random.uniform(1 - self.fleet.config.jitter,
+                                                                                    1 + self.fleet.config.jitter)
+        handle = self.fleet.loop.call_later(delay, self._tick, fn, interval)
+        self.timers = [h for h in self.timers if not h.cancelled() and h.when() > self.fleet.loop.time()]
+        self.timers.append(handle)
+
+    def _tick(self, fn, interval):
+        if self.link is None:
+            return
+        fn()
+        self._schedule(fn, interval)
+
+    def send_location(self, sched_ns=None):
+        self.send_telemetry(self.location_msg(), 'location', sched_ns)
+
+    def send_status(self, sched_ns=None):
+        self.send_telemetry(self.status_msg(), 'status', sched_ns)
+
+    def send_telemetry(self, msg, kind, sched_ns=None):
+        if sched_ns is not None and self.clock.synced:
+            msg['sched_ns'] = sched_ns + self.clock.offset_ns  # Planlanan an, sunucu saatinde
+        if self.sid is not None:
+            payload = wire_format.encode_message(msg, self.sid)
+        else:
+            payload = json.dumps(msg)
+        self.fleet.send(self, payload, kind)
+
+    # --- Gelen mesajlar ---
+    def on_message(self, msg):
+        rx_ns = clock.now_ns()
+        if msg.get('type') == 'register_ack':
+            self.sid = msg.get('sid')
+            if msg.get('clock'):
+                self.clock.update(msg['clock'], rx_ns)
+        elif msg.get('command'):
+            self.fleet.stats.commands += 1
+            self.fleet.loop.call_later(self.fleet.config.exec_time.sample(), self.send_ack, msg, rx_ns)
+
+    def send_ack(self, msg, rx_ns=None):
+        if self.link is None:
+            return
+        stamps = self.clock.ack_fields(msg, rx_ns or clock.now_ns())
+        user = None
+        if self.sid is not None:
+            payload = wire_format.encode_ack(self.sid, msg['command'], stamps['send_ns'],
+                                             stamps.get('rx_ns'), stamps.get('tx_ns'))
+        else:
+            ack = dict({
+                'type': 'ack',
+                'scooter_id': self.id,
+                'ack': f"command '{msg['command']}' received",
+            }, **stamps)
+            if isinstance(self.link, MQTTLink) and self.link.v5:
+                ack, user = mqtt5.split_stamps(ack)  # Damgalar user property olarak (bkz. mqtt5.py)
+            payload = json.dumps(ack)
+        self.fleet.stats.acks += 1
+        self.fleet.send(self, payload, 'ack', ack_seq=msg.get('seq'), user=user)
+
+
+# --- Protokol bağlantıları ---
+
+class TCPLink(asyncio.Protocol):
+    def __init__(self, scooter):
+        self.scooter = scooter
+        self.transport = None
+        self.framer = LineFramer()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, payload, kind):
+        data = payload.encode('utf-8') + b'\n' if isinstance(payload, str) else payload
+        self.transport.write(data)
+        return len(data)
+
+    def data_received(self, data):
+        stats = self.scooter.fleet.stats
+        stats.rx_bytes += len(data)
+        try:
+            frames = self.framer.feed(data)
+        except FrameTooLarge:
+            self.transport.close()
+            return
+        for frame in frames:
+            stats.rx_messages += 1
+            self.scooter.on_message(json.loads(frame))
+
+    def connection_lost(self, exc):
+        self.scooter.fleet.on_disconnect(self.scooter)
+
+
+class UDPLink(asyncio.DatagramProtocol):
+    def __init__(self, scooter):
+        self.scooter = scooter
+        self.transport = None
+        self.tx_seq = 0
+        self.rx_seq = udp_reliability.SequenceTracker()
+        scooter.fleet.seq_trackers.append(self.rx_seq)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def send(self, payload, kind, ack_seq=None):
+        payload = udp_reliability.add_seq(payload, self.tx_seq, ack_seq)
+        self.tx_seq += 1
+        data = payload.encode('utf-8') if isinstance(payload, str) else payload
+        self.transport.sendto(data)
+        return len(data)
+
+    def datagram_received(self, data, addr):
+        stats = self.scooter.fleet.stats
+        stats.rx_bytes += len(data)
+        stats.rx_messages += 1
+        try:
+            msg = json.loads(data)
+        except ValueError:
+            return
+        seq = msg.get('seq')
+        if seq is not None and not self.rx_seq.observe(seq):
+            # Sunucunun yeniden gönderdiği komut: tekrar çalıştırılmaz, sadece ACK yenilenir
+            if msg.get('command'):
+                self.scooter.send_ack(msg)
+            return
+        self.scooter.on_message(msg)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        self.scooter.fleet.on_disconnect(self.scooter)
+
+
+class MQTTLink(asyncio.Protocol):
+    """
+    Scooter başına tek TCP bağlantısı üzerinde minimal MQTT 3.1.1 / 5 istemcisi.
+    QoS 1/2 yayınlarda onay bekleyen mesaj sayısı max_inflight ile sınırlıdır;
+    pencere doluyken yayınlar sıraya alınır ve onay geldikçe gönderilir.
+    MQTT 5'te QoS 0 telemetri topic'leri alias ile gönderilir (bkz. mqtt5.py).
+    """
+
+    def __init__(self, scooter, keepalive=60):
+        self.scooter = scooter
+        self.keepalive = keepalive
+        self.qos = scooter.fleet.config.qos
+        self.delivery = scooter.fleet.delivery
+        self.level = mqtt5.codec_level(scooter.fleet.config.mqtt_version)
+        self.v5 = self.level >= mqtt_codec.PROTOCOL_LEVEL_5
+        self.aliases = mqtt5.TopicAliases()
+        self.transport = None
+        self.reader = mqtt_codec.PacketReader()
+        self.connack = asyncio.get_running_loop().create_future()
+        self.ping_handle = None
+        self.packet_ids = itertools.cycle(range(1, 65536))
+        self.inflight = set()  # PUBACK/PUBCOMP beklenen paket kimlikleri
+        self.backlog = collections.deque()  # Pencere doluyken bekleyen (paket kimliği, topic, payload, qos)
+        self.awaiting_rel = set()  # QoS 2 ile alınıp PUBREL beklenen paket kimlikleri
+
+    def connection_made(self, transport):
+        self.transport = transport
+        transport.write(mqtt_codec.connect(self.scooter.id, self.keepalive, level=self.level))
+
+    def send(self, payload, kind, user=None):
+        topic = f"scooter/{self.scooter.id}/{kind}"
+        qos = self.qos.qos_for(kind)
+        start_ns = clock.now_ns()
+        properties = None
+        if self.v5:
+            alias = None
+            if not qos and kind in ('location', 'status'):
+                wire_topic, alias = self.aliases.resolve(topic)
+                self.aliases.sent(topic)  # Yazma hemen yapıldığından alias açan yayın gönderilmiş sayılır
+                topic = wire_topic
+            properties = mqtt5.codec_properties(alias=alias, user=user)
+        if not qos:
+            # QoS 0'da yayın sokete yazıldığında tamamlanmış sayılır
+            key = (self.scooter.idx, 0)
+            self.delivery.started(key, kind, start_ns)
+            self.delivery.done(key)
+            return self._write_publish(None, topic, payload, 0, properties)
+        packet_id = next(self.packet_ids)
+        if len(self.inflight) >= self.qos.max_inflight:
+            if self.qos.max_queued and len(self.backlog) >= self.qos.max_queued:
+                self.delivery.rejected(kind)
+                return 0
+            self.delivery.started((self.scooter.idx, packet_id), kind, start_ns, self.scooter.id)
+            self.backlog.append((packet_id, topic, payload, qos, properties))
+            return 0  # Bayt sayısı gönderildiğinde eklenir
+        self.delivery.started((self.scooter.idx, packet_id), kind, start_ns, self.scooter.id)
+        return self._write_publish(packet_id, topic, payload, qos, properties)
+
+    def _write_publish(self, packet_id, topic, payload, qos, properties=None):
+        data = mqtt_codec.publish(topic, payload, qos, packet_id=packet_id, properties=properties)
+        if qos:
+            self.inflight.add(packet_id)
+        self.transport.write(data)
+        return len(data)
+
+    def _complete(self, packet_id):
+        if packet_id not in self.inflight:
+            return
+        self.inflight.discard(packet_id)
+        self.delivery.done((self.scooter.idx, packet_id))
+        while self.backlog and len(self.inflight) < self.qos.max_inflight:
+            self.scooter.fleet.stats.tx_bytes += self._write_publish(*self.backlog.popleft())
+
+    def _ping(self):
+        if self.transport and not self.transport.is_closing():
+            self.transport.write(mqtt_codec.pingreq())
+            self.ping_handle = asyncio.get_running_loop().call_later(self.keepalive / 2, self._ping)
+
+    def data_received(self, data):
+        stats = self.scooter.fleet.stats
+        stats.rx_bytes += len(data)
+        try:
+            packets = self.reader.feed(data)
+        except mqtt_codec.MQTTProtocolError:
+            self.transport.close()
+            return
+        for packet_type, flags, body in packets:
+            if packet_type == mqtt_codec.CONNACK:
+                code, properties = mqtt_codec.parse_connack(body, self.level)
+                if code == 0:
+                    scooter = self.scooter
+                    self.aliases.reset(dict(properties).get(mqtt_codec.PROP_TOPIC_ALIAS_MAXIMUM, 0))
+                    topics = mqtt_topics.command_topics(scooter.id, scooter.zone, scooter.model)
+                    self.transport.write(mqtt_codec.subscribe(1, topics, self.qos.command, self.level))
+                    self.ping_handle = asyncio.get_running_loop().call_later(self.keepalive / 2, self._ping)
+                    if not self.connack.done():
+                        self.connack.set_result(True)
+                elif not self.connack.done():
+                    self.connack.set_exception(ConnectionError(f"CONNACK reddedildi: {code}"))
+            elif packet_type == mqtt_codec.PUBLISH:
+                stats.rx_messages += 1
+                topic, payload, qos, packet_id, _, properties = mqtt_codec.decode_publish(flags, body, self.level)
+                if qos == 1:
+                    self.transport.write(mqtt_codec.puback(packet_id))
+                elif qos == 2:
+                    self.transport.write(mqtt_codec.pubrec(packet_id))
+                    if packet_id in self.awaiting_rel:
+                        continue  # PUBREC'i kaybolan yayının tekrarı; komut ikinci kez çalıştırılmaz
+                    self.awaiting_rel.add(packet_id)
+                try:
+                    msg = json.loads(payload)
+                    if properties:
+                        mqtt5.merge_stamps(msg, mqtt5.user_properties(mqtt_codec.parse_properties(properties)))
+                    self.scooter.on_message(msg)
+                except ValueError:
+                    pass
+            elif packet_type in (mqtt_codec.PUBACK, mqtt_codec.PUBCOMP):
+                self._complete(mqtt_codec.parse_packet_id(body))
+            elif packet_type == mqtt_codec.PUBREC:
+                self.transport.write(mqtt_codec.pubrel(mqtt_codec.parse_packet_id(body)))
+            elif packet_type == mqtt_codec.PUBREL:
+                packet_id = mqtt_codec.parse_packet_id(body)
+                self.awaiting_rel.discard(packet_id)
+                self.transport.write(mqtt_codec.pubcomp(packet_id))
+
+    def connection_lost(self, exc):
+        if self.ping_handle:
+            self.ping_handle.cancel()
+        if not self.connack.done():
+            self.connack.set_exception(ConnectionError("Bağlantı CONNACK öncesi kapandı"))
+        self.scooter.fleet.on_disconnect(self.scooter)
+
+
+class WebSocketLink:
+    """websockets bağlantısı; gönderimler sıralı bir görev kuyruğu ile yapılır."""
+
+    def __init__(self, scooter, ws):
+        self.scooter = scooter
+        self.ws = ws
+        self.queue = asyncio.Queue()
+        self.writer = asyncio.create_task(self._writer())
+        self.reader = asyncio.create_task(self._reader())
+
+    def send(self, payload, kind):
+        self.queue.put_nowait(payload)
+        return len(payload) if isinstance(payload, bytes) else len(payload.encode('utf-8'))
+
+    async def _writer(self):
+        try:
+            while True:
+                await self.ws.send(await self.queue.get())
+        except Exception:
+            pass
+
+    async def _reader(self):
+        stats = self.scooter.fleet.stats
+        try:
+            async for message in self.ws:
+                stats.rx_bytes += len(message) if isinstance(message, bytes) else len(message.encode('utf-8'))
+                stats.rx_messages += 1
+                self.scooter.on_message(json.loads(message))
+        except Exception:
+            pass
+        finally:
+            self.writer.cancel()
+            self.scooter.fleet.on_disconnect(self.scooter)
+
+
+class OpenLoopGenerator:
+    """
+    Filo geneli açık döngü telemetri üreticisi: gönderim anları hedef hıza göre
+    önceden planlanır ve hiçbir gönderimin tamamlanmasını beklemez. Her
+    uyanışta zamanı gelmiş (geride kalınmışsa birikmiş) tüm mesajlar sırayla
+    bağlı scooterlara dağıtılır; planlanan ile gerçek gönderim arasındaki fark
+    'OpenLoopLag' histogramına yazılır.
+    """
+
+    def __init__(self, fleet, rate, arrival='constant'):
+        self.fleet = fleet
+        self.rate = rate
+        self.arrival = arrival
+        scenario = fleet.config.scenario
+        self.kinds = itertools.cycle(('location', 'status') if scenario == 'all' else (scenario,))
+        self.lag = fleet.registry.latency('OpenLoopLag')
+        self.next_ns = None
+        self.cursor = 0
+        self.scheduled = 0
+        self.unsent = 0  # Zamanı geldiğinde bağlı scooter olmadığı için gönderilemeyen
+        self.handle = None
+
+    def _interval_ns(self):
+        if self.arrival == 'poisson':
+            return int(random.expovariate(self.rate) * 1e9)
+        return int(1e9 / self.rate)
+
+    def _next_scooter(self):
+        scooters = self.fleet.scooters
+        for _ in range(len(scooters)):
+            scooter = scooters[self.cursor % len(scooters)]
+            self.cursor += 1
+            if scooter.link is not None:
+                return scooter
+        return None
+
+    def start(self):
+        self.next_ns = clock.now_ns()
+        self._tick()
+
+    def stop(self):
+        if self.handle is not None:
+            self.handle.cancel()
+
+    def _tick(self):
+        now = clock.now_ns()
+        while self.next_ns <= now:
+            sched_ns = self.next_ns
+            self.next_ns += self._interval_ns()
+            self.scheduled += 1
+            scooter = self._next_scooter()
+            if scooter is None:
+                self.unsent += 1
+                continue
+            if next(self.kinds) == 'location':
+                scooter.send_location(sched_ns)
+            else:
+                scooter.send_status(sched_ns)
+            self.lag.record((clock.now_ns() - sched_ns) / 1e9)
+        self.handle = self.fleet.loop.call_later((self.next_ns - clock.now_ns()) / 1e9, self._tick)
+
+
+class Fleet:
+    def __init__(self, config):
+        self.config = config
+        self.stats = FleetStats()
+        self.registry = metrics.MetricsRegistry()
+        self.delivery = mqtt_qos.DeliveryTracker(self.registry, config.qos)  # MQTT yayın onayları
+        self.loop = None
+        self.scooters = []
+        self.closing = False
+        self.seq_trackers = []  # UDP bağlantılarının gelen sıra numarası takibi
+        self.generator = None  # Açık döngü modda (--rate) OpenLoopGenerator
+
+    def local_addr(self, idx):
+        if not self.config.spread_source:
+            return None
+        return (f"127.0.{(idx // 250) % 250}.{1 + idx % 250}", 0)
+
+    def send(self, scooter, payload, kind, ack_seq=None, user=None):
+        if scooter.link is None:
+            return
+        try:
+            if user is not None:
+                self.stats.tx_bytes += scooter.link.send(payload, kind, user)  # MQTT 5 user property'leri
+            elif ack_seq is None:
+                self.stats.tx_bytes += scooter.link.send(payload, kind)
+            else:
+                self.stats.tx_bytes += scooter.link.send(payload, kind, ack_seq)
+            self.stats.tx_messages += 1
+        except Exception:
+            pass
+
+    def on_disconnect(self, scooter):
+        if scooter.link is not None:
+            scooter.link = None
+            scooter.stop()
+            if not self.closing:
+                self.stats.disconnected += 1
+
+    async def connect(self, scooter):
+        cfg = self.config
+        start_ns = clock.now_ns()
+        try:
+            if cfg.protocol == 'tcp':
+                _, link = await self.loop.create_connection(lambda: TCPLink(scooter), cfg.host, cfg.port,
+                                                            local_addr=self.local_addr(scooter.idx))
+            elif cfg.protocol == 'udp':
+                _, link = await self.loop.create_datagram_endpoint(lambda: UDPLink(scooter),
+                                                                   remote_addr=(cfg.host, cfg.port))
+            elif cfg.protocol == 'mqtt':
+                _, link = await self.loop.create_connection(lambda: MQTTLink(scooter), cfg.host, cfg.port,
+                                                            local_addr=self.local_addr(scooter.idx))
+                await asyncio.wait_for(link.connack, timeout=10)
+            else:
+                import websockets
+                ws = await websockets.connect(f"ws://{cfg.host}:{cfg.port}", open_timeout=10,
+                                              max_queue=16, local_addr=self.local_addr(scooter.idx))
+                link = WebSocketLink(scooter, ws)
+        except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+            self.stats.connect_failed += 1
+            logging.debug(f"Bağlantı hatası ({scooter.id}): {e}")
+            return
+        except Exception as e:
+            self.stats.connect_failed += 1
+            logging.debug(f"Bağlantı hatası ({scooter.id}): {e}")
+            return
+
+        self.stats.record_connect((clock.now_ns() - start_ns) / 1e9)
+        scooter.link = link
+
+        # Register (MQTT'de istemci scriptleri gibi scooter/<id>/register topic'ine)
+        reg = json.dumps(wire_format.register_message(scooter.id, cfg.encoding, scooter.clock.request(),
+                                                      mqtt_topics.groups(scooter.zone, scooter.model)))
+        self.send(scooter, reg, 'register')
+        scooter.start()
+
+    async def ramp_up(self, count, ramp_up_s, concurrency):
+        """Bağlantıları ramp_up_s süresine doğrusal yayarak açar."""
+        sem = asyncio.Semaphore(concurrency)
+        start = self.loop.time()
+
+        async def one(idx):
+            scooter = VirtualScooter(self, idx)
+            self.scooters.append(scooter)
+            target = start + (ramp_up_s * idx / count if count else 0)
+            delay = target - self.loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with sem:
+                await self.connect(scooter)
+
+        await asyncio.gather(*(one(i) for i in range(count)))
+
+    async def report(self, interval):
+        prev_tx = prev_rx = 0
+        while True:
+            await asyncio.sleep(interval)
+            s = self.stats
+            logging.info(f"FİLO | bağlı: {s.connected - s.disconnected} | hata: {s.connect_failed} | "
+                         f"TX: {(s.tx_messages - prev_tx) / interval:.0f} msg/s | "
+                         f"RX: {(s.rx_messages - prev_rx) / interval:.0f} msg/s | "
+                         f"komut: {s.commands} | ack: {s.acks}")
+            prev_tx, prev_rx = s.tx_messages, s.rx_messages
+
+    async def wait_for_messages(self, max_messages):
+        """Filonun gönderdiği mesaj sayısı max_messages'a ulaşana kadar bekler."""
+        while self.stats.tx_messages < max_messages:
+            await asyncio.sleep(0.05)
+
+    async def run(self, count, ramp_up_s, concurrency, duration, report_interval, max_messages=0):
+        self.loop = asyncio.get_running_loop()
+        reporter = asyncio.create_task(self.report(report_interval))
+        started = time.perf_counter()
+        try:
+            await self.ramp_up(count, ramp_up_s, concurrency)
+            logging.info(f"Ramp-up tamamlandı: {self.stats.connected}/{count} scooter bağlı "
+                         f"({time.perf_counter() - started:.1f} sn)")
+            if self.config.rate and self.config.scenario != 'command':
+                self.generator = OpenLoopGenerator(self, self.config.rate, self.config.arrival)
+                self.generator.start()
+                logging.info(f"Açık döngü yük: {self.config.rate:g} mesaj/sn ({self.config.arrival})")
+            remaining = max(duration - (time.perf_counter() - started), 0) if duration else None
+            if max_messages:
+                try:
+                    await asyncio.wait_for(self.wait_for_messages(max_messages), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            elif remaining is not None:
+                await asyncio.sleep(remaining)
+            else:
+                await asyncio.Future()
+        finally:
+            reporter.cancel()
+            if self.generator is not None:
+                self.generator.stop()
+            await self.close()
+
+    async def close(self):
+        self.closing = True
+        ws_closing = []
+        for scooter in self.scooters:
+            link = scooter.link
+            scooter.stop()
+            if link is None:
+                continue
+            if isinstance(link, WebSocketLink):
+                ws_closing.append(link.ws.close())
+            elif link.transport is not None:
+                if isinstance(link, MQTTLink):
+                    link.transport.write(mqtt_codec.disconnect())
+                link.transport.close()
+        if ws_closing:
+            await asyncio.wait_for(asyncio.gather(*ws_closing, return_exceptions=True), timeout=10)
+
+
+def print_summary(fleet, elapsed):
+    s = fleet.stats
+    logging.info(f"--- FİLO SONUÇLARI ({fleet.config.protocol.upper()}, {fleet.config.encoding}) ---")
+    logging.info(f"Bağlanan Scooter: {s.connected} | Başarısız: {s.connect_failed} | Kopan: {s.disconnected}")
+    if s.connected:
+        logging.info(f"Ortalama Bağlanma: {s.connect_time_total / s.connected:.4f} sn "
+                     f"(Maks: {s.connect_time_max:.4f} sn)")
+    logging.info(f"TX: {s.tx_messages} mesaj, {s.tx_bytes} bytes ({s.tx_messages / elapsed:.0f} msg/s)")
+    logging.info(f"RX: {s.rx_messages} mesaj, {s.rx_bytes} bytes ({s.rx_messages / elapsed:.0f} msg/s)")
+    logging.info(f"Komut: {s.commands} | ACK: {s.acks}")
+    generator = fleet.generator
+    if generator is not None:
+        logging.info(f"Açık döngü: hedef {generator.rate:g} mesaj/sn ({generator.arrival}) | "
+                     f"planlanan: {generator.scheduled} | gönderilemeyen: {generator.unsent}")
+        logging.info(generator.lag.format())
+    if fleet.config.protocol == 'mqtt':
+        logging.info(f"MQTT {'5' if fleet.config.mqtt_version == mqtt5.MQTT_5 else '3.1.1'} | "
+                     f"{fleet.config.qos.describe()}")
+        for line in fleet.delivery.summary_lines():
+            logging.info(line)
+    if fleet.seq_trackers:
+        loss = udp_reliability.merge_summaries(t.summary() for t in fleet.seq_trackers)
+        logging.info(f"Sunucu → Filo {udp_reliability.format_loss(loss)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tek proseste sanal scooter filosu")
+    parser.add_argument('--protocol', choices=['tcp', 'udp', 'websocket', 'mqtt'], default='tcp')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=None, help="Varsayılan: protokolün standart portu")
+    parser.add_argument('--scooters', type=int, default=1000)
+    parser.add_argument('--scenario', choices=['status', 'location', 'command', 'all'], default='all')
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON)
+    parser.add_argument('--ramp-up', type=float, default=10.0, help="Tüm bağlantıların açılacağı süre (sn)")
+    parser.add_argument('--connect-concurrency', type=int, default=500, help="Aynı anda açılan bağlantı sayısı")
+    parser.add_argument('--status-interval', type=float, default=5.0)
+    parser.add_argument('--location-interval', type=float, default=10.0)
+    parser.add_argument('--jitter', type=float, default=0.1, help="Periyotlara uygulanacak ± oran (0.1 = %%10)")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Açık döngü mod: filo geneli hedef telemetri hızı (mesaj/sn); periyotlar yok sayılır")
+    parser.add_argument('--arrival', choices=['constant', 'poisson'], default='constant',
+                        help="Açık döngüde gönderim aralıkları: sabit ya da üstel (Poisson)")
+    parser.add_argument('--exec-time', type=command_exec.exec_time_arg, default=command_exec.DEFAULT_EXEC_TIME,
+                        help="Simüle komut işleme süresi: 0.1 | fixed:S | uniform:A,B | exp:ORT | lognormal:MEDYAN,SIGMA")
+    mqtt_qos.add_arguments(parser)
+    mqtt5.add_arguments(parser)
+    parser.add_argument('--zones', type=int, default=10, help="Scooterların dağıtılacağı bölge sayısı")
+    parser.add_argument('--models', nargs='+', default=[mqtt_topics.DEFAULT_MODEL], help="Scooter modelleri")
+    parser.add_argument('--duration', type=float, default=0, help="Çalışma süresi (sn), 0 = CTRL+C'ye kadar")
+    parser.add_argument('--max-messages', type=int, default=0,
+                        help="Filo bu kadar mesaj gönderince durur (0 = sınırsız; --duration üst sınır olarak kalır)")
+    parser.add_argument('--summary-file', default=None, help="Filo sayaçlarının yazılacağı JSON dosyası")
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    parser.add_argument('--id-prefix', default='fleet_')
+    args = parser.parse_args()
+
+    limit = raise_nofile_limit()
+    if limit and args.scooters + 64 > limit:
+        logging.warning(f"Soket limiti ({limit}) {args.scooters} scooter için yetersiz olabilir.")
+
+    fleet = Fleet(FleetConfig(args))
+    started = time.perf_counter()
+    try:
+        asyncio.run(fleet.run(args.scooters, args.ramp_up, args.connect_concurrency,
+                              args.duration, args.report_interval, args.max_messages))
+    except KeyboardInterrupt:
+        logging.info("Filo kapatılıyor...")
+    finally:
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print_summary(fleet, elapsed)
+        if args.summary_file:
+            with open(args.summary_file, 'w') as f:
+                summary = {'elapsed': elapsed, **fleet.stats.as_dict()}
+                if fleet.generator is not None:
+                    lag = fleet.generator.lag
+                    summary['open_loop'] = {'rate': fleet.generator.rate, 'arrival': fleet.generator.arrival,
+                                            'scheduled': fleet.generator.scheduled,
+                                            'unsent': fleet.generator.unsent,
+                                            'lag': {f'p{p:g}': lag.percentile(p) for p in (50, 99, 99.9)}}
+                json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Sunucuların aldığı telemetriden filonun güncel durumunu tutan sütunlu (columnar) depo.
+
+Her scooter'a ilk mesajında bir satır (slot) atanır (id -> slot sözlüğü);
+durum önceden ayrılmış tek bir NumPy yapılı dizide (structured array) tutulur:
+
+    lat, lon        float64  son konum (bilinmiyorsa NaN)
+    battery         float32  son batarya yüzdesi (konum ya da durum mesajından, bilinmiyorsa NaN)
+    speed           float32  son hız (km/sa, bilinmiyorsa NaN)
+    locked          int8     1 kilitli, 0 açık, -1 bilinmiyor
+    last_seen_ns    int64    son mesajın alındığı monotonik an (clock.now_ns), 0 = hiç
+    location_ns     int64    son konumun alındığı an
+    status_ns       int64    son durumun alındığı an
+
+Güncellemeler O(1)'dir ve bellek ayırmaz: sütun görünümleri (view) bir kez
+oluşturulur, mesaj alanları doğrudan ilgili satıra yazılır. Kapasite
+dolunca dizi iki katına büyütülür (seyrek, amortize O(1)); beklenen filo
+boyutu 'capacity' ile baştan verilirse hiç büyüme olmaz. Sorgular tüm
+sütun üzerinde vektörel çalışır ('batarya %15'in altındaki scooterlar').
+
+Yazma birden çok thread'den yapılabilir: yeni slot ataması kilitlenir,
+alan yazmaları tek elemanlı NumPy atamalarıdır (kapasite büyürken başka
+thread'in yaptığı tek bir güncelleme eski diziye düşebilir; bu yüzden
+beklenen filo boyutu 'capacity' ile verilmelidir; sunucular bunu --max-scooters
+ile thread'ler başlamadan reserve() çağırarak yapar). Çok worker'lı sunucularda
+(udp_server.py / mqtt_server.py --workers) her worker kendi aldığı
+scooterların durumunu tutar.
+
+Konuma göre sorgular için depoya mekânsal indeks bağlanabilir
+(geo_index.GridIndex(state)); bağlıysa konum güncellemeleri indekse de yansır.
+
+Örnek:
+    state = FleetState(capacity=100_000)
+    state.update(msg, clock.now_ns(), scooter_id)
+    state.query(battery_below=15, locked=True)   # -> scooter id listesi
+"""
+import threading
+
+import numpy as np
+
+import clock
+
+DTYPE = np.dtype([
+    ('lat', np.float64),
+    ('lon', np.float64),
+    ('battery', np.float32),
+    ('speed', np.float32),
+    ('locked', np.int8),
+    ('last_seen_ns', np.int64),
+    ('location_ns', np.int64),
+    ('status_ns', np.int64),
+])
+
+LOCKED_UNKNOWN = -1
+DEFAULT_CAPACITY = 1024
+
+
+class FleetState:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.slots = {}  # {scooter_id: satır}
+        self.index = None  # Bağlı mekânsal indeks (geo_index.GridIndex)
+        self._lock = threading.Lock()
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity, old=None):
+        data = np.empty(capacity, dtype=DTYPE)
+        data['lat'] = data['lon'] = data['battery'] = data['speed'] = np.nan
+        data['locked'] = LOCKED_UNKNOWN
+        data['last_seen_ns'] = data['location_ns'] = data['status_ns'] = 0
+        ids = np.empty(capacity, dtype=object)
+        if old is not None:
+            data[:len(old[0])] = old[0]
+            ids[:len(old[1])] = old[1]
+        self.data = data
+        self.ids = ids  # Satır -> scooter id (vektörel sorgu sonuçları için)
+        # Sütun görünümleri: güncellemelerde alan adıyla yeni görünüm oluşturulmaz
+        self.lat = data['lat']
+        self.lon = data['lon']
+        self.battery = data['battery']
+        self.speed = data['speed']
+        self.locked = data['locked']
+        self.last_seen_ns = data['last_seen_ns']
+        self.location_ns = data['location_ns']
+        self.status_ns = data['status_ns']
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, scooter_id):
+        return scooter_id in self.slots
+
+    def __getstate__(self):
+        # Worker -> ana proses aktarımı: kilit, indeks ve boş kapasite taşınmaz
+        n = len(self.slots)
+        return {'slots': self.slots, 'data': self.data[:n].copy(), 'ids': self.ids[:n].copy()}
+
+    def __setstate__(self, state):
+        self.slots = state['slots']
+        self.index = None
+        self._lock = threading.Lock()
+        self._allocate(max(len(state['data']), 1), (state['data'], state['ids']))
+
+    def reserve(self, capacity):
+        """Kapasiteyi en az 'capacity' satıra çıkarır; yazan thread'ler başlamadan çağrılmalıdır."""
+        with self._lock:
+            if capacity > len(self.data):
+                self._allocate(capacity, (self.data, self.ids))
+
+    def slot(self, scooter_id):
+        """Scooter'ın satırı; ilk görülüşte atanır (gerekirse kapasite iki katına çıkar)."""
+        slot = self.slots.get(scooter_id)
+        if slot is not None:
+            return slot
+        with self._lock:
+            slot = self.slots.get(scooter_id)
+            if slot is None:
+                slot = len(self.slots)
+                if slot == len(self.data):
+                    self._allocate(2 * len(self.data), (self.data, self.ids))
+                self.ids[slot] = scooter_id
+                self.slots[scooter_id] = slot
+        return slot
+
+    # --- Güncelleme ---
+    def update_location(self, scooter_id, lat, lon, battery=None, ts_ns=None):
+        i = self.slots.get(scooter_id)
+        if i is None:
+            i = self.slot(scooter_id)
+        ts_ns = ts_ns or clock.now_ns()
+        self.lat[i] = lat
+        self.lon[i] = lon
+        if self.index is not None:
+            self.index.move(i, lat, lon)
+        if battery is not None:
+            self.battery[i] = battery
+        self.location_ns[i] = ts_ns
+        self.last_seen_ns[i] = ts_ns
+
+    def update_status(self, scooter_id, battery=None, locked=None, speed=None, ts_ns=None):
+        i = self.slots.get(scooter_id)
+        if i is None:
+            i = self.slot(scooter_id)
+        ts_ns = ts_ns or clock.now_ns()
+        if battery is not None:
+            self.battery[i] = battery
+        if locked is not None:
+            self.locked[i] = locked
+        if speed is not None:
+            self.speed[i] = speed
+        self.status_ns[i] = ts_ns
+        self.last_seen_ns[i] = ts_ns
+
+    def touch(self, scooter_id, ts_ns=None):
+        """Telemetri dışı mesaj (register, ACK): sadece son görülme anı."""
+        self.last_seen_ns[self.slot(scooter_id)] = ts_ns or clock.now_ns()
+
+    def update(self, msg, ts_ns=None, scooter_id=None):
+        """
+        Sunucunun çözdüğü mesajı (JSON ya da wire_format.decode) uygular.
+        Konum/durum taşımayan mesajlar son görülme anını günceller. Mesajın
+        hangi scooter'a ait olduğu bilinmiyorsa hiçbir şey yapılmaz.
+        """
+        scooter_id = scooter_id or msg.get('scooter_id')
+        if not scooter_id or scooter_id == 'unknown':
+            return
+        location = msg.get('location')
+        status = msg.get('status')
+        if location is not None:
+            self.update_location(scooter_id, location['lat'], location['lon'], msg.get('battery'), ts_ns)
+        elif status is not None:
+            self.update_status(scooter_id, status.get('battery_level'), status.get('is_locked'),
+                               status.get('speed'), ts_ns)
+        else:
+            self.touch(scooter_id, ts_ns)
+
+    def merge(self, other):
+        """Başka bir depodaki (ör. worker prosesinden gelen) kayıtları ekler; aynı scooter için son görülen kazanır."""
+        for scooter_id, j in other.slots.items():
+            i = self.slot(scooter_id)
+            if other.last_seen_ns[j] >= self.last_seen_ns[i]:
+                self.data[i] = other.data[j]
+                if self.index is not None:
+                    self.index.move(i, self.lat[i], self.lon[i])
+        return self
+
+    # --- Sorgular ---
+    def get(self, scooter_id):
+        """Tek scooter'ın durumu sözlük olarak (bilinmeyen alanlar None); kayıt yoksa None."""
+        i = self.slots.get(scooter_id)
+        if i is None:
+            return None
+        row = self.data[i]
+        value = lambda v: None if v != v else float(v)  # NaN -> None
+        return {
+            'scooter_id': scooter_id,
+            'lat': value(row['lat']), 'lon': value(row['lon']),
+            'battery': value(row['battery']), 'speed': value(row['speed']),
+            'locked': None if row['locked'] == LOCKED_UNKNOWN else bool(row['locked']),
+            'last_seen_ns': int(row['last_seen_ns']) or None,
+        }
+
+    def mask(self, battery_below=None, locked=None, seen_within=None, bbox=None, now_ns=None, rows=None):
+        """
+        Kayıtlı satırlar (ya da verilirse yalnızca 'rows' satırları, ör. mekânsal
+        indeksin adayları) üzerinde koşullara uyanların boolean maskesi.
+            battery_below  batarya bu yüzdenin altında (bilinmeyenler hariç)
+            locked         True/False: kilit durumu bu olan (bilinmeyenler hariç)
+            seen_within    son bu kadar saniye içinde mesaj gönderen
+            bbox           (lat_min, lon_min, lat_max, lon_max) içinde son konumu olan
+        """
+        if rows is None:
+            rows = slice(0, len(self.slots))
+            m = np.ones(len(self.slots), dtype=bool)
+        else:
+            m = np.ones(len(rows), dtype=bool)
+        if battery_below is not None:
+            m &= self.battery[rows] < battery_below  # NaN karşılaştırması False döner
+        if locked is not None:
+            m &= self.locked[rows] == int(locked)
+        if seen_within is not None:
+            m &= self.last_seen_ns[rows] >= (now_ns or clock.now_ns()) - int(seen_within * 1e9)
+        if bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = bbox
+            lat, lon = self.lat[rows], self.lon[rows]
+            m &= (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return m
+
+    def query(self, **conditions):
+        """mask() koşullarına uyan scooter id'leri."""
+        return self.ids[:len(self.slots)][self.mask(**conditions)].tolist()
+
+    def count(self, **conditions):
+        return int(np.count_nonzero(self.mask(**conditions)))
+
+    @property
+    def nbytes(self):
+        """Sütun dizilerinin bellek kullanımı (id tablosu ve sözlük hariç)."""
+        return self.data.nbytes + self.ids.nbytes
+
+    def describe(self, low_battery=15, seen_within=60):
+        if not self.slots:
+            return "Filo durumu: kayıt yok"
+        return (f"Filo durumu: {len(self.slots)} scooter | son {seen_within} sn'de görülen: "
+                f"{self.count(seen_within=seen_within)} | batarya < %{low_battery}: "
+                f"{self.count(battery_below=low_battery)} | kilitli: {self.count(locked=True)}")
+
+
+def add_arguments(parser):
+    parser.add_argument('--max-scooters', type=int, default=DEFAULT_CAPACITY,
+                        help="Beklenen en fazla scooter; filo deposu baştan bu boyutta ayrılır "
+                             "(eşzamanlı yazarken büyüme güncelleme kaybettirebilir)")
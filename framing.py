@@ -0,0 +1,123 @@
+"""
+TCP akışı için satır (newline) tabanlı çerçeve çözücü.
+
+Gelen veri tek bir bytearray içinde tutulur. Her feed çağrısında sadece yeni
+gelen kısımda son ayraç yerinde aranır; ayraca kadar olan tamamlanmış bölge
+tek seferde kopyalanıp C seviyesinde bölünür ve tüketilen önek tek bir
+silme işlemiyle atılır. Yarım kalan çerçeve tamamlanana kadar çözülmez
+ve bölünmez; böylece çok sayıda satır içeren (pipelined) büyük parçalar da
+lineer zamanda işlenir.
+
+fixed_sizes verilirse (bkz. wire_format.FRAME_SIZES) akış karma modda okunur:
+ilk baytı tabloda bulunan çerçeveler ayraç aranmadan sabit boyutlarıyla kesilir.
+
+Boyut sınırı aşılınca aynı parçadaki sınırdan önceki tam çerçeveler yine
+döndürülür, tampon boşaltılır ve FrameTooLarge bir sonraki feed çağrısında
+fırlatılır (parçada tam çerçeve yoksa hemen).
+"""
+
+DEFAULT_MAX_FRAME_SIZE = 64 * 1024
+
+
+class FrameTooLarge(ValueError):
+    """Ayraç görülmeden çerçeve boyutu sınırı aşıldığında fırlatılır."""
+
+
+class LineFramer:
+    def __init__(self, max_frame_size=DEFAULT_MAX_FRAME_SIZE, delimiter=b'\n', fixed_sizes=None):
+        self.max_frame_size = max_frame_size
+        self.delimiter = delimiter
+        self.fixed_sizes = fixed_sizes  # {ilk bayt: çerçeve boyutu}, ikili format için
+        self._buf = bytearray()
+        self._scanned = 0  # Ayraç bulunmadığı bilinen önek uzunluğu
+        self._error = None  # Tam çerçeveler döndürüldükten sonra fırlatılacak sınır hatası
+
+    def feed(self, data):
+        """
+        Soketten okunan ham baytları ekler ve tamamlanan çerçeveleri (bytes) döndürür.
+        Boş ve yalnızca boşluk içeren satırlar atlanır; yarım kalan çerçeve bir
+        sonraki çağrıya saklanır.
+        """
+        if self._error is not None:
+            raise self._error
+        if self.fixed_sizes:
+            return self._feed_mixed(data)
+
+        buf = self._buf
+        buf += data
+        limit = self.max_frame_size
+
+        last = buf.rfind(self.delimiter, self._scanned)
+        if last == -1:
+            if len(buf) > limit:
+                raise FrameTooLarge(f"Çerçeve boyutu sınırı aşıldı: {len(buf)} > {limit} bytes")
+            self._scanned = len(buf)
+            return []
+
+        view = memoryview(buf)
+        try:
+            parts = bytes(view[:last]).split(self.delimiter)
+        finally:
+            view.release()
+        del buf[:last + 1]
+        self._scanned = len(buf)
+
+        if max(map(len, parts)) <= limit and len(buf) <= limit:
+            return list(filter(bytes.strip, parts))  # strip boş dönerse (boşluk satırı) atlanır
+        frames = []
+        for part in parts:
+            if len(part) > limit:
+                return self._fail(frames, len(part))
+            if part.strip():
+                frames.append(part)
+        return self._fail(frames, len(buf))
+
+    def _fail(self, frames, size):
+        """Sınırdan önceki tam çerçeveleri döndürür, hatayı sonraki feed'e bırakır (çerçeve yoksa fırlatır)."""
+        self._buf.clear()
+        self._scanned = 0
+        error = FrameTooLarge(f"Çerçeve boyutu sınırı aşıldı: {size} > {self.max_frame_size} bytes")
+        if not frames:
+            raise error
+        self._error = error
+        return frames
+
+    def _feed_mixed(self, data):
+        """Sabit boyutlu ikili çerçeveler ile satır çerçevelerinin karışık geldiği akış."""
+        buf = self._buf
+        buf += data
+        limit = self.max_frame_size
+        sizes = self.fixed_sizes
+        delim = self.delimiter
+        frames = []
+
+        pos = 0
+        n = len(buf)
+        while pos < n:
+            size = sizes.get(buf[pos])
+            if size is not None:
+                if n - pos < size:
+                    break
+                frames.append(bytes(buf[pos:pos + size]))
+                pos += size
+                continue
+
+            end = buf.find(delim, pos)
+            if end == -1:
+                break
+            if end - pos > limit:
+                return self._fail(frames, end - pos)
+            frame = bytes(buf[pos:end])
+            if frame.strip():
+                frames.append(frame)
+            pos = end + 1
+
+        del buf[:pos]
+        self._scanned = 0
+        if len(buf) > limit:
+            return self._fail(frames, len(buf))
+        return frames
+
+    def pending(self):
+        """Tamponda bekleyen (henüz ayracı gelmemiş) bayt sayısı."""
+        return len(self._buf)
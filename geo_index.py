@@ -0,0 +1,321 @@
+"""
+Filo durumu deposu (fleet_state.py) üzerinde ızgara (grid) tabanlı mekânsal indeks.
+
+Dünya yaklaşık kare hücrelere (varsayılan 250 m) bölünür; her hücre içindeki
+scooterların satır (slot) numaralarını tutar. İndeks depoya bağlanınca
+(GridIndex(state)) her konum güncellemesi FleetState.update_location
+içinden move() ile indekse yansır: scooter aynı hücrede kalıyorsa hiçbir şey
+yapılmaz, hücre değiştirdiyse eski hücreden çıkarılıp yenisine eklenir (O(1)).
+
+Sorgular yalnızca bölgeyi kesen hücrelerin adaylarına bakar; kesin
+konum/mesafe filtresi adaylar üzerinde depo sütunlarından vektörel yapılır:
+    bbox(lat_min, lon_min, lat_max, lon_max)   dikdörtgen içindekiler
+    radius(lat, lon, meters)                   mesafeye göre sıralı, yarıçap içindekiler
+    nearest(lat, lon, k)                       en yakın k scooter (hücre halkalarıyla genişleyerek)
+Üçü de FleetState.mask() koşullarını alır (ör. locked=True, battery_below=15).
+
+Güncellemeler (thread'li sunucularda bağlantı thread'leri, paho ağ
+thread'i) ve sorgular (komut thread'i) farklı thread'lerden gelebilir;
+hücre tabloları tek bir kilitle korunur. Kilit yalnızca hücre değişiminde
+ve aday toplama sırasında tutulur; mesafe filtresi kilit dışında yapılır.
+
+Hücre boyu boylamda indeksin referans enleminde (ilk konumdan ya da
+ref_lat'tan) sabitlenir; tek şehirlik filolarda hücreler kareye yakındır.
+Mesafeler eşdikdörtgen (equirectangular) yaklaşımla hesaplanır, şehir
+ölçeğindeki mesafelerde hata binde birin altındadır.
+
+Bölge hedefli komutlar için metinden alan tanımı:
+    bbox:41.00,28.95,41.02,28.99     (lat_min,lon_min,lat_max,lon_max)
+    radius:41.0082,28.9784,500       (merkez ve metre)
+Sunucular --command-area ile periyodik komutu yalnızca bu alandaki
+scooterlara gönderir.
+
+Örnek:
+    state = fleet_state.FleetState(capacity=100_000)
+    geo = GridIndex(state)
+    state.update_location('scooter_1', 41.0082, 28.9784)
+    geo.nearest(41.01, 28.98, 10, locked=True)   # -> [(scooter id, metre), ...]
+"""
+import argparse
+import math
+import threading
+from itertools import chain
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+M_PER_DEG = math.pi * EARTH_RADIUS_M / 180  # Enlem derecesi başına metre
+DEFAULT_CELL_M = 250.0
+# nearest(): halka taraması dolu hücre sayısının SCAN_FACTOR katını ya da toplanan adaylar
+# filonun SCAN_SHARE'ini aşınca tüm filo üzerinde vektörel taramaya geçilir
+SCAN_FACTOR = 1
+SCAN_MIN_CELLS = 64
+SCAN_SHARE = 0.02
+
+
+def distances_m(lat, lon, lats, lons):
+    """(lat, lon) noktasından dizilerdeki konumlara yaklaşık mesafe (metre)."""
+    x = np.radians(lons - lon) * np.cos(np.radians((lats + lat) / 2))
+    y = np.radians(lats - lat)
+    return EARTH_RADIUS_M * np.hypot(x, y)
+
+
+class GridIndex:
+    def __init__(self, state, cell_m=DEFAULT_CELL_M, ref_lat=None):
+        self.state = state
+        self.cell_m = cell_m
+        self.dlat = cell_m / M_PER_DEG  # Hücrenin enlem yüksekliği (derece)
+        self.dlon = None  # Boylam genişliği; referans enlem belli olunca sabitlenir
+        self.cells = {}  # {(satır, sütun): {slot, ...}}
+        self.slot_cell = {}  # {slot: (satır, sütun)}
+        self._lock = threading.Lock()  # cells / slot_cell için (güncelleme ve sorgu thread'leri)
+        self.bounds = None  # Dolu hücrelerin [min satır, max satır, min sütun, max sütun] kapsamı (yalnız genişler)
+        if ref_lat is not None:
+            self._set_reference(ref_lat)
+        state.index = self
+        self.rebuild()
+
+    def _set_reference(self, lat):
+        self.ref_lat = lat
+        self.dlon = self.dlat / max(math.cos(math.radians(lat)), 0.01)
+
+    def rebuild(self):
+        """Depodaki tüm konumları baştan indeksler (ör. merge sonrası)."""
+        with self._lock:
+            self.cells.clear()
+            self.slot_cell.clear()
+            self.bounds = None
+            n = len(self.state)
+            for slot in np.flatnonzero(~np.isnan(self.state.lat[:n])).tolist():
+                self._move(slot, self.state.lat[slot], self.state.lon[slot])
+
+    def cell_of(self, lat, lon):
+        return int(lat // self.dlat), int(lon // self.dlon)
+
+    def move(self, slot, lat, lon):
+        """Scooter'ın hücresini günceller; hücre değişmediyse hiçbir şey yapmaz."""
+        if lat != lat or lon != lon:  # NaN: konum bilinmiyor
+            return
+        with self._lock:
+            self._move(slot, lat, lon)
+
+    def _move(self, slot, lat, lon):
+        if self.dlon is None:
+            self._set_reference(lat)
+        key = (int(lat // self.dlat), int(lon // self.dlon))
+        old = self.slot_cell.get(slot)
+        if old == key:
+            return
+        if old is not None:
+            cell = self.cells[old]
+            cell.discard(slot)
+            if not cell:
+                del self.cells[old]
+        cell = self.cells.get(key)
+        if cell is None:
+            self.cells[key] = {slot}
+            bounds = self.bounds
+            if bounds is None:
+                self.bounds = [key[0], key[0], key[1], key[1]]
+            elif not (bounds[0] <= key[0] <= bounds[1] and bounds[2] <= key[1] <= bounds[3]):
+                self.bounds = [min(bounds[0], key[0]), max(bounds[1], key[0]),
+                               min(bounds[2], key[1]), max(bounds[3], key[1])]
+        else:
+            cell.add(slot)
+        self.slot_cell[slot] = key
+
+    def __len__(self):
+        return len(self.slot_cell)
+
+    # --- Aday toplama ---
+    def _gather(self, keys):
+        """Hücrelerdeki slotlar; çağıran kilidi tutar."""
+        cells = self.cells
+        found = [cells[k] for k in keys if k in cells]
+        return np.fromiter(chain.from_iterable(found), dtype=np.int64)
+
+    def _range(self, lat_min, lon_min, lat_max, lon_max):
+        """Dikdörtgeni kesen hücrelerdeki slotlar."""
+        if self.dlon is None:
+            return np.empty(0, dtype=np.int64)
+        r0, c0 = self.cell_of(lat_min, lon_min)
+        r1, c1 = self.cell_of(lat_max, lon_max)
+        with self._lock:
+            if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self.cells):
+                # Alan dolu hücre sayısından genişse hücreleri tek tek dolaş
+                keys = [k for k in self.cells if r0 <= k[0] <= r1 and c0 <= k[1] <= c1]
+            else:
+                keys = [(r, c) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+            return self._gather(keys)
+
+    def _ring(self, row, col, r, bounds=None):
+        """(row, col) hücresine Chebyshev uzaklığı tam r olan hücreler (verilirse bounds kapsamıyla kırpılmış)."""
+        if r == 0:
+            return [(row, col)]
+        r0, r1, c0, c1 = bounds or (row - r, row + r, col - r, col + r)
+        cols = range(max(col - r, c0), min(col + r, c1) + 1)
+        rows = range(max(row - r + 1, r0), min(row + r - 1, r1) + 1)
+        keys = []
+        if r0 <= row - r <= r1:
+            keys += [(row - r, c) for c in cols]
+        if r0 <= row + r <= r1:
+            keys += [(row + r, c) for c in cols]
+        if c0 <= col - r <= c1:
+            keys += [(rr, col - r) for rr in rows]
+        if c0 <= col + r <= c1:
+            keys += [(rr, col + r) for rr in rows]
+        return keys
+
+    def _filter(self, slots, conditions):
+        if conditions and len(slots):
+            slots = slots[self.state.mask(rows=slots, **conditions)]
+        return slots
+
+    # --- Sorgular ---
+    def bbox(self, lat_min, lon_min, lat_max, lon_max, **conditions):
+        """Dikdörtgen içindeki (ve koşullara uyan) scooter id'leri."""
+        slots = self._range(lat_min, lon_min, lat_max, lon_max)
+        slots = self._filter(slots, dict(conditions, bbox=(lat_min, lon_min, lat_max, lon_max)))
+        return self.state.ids[slots].tolist()
+
+    def radius(self, lat, lon, meters, **conditions):
+        """Merkeze 'meters' uzaklıktaki scooterlar, yakından uzağa: [(scooter id, metre), ...]"""
+        dlat = meters / M_PER_DEG
+        dlon = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 0.01)
+        slots = self._filter(self._range(lat - dlat, lon - dlon, lat + dlat, lon + dlon), conditions)
+        dist = distances_m(lat, lon, self.state.lat[slots], self.state.lon[slots])
+        inside = dist <= meters
+        slots, dist = slots[inside], dist[inside]
+        order = np.argsort(dist, kind='stable')
+        return list(zip(self.state.ids[slots[order]].tolist(), dist[order].tolist()))
+
+    def nearest(self, lat, lon, k=10, max_meters=None, **conditions):
+        """
+        En yakın k scooter: [(scooter id, metre), ...]. Merkez hücreden halka
+        halka genişler; bulunan k'ncı aday taranmış karenin iç yarıçapından
+        yakınsa daha dışta daha yakın scooter olamayacağı için durur. Halkalar
+        filonun kapsamıyla (bounds) kırpılır, merkez kapsam dışındaysa boş
+        halkalar atlanır; böylece süre merkezin filoya uzaklığıyla büyümez.
+        Bakılan hücre sayısı dolu hücre sayısını ya da toplanan adaylar filonun
+        bir payını aşarsa (seyrek filo; filonun çok dışından, durma sınırının
+        gevşek kaldığı köşegen sorgular) tüm filo üzerinde vektörel taramaya
+        geçilir.
+        """
+        if self.dlon is None or k <= 0:
+            return []
+        row, col = self.cell_of(lat, lon)
+        # Taranmış karenin kenarına en kısa mesafe: halka başına en dar hücre kenarı
+        side = min(self.cell_m, self.dlon * M_PER_DEG * math.cos(math.radians(lat)))
+        best_slots = np.empty(0, dtype=np.int64)  # Şimdiye kadarki en yakın k aday
+        best_dist = np.empty(0)
+        visited = checked = gathered = 0
+        bounds = self.bounds
+        # Kapsamın dışındaki halkalar boştur: ilk dolu olabilecek halkadan başla, halkaları kapsamla kırp
+        r = max(bounds[0] - row, row - bounds[1], bounds[2] - col, col - bounds[3], 0) if bounds else 0
+        while True:
+            ring = self._ring(row, col, r, bounds)
+            with self._lock:
+                keys = [key for key in ring if key in self.cells]
+                slots = self._gather(keys)
+                occupied = len(self.cells)
+            checked += len(ring)
+            visited += len(keys)
+            gathered += len(slots)
+            slots = self._filter(slots, conditions)
+            if len(slots):
+                dist = distances_m(lat, lon, self.state.lat[slots], self.state.lon[slots])
+                if max_meters is not None:
+                    inside = dist <= max_meters
+                    slots, dist = slots[inside], dist[inside]
+                best_slots, best_dist = _closest(np.concatenate((best_slots, slots)),
+                                                 np.concatenate((best_dist, dist)), k)
+            covered = r * side
+            if len(best_dist) == k and best_dist.max() <= covered:
+                break
+            if visited >= occupied or (max_meters is not None and covered > max_meters):
+                break
+            r += 1
+            if checked > SCAN_FACTOR * occupied + SCAN_MIN_CELLS or gathered > SCAN_SHARE * len(self.state):
+                return self._nearest_scan(lat, lon, k, max_meters, conditions)
+        order = np.argsort(best_dist, kind='stable')
+        return list(zip(self.state.ids[best_slots[order]].tolist(), best_dist[order].tolist()))
+
+    def _nearest_scan(self, lat, lon, k, max_meters, conditions):
+        """nearest() yedeği: konumu bilinen tüm scooterlar üzerinde vektörel en yakın k."""
+        n = len(self.state)
+        m = self.state.mask(**conditions) & ~np.isnan(self.state.lat[:n])
+        slots = np.flatnonzero(m)
+        dist = distances_m(lat, lon, self.state.lat[slots], self.state.lon[slots])
+        if max_meters is not None:
+            inside = dist <= max_meters
+            slots, dist = slots[inside], dist[inside]
+        slots, dist = _closest(slots, dist, k)
+        order = np.argsort(dist, kind='stable')
+        return list(zip(self.state.ids[slots[order]].tolist(), dist[order].tolist()))
+
+    def describe(self):
+        with self._lock:
+            sizes = [len(c) for c in self.cells.values()]
+            count = len(self.slot_cell)
+        if not sizes:
+            return "Mekânsal indeks: konum yok"
+        return (f"Mekânsal indeks: {count} scooter, {len(sizes)} dolu hücre "
+                f"({self.cell_m:g} m) | hücre başına ort. {np.mean(sizes):.1f}, en fazla {max(sizes)}")
+
+
+def _closest(slots, dist, k):
+    """En yakın k (slot, mesafe); halkalar arasında hücre değiştirip iki kez toplanan slotlar tekilleştirilir."""
+    if len(slots) > k:
+        slots, first = np.unique(slots, return_index=True)
+        dist = dist[first]
+    if len(slots) > k:
+        best = np.argpartition(dist, k - 1)[:k]
+        slots, dist = slots[best], dist[best]
+    return slots, dist
+
+
+class Area:
+    """Komut hedefi olan coğrafi alan: bbox (lat_min, lon_min, lat_max, lon_max) ya da radius (lat, lon, metre)."""
+
+    def __init__(self, kind, params):
+        self.kind = kind
+        self.params = tuple(params)
+
+    def select(self, index, **conditions):
+        """Alandaki scooter id'leri (küme)."""
+        if self.kind == 'bbox':
+            return set(index.bbox(*self.params, **conditions))
+        return {scooter_id for scooter_id, _ in index.radius(*self.params, **conditions)}
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+def parse_area(text):
+    """'bbox:lat_min,lon_min,lat_max,lon_max' ya da 'radius:lat,lon,metre' -> Area"""
+    kind, _, rest = text.partition(':')
+    try:
+        params = [float(p) for p in rest.split(',')]
+    except ValueError:
+        raise ValueError(f"Alan sayısal olmalı: {text}") from None
+    if kind == 'bbox' and len(params) == 4:
+        lat_min, lon_min, lat_max, lon_max = params
+        if lat_min > lat_max or lon_min > lon_max:
+            raise ValueError(f"bbox köşeleri (min, max) sırasında olmalı: {text}")
+        return Area(kind, params)
+    if kind == 'radius' and len(params) == 3 and params[2] > 0:
+        return Area(kind, params)
+    raise ValueError(f"Geçersiz alan: {text} (bbox:lat_min,lon_min,lat_max,lon_max | radius:lat,lon,metre)")
+
+
+def area_arg(text):
+    try:
+        return parse_area(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_arguments(parser):
+    parser.add_argument('--command-area', type=area_arg, default=None,
+                        help="Periyodik komutu yalnızca bu alandaki scooterlara gönder: "
+                             "bbox:lat_min,lon_min,lat_max,lon_max | radius:lat,lon,metre")
@@ -0,0 +1,153 @@
+"""
+Log yapılandırması: senkron veya kuyruklu (asenkron) yazım ve mesaj başına log örneklemesi.
+
+Her gönderilen/alınan mesaj için atılan loglar (SERVER RX/TX, SCOOTER RX/TX)
+'msg_log' üzerinden yazılır. Bu loglar:
+  * örneklenir: sample_rate olasılığıyla yazılır (0 ise hiç kayıt oluşturulmaz)
+  * tembel biçimlendirilir: '%s' argümanları ancak kayıt yazılırken metne çevrilir
+
+Asenkron modda kök logger'a QueueHandler bağlanır; kayıtlar sınırlı bir
+kuyruğa bırakılır ve QueueListener thread'i stderr'e yazar. Kuyruk dolarsa
+kayıt bekletilmeden atılır. Biçimlendirme de bu thread'de yapılır.
+
+Profiller (SCOOTER_LOG_PROFILE ortam değişkeni veya --log-profile):
+    verbose  senkron, tüm mesaj logları (varsayılan, eski davranış)
+    async    kuyruklu, tüm mesaj logları
+    sampled  kuyruklu, mesaj logları %1 örneklenir
+    quiet    kuyruklu, mesaj logları kapalı (benchmark profili)
+Örnekleme oranı SCOOTER_LOG_SAMPLE veya --log-sample-rate ile değiştirilebilir.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+
+PROFILE_ENV = 'SCOOTER_LOG_PROFILE'
+SAMPLE_ENV = 'SCOOTER_LOG_SAMPLE'
+
+# {profil: (asenkron, mesaj logu örnekleme oranı)}
+PROFILES = {
+    'verbose': (False, 1.0),
+    'async': (True, 1.0),
+    'sampled': (True, 0.01),
+    'quiet': (True, 0.0),
+}
+
+DEFAULT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
+_state = {'listener': None, 'format': DEFAULT_FORMAT, 'datefmt': None, 'profile': None}
+
+
+class MessageLog:
+    """Sıcak yol logları: örnekleme kayıt oluşturulmadan önce yapılır."""
+
+    def __init__(self, name='scooter.msg'):
+        self.logger = logging.getLogger(name)
+        self.sample_rate = 1.0
+
+    def enabled(self):
+        """Pahalı argüman hazırlığını atlamak için: bu çağrı yazılacak mı?"""
+        rate = self.sample_rate
+        if rate >= 1.0:
+            return self.logger.isEnabledFor(logging.INFO)
+        if rate <= 0.0 or random.random() >= rate:
+            return False
+        return self.logger.isEnabledFor(logging.INFO)
+
+    def info(self, msg, *args):
+        if self.enabled():
+            self.logger.info(msg, *args)
+
+
+msg_log = MessageLog()
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """Kaydı biçimlendirmeden kuyruğa bırakır; kuyruk doluysa beklemeden atar."""
+
+    def __init__(self, q, queue_size):
+        super().__init__(q)
+        self.queue_size = queue_size
+        self.dropped = 0  # Kuyruk dolu olduğu için atılan kayıtlar
+
+    def prepare(self, record):
+        # İstisna bilgisi (traceback) çağıran thread'de metne çevrilir; diğerleri dinleyicide
+        if record.exc_info:
+            return super().prepare(record)
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+def configure(profile=None, sample_rate=None, format=None, datefmt=None, queue_size=100_000):
+    """
+    Kök logger'ı profile göre (yeniden) yapılandırır. Format ilk çağrıda
+    verilir, sonraki çağrılarda (ör. argümanlar okunduktan sonra) korunur.
+    """
+    if format is not None:
+        _state['format'] = format
+    if datefmt is not None:
+        _state['datefmt'] = datefmt
+    profile = profile or os.environ.get(PROFILE_ENV) or 'verbose'
+    if profile not in PROFILES:
+        raise ValueError(f"Bilinmeyen log profili: {profile} (seçenekler: {', '.join(PROFILES)})")
+    use_queue, rate = PROFILES[profile]
+    if sample_rate is None and os.environ.get(SAMPLE_ENV):
+        sample_rate = float(os.environ[SAMPLE_ENV])
+    msg_log.sample_rate = rate if sample_rate is None else sample_rate
+    _state['profile'] = profile
+
+    shutdown()
+    formatter = logging.Formatter(_state['format'], _state['datefmt'])
+    stream = logging.StreamHandler()
+    stream.setFormatter(formatter)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(logging.INFO)
+
+    if use_queue:
+        q = queue.SimpleQueue()  # put kilitsiz; bkz. results_writer.ResultsWriter
+        root.addHandler(_LazyQueueHandler(q, queue_size))
+        listener = logging.handlers.QueueListener(q, stream, respect_handler_level=True)
+        listener.start()
+        _state['listener'] = listener
+    else:
+        root.addHandler(stream)
+    return profile
+
+
+def shutdown():
+    """Kuyruktaki kayıtları yazar ve dinleyici thread'ini durdurur."""
+    listener, _state['listener'] = _state['listener'], None
+    if listener is not None:
+        listener.stop()
+
+
+def after_fork():
+    """
+    Fork ile açılan worker prosesinde aynı ayarlarla yeniden yapılandırır;
+    dinleyici thread'i çocuk prosese kopyalanmadığı için gereklidir.
+    """
+    _state['listener'] = None
+    configure(_state['profile'], msg_log.sample_rate)
+
+
+def add_arguments(parser):
+    parser.add_argument('--log-profile', choices=list(PROFILES), default=None,
+                        help=f"Log profili (varsayılan: ${PROFILE_ENV} veya 'verbose')")
+    parser.add_argument('--log-sample-rate', type=float, default=None,
+                        help="Mesaj başına logların yazılma oranı (0-1)")
+
+
+def configure_from_args(args):
+    return configure(args.log_profile, args.log_sample_rate)
+
+
+atexit.register(shutdown)
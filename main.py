@@ -5,7 +5,18 @@ import time
 import random
 import logging
 import argparse
-import csv
+
+import clock
+import command_dispatch
+import command_exec
+import event_trace
+import fleet_state
+import geo_index
+import log_config
+import metrics
+import results_writer
+import wire_format
+from log_config import msg_log
 
 # Sunucu ayarları
 SERVER_HOST = "localhost"
@@ -15,79 +26,284 @@ SERVER_PORT = 8765
 LOCATION_UPDATE_INTERVAL_S = 10
 STATUS_UPDATE_INTERVAL_S = 5
 COMMAND_INTERVAL_S = 15
-
-latency_data = []  # Gecikme / İşlem Süresi
-reconnect_time_data = []  # Yeniden Bağlanma Süresi
-bandwidth_data = []  # Bant Genişliği
+COMMAND_AREA = None  # Verilirse periyodik komut yalnızca bu alandaki scooterlara (geo_index.Area)
+
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency')  # Gecikme / İşlem Süresi
+reconnect_time_data = registry.latency('ReconnectTime')  # Yeniden Bağlanma Süresi
+bandwidth_data = registry.size('Bandwidth')  # Bant Genişliği
+json_bandwidth_data = registry.size('JSONBandwidth')  # Aynı trafiğin JSON karşılığı (format karşılaştırması için)
+downlink_data = registry.latency('Latency_Downlink')  # Sunucu: tek yönlü gecikmeler (bkz. clock.py)
+uplink_data = registry.latency('Latency_Uplink')
+telemetry_data = registry.latency('Latency_Telemetry')  # Sunucu: açık döngü yükte planlanan gönderimden alışa
+command_queue_data = registry.latency('CommandQueueDelay')  # İstemci: komutun yürütülmeyi beklediği süre
+command_exec_data = registry.latency('CommandExecTime')  # İstemci: komut yürütme süresi
+tracer = event_trace.Tracer('websocket', bandwidth=bandwidth_data, latency=latency_data,
+                            reconnect=reconnect_time_data, json_bandwidth=json_bandwidth_data,
+                            downlink=downlink_data, uplink=uplink_data, telemetry=telemetry_data)
 
 # Loglama ayarları
-logging.basicConfig(
-    level=logging.INFO,
+log_config.configure(
     format='%(asctime)s [%(levelname)s] %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 
-connected_scooters = set()
+OUTBOX_LIMIT = 64  # Bağlantı başına bekleyebilecek en fazla mesaj; dolarsa yeni mesaj atlanır
+STALL_TIMEOUT_S = 1.0  # Yazma tamponu bu süre boşalmayan bağlantı takılmış sayılır
+
+connected_scooters = {}  # {websocket: ScooterOutbox}
+scooter_registry = {}  # {scooter_id: ScooterOutbox}, register mesajıyla doldurulur
+sid_registry = wire_format.SidRegistry()
+fleet = fleet_state.FleetState()  # Sunucu: scooterların son konum/durumu (bkz. fleet_state.py)
+geo = geo_index.GridIndex(fleet)  # Sunucu: konuma göre sorgular ve bölge hedefli komutlar (bkz. geo_index.py)
+dispatcher = command_dispatch.Dispatcher(registry, tracer)  # Sunucu: ACK eşleme, zaman aşımı ve yeniden deneme
+
+# İstemci oturumu: scooter id'si, istenen format, sunucunun atadığı sid ve sunucu saatine olan fark
+scooter_session = {'id': 'scooter_ws_1', 'encoding': wire_format.ENCODING_JSON, 'sid': None,
+                   'clock': clock.ClockSync(), 'command_workers': command_exec.DEFAULT_WORKERS,
+                   'exec_time': command_exec.ExecTime.parse(command_exec.DEFAULT_EXEC_TIME)}
+
+
+def message_size(message):
+    """WebSocket mesajının byte boyutu (text veya binary)"""
+    return len(message) if isinstance(message, bytes) else len(message.encode('utf-8'))
+
+
+class BroadcastTicket:
+    """Bir yayının kaç bağlantıda bittiğini izler; hepsi gönderilince/atlanınca done tamamlanır."""
+
+    def __init__(self, count):
+        self.remaining = count
+        self.total = count
+        self.dropped = 0
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.done = asyncio.get_running_loop().create_future()
+        if count == 0:
+            self._finish()
+
+    def complete_one(self, dropped=False):
+        if dropped:
+            self.dropped += 1
+        self.remaining -= 1
+        if self.remaining == 0:
+            self._finish()
+
+    def _finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        if not self.done.done():
+            self.done.set_result(self)
+
+
+class ScooterOutbox:
+    """
+    Bağlantı başına sınırlı gönderim kuyruğu ve yazıcı görevi. Yayın döngüsü
+    sadece kuyruğa ekler, hiçbir soketi beklemez. Yazma tamponu dolu bir
+    bağlantıda gönderim STALL_TIMEOUT_S içinde bitmezse bağlantı 'takılmış'
+    sayılır: kuyruktaki mesajlar atlanır ve tampon boşalana kadar yeni
+    mesaj kabul edilmez.
+    """
+
+    def __init__(self, websocket, limit=OUTBOX_LIMIT):
+        self.websocket = websocket
+        self.scooter_id = None
+        self.queue = asyncio.Queue(maxsize=limit)
+        self.dropped = 0
+        self.stalled = False
+        self.task = asyncio.create_task(self._writer())
+
+    def put(self, message, ticket=None):
+        if self.stalled:
+            self._drop(ticket)
+            return False
+        try:
+            self.queue.put_nowait((message, ticket))
+            return True
+        except asyncio.QueueFull:
+            self._drop(ticket)
+            return False
+
+    def _drop(self, ticket):
+        self.dropped += 1
+        if ticket:
+            ticket.complete_one(dropped=True)
+
+    def _would_block(self, message):
+        transport = self.websocket.transport
+        _, high = transport.get_write_buffer_limits()
+        return transport.get_write_buffer_size() + message_size(message) > high
+
+    async def _writer(self):
+        while True:
+            message, ticket = await self.queue.get()
+            try:
+                if not self._would_block(message):
+                    # Tampon sınırın altında: send bekleme yapmadan döner
+                    await self.websocket.send(message)
+                    continue
+
+                send = asyncio.ensure_future(self.websocket.send(message))
+                done, _ = await asyncio.wait({send}, timeout=STALL_TIMEOUT_S)
+                if not done:
+                    # Çerçeve transport tamponunda; bağlantı boşalana kadar diğer mesajlar atlanır
+                    self.stalled = True
+                    while not self.queue.empty():
+                        self._drop(self.queue.get_nowait()[1])
+                    if ticket:
+                        ticket.complete_one()
+                        ticket = None
+                    await send
+                    self.stalled = False
+                else:
+                    send.result()
+            except websockets.exceptions.ConnectionClosed:
+                pass
+            finally:
+                if ticket:
+                    ticket.complete_one()
+
+    def close(self):
+        self.task.cancel()
+        # Kuyrukta kalan mesajların yayın sayaçlarını kapat
+        while not self.queue.empty():
+            self._drop(self.queue.get_nowait()[1])
+
+
+def broadcast_command(command, targets=None):
+    """
+    Komutu tüm bağlı scooterların (targets verilirse yalnızca bu id'lerin)
+    kuyruğuna ekler (bloklamaz) ve yayın takip nesnesini döndürür.
+    """
+    message = json.dumps(command)
+    outboxes = list(connected_scooters.values())
+    if targets is not None:
+        outboxes = [outbox for outbox in outboxes if outbox.scooter_id in targets]
+    ticket = BroadcastTicket(len(outboxes))
+    size = len(message.encode('utf-8'))
+    for outbox in outboxes:
+        if outbox.put(message, ticket):
+            tracer.tx('command', size, outbox.scooter_id)
+    return ticket
+
+
+def send_to_scooter(scooter_id, command):
+    """Komutu sadece belirtilen scooter'a gönderir. Scooter kayıtlı değilse False döner."""
+    outbox = scooter_registry.get(scooter_id)
+    if outbox is None:
+        return False
+    message = json.dumps(dict(command, scooter_id=scooter_id))
+    if outbox.put(message):
+        tracer.tx('command', len(message.encode('utf-8')), scooter_id)
+        return True
+    return False
+
+
+def log_broadcast(ticket):
+    logging.info(f"SERVER TX (Broadcast) -> {ticket.total} scooter | "
+                 f"Tamamlanma: {ticket.elapsed * 1000:.1f} ms | Atlanan: {ticket.dropped}")
+
+
+def publish_broadcast(command, targets):
+    """Dispatcher'ın tek yayını: aynı komut (ortak cmd_id) hedeflerin kuyruklarına, tek JSON kodlamasıyla."""
+    ticket = broadcast_command(command, targets)
+    ticket.done.add_done_callback(lambda f: log_broadcast(f.result()))
+
 
 # istemci tarafına sürekli istek gönderir, komut atma
 async def send_periodic_commands():
-    global latency_data, bandwidth_data
     while True:
         await asyncio.sleep(COMMAND_INTERVAL_S) # belirtilen süre kadar bekler
-        if connected_scooters: # bağlı scooter yoksa işlem yapmaz
-            command = {
-                "command": "unlock",
-                "scooter_id": "S123",
-                "send_time": time.time()
-            }
-            message = json.dumps(command)
-            bandwidth_data.append(len(message.encode('utf-8'))) # sunucunun dışarıya ne kadar boyutta veri gönderdiğini tutar
-
-            for scooter_ws in list(connected_scooters):
-                try:
-                    logging.info(f"SERVER TX: {message} -> {scooter_ws.remote_address}")
-                    await scooter_ws.send(message)
-                except websockets.exceptions.ConnectionClosed:
-                    pass
+        area = COMMAND_AREA.select(geo) if COMMAND_AREA else None
+        # ACK'i beklenebilmesi için sadece kayıtlı (register olmuş) scooterlar hedeflenir
+        targets = {sid for sid in scooter_registry if area is None or sid in area}
+        if targets: # bağlı scooter yoksa işlem yapmaz
+            # ACK'ler scooter başına beklenir; yeniden gönderimler send_to_scooter ile (bkz. command_dispatch.py)
+            dispatcher.fanout(list(targets), "unlock", lambda cmd: publish_broadcast(cmd, targets),
+                              scooter_id="broadcast")
 
 # sunucuya bir scooter bağlanınca devreye girer ve bağlantı açık kaldığı sürece listener görevi görür
 async def server_handler(websocket):
-    connected_scooters.add(websocket) # yeni gelen bağlantıyı aktif scooterlara ekler
-    logging.info(f"Yeni Scooter bağlandı: {websocket.remote_address}")
+    outbox = ScooterOutbox(websocket)
+    connected_scooters[websocket] = outbox # yeni gelen bağlantıyı aktif scooterlara ekler
+    msg_log.info("Yeni Scooter bağlandı: %s", websocket.remote_address)
     try:
         async for message in websocket: # scooterdan gelen her mesajı yakalar
-            global latency_data, bandwidth_data
-            bandwidth_data.append(len(message.encode('utf-8')))
+            ts_ns = clock.now_ns()
 
-            data = json.loads(message)
-
-            if "location" in data:
-                logging.info(f"SERVER RX (Konum): {data} <- {websocket.remote_address}")
+            # binary mesajlar sabit yerleşimli formatta, text mesajlar JSON
+            if isinstance(message, bytes):
+                data = wire_format.decode(message, sid_registry)
+            else:
+                data = json.loads(message)
+
+            msg_type = data.get("type")
+            rtt, downlink, uplink = clock.NO_DELAYS
+            if msg_type == "register":
+                outbox.scooter_id = data['scooter_id']
+                scooter_registry[outbox.scooter_id] = outbox
+                msg_log.info("SERVER RX (Register): %s <- %s", data['scooter_id'], websocket.remote_address)
+                reg_ack = clock.stamp_register_ack(data, ts_ns, wire_format.negotiate(data, sid_registry))
+                if reg_ack:
+                    ack_json = json.dumps(reg_ack)
+                    tracer.tx('register_ack', len(ack_json.encode('utf-8')), outbox.scooter_id)
+                    outbox.put(ack_json)
+                    msg_log.info("SERVER TX (Register ACK): format=%s, sid=%s",
+                                 reg_ack.get('encoding', wire_format.ENCODING_JSON), reg_ack.get('sid'))
+            elif "location" in data:
+                msg_type = "location"
+                rtt = clock.telemetry_delay(data, ts_ns)
+                msg_log.info("SERVER RX (Konum): %s <- %s", data, websocket.remote_address)
             elif "status" in data:
-                logging.info(f"SERVER RX (Durum): {data} <- {websocket.remote_address}")
+                msg_type = "status"
+                rtt = clock.telemetry_delay(data, ts_ns)
+                msg_log.info("SERVER RX (Durum): %s <- %s", data, websocket.remote_address)
             elif "ack" in data: # komut aldıysa eğer, komutu aldım diye geri mesaj yollar.
-                send_time = data.get("send_time", 0)
-                if send_time:
-                    # Sunucu tarafı RTT Hesabı (Gerçek Ağ Gecikmesi)
-                    rtt = time.time() - send_time
-                    latency_data.append(rtt)
-                    logging.info(f"SERVER RX (ACK): '{data['ack']}' RTT: {rtt:.4f}s")
+                msg_type = "ack"
+                # Sunucu tarafı RTT ve (scooter saati senkronsa) tek yönlü gecikmeler; sadece komutun
+                # ilk ACK'inde (tekrar ve geç ACK'ler gecikmeye yazılmaz, bkz. command_dispatch.py)
+                if dispatcher.acknowledge(outbox.scooter_id, data, ts_ns):
+                    rtt, downlink, uplink = clock.ack_delays(data, ts_ns)
+                if rtt is not None and msg_log.enabled():
+                    msg_log.logger.info("SERVER RX (ACK): '%s' %s", data['ack'],
+                                        clock.describe_delays(rtt, downlink, uplink))
             else:
                 logging.warning(f"SERVER RX (Bilinmeyen): {data}")
+            fleet.update(data, ts_ns, outbox.scooter_id)
+            tracer.rx(msg_type, message_size(message), outbox.scooter_id, latency=rtt, ts_ns=ts_ns,
+                      downlink=downlink, uplink=uplink)
     except Exception as e:
         logging.error(f"Sunucuda hata: {e}")
     finally: # bağlantı koparsa o scooterı listeden siler. Bu, hayalet bağlantılara mesaj atmasını önler
-        connected_scooters.remove(websocket)
+        del connected_scooters[websocket]
+        if outbox.scooter_id and scooter_registry.get(outbox.scooter_id) is outbox:
+            del scooter_registry[outbox.scooter_id]
+        outbox.close()
 
 
 async def start_server():
     logging.info(f"WebSocket Sunucusu başlatılıyor: ws://{SERVER_HOST}:{SERVER_PORT}")
+    dispatcher.send = send_to_scooter
+    asyncio.create_task(dispatcher.run_async())
     asyncio.create_task(send_periodic_commands())
     async with websockets.serve(server_handler, SERVER_HOST, SERVER_PORT):
         await asyncio.Future()
 
 
 #İSTEMCİ TARAFI
+async def scooter_send(ws, payload, msg_type='other'):
+    """ Mesajı anlaşılan formatta gönderir; ikili format onaylanmadıysa JSON kullanır """
+    message = json.dumps(payload)
+    json_size = len(message.encode('utf-8'))
+    sid = scooter_session['sid']
+    if sid is not None:
+        binary = wire_format.encode_message(payload, sid)
+        if binary is not None:
+            message = binary
+    tracer.tx(msg_type, message_size(message), scooter_session['id'], json_equiv=json_size)
+    await ws.send(message)
+    return message
+
+
 async def scooter_send_location(ws):
     """ Konum Gönderme """
     global bandwidth_data
@@ -99,10 +315,8 @@ async def scooter_send_location(ws):
                 "lon": round(random.uniform(28.95, 29.00), 6)
             }
         }
-        message = json.dumps(location_data)
-        bandwidth_data.append(len(message.encode('utf-8')))
-        logging.info(f"SCOOTER TX (Konum): {message}")
-        await ws.send(message)
+        await scooter_send(ws, location_data, 'location')
+        msg_log.info("SCOOTER TX (Konum): %s", location_data)
 
 
 async def scooter_send_status(ws):
@@ -118,36 +332,67 @@ async def scooter_send_status(ws):
                 "speed": 0 if is_currently_locked else random.randint(0, 25)
             }
         }
-        message = json.dumps(status_data)
-        bandwidth_data.append(len(message.encode('utf-8')))
-        logging.info(f"SCOOTER TX (Durum): {message}")
-        await ws.send(message)
+        await scooter_send(ws, status_data, 'status')
+        msg_log.info("SCOOTER TX (Durum): %s", status_data)
+
+
+async def execute_command(ws, data, rx_ns, slots):
+    """ Komutu yürütür ve ACK döner; aynı anda en fazla 'command_workers' komut yürütülür """
+    async with slots:
+        start_ns = clock.now_ns()
+        command_queue_data.record((start_ns - rx_ns) / 1e9)
+        await asyncio.sleep(scooter_session['exec_time'].sample())
+        command_exec_data.record((clock.now_ns() - start_ns) / 1e9)
+
+    stamps = scooter_session['clock'].ack_fields(data, rx_ns)
+    ack_message = dict({"ack": f"command '{data['command']}' received"}, **stamps)
+    response_json = json.dumps(ack_message)
+    response = response_json
+    if scooter_session['sid'] is not None:
+        response = wire_format.encode_ack(scooter_session['sid'], data['command'], stamps['send_ns'],
+                                          stamps.get('rx_ns'), stamps.get('tx_ns'))
+
+    msg_log.info("SCOOTER TX (ACK): %s", ack_message['ack'])
+    await ws.send(response)
+
+    # Komutun gelişinden cevabın çıkışına kadar geçen süre (bekleme + yürütme)
+    process_latency = (clock.now_ns() - rx_ns) / 1e9
+    tracer.tx("ack", message_size(response), scooter_session['id'], latency=process_latency,
+              json_equiv=len(response_json.encode('utf-8')))
 
 
 async def scooter_listen(ws):
-    """ Komut Dinleme ve Cevaplama """
+    """ Komut Dinleme ve Cevaplama; komutlar ayrı görevlerde yürütülür, dinleme beklemez """
     global latency_data, bandwidth_data
+    workers = scooter_session['command_workers']
+    slots = asyncio.Semaphore(max(workers, 1))
+    running = set()
     async for message in ws:
-        bandwidth_data.append(len(message.encode('utf-8')))
-        logging.info(f"SCOOTER RX (Komut): {message}")
-        process_start_time = time.time()
+        rx_ns = clock.now_ns()
         data = json.loads(message)
+        tracer.rx("command" if "command" in data else data.get("type"), message_size(message), scooter_session['id'],
+                  ts_ns=rx_ns)
+        if data.get("type") == "register_ack":
+            apply_register_ack(data, rx_ns)
+            continue
+        msg_log.info("SCOOTER RX (Komut): %s", message)
         if "command" in data:
-            await asyncio.sleep(0.1)
-            ack_message = {
-                "ack": f"command '{data['command']}' received",
-                "send_time": data.get("send_time")
-            }
-            response_json = json.dumps(ack_message)
-
-            bandwidth_data.append(len(response_json.encode('utf-8')))
+            if workers <= 0:
+                await execute_command(ws, data, rx_ns, slots)  # Eski davranış: dinleme yürütmeyi bekler
+                continue
+            task = asyncio.create_task(execute_command(ws, data, rx_ns, slots))
+            running.add(task)
+            task.add_done_callback(running.discard)
 
-            logging.info(f"SCOOTER TX (ACK): {ack_message['ack']}")
-            await ws.send(response_json)
 
-            # Komutun gelişinden cevabın çıkışına kadar geçen süre
-            process_latency = time.time() - process_start_time
-            latency_data.append(process_latency)
+def apply_register_ack(reply, rx_ns):
+    """register_ack'teki ikili format onayını ve saat damgalarını oturuma uygular."""
+    scooter_session['sid'] = reply.get('sid')
+    sync = scooter_session['clock']
+    if reply.get('clock'):
+        sync.update(reply['clock'], rx_ns)
+    msg_log.info("SCOOTER RX (Register ACK): format=%s, sid=%s, saat: %s",
+                 reply.get('encoding', wire_format.ENCODING_JSON), reply.get('sid'), sync.describe())
 
 
 async def scooter_client_main(scenario_to_run: str):
@@ -157,12 +402,29 @@ async def scooter_client_main(scenario_to_run: str):
     while True:
         try:
             logging.info(f"Scooter sunucuya bağlanıyor: {uri}")
-            reconnect_start_time = time.time()
+            reconnect_start_ns = clock.now_ns()
             async with websockets.connect(uri) as websocket:
-                reconnect_time = time.time() - reconnect_start_time
-                reconnect_time_data.append(reconnect_time)
+                reconnect_time = (clock.now_ns() - reconnect_start_ns) / 1e9
+                tracer.connected(scooter_session['id'], reconnect_time)
 
                 logging.info(f"Scooter bağlandı! (Süre: {reconnect_time:.4f}s)")
+
+                # Register: onayı (ikili format ve saat damgaları) bekle, gelmezse JSON ile devam et
+                scooter_session['sid'] = None
+                reg_json = json.dumps(wire_format.register_message(scooter_session['id'], scooter_session['encoding'],
+                                                                   scooter_session['clock'].request()))
+                tracer.tx("register", len(reg_json.encode('utf-8')), scooter_session['id'])
+                await websocket.send(reg_json)
+                try:
+                    reply = await asyncio.wait_for(websocket.recv(), timeout=2)
+                    rx_ns = clock.now_ns()
+                    tracer.rx("register_ack", message_size(reply), scooter_session['id'], ts_ns=rx_ns)
+                    reply = json.loads(reply)
+                    if reply.get("type") == "register_ack":
+                        apply_register_ack(reply, rx_ns)
+                except asyncio.TimeoutError:
+                    logging.warning("Sunucu register_ack göndermedi, JSON ile ve saat senkronu olmadan devam ediliyor.")
+
                 logging.info(f"ÇALIŞAN SENARYO: {scenario_to_run}")
 
                 if scenario_to_run == 'status':
@@ -186,75 +448,102 @@ async def scooter_client_main(scenario_to_run: str):
             await asyncio.sleep(5)
 
 
-def save_results_to_csv(protocol_name, suffix=""):
+def open_results(protocol_name, suffix=""):
     """
-    Toplanan verileri CSV dosyasına kaydeder.
+    Olayları çalışma boyunca iz dosyasına akıtan yazıcıyı başlatır
+    (results_<protokol><suffix>.<koşu kimliği>.<parça>.trace).
     """
-    filename = f"results_{protocol_name.lower()}{suffix}.csv"
-
-    rows = []
-    max_len = max(len(latency_data), len(bandwidth_data), len(reconnect_time_data))
-
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rec = reconnect_time_data[i] if i < len(reconnect_time_data) else None
-        rows.append([lat, bw, rec])
-
-    with open(filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Latency", "Bandwidth", "ReconnectTime"])
-        writer.writerows(rows)
+    return tracer.open(f"results_{protocol_name.lower()}{suffix}")
 
-    logging.info(f"Sonuçlar kaydedildi: {filename}")
 
 def main():
+    global SERVER_PORT, COMMAND_INTERVAL_S, COMMAND_AREA
     parser = argparse.ArgumentParser(description="IoT Scooter Simülasyonu")
     parser.add_argument('mode', choices=['server', 'client'], help="'server' veya 'client' modu")
     parser.add_argument('--scenario', choices=['status', 'location', 'command', 'all'], default='all',
                         help="Senaryo seçimi")
+    parser.add_argument('--id', default='scooter_ws_1', help="Scooter kimliği (client modu)")
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON, help="Telemetri formatı (register sırasında anlaşılır)")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help="Sunucu portu")
+    parser.add_argument('--command-interval', type=float, default=COMMAND_INTERVAL_S,
+                        help="Komut yayın periyodu (sn, server modu)")
+    parser.add_argument('--results-file', default=None,
+                        help="Sonuç dosyası öneki (server modu; koşu kimliği ve parça numarası eklenir)")
+    command_exec.add_arguments(parser)
+    fleet_state.add_arguments(parser)
+    geo_index.add_arguments(parser)
+    command_dispatch.add_arguments(parser)
+    log_config.add_arguments(parser)
     args = parser.parse_args()
+    log_config.configure_from_args(args)
+    SERVER_PORT = args.port
+    COMMAND_INTERVAL_S = args.command_interval
+    COMMAND_AREA = args.command_area
+    dispatcher.configure(**command_dispatch.settings_from_args(args))
+    scooter_session['id'] = args.id
+    scooter_session['encoding'] = args.encoding
+    scooter_session['command_workers'] = args.command_workers
+    scooter_session['exec_time'] = args.exec_time
+    results_writer.install_sigterm_handler()
 
     if args.mode == 'server':
+        fleet.reserve(args.max_scooters)
+        results = tracer.open(args.results_file) if args.results_file else open_results("WebSocket", suffix="_server")
         try:
             asyncio.run(start_server())
         except KeyboardInterrupt:
             logging.info("Sunucu kapatılıyor...")
-            save_results_to_csv("WebSocket", suffix="_server")
+            registry.log_summary("SUNUCU METRİKLERİ")
+            logging.info(dispatcher.summary_line())
+            logging.info(fleet.describe())
+            logging.info(geo.describe())
+            results.close()
 
     elif args.mode == 'client':
+        suffix = "_client" if args.encoding == wire_format.ENCODING_JSON else f"_client_{args.encoding}"
+        results = open_results("WebSocket", suffix=suffix)
         try:
             asyncio.run(scooter_client_main(args.scenario))
         except KeyboardInterrupt:
             logging.info("Scooter kapatılıyor...")
 
             #SONUÇ
-            logging.info("--- SIMÜLASYON SONUÇLARI (WebSocket) ---")
+            logging.info(f"--- SIMÜLASYON SONUÇLARI (WebSocket, {args.encoding}) ---")
 
             # 1. Yeniden Bağlanma
             if reconnect_time_data:
-                avg_reconnect = sum(reconnect_time_data) / len(reconnect_time_data)
+                avg_reconnect = reconnect_time_data.mean()
                 logging.info(
                     f"Ortalama Yeniden Bağlanma: {avg_reconnect:.4f} sn (Toplam {len(reconnect_time_data)} bağlantı)")
 
             # 2. Gecikme (Latency)
             if latency_data:
-                avg_latency = sum(latency_data) / len(latency_data)
+                avg_latency = latency_data.mean()
                 logging.info(f"Ortalama Gecikme (Latency): {avg_latency:.4f} sn (Toplam {len(latency_data)} işlem)")
+                logging.info(latency_data.format())
             else:
                 logging.info("Gecikme verisi yok (Komut senaryosu çalışmadı mı?)")
 
             # 3. Bant Genişliği (Bandwidth)
             if bandwidth_data:
-                total_bw = sum(bandwidth_data)
+                total_bw = bandwidth_data.total
                 avg_bw = total_bw / len(bandwidth_data)
                 logging.info(f"Toplam Veri Transferi: {total_bw} bytes ({total_bw / 1024:.2f} KB)")
                 logging.info(f"Ortalama Mesaj Boyutu: {avg_bw:.1f} bytes")
+                json_total = json_bandwidth_data.total
+                if json_total and args.encoding != wire_format.ENCODING_JSON:
+                    logging.info(f"JSON Karşılığı: {json_total} bytes ({json_total / 1024:.2f} KB) | "
+                                 f"{args.encoding}: {total_bw} bytes | Tasarruf: %{(1 - total_bw / json_total) * 100:.1f}")
             else:
                 logging.info("Veri transferi olmadı.")
+            # 4. Komut kuyruğu ve yürütme süreleri (bkz. command_exec.py)
+            for hist in (command_queue_data, command_exec_data):
+                if hist:
+                    logging.info(hist.format())
             logging.info("Paket Kayıp Oranı: %0.00 (WebSocket/TCP Garantili İletim)")
             logging.info("--- METRİKLER (Ham Veri Özeti) ---")
-            save_results_to_csv("WebSocket", suffix="_client")
+            results.close()
 
 
 if __name__ == "__main__":
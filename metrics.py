@@ -0,0 +1,346 @@
+"""
+Sabit bellekli, birleştirilebilir (mergeable) metrikler.
+
+Histogram, HDR Histogram'a benzer log-doğrusal kovalar kullanır: değer
+'resolution' biriminde tamsayıya çevrilir, 2^sub_bucket_bits altındaki
+değerler birebir, üstündekiler her ikinin kuvveti aralığında eşit genişlikte
+alt kovalarla sayılır. Varsayılan 8 bit ile göreli hata %0.4 civarındadır ve
+kova sayısı kaç örnek kaydedilirse kaydedilsin sabit bir üst sınırda kalır.
+
+Kayıt yolu GIL'e güvenmez: her thread kendi parçasına (shard) yazar, okuma
+tarafı parçaları toplar; böylece free-threaded Python'da da doğru sayar.
+Aynı yapıdaki histogramlar kova kova toplanarak birleştirilir; nesneler
+pickle edilebildiği için worker proseslerinden ana prosese taşınabilir.
+Ham örnekler bellekte tutulmaz; olay başına kayıt için bkz. event_trace.py.
+"""
+import logging
+import math
+import threading
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class _Shard:
+    """Tek bir thread'in kaydettiği değerler; sadece sahibi olan thread yazar."""
+    __slots__ = ('owner', 'counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self, owner=None):
+        self.owner = owner
+        self.counts = {}  # {kova indeksi: adet}; seyrek tutulur, thread başına bellek küçük kalır
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, other):
+        counts = self.counts
+        for idx, c in list(other.counts.items()):
+            counts[idx] = counts.get(idx, 0) + c
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+
+class Histogram:
+    """
+    Kayıt yolu kilit almaz: her thread kendi parçasına (shard) yazar, okuma
+    tarafı parçaları toplar. Kilit sadece bir thread ilk kez kayıt yaptığında
+    ve okuma/birleştirme sırasında alınır; sonlanan thread'lerin parçaları
+    ortak parçaya katlanır.
+    """
+
+    def __init__(self, name, unit='', resolution=1.0, sub_bucket_bits=8, max_value_bits=40):
+        self.name = name
+        self.unit = unit
+        self.resolution = resolution
+        self._scale = 1.0 / resolution
+        self._sub_bits = sub_bucket_bits
+        self._sub_count = 1 << sub_bucket_bits
+        self._half = self._sub_count >> 1
+        self._max_raw = (1 << max_value_bits) - 1
+        self._buckets = self._index(self._max_raw) + 1
+        self._base = _Shard()  # Birleştirilen (merge) ve sonlanan thread'lerden katlanan değerler
+        self._init_shards()
+
+    def _init_shards(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+
+    def _index(self, raw):
+        if raw < self._sub_count:
+            return raw
+        shift = raw.bit_length() - self._sub_bits
+        return self._sub_count + (shift - 1) * self._half + ((raw >> shift) - self._half)
+
+    def _highest_value(self, index):
+        """Kovaya düşen en büyük ham değer."""
+        if index < self._sub_count:
+            return index
+        j = index - self._sub_count
+        shift = j // self._half + 1
+        return ((j % self._half + self._half + 1) << shift) - 1
+
+    def _new_shard(self):
+        """Çağıran thread için parça açar (thread başına bir kez, kilit altında)."""
+        shard = self._local.shard = _Shard(threading.current_thread())
+        with self._lock:
+            self._fold_finished()
+            self._shards.append(shard)
+        return shard
+
+    def _fold_finished(self):
+        """Sonlanmış thread'lerin parçalarını ortak parçaya katlar (kilit altında çağrılır)."""
+        alive = []
+        for shard in self._shards:
+            if shard.owner.is_alive():
+                alive.append(shard)
+            else:
+                self._base.add(shard)
+        self._shards = alive
+
+    def _snapshot(self):
+        """Tüm parçaların toplamı."""
+        total = _Shard()
+        with self._lock:
+            self._fold_finished()
+            total.add(self._base)
+            for shard in self._shards:
+                total.add(shard)
+        return total
+
+    def record(self, value):
+        if value is None:
+            return
+        raw = int(value * self._scale)
+        raw = 0 if raw < 0 else (self._max_raw if raw > self._max_raw else raw)
+        idx = self._index(raw)
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        counts = shard.counts
+        counts[idx] = counts.get(idx, 0) + 1
+        shard.count += 1
+        shard.total += value
+        if shard.min is None or value < shard.min:
+            shard.min = value
+        if shard.max is None or value > shard.max:
+            shard.max = value
+
+    @property
+    def count(self):
+        return self._snapshot().count
+
+    @property
+    def total(self):
+        return self._snapshot().total
+
+    @property
+    def min(self):
+        return self._snapshot().min
+
+    @property
+    def max(self):
+        return self._snapshot().max
+
+    def __len__(self):
+        return self.count
+
+    def mean(self):
+        snap = self._snapshot()
+        return snap.total / snap.count if snap.count else None
+
+    def percentile(self, p, snap=None):
+        """p. yüzdelik değer (kova çözünürlüğünde, gerçek maksimumla sınırlı)."""
+        snap = snap or self._snapshot()
+        if not snap.count:
+            return None
+        if p >= 100:
+            return snap.max
+        target = max(1, math.ceil(snap.count * p / 100))
+        seen = 0
+        for idx in sorted(snap.counts):
+            seen += snap.counts[idx]
+            if seen >= target:
+                value = self._highest_value(idx) / self._scale
+                return min(max(value, snap.min), snap.max)
+        return snap.max
+
+    def summary(self):
+        snap = self._snapshot()
+        out = {'count': snap.count, 'mean': snap.total / snap.count if snap.count else None, 'min': snap.min}
+        for p in PERCENTILES:
+            out[f"p{p:g}"] = self.percentile(p, snap)
+        out['max'] = snap.max
+        return out
+
+    def merge(self, other):
+        """Aynı kova yapısındaki başka bir histogramı (ör. worker prosesinden gelen) ekler."""
+        if other._buckets != self._buckets or other._scale != self._scale:
+            raise ValueError(f"Histogram yapıları uyumsuz: {self.name} / {other.name}")
+        snap = other._snapshot()
+        with self._lock:
+            self._base.add(snap)
+        return self
+
+    def reset(self):
+        """Tüm parçaları sıfırlar (kayıt yapan thread'ler dururken çağrılmalıdır)."""
+        with self._lock:
+            self._base = _Shard()
+            for shard in self._shards:
+                shard.counts = {}
+                shard.count = 0
+                shard.total = 0
+                shard.min = shard.max = None
+
+    def format(self):
+        snap = self._snapshot()
+        if not snap.count:
+            return f"{self.name}: veri yok"
+        fmt = _formatter(self.unit)
+        parts = [f"n={snap.count}", f"ort={fmt(snap.total / snap.count)}"]
+        parts += [f"p{p:g}={fmt(self.percentile(p, snap))}" for p in PERCENTILES]
+        parts.append(f"maks={fmt(snap.max)}")
+        return f"{self.name}: " + " | ".join(parts)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_base'] = self._snapshot()
+        for key in ('_lock', '_local', '_shards'):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_shards()
+
+
+def _formatter(unit):
+    if unit == 's':
+        return lambda v: f"{v:.4f} sn"
+    if unit == 'B':
+        return lambda v: f"{v:.0f} B"
+    return lambda v: f"{v:g}{unit}"
+
+
+def latency_histogram(name, **kwargs):
+    """Saniye cinsinden gecikme histogramı (1 µs çözünürlük)."""
+    return Histogram(name, unit='s', resolution=1e-6, **kwargs)
+
+
+def size_histogram(name, **kwargs):
+    """Byte cinsinden mesaj boyutu histogramı."""
+    return Histogram(name, unit='B', resolution=1, **kwargs)
+
+
+class Counter:
+    """Thread başına parçalı sayaç; Histogram gibi ekleme yolu kilit almaz."""
+
+    def __init__(self, name):
+        self.name = name
+        self._base = 0
+        self._init_shards()
+
+    def _init_shards(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []  # [[sahip thread, değer]]
+
+    def add(self, n=1):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [threading.current_thread(), 0]
+            with self._lock:
+                self._fold_finished()
+                self._shards.append(shard)
+        shard[1] += n
+
+    def _fold_finished(self):
+        alive = []
+        for shard in self._shards:
+            if shard[0].is_alive():
+                alive.append(shard)
+            else:
+                self._base += shard[1]
+        self._shards = alive
+
+    @property
+    def value(self):
+        with self._lock:
+            self._fold_finished()
+            return self._base + sum(shard[1] for shard in self._shards)
+
+    def merge(self, other):
+        value = other.value
+        with self._lock:
+            self._base += value
+        return self
+
+    def format(self):
+        return f"{self.name}: {self.value}"
+
+    def __getstate__(self):
+        return {'name': self.name, '_base': self.value}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_shards()
+
+
+class MetricsRegistry:
+    """İsimle erişilen histogram/sayaç kümesi; prosesler arası tek seferde birleştirilir."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = factory()
+        return metric
+
+    def histogram(self, name, factory=Histogram, **kwargs):
+        return self._get(name, lambda: factory(name, **kwargs))
+
+    def latency(self, name, **kwargs):
+        return self.histogram(name, factory=latency_histogram, **kwargs)
+
+    def size(self, name, **kwargs):
+        return self.histogram(name, factory=size_histogram, **kwargs)
+
+    def counter(self, name):
+        return self._get(name, lambda: Counter(name))
+
+    def __iter__(self):
+        return iter(list(self._metrics.values()))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def snapshot(self):
+        """Pickle edilebilir kopya (worker -> ana proses aktarımı için)."""
+        return {name: m for name, m in list(self._metrics.items())}
+
+    def merge(self, snapshot):
+        for name, metric in snapshot.items():
+            local = self._metrics.get(name)
+            if local is None:
+                with self._lock:
+                    self._metrics.setdefault(name, metric)
+            else:
+                local.merge(metric)
+
+    def log_summary(self, title=None):
+        if title:
+            logging.info(f"--- {title} ---")
+        for metric in self:
+            logging.info(metric.format())
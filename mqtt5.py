@@ -0,0 +1,146 @@
+"""
+MQTT 5'e özgü mesaj başı tasarruflar: topic alias, mesaj ömrü ve user property damgaları.
+
+    topic alias     Tekrarlayan telemetri topic'i (scooter/<id>/location) bağlantı
+                    başına ilk yayında alias numarasıyla birlikte, sonrakilerde
+                    boş topic ve sadece 2 baytlık alias ile gönderilir. Broker'ın
+                    CONNACK'te bildirdiği Topic Alias Maximum kadar alias açılır.
+                    Alias'lar bağlantıya özeldir, yeniden bağlanınca sıfırlanır.
+                    Bağlantı yokken paho QoS 1/2 yayınları saklayıp yeniden
+                    bağlanınca gönderdiği için alias sadece QoS 0 sınıfta kullanılır.
+    mesaj ömrü      Komutlar Message Expiry Interval ile yayınlanır; süresi dolan
+                    komut broker'da bekliyorsa scooter'a hiç iletilmez (bağlantısı
+                    kopuk scooter geç gelen bir 'unlock'u çalıştırmaz).
+    user property   Komut ve JSON ACK'lerdeki zaman damgaları (send_ns, rx_ns,
+                    tx_ns) JSON alanı yerine user property olarak taşınır; sunucu
+                    RTT için payload'ı çözmeden damgaları okur. İkili ACK çerçevesi
+                    (wire_format.py) damgaları zaten sabit alanlarda taşır, değişmez.
+
+User property'ler MQTT 3.1.1 abonelere iletilmediği için sunucu ve scooterlar
+aynı --mqtt-version ile çalıştırılmalıdır.
+"""
+import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+import mqtt_codec
+
+MQTT_311 = 3
+MQTT_5 = 5
+MQTT_VERSIONS = (MQTT_311, MQTT_5)
+
+DEFAULT_COMMAND_EXPIRY = 10  # sn; bu süreden geç ulaşacak komut çalıştırılmaz
+STAMP_KEYS = ('send_ns', 'rx_ns', 'tx_ns')
+
+
+def paho_protocol(version):
+    return mqtt.MQTTv5 if version == MQTT_5 else mqtt.MQTTv311
+
+
+def codec_level(version):
+    return mqtt_codec.PROTOCOL_LEVEL_5 if version == MQTT_5 else mqtt_codec.PROTOCOL_LEVEL_311
+
+
+class TopicAliases:
+    """İstemci -> broker topic alias tablosu (bağlantı başına)."""
+
+    def __init__(self, maximum=0):
+        self.maximum = maximum
+        self.aliases = {}  # {topic: alias}
+        self.established = set()  # Broker'a topic'iyle birlikte ulaşmış alias'lar
+
+    def reset(self, maximum):
+        """Yeni bağlantı: broker'ın CONNACK'teki Topic Alias Maximum değeriyle."""
+        self.maximum = maximum
+        self.aliases.clear()
+        self.established.clear()
+
+    def resolve(self, topic):
+        """
+        (kablodaki topic, alias): alias yerleşmişse ('', alias), yeni açılıyorsa
+        (topic, alias), tablo doluysa (topic, None).
+        """
+        alias = self.aliases.get(topic)
+        if alias is not None:
+            return ('', alias) if alias in self.established else (topic, alias)
+        if len(self.aliases) >= self.maximum:
+            return topic, None
+        alias = self.aliases[topic] = len(self.aliases) + 1
+        return topic, alias
+
+    def sent(self, topic, ok=True):
+        """Alias'ı açan yayın gönderildiyse alias yerleşir; gönderilemediyse sonraki yayın yeniden açar."""
+        alias = self.aliases.get(topic)
+        if alias is not None and ok:
+            self.established.add(alias)
+
+
+def split_stamps(msg):
+    """Mesajdaki zaman damgalarını user property listesine taşır: (damgasız mesaj, [(ad, değer)])."""
+    body = {k: v for k, v in msg.items() if k not in STAMP_KEYS}
+    user = [(k, str(msg[k])) for k in STAMP_KEYS if msg.get(k) is not None]
+    return body, user
+
+
+def merge_stamps(msg, user_properties):
+    """User property'lerdeki damgaları mesaj sözlüğüne (int olarak) ekler."""
+    for name, value in user_properties or ():
+        if name in STAMP_KEYS:
+            msg[name] = int(value)
+    return msg
+
+
+# --- paho ---
+
+def paho_properties(alias=None, expiry=None, user=None):
+    """PUBLISH için paho Properties; eklenecek bir şey yoksa None."""
+    if alias is None and expiry is None and not user:
+        return None
+    props = Properties(PacketTypes.PUBLISH)
+    if alias is not None:
+        props.TopicAlias = alias
+    if expiry is not None:
+        props.MessageExpiryInterval = expiry
+    if user:
+        props.UserProperty = list(user)
+    return props
+
+
+def paho_properties_len(properties):
+    """Property bloğunun uzunluk öneki hariç bayt sayısı (publish_size için)."""
+    if properties is None:
+        return 0
+    raw, _ = mqtt_codec.decode_properties(properties.pack(), 0)
+    return len(raw)
+
+
+def paho_user_properties(message):
+    """paho mesajının user property'leri (MQTT 3.1.1'de boş)."""
+    return getattr(message.properties, 'UserProperty', None) or []
+
+
+def paho_alias_maximum(properties):
+    """paho CONNACK property'lerinden Topic Alias Maximum (yoksa 0)."""
+    return getattr(properties, 'TopicAliasMaximum', 0) if properties is not None else 0
+
+
+# --- mqtt_codec (fleet.py) ---
+
+def codec_properties(alias=None, expiry=None, user=None):
+    items = []
+    if expiry is not None:
+        items.append((mqtt_codec.PROP_MESSAGE_EXPIRY, expiry))
+    if alias is not None:
+        items.append((mqtt_codec.PROP_TOPIC_ALIAS, alias))
+    items.extend((mqtt_codec.PROP_USER_PROPERTY, pair) for pair in user or ())
+    return mqtt_codec.build_properties(items)
+
+
+def user_properties(items):
+    """parse_properties çıktısından user property çiftleri."""
+    return [value for prop_id, value in items if prop_id == mqtt_codec.PROP_USER_PROPERTY]
+
+
+def add_arguments(parser):
+    parser.add_argument('--mqtt-version', type=int, choices=MQTT_VERSIONS, default=MQTT_311,
+                        help="5: topic alias, komut ömrü ve user property damgaları (tüm taraflarda aynı olmalı)")
@@ -0,0 +1,493 @@
+"""
+Gömülü, hafif asyncio MQTT 3.1.1 / 5 broker'ı.
+
+Harici bir Mosquitto kurulumu olmadan MQTT senaryolarını (mqtt_server.py,
+mqtt_client.py, fleet.py --protocol mqtt) aynı makinede, kendi içinde
+çalıştırabilmek için yazılmıştır. Desteklenenler:
+  * CONNECT (3.1.1 ve 5), boş client id için broker'ın kimlik ataması,
+    aynı client id ile yeni bağlantıda eski bağlantının kapatılması
+  * QoS 0/1/2 PUBLISH; aboneye min(yayın QoS, abonelik QoS) ile iletilir.
+    QoS 2'de mesaj PUBREC ile birlikte iletilir, PUBREL gelene kadar aynı
+    paket kimliğiyle tekrar gelen yayın yeniden iletilmez (tam olarak bir kez)
+  * '+' ve '#' joker karakterli abonelikler, UNSUBSCRIBE
+  * paylaşımlı abonelikler ($share/<grup>/<filtre>): eşleşen her mesaj
+    grubun yalnızca bir üyesine, sırayla (round-robin) iletilir; yazma
+    tamponu dolu üye varsa sıradaki boştaki üye seçilir. Paylaşımlı
+    aboneliklere retained mesaj gönderilmez
+  * retained mesajlar (boş payload retained mesajı siler)
+  * PINGREQ ve keepalive'ın 1.5 katı sessizlikte bağlantının kapatılması
+MQTT 5'te property blokları okunur, PUBLISH property'leri MQTT 5 abonelerine
+aynen iletilir. MQTT 5 yayıncılar CONNACK'te bildirilen Topic Alias Maximum
+kadar topic alias kullanabilir (alias bağlantıya özeldir, abonelere tam topic
+iletilir). Message Expiry Interval'lı mesajlar abonenin kuyruğunda süresi
+dolarsa atılır ('BrokerExpired'); iletilenlerde kalan süre yazılır. Kalıcı
+oturumlar, will mesajları ve kimlik doğrulama yoktur.
+
+Her abone için broker içinde bir çıkış kuyruğu tutulur; soketin yazma tamponu
+dolduğunda (pause_writing) mesajlar burada bekler, kuyruk da dolarsa atılır.
+PUBLISH'in yayıncıdan alınmasından aboneye yazılmasına kadar geçen süre
+'BrokerQueueDelay' histogramına kaydedilir; böylece broker içi bekleme ağ
+RTT'sinden ayrı ölçülür. İstemcilerden gelen tüm paketlerin ve abonelere
+iletilen PUBLISH'lerin kablodaki bayt sayısı 'BrokerBytesIn' / 'BrokerBytesOut'
+sayaçlarındadır.
+
+Kullanım:
+    python mqtt_broker.py --port 1883                      # ayrı proses
+    broker = mqtt_broker.start_in_thread(port=1883)         # aynı proseste
+    ...
+    broker.stop()
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import logging
+import threading
+
+import clock
+import log_config
+import metrics
+import mqtt_codec
+import results_writer
+
+DEFAULT_MAX_QUEUED = 10_000  # Abone başına çıkış kuyruğu sınırı (mesaj)
+DEFAULT_TOPIC_ALIAS_MAXIMUM = 64  # MQTT 5 yayıncı başına kabul edilen topic alias sayısı
+
+
+class BrokerSession(asyncio.Protocol):
+    """Tek bir istemci bağlantısı: paket çözme, abonelikler ve çıkış kuyruğu."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.transport = None
+        self.reader = mqtt_codec.PacketReader()
+        self.client_id = None
+        self.level = mqtt_codec.PROTOCOL_LEVEL_311
+        self.keepalive = 0
+        self.subscriptions = {}  # {filtre: qos}
+        self.aliases = {}  # MQTT 5 yayıncının topic alias'ları {alias: topic}
+        self.outbox = collections.deque()  # (paket, yayıncıdan alınma anı ns, son geçerlilik ns veya None)
+        self.paused = False
+        self.inflight = {}  # QoS 1/2 ile gönderilip PUBACK/PUBCOMP beklenen {packet_id: yayıncıdan alınma ns}
+        self.awaiting_rel = set()  # QoS 2 ile alınıp PUBREL beklenen paket kimlikleri
+        self._packet_ids = itertools.cycle(range(1, 65536))
+        self._last_rx = 0.0
+        self._keepalive_handle = None
+
+    # --- asyncio.Protocol ---
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._last_rx = self.broker.loop.time()
+
+    def data_received(self, data):
+        ts_ns = clock.now_ns()
+        self._last_rx = self.broker.loop.time()
+        self.broker.bytes_in.add(len(data))
+        try:
+            for packet_type, flags, body in self.reader.feed(data):
+                if self.client_id is None and packet_type != mqtt_codec.CONNECT:
+                    raise mqtt_codec.MQTTProtocolError("CONNECT beklenirken başka paket geldi")
+                self.handle_packet(packet_type, flags, body, ts_ns)
+                if self.transport.is_closing():
+                    return
+        except (mqtt_codec.MQTTProtocolError, UnicodeDecodeError) as e:
+            logging.warning(f"BROKER: {self.client_id or '?'} protokol hatası, bağlantı kapatılıyor: {e}")
+            self.transport.close()
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.flush()
+
+    def connection_lost(self, exc):
+        if self._keepalive_handle is not None:
+            self._keepalive_handle.cancel()
+        self.broker.remove_session(self)
+        self.outbox.clear()
+
+    # --- Gelen paketler ---
+
+    def handle_packet(self, packet_type, flags, body, ts_ns):
+        if packet_type == mqtt_codec.PUBLISH:
+            self.handle_publish(flags, body, ts_ns)
+        elif packet_type in (mqtt_codec.PUBACK, mqtt_codec.PUBCOMP):
+            self.inflight.pop(mqtt_codec.parse_packet_id(body), None)
+        elif packet_type == mqtt_codec.PUBREC:
+            self.transport.write(mqtt_codec.pubrel(mqtt_codec.parse_packet_id(body)))
+        elif packet_type == mqtt_codec.PUBREL:
+            packet_id = mqtt_codec.parse_packet_id(body)
+            self.awaiting_rel.discard(packet_id)
+            self.transport.write(mqtt_codec.pubcomp(packet_id))
+        elif packet_type == mqtt_codec.PINGREQ:
+            self.transport.write(mqtt_codec.pingresp())
+        elif packet_type == mqtt_codec.SUBSCRIBE:
+            self.handle_subscribe(body)
+        elif packet_type == mqtt_codec.UNSUBSCRIBE:
+            packet_id, filters = mqtt_codec.parse_unsubscribe(body, self.level)
+            for topic_filter in filters:
+                if self.subscriptions.pop(topic_filter, None) is not None:
+                    self.broker.unsubscribe(self, topic_filter)
+            self.transport.write(mqtt_codec.unsuback(packet_id, len(filters), self.level))
+        elif packet_type == mqtt_codec.DISCONNECT:
+            self.transport.close()
+        elif packet_type == mqtt_codec.CONNECT:
+            if self.client_id is not None:
+                raise mqtt_codec.MQTTProtocolError("İkinci CONNECT")
+            self.handle_connect(body)
+        else:
+            raise mqtt_codec.MQTTProtocolError(f"Desteklenmeyen paket tipi: {packet_type}")
+
+    def handle_connect(self, body):
+        info = mqtt_codec.parse_connect(body)
+        self.level = info['level']
+        if self.level not in (mqtt_codec.PROTOCOL_LEVEL_311, mqtt_codec.PROTOCOL_LEVEL_5):
+            code = mqtt_codec.CONNACK_BAD_PROTOCOL_V5 if self.level >= mqtt_codec.PROTOCOL_LEVEL_5 \
+                else mqtt_codec.CONNACK_BAD_PROTOCOL
+            self.transport.write(mqtt_codec.connack(code, level=self.level))
+            self.transport.close()
+            return
+        self.client_id = info['client_id'] or self.broker.assign_client_id()
+        self.keepalive = info['keepalive']
+        self.broker.add_session(self)
+        properties = b""
+        if self.level >= mqtt_codec.PROTOCOL_LEVEL_5 and self.broker.topic_alias_maximum:
+            properties = mqtt_codec.build_properties(
+                [(mqtt_codec.PROP_TOPIC_ALIAS_MAXIMUM, self.broker.topic_alias_maximum)])
+        self.transport.write(mqtt_codec.connack(level=self.level, properties=properties))
+        if self.keepalive:
+            self._keepalive_handle = self.broker.loop.call_later(self.keepalive, self._check_keepalive)
+        logging.debug(f"BROKER: {self.client_id} bağlandı (MQTT seviye {self.level})")
+
+    def _check_keepalive(self):
+        idle = self.broker.loop.time() - self._last_rx
+        if idle > self.keepalive * 1.5:
+            logging.info(f"BROKER: {self.client_id} keepalive süresi aşıldı ({idle:.1f} sn), bağlantı kapatılıyor")
+            self.transport.close()
+        else:
+            self._keepalive_handle = self.broker.loop.call_later(self.keepalive / 2, self._check_keepalive)
+
+    def handle_publish(self, flags, body, ts_ns):
+        topic, payload, qos, packet_id, retain, properties = mqtt_codec.decode_publish(flags, body, self.level)
+        expires_ns = None
+        if properties:
+            topic, properties, expires_ns = self._publish_properties(topic, properties, ts_ns)
+        if not topic or mqtt_codec.has_wildcard(topic):
+            raise mqtt_codec.MQTTProtocolError(f"Geçersiz yayın topic'i: {topic!r}")
+        if qos == 2:
+            self.transport.write(mqtt_codec.pubrec(packet_id))
+            if packet_id in self.awaiting_rel:
+                return  # PUBREC'i kaybolan yayının tekrarı; zaten iletildi
+            self.awaiting_rel.add(packet_id)
+        elif qos:
+            self.transport.write(mqtt_codec.puback(packet_id))
+        self.broker.publish(topic, payload, qos, retain, properties, ts_ns, expires_ns)
+
+    def _publish_properties(self, topic, properties, ts_ns):
+        """
+        Topic alias'ı çözer, mesaj ömrünü son geçerlilik anına çevirir; ikisi de
+        abonelere iletilen property'lerden çıkarılır: (topic, property'ler, son geçerlilik ns).
+        """
+        items = mqtt_codec.parse_properties(properties)
+        expires_ns = None
+        forwarded = []
+        for prop_id, value in items:
+            if prop_id == mqtt_codec.PROP_TOPIC_ALIAS:
+                if not 0 < value <= self.broker.topic_alias_maximum:
+                    raise mqtt_codec.MQTTProtocolError(f"Geçersiz topic alias: {value}")
+                if topic:
+                    self.aliases[value] = topic
+                elif value in self.aliases:
+                    topic = self.aliases[value]
+                else:
+                    raise mqtt_codec.MQTTProtocolError(f"Tanımsız topic alias: {value}")
+            elif prop_id == mqtt_codec.PROP_MESSAGE_EXPIRY:
+                expires_ns = ts_ns + value * 1_000_000_000
+            else:
+                forwarded.append((prop_id, value))
+        if len(forwarded) != len(items):
+            properties = mqtt_codec.build_properties(forwarded)
+        return topic, properties, expires_ns
+
+    def handle_subscribe(self, body):
+        packet_id, filters, _ = mqtt_codec.parse_subscribe(body, self.level)
+        codes = []
+        granted = []
+        for topic_filter, qos in filters:
+            if qos > 2 or not mqtt_codec.valid_filter(topic_filter):
+                codes.append(mqtt_codec.SUBACK_FAILURE)
+                continue
+            self.subscriptions[topic_filter] = qos
+            self.broker.subscribe(self, topic_filter, qos)
+            codes.append(qos)
+            granted.append((topic_filter, qos))
+        self.transport.write(mqtt_codec.suback(packet_id, codes, self.level))
+        # Retained mesajlar SUBACK'ten sonra gönderilir
+        for topic_filter, qos in granted:
+            self.broker.send_retained(self, topic_filter, qos)
+
+    # --- Giden mesajlar ---
+
+    def deliver(self, topic, payload, qos, properties, rx_ns, retain=False, expires_ns=None):
+        """Mesajı çıkış kuyruğuna ekler; soket yazılabilir durumdaysa hemen gönderir."""
+        if self.transport is None or self.transport.is_closing():
+            return
+        if len(self.outbox) >= self.broker.max_queued:
+            self.broker.dropped.add()
+            return
+        v5 = self.level >= mqtt_codec.PROTOCOL_LEVEL_5
+        if expires_ns is not None:
+            remaining_ns = expires_ns - clock.now_ns()
+            if remaining_ns <= 0:
+                self.broker.expired.add()
+                return
+            if v5:
+                # Kalan ömür (yukarı yuvarlanmış saniye) iletilen mesaja yazılır
+                properties = mqtt_codec.build_properties(
+                    [(mqtt_codec.PROP_MESSAGE_EXPIRY, -(-remaining_ns // 1_000_000_000))]) + properties
+        packet_id = None
+        if qos:
+            packet_id = next(self._packet_ids)
+            self.inflight[packet_id] = rx_ns
+        data = mqtt_codec.publish(topic, payload, qos, retain, packet_id, properties if v5 else None)
+        self.outbox.append((data, rx_ns, expires_ns))
+        if not self.paused:
+            self.flush()
+
+    def flush(self):
+        outbox = self.outbox
+        transport = self.transport
+        broker = self.broker
+        queue_delay = broker.queue_delay
+        now_ns = clock.now_ns()
+        while outbox and not self.paused and not transport.is_closing():
+            data, rx_ns, expires_ns = outbox.popleft()
+            if expires_ns is not None and expires_ns <= now_ns:
+                broker.expired.add()  # Kuyrukta beklerken süresi doldu
+                continue
+            transport.write(data)
+            now_ns = clock.now_ns()
+            queue_delay.record((now_ns - rx_ns) / 1e9)
+            broker.publish_out.add()
+            broker.bytes_out.add(len(data))
+
+
+class MQTTBroker:
+    """
+    Tek event loop üzerinde çalışan broker. Tam topic'ler sözlükte, joker
+    karakterli filtreler ayrı bir listede tutulur; yayın başına sadece joker
+    filtreler ve paylaşımlı gruplar taranır.
+    """
+
+    def __init__(self, host='127.0.0.1', port=1883, max_queued=DEFAULT_MAX_QUEUED, registry=None,
+                 topic_alias_maximum=DEFAULT_TOPIC_ALIAS_MAXIMUM):
+        self.host = host
+        self.port = port
+        self.max_queued = max_queued
+        self.topic_alias_maximum = topic_alias_maximum
+        self.registry = registry if registry is not None else metrics.MetricsRegistry()
+        self.queue_delay = self.registry.latency('BrokerQueueDelay')
+        self.publish_in = self.registry.counter('BrokerPublishIn')
+        self.publish_out = self.registry.counter('BrokerPublishOut')
+        self.dropped = self.registry.counter('BrokerDropped')
+        self.expired = self.registry.counter('BrokerExpired')
+        self.bytes_in = self.registry.counter('BrokerBytesIn')
+        self.bytes_out = self.registry.counter('BrokerBytesOut')
+        self.sessions = {}  # {client_id: BrokerSession}
+        self.exact = {}  # {topic: {session: qos}}
+        self.wildcards = {}  # {filtre: {session: qos}}
+        self.shared = {}  # {(grup, filtre): OrderedDict{session: qos}}; sıradaki üye başta
+        self.retained = {}  # {topic: (payload, qos, properties, son geçerlilik ns)}
+        self.loop = None
+        self.server = None
+        self._client_ids = itertools.count(1)
+
+    # --- Oturumlar ---
+
+    def assign_client_id(self):
+        return f"auto-{next(self._client_ids)}"
+
+    def add_session(self, session):
+        old = self.sessions.get(session.client_id)
+        if old is not None and old is not session:
+            logging.info(f"BROKER: {session.client_id} yeniden bağlandı, eski bağlantı kapatılıyor")
+            self.remove_session(old)
+            old.transport.close()
+        self.sessions[session.client_id] = session
+
+    def remove_session(self, session):
+        for topic_filter in list(session.subscriptions):
+            self.unsubscribe(session, topic_filter)
+        session.subscriptions.clear()
+        if session.client_id is not None and self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+
+    def _table(self, topic_filter):
+        """Filtrenin tutulduğu tablo ve anahtarı."""
+        group, inner = mqtt_codec.parse_shared(topic_filter)
+        if group is not None:
+            return self.shared, (group, inner)
+        return (self.wildcards if mqtt_codec.has_wildcard(topic_filter) else self.exact), topic_filter
+
+    def subscribe(self, session, topic_filter, qos):
+        table, key = self._table(topic_filter)
+        table.setdefault(key, collections.OrderedDict())[session] = qos
+
+    def unsubscribe(self, session, topic_filter):
+        table, key = self._table(topic_filter)
+        subscribers = table.get(key)
+        if subscribers is not None:
+            subscribers.pop(session, None)
+            if not subscribers:
+                del table[key]
+
+    # --- Yönlendirme ---
+
+    def subscribers(self, topic):
+        """{session: qos}; aynı oturum birden fazla filtreyle eşleşirse en yüksek QoS alınır."""
+        targets = dict(self.exact.get(topic, ()))
+        for topic_filter, subscribers in self.wildcards.items():
+            if mqtt_codec.topic_matches(topic_filter, topic):
+                for session, qos in subscribers.items():
+                    if targets.get(session, -1) < qos:
+                        targets[session] = qos
+        for (_, topic_filter), members in self.shared.items():
+            if mqtt_codec.topic_matches(topic_filter, topic):
+                session = self._next_member(members)
+                if targets.get(session, -1) < members[session]:
+                    targets[session] = members[session]
+        return targets
+
+    @staticmethod
+    def _next_member(members):
+        """Round-robin: yazma tamponu dolu olmayan ilk üye seçilip sıranın sonuna alınır."""
+        chosen = next(iter(members))
+        for session in members:
+            if not session.paused:
+                chosen = session
+                break
+        members.move_to_end(chosen)
+        return chosen
+
+    def publish(self, topic, payload, qos=0, retain=False, properties=b"", rx_ns=None, expires_ns=None):
+        if rx_ns is None:
+            rx_ns = clock.now_ns()
+        self.publish_in.add()
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos, properties, expires_ns)
+            else:
+                self.retained.pop(topic, None)
+        for session, sub_qos in self.subscribers(topic).items():
+            session.deliver(topic, payload, min(qos, sub_qos), properties, rx_ns, expires_ns=expires_ns)
+
+    def send_retained(self, session, topic_filter, qos):
+        if topic_filter.startswith(mqtt_codec.SHARE_PREFIX):
+            return
+        now = clock.now_ns()
+        for topic, (payload, pub_qos, properties, expires_ns) in list(self.retained.items()):
+            if expires_ns is not None and expires_ns <= now:
+                del self.retained[topic]
+                continue
+            if mqtt_codec.topic_matches(topic_filter, topic):
+                session.deliver(topic, payload, min(qos, pub_qos), properties, now, retain=True,
+                                expires_ns=expires_ns)
+
+    # --- Çalıştırma ---
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await self.loop.create_server(lambda: BrokerSession(self), self.host, self.port)
+        if not self.port:
+            self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"MQTT Broker dinliyor: {self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for session in list(self.sessions.values()):
+            session.transport.close()
+
+    def log_summary(self):
+        self.registry.log_summary("BROKER METRİKLERİ")
+
+
+class BrokerThread:
+    """Broker'ı aynı proseste, kendi event loop'u olan bir daemon thread'de çalıştırır."""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._error = None
+        self.thread = threading.Thread(target=self._run, name='mqtt-broker', daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.broker.start())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self.broker.close()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def start(self, timeout=5):
+        self.thread.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("MQTT broker başlatılamadı")
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self, timeout=5):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+
+    @property
+    def port(self):
+        return self.broker.port
+
+    @property
+    def registry(self):
+        return self.broker.registry
+
+
+def start_in_thread(host='127.0.0.1', port=1883, **kwargs):
+    """Gömülü broker'ı arka plan thread'inde başlatır (port=0: boş bir port seçilir)."""
+    return BrokerThread(MQTTBroker(host, port, **kwargs)).start()
+
+
+if __name__ == "__main__":
+    log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description="Gömülü MQTT 3.1.1/5 broker")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--max-queued', type=int, default=DEFAULT_MAX_QUEUED,
+                        help="Abone başına çıkış kuyruğu sınırı (mesaj)")
+    log_config.add_arguments(parser)
+    args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
+    broker = MQTTBroker(args.host, args.port, args.max_queued)
+    try:
+        asyncio.run(broker.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.log_summary()
@@ -5,25 +5,60 @@ import random
 import logging
 import argparse
 import threading
-import csv
+
+import clock
+import command_exec
+import event_trace
+import log_config
+import metrics
+import mqtt5
+import mqtt_codec
+import mqtt_qos
+import mqtt_topics
+import results_writer
+import wire_format
+from log_config import msg_log
 
 # Loglama ayarları
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
-latency_data = []
-reconnect_time_data = []
-bandwidth_data = []
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency')
+reconnect_time_data = registry.latency('ReconnectTime')
+bandwidth_data = registry.size('Bandwidth')
+json_bandwidth_data = registry.size('JSONBandwidth')  # Aynı trafiğin JSON karşılığı (format karşılaştırması için)
+wire_bandwidth_data = registry.size('WireBandwidth')  # PUBLISH paketinin kablodaki boyutu (topic ve property'ler dahil)
+tracer = event_trace.Tracer('mqtt', bandwidth=bandwidth_data, latency=latency_data,
+                            reconnect=reconnect_time_data, json_bandwidth=json_bandwidth_data)
 
 class MQTTScooterClient:
-    def __init__(self, scooter_id, broker='localhost', port=1883):
+    def __init__(self, scooter_id, broker='localhost', port=1883, encoding=wire_format.ENCODING_JSON,
+                 executor=None, qos=None, zone=mqtt_topics.DEFAULT_ZONE, model=mqtt_topics.DEFAULT_MODEL,
+                 mqtt_version=mqtt5.MQTT_311):
         self.id = scooter_id
         self.broker = broker
         self.port = port
         self.location = {'lat': 41.0082, 'lon': 28.9784}
         self.battery = 100
+        self.encoding = encoding
+        self.zone = zone  # Grup komutları için bölge ve model (bkz. mqtt_topics.py)
+        self.model = model
+        self.sid = None  # Sunucu ikili formatı onaylayınca atanır
+        self.clock = clock.ClockSync()  # register_ack'teki damgalarla sunucu saatine olan fark
+        # Komutlar paho'nun ağ döngüsü thread'inde değil worker'larda yürütülür (keepalive'lar gecikmez)
+        self.executor = executor or command_exec.CommandExecutor()
+
+        # MQTT 5: telemetri topic'leri için alias, damgalar user property'lerde (bkz. mqtt5.py)
+        self.v5 = mqtt_version == mqtt5.MQTT_5
+        self.aliases = mqtt5.TopicAliases()
 
         # Paho Client Kurulumu (V2 API)
-        self.client = mqtt.Client(client_id=scooter_id, callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self.client = mqtt.Client(client_id=scooter_id, callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+                                  protocol=mqtt5.paho_protocol(mqtt_version))
+        # Mesaj sınıfı başına QoS, in-flight penceresi ve yayın onayı takibi (bkz. mqtt_qos.py)
+        self.qos = qos or mqtt_qos.QoSPolicy()
+        self.qos.configure_client(self.client)
+        self.delivery = mqtt_qos.DeliveryTracker(registry, self.qos)
 
         self.running = True
         self.current_scenario = 'all'
@@ -33,70 +68,121 @@ class MQTTScooterClient:
             # Bağlantı süresini burada ölçemiyoruz çünkü callback sonradan çalışır,
             # ama connect() fonksiyonunda ölçeceğiz.
 
-            # Komutları dinlemek için abone ol
-            topic = f"scooter/{self.id}/command"
-            client.subscribe(topic)
+            # Alias'lar bağlantıya özeldir; broker'ın izin verdiği sayı CONNACK'te gelir
+            self.aliases.reset(mqtt5.paho_alias_maximum(properties) if self.v5 else 0)
+
+            # Kendi komut topic'i ile filo/bölge/model grup topic'lerine abone ol
+            client.subscribe([(topic, self.qos.command)
+                              for topic in mqtt_topics.command_topics(self.id, self.zone, self.model)])
 
-            # Register mesajı gönder
-            reg_msg = json.dumps({'type': 'register', 'scooter_id': self.id})
-            self.publish_data(f"scooter/{self.id}/register", reg_msg)
+            # Register mesajı gönder (ikili format talebi ve saat farkı ölçümü burada yapılır)
+            self.sid = None
+            reg_msg = json.dumps(wire_format.register_message(self.id, self.encoding, self.clock.request(),
+                                                              mqtt_topics.groups(self.zone, self.model)))
+            self.publish_data(f"scooter/{self.id}/register", reg_msg, msg_type='register')
         else:
             logging.error(f"Broker bağlantı hatası: {reason_code}")
 
     def on_message(self, client, userdata, msg):
         try:
+            rx_ns = clock.now_ns()
             payload = msg.payload.decode()
-            bandwidth_data.append(len(payload))
-
             data = json.loads(payload)
+            if self.v5:
+                mqtt5.merge_stamps(data, mqtt5.paho_user_properties(msg))
+            tracer.rx('command' if data.get('command') else data.get('type'), len(msg.payload), self.id, ts_ns=rx_ns)
+
+            if data.get('type') == 'register_ack':
+                self.sid = data.get('sid')
+                if data.get('clock'):
+                    self.clock.update(data['clock'], rx_ns)
+                msg_log.info("SCOOTER RX (Register ACK): format=%s, sid=%s, saat: %s",
+                             data.get('encoding', wire_format.ENCODING_JSON), self.sid, self.clock.describe())
+                return
 
             if data.get('command'):
                 if self.current_scenario in ['command', 'all']:
-                    logging.info(f"SCOOTER RX (Komut): {json.dumps(data)}")
-
-                process_start = time.time()
-                time.sleep(0.1)
-
-                ack_msg = json.dumps({
-                    'type': 'ack',
-                    'scooter_id': self.id,
-                    'ack': f"command '{data['command']}' received",
-                    'send_time': data.get('send_time')
-                })
+                    msg_log.info("SCOOTER RX (Komut): %s", data)
 
-                self.publish_data(f"scooter/{self.id}/ack", ack_msg)
-                if self.current_scenario in ['command', 'all']:
-                    logging.info(f"SCOOTER TX (ACK): command '{data['command']}' received")
-                    latency_data.append(time.time() - process_start)
+                self.executor.submit(data, rx_ns, self.complete_command)
 
         except Exception as e:
             logging.error(f"Mesaj işleme hatası: {e}")
 
-    def publish_data(self, topic, payload):
-        """Veri gönderme sarmalayıcısı"""
+    def complete_command(self, data, rx_ns):
+        """Yürütülen komutun ACK'ini yayınlar (worker thread'inde çağrılır)."""
+        stamps = self.clock.ack_fields(data, rx_ns)
+        ack_dict = dict({
+            'type': 'ack',
+            'scooter_id': self.id,
+            'ack': f"command '{data['command']}' received",
+        }, **stamps)
+        ack_msg = json.dumps(ack_dict)
+
+        logged = self.current_scenario in ['command', 'all']
+        latency = (clock.now_ns() - rx_ns) / 1e9 if logged else None
+        if self.sid is not None:
+            self.publish_data(f"scooter/{self.id}/ack",
+                              wire_format.encode_ack(self.sid, data['command'], stamps['send_ns'],
+                                                     stamps.get('rx_ns'), stamps.get('tx_ns')),
+                              json_equiv=len(ack_msg), msg_type='ack', latency=latency)
+        elif self.v5:
+            body, user = mqtt5.split_stamps(ack_dict)
+            self.publish_data(f"scooter/{self.id}/ack", json.dumps(body), msg_type='ack', latency=latency,
+                              user=user)
+        else:
+            self.publish_data(f"scooter/{self.id}/ack", ack_msg, msg_type='ack', latency=latency)
+        if logged:
+            msg_log.info("SCOOTER TX (ACK): command '%s' received", data['command'])
+
+    def publish_data(self, topic, payload, json_equiv=None, msg_type='other', latency=None, user=None):
+        """Veri gönderme sarmalayıcısı (str: JSON, bytes: ikili çerçeve)"""
         try:
-            bandwidth_data.append(len(payload))  # TX Metriği
-            self.client.publish(topic, payload)
+            tracer.tx(msg_type, len(payload), self.id, latency, json_equiv)  # TX Metriği
+            if not self.v5:
+                self.delivery.publish(self.client, topic, payload, msg_type)
+                wire_bandwidth_data.record(mqtt_codec.publish_size(topic, len(payload), self.qos.qos_for(msg_type)))
+                return
+            qos = self.qos.qos_for(msg_type)
+            wire_topic, alias = topic, None
+            if msg_type in ('location', 'status') and not qos:
+                wire_topic, alias = self.aliases.resolve(topic)
+            props = mqtt5.paho_properties(alias=alias, user=user)
+            info = self.delivery.publish(self.client, wire_topic, payload, msg_type, properties=props)
+            if alias is not None:
+                self.aliases.sent(topic, info.rc == mqtt.MQTT_ERR_SUCCESS)
+            wire_bandwidth_data.record(mqtt_codec.publish_size(wire_topic, len(payload), qos,
+                                                               mqtt5.paho_properties_len(props)))
         except Exception as e:
             logging.error(f"Yayınlama hatası: {e}")
 
+    def publish_message(self, topic, msg_dict):
+        """Konum/durum mesajını anlaşılan formatta yayınlar; ikili format onaylanmadıysa JSON kullanır."""
+        json_msg = json.dumps(msg_dict)
+        if self.sid is not None:
+            self.publish_data(topic, wire_format.encode_message(msg_dict, self.sid), json_equiv=len(json_msg),
+                              msg_type=msg_dict['type'])
+        else:
+            self.publish_data(topic, json_msg, msg_type=msg_dict['type'])
+
     def connect(self):
         try:
             logging.info(f"Scooter sunucuya bağlanıyor: mqtt://{self.broker}:{self.port}")
 
-            start_time = time.time()
+            start_ns = clock.now_ns()
 
             # Callbackler
             self.client.on_connect = self.on_connect
             self.client.on_message = self.on_message
+            self.client.on_publish = self.delivery.on_publish
 
             self.client.connect(self.broker, self.port, 60)
 
             # Arka planda network trafiği yönetimi
             self.client.loop_start()
 
-            rec_time = time.time() - start_time
-            reconnect_time_data.append(rec_time)
+            rec_time = (clock.now_ns() - start_ns) / 1e9
+            tracer.connected(self.id, rec_time)
 
             logging.info(f"Scooter bağlandı! (Süre: {rec_time:.4f}s)")
             return True
@@ -120,10 +206,8 @@ class MQTTScooterClient:
                     'location': self.location,
                     'battery': round(self.battery, 1)
                 }
-                msg = json.dumps(msg_dict)
-
-                self.publish_data(f"scooter/{self.id}/location", msg)
-                logging.info(f"SCOOTER TX (Konum): {json.dumps(msg_dict)}")
+                self.publish_message(f"scooter/{self.id}/location", msg_dict)
+                msg_log.info("SCOOTER TX (Konum): %s", msg_dict)
 
                 time.sleep(10)
             except:
@@ -143,10 +227,8 @@ class MQTTScooterClient:
                         'speed': 0 if is_locked else random.randint(0, 25)
                     }
                 }
-                msg = json.dumps(msg_dict)
-
-                self.publish_data(f"scooter/{self.id}/status", msg)
-                logging.info(f"SCOOTER TX (Durum): {json.dumps(msg_dict)}")
+                self.publish_message(f"scooter/{self.id}/status", msg_dict)
+                msg_log.info("SCOOTER TX (Durum): %s", msg_dict)
 
                 time.sleep(5)
             except:
@@ -154,11 +236,12 @@ class MQTTScooterClient:
 
     def run(self, scenario):
         self.current_scenario = scenario
+        results = open_results("MQTT", self.encoding)
 
         if not self.connect():
             return
 
-        logging.info(f"ÇALIŞAN SENARYO: {scenario}")
+        logging.info(f"ÇALIŞAN SENARYO: {scenario} | {self.executor.describe()} | {self.qos.describe()}")
 
         threads = []
 
@@ -179,53 +262,60 @@ class MQTTScooterClient:
         except KeyboardInterrupt:
             self.running = False
             logging.info("Scooter kapatılıyor...")
+            self.executor.shutdown()
             self.client.loop_stop()
             self.client.disconnect()
-            print_metrics("MQTT")
-            save_results_to_csv("MQTT")
+            print_metrics("MQTT", self.encoding, self.delivery)
+            results.close()
 
 
-def save_results_to_csv(protocol_name):
+def open_results(protocol_name, encoding=wire_format.ENCODING_JSON):
     """
-    Toplanan verileri analiz için CSV dosyasına kaydeder.
+    Olayları çalışma boyunca iz dosyasına akıtan yazıcıyı başlatır
+    (results_<protokol>[_binary].<koşu kimliği>.<parça>.trace).
     """
-    filename = f"results_{protocol_name.lower()}.csv"
-
-    rows = []
-    max_len = max(len(latency_data), len(bandwidth_data), len(reconnect_time_data))
-
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rec = reconnect_time_data[i] if i < len(reconnect_time_data) else None
-        rows.append([lat, bw, rec])
+    suffix = "" if encoding == wire_format.ENCODING_JSON else f"_{encoding}"
+    return tracer.open(f"results_{protocol_name.lower()}{suffix}")
 
-    with open(filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Latency", "Bandwidth", "ReconnectTime"])  # Başlıklar
-        writer.writerows(rows)
-
-    logging.info(f"Sonuçlar kaydedildi: {filename}")
-
-def print_metrics(protocol_name):
-    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}) ---")
+def print_metrics(protocol_name, encoding=wire_format.ENCODING_JSON, delivery=None):
+    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}, {encoding}) ---")
     if reconnect_time_data:
-        avg_rec = sum(reconnect_time_data) / len(reconnect_time_data)
+        avg_rec = reconnect_time_data.mean()
         count = len(reconnect_time_data)
         logging.info(f"Ortalama Yeniden Bağlanma: {avg_rec:.4f} sn (Toplam {count} bağlantı)")
 
     if latency_data:
-        avg_lat = sum(latency_data) / len(latency_data)
+        avg_lat = latency_data.mean()
         count = len(latency_data)
         logging.info(f"Ortalama Gecikme (Latency): {avg_lat:.4f} sn (Toplam {count} işlem)")
+        logging.info(latency_data.format())
+
+    if wire_bandwidth_data:
+        wire_total = wire_bandwidth_data.total
+        logging.info(f"Kablodaki PUBLISH: {wire_total} bytes | Ortalama {wire_total / len(wire_bandwidth_data):.1f} "
+                     f"bytes (topic, başlık ve property'ler dahil)")
 
     if bandwidth_data:
-        total = sum(bandwidth_data)
+        total = bandwidth_data.total
         avg_size = total / len(bandwidth_data)
         logging.info(f"Toplam Veri Transferi: {total} bytes ({total / 1024:.2f} KB)")
         logging.info(f"Ortalama Mesaj Boyutu: {avg_size:.1f} bytes")
 
-    logging.info(f"Paket Kayıp Oranı: %0.00 (QoS 0)")
+        json_total = json_bandwidth_data.total
+        if json_total and encoding != wire_format.ENCODING_JSON:
+            logging.info(f"JSON Karşılığı: {json_total} bytes ({json_total / 1024:.2f} KB) | "
+                         f"{encoding}: {total} bytes | Tasarruf: %{(1 - total / json_total) * 100:.1f}")
+
+    # Komut kuyruğu ve yürütme süreleri (bkz. command_exec.py)
+    for name in ('CommandQueueDelay', 'CommandExecTime'):
+        hist = registry.get(name)
+        if hist:
+            logging.info(hist.format())
+
+    # Yayınların broker onayları; QoS 0'da onay, mesajın sokete yazılmasıdır
+    if delivery is not None:
+        for line in delivery.summary_lines():
+            logging.info(line)
     logging.info("--- METRİKLER (Ham Veri Özeti) ---")
 
 
@@ -233,7 +323,22 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--scenario', choices=['status', 'location', 'command', 'all'], default='all')
     parser.add_argument('--id', default='scooter_mqtt_1')
+    parser.add_argument('--broker', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON, help="Telemetri formatı (register sırasında anlaşılır)")
+    command_exec.add_arguments(parser)
+    parser.add_argument('--zone', default=mqtt_topics.DEFAULT_ZONE, help="Grup komutları için bölge")
+    parser.add_argument('--model', default=mqtt_topics.DEFAULT_MODEL, help="Grup komutları için model")
+    mqtt_qos.add_arguments(parser)
+    mqtt5.add_arguments(parser)
+    log_config.add_arguments(parser)
     args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
 
-    client = MQTTScooterClient(args.id)
+    client = MQTTScooterClient(args.id, args.broker, args.port, encoding=args.encoding,
+                               executor=command_exec.from_args(args, registry), qos=mqtt_qos.from_args(args),
+                               zone=args.zone, model=args.model, mqtt_version=args.mqtt_version)
     client.run(args.scenario)
\ No newline at end of file
@@ -0,0 +1,443 @@
+"""
+Hafif MQTT 3.1.1 / 5 paket kodlayıcı/çözücü.
+
+paho-mqtt her istemci için ayrı bir ağ thread'i açtığından tek proseste binlerce
+scooter simüle etmek için uygun değildir. Bu modül asyncio protokolleri içinde
+kullanılacak kadar paket desteği sağlar (CONNECT, CONNACK, PUBLISH QoS 0/1/2,
+PUBACK, PUBREC, PUBREL, PUBCOMP, SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT).
+Broker tarafı (mqtt_broker.py) için paketlerin çözülmesi ve MQTT 5 property
+blokları da buradadır; property'ler ham bayt olarak taşınır, gerektiğinde
+parse_properties/build_properties ile (kimlik, değer) listesine çevrilir.
+"""
+import struct
+
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+PROTOCOL_LEVEL_311 = 4
+PROTOCOL_LEVEL_5 = 5
+
+# CONNACK dönüş kodları (3.1.1) ve karşılık gelen MQTT 5 reason code'ları
+CONNACK_ACCEPTED = 0x00
+CONNACK_BAD_PROTOCOL = 0x01
+CONNACK_BAD_PROTOCOL_V5 = 0x84
+SUBACK_FAILURE = 0x80
+
+SHARE_PREFIX = '$share/'  # MQTT 5 paylaşımlı abonelik: $share/<grup>/<filtre>
+
+# MQTT 5 property kimlikleri (kullanılanlar) ve tüm property'lerin değer tipleri
+PROP_MESSAGE_EXPIRY = 0x02
+PROP_TOPIC_ALIAS_MAXIMUM = 0x22
+PROP_TOPIC_ALIAS = 0x23
+PROP_USER_PROPERTY = 0x26
+
+_BYTE, _UINT16, _UINT32, _VARINT, _STRING, _BINARY, _STRING_PAIR = range(7)
+_PROPERTY_TYPES = {
+    0x01: _BYTE, 0x02: _UINT32, 0x03: _STRING, 0x08: _STRING, 0x09: _BINARY, 0x0B: _VARINT,
+    0x11: _UINT32, 0x12: _STRING, 0x13: _UINT16, 0x15: _STRING, 0x16: _BINARY, 0x17: _BYTE,
+    0x18: _UINT32, 0x19: _BYTE, 0x1A: _STRING, 0x1C: _STRING, 0x1F: _STRING, 0x21: _UINT16,
+    0x22: _UINT16, 0x23: _UINT16, 0x24: _BYTE, 0x25: _BYTE, 0x26: _STRING_PAIR, 0x27: _UINT32,
+    0x28: _BYTE, 0x29: _BYTE, 0x2A: _BYTE,
+}
+
+
+class MQTTProtocolError(ValueError):
+    """Bozuk veya desteklenmeyen paket."""
+
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value % 128
+        value //= 128
+        if value:
+            byte |= 0x80
+        out.append(byte)
+        if not value:
+            return bytes(out)
+
+
+def encode_string(value):
+    data = value.encode('utf-8') if isinstance(value, str) else value
+    return struct.pack('!H', len(data)) + data
+
+
+def decode_varint(data, pos):
+    """pos'taki varint'i (değer, sonraki konum) olarak okur."""
+    value = 0
+    multiplier = 1
+    while True:
+        if pos >= len(data):
+            raise MQTTProtocolError("Eksik varint")
+        byte = data[pos]
+        pos += 1
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, pos
+        multiplier *= 128
+        if multiplier > 128 ** 3:
+            raise MQTTProtocolError("Geçersiz varint")
+
+
+def decode_string(data, pos):
+    if pos + 2 > len(data):
+        raise MQTTProtocolError("Eksik string")
+    (length,) = struct.unpack_from('!H', data, pos)
+    end = pos + 2 + length
+    if end > len(data):
+        raise MQTTProtocolError("Eksik string")
+    return bytes(data[pos + 2:end]).decode('utf-8'), end
+
+
+def encode_properties(properties=b""):
+    """MQTT 5 property bloğu (uzunluk + ham property baytları)."""
+    return encode_varint(len(properties)) + properties
+
+
+def decode_properties(data, pos):
+    """MQTT 5 property bloğunu (ham baytlar, sonraki konum) olarak okur."""
+    length, pos = decode_varint(data, pos)
+    return bytes(data[pos:pos + length]), pos + length
+
+
+def parse_properties(raw):
+    """Ham property baytlarını [(kimlik, değer)] listesine çevirir; user property değeri (ad, değer)."""
+    items = []
+    pos = 0
+    while pos < len(raw):
+        prop_id, pos = decode_varint(raw, pos)
+        kind = _PROPERTY_TYPES.get(prop_id)
+        if kind is None:
+            raise MQTTProtocolError(f"Bilinmeyen property: {prop_id:#x}")
+        if kind == _BYTE:
+            if pos >= len(raw):
+                raise MQTTProtocolError("Eksik property")
+            value, pos = raw[pos], pos + 1
+        elif kind in (_UINT16, _UINT32):
+            size = 2 if kind == _UINT16 else 4
+            if pos + size > len(raw):
+                raise MQTTProtocolError("Eksik property")
+            (value,) = struct.unpack_from('!H' if size == 2 else '!I', raw, pos)
+            pos += size
+        elif kind == _VARINT:
+            value, pos = decode_varint(raw, pos)
+        elif kind == _STRING:
+            value, pos = decode_string(raw, pos)
+        elif kind == _BINARY:
+            if pos + 2 > len(raw):
+                raise MQTTProtocolError("Eksik property")
+            (length,) = struct.unpack_from('!H', raw, pos)
+            value, pos = bytes(raw[pos + 2:pos + 2 + length]), pos + 2 + length
+        else:
+            name, pos = decode_string(raw, pos)
+            text, pos = decode_string(raw, pos)
+            value = (name, text)
+        items.append((prop_id, value))
+    return items
+
+
+def build_properties(items):
+    """[(kimlik, değer)] listesinden ham property baytları (uzunluk öneki hariç)."""
+    out = bytearray()
+    for prop_id, value in items:
+        kind = _PROPERTY_TYPES[prop_id]
+        out += encode_varint(prop_id)
+        if kind == _BYTE:
+            out.append(value)
+        elif kind == _UINT16:
+            out += struct.pack('!H', value)
+        elif kind == _UINT32:
+            out += struct.pack('!I', value)
+        elif kind == _VARINT:
+            out += encode_varint(value)
+        elif kind == _STRING_PAIR:
+            out += encode_string(value[0]) + encode_string(value[1])
+        else:
+            out += encode_string(value)
+    return bytes(out)
+
+
+def packet(packet_type, flags, body=b""):
+    return bytes([(packet_type << 4) | flags]) + encode_varint(len(body)) + body
+
+
+def connect(client_id, keepalive=60, clean_session=True, level=PROTOCOL_LEVEL_311):
+    flags = 0x02 if clean_session else 0x00
+    body = encode_string("MQTT") + bytes([level, flags]) + struct.pack('!H', keepalive)
+    if level >= PROTOCOL_LEVEL_5:
+        body += encode_properties()
+    return packet(CONNECT, 0, body + encode_string(client_id))
+
+
+def parse_connect(body):
+    """CONNECT gövdesini {'level', 'clean', 'keepalive', 'client_id', 'properties'} olarak çözer (will/kimlik atlanır)."""
+    name, pos = decode_string(body, 0)
+    if name not in ('MQTT', 'MQIsdp') or pos + 4 > len(body):
+        raise MQTTProtocolError(f"Geçersiz protokol adı: {name}")
+    level, flags = body[pos], body[pos + 1]
+    (keepalive,) = struct.unpack_from('!H', body, pos + 2)
+    pos += 4
+    properties = b""
+    if level >= PROTOCOL_LEVEL_5:
+        properties, pos = decode_properties(body, pos)
+    client_id, pos = decode_string(body, pos)
+    return {'level': level, 'clean': bool(flags & 0x02), 'keepalive': keepalive,
+            'client_id': client_id, 'properties': properties}
+
+
+def connack(return_code=CONNACK_ACCEPTED, session_present=False, level=PROTOCOL_LEVEL_311, properties=b""):
+    body = bytes([1 if session_present else 0, return_code])
+    if level >= PROTOCOL_LEVEL_5:
+        body += encode_properties(properties)
+    return packet(CONNACK, 0, body)
+
+
+def parse_connack(body, level=PROTOCOL_LEVEL_311):
+    """CONNACK'i (dönüş kodu, property listesi) olarak çözer."""
+    if len(body) < 2:
+        raise MQTTProtocolError("Eksik CONNACK")
+    properties = []
+    if level >= PROTOCOL_LEVEL_5 and len(body) > 2:
+        raw, _ = decode_properties(body, 2)
+        properties = parse_properties(raw)
+    return body[1], properties
+
+
+def publish(topic, payload, qos=0, retain=False, packet_id=None, properties=None, dup=False):
+    """properties None değilse (MQTT 5 alıcı) property bloğu eklenir."""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    body = encode_string(topic)
+    if qos:
+        body += struct.pack('!H', packet_id)
+    if properties is not None:
+        body += encode_properties(properties)
+    flags = (0x08 if dup else 0) | (qos << 1) | (1 if retain else 0)
+    return packet(PUBLISH, flags, body + payload)
+
+
+def publish_size(topic, payload_len, qos=0, properties_len=None):
+    """PUBLISH paketinin kablodaki boyutu (paketi oluşturmadan); properties_len None ise MQTT 3.1.1."""
+    body = 2 + len(topic.encode('utf-8')) + (2 if qos else 0) + payload_len
+    if properties_len is not None:
+        body += len(encode_varint(properties_len)) + properties_len
+    return 1 + len(encode_varint(body)) + body
+
+
+def puback(packet_id):
+    # MQTT 5'te de reason code'suz 2 baytlık form 'başarılı' anlamına gelir (PUBREC/PUBREL/PUBCOMP için de)
+    return packet(PUBACK, 0, struct.pack('!H', packet_id))
+
+
+def pubrec(packet_id):
+    return packet(PUBREC, 0, struct.pack('!H', packet_id))
+
+
+def pubrel(packet_id):
+    return packet(PUBREL, 0x02, struct.pack('!H', packet_id))
+
+
+def pubcomp(packet_id):
+    return packet(PUBCOMP, 0, struct.pack('!H', packet_id))
+
+
+def parse_packet_id(body):
+    if len(body) < 2:
+        raise MQTTProtocolError("Eksik paket kimliği")
+    return struct.unpack_from('!H', body, 0)[0]
+
+
+def subscribe(packet_id, topic_filter, qos=0, level=PROTOCOL_LEVEL_311):
+    """topic_filter tek bir filtre veya aynı QoS ile abone olunacak filtre listesi olabilir."""
+    body = struct.pack('!H', packet_id)
+    if level >= PROTOCOL_LEVEL_5:
+        body += encode_properties()
+    filters = [topic_filter] if isinstance(topic_filter, str) else topic_filter
+    return packet(SUBSCRIBE, 0x02, body + b"".join(encode_string(f) + bytes([qos]) for f in filters))
+
+
+def parse_subscribe(body, level=PROTOCOL_LEVEL_311):
+    """SUBSCRIBE gövdesini (packet_id, [(filtre, istenen qos)], properties) olarak çözer."""
+    packet_id = parse_packet_id(body)
+    pos = 2
+    properties = b""
+    if level >= PROTOCOL_LEVEL_5:
+        properties, pos = decode_properties(body, pos)
+    filters = []
+    while pos < len(body):
+        topic_filter, pos = decode_string(body, pos)
+        if pos >= len(body):
+            raise MQTTProtocolError("Eksik abonelik seçenekleri")
+        filters.append((topic_filter, body[pos] & 0x03))  # MQTT 5'te üst bitler seçeneklerdir
+        pos += 1
+    if not filters:
+        raise MQTTProtocolError("Boş SUBSCRIBE")
+    return packet_id, filters, properties
+
+
+def suback(packet_id, codes, level=PROTOCOL_LEVEL_311):
+    body = struct.pack('!H', packet_id)
+    if level >= PROTOCOL_LEVEL_5:
+        body += encode_properties()
+    return packet(SUBACK, 0, body + bytes(codes))
+
+
+def parse_unsubscribe(body, level=PROTOCOL_LEVEL_311):
+    packet_id = parse_packet_id(body)
+    pos = 2
+    if level >= PROTOCOL_LEVEL_5:
+        _, pos = decode_properties(body, pos)
+    filters = []
+    while pos < len(body):
+        topic_filter, pos = decode_string(body, pos)
+        filters.append(topic_filter)
+    return packet_id, filters
+
+
+def unsuback(packet_id, count, level=PROTOCOL_LEVEL_311):
+    body = struct.pack('!H', packet_id)
+    if level >= PROTOCOL_LEVEL_5:
+        body += encode_properties() + bytes(count)  # 0x00: başarılı
+    return packet(UNSUBACK, 0, body)
+
+
+def pingreq():
+    return packet(PINGREQ, 0)
+
+
+def pingresp():
+    return packet(PINGRESP, 0)
+
+
+def disconnect():
+    return packet(DISCONNECT, 0)
+
+
+def parse_shared(topic_filter):
+    """'$share/<grup>/<filtre>' -> (grup, filtre); paylaşımlı değilse (None, topic_filter)."""
+    if not topic_filter.startswith(SHARE_PREFIX):
+        return None, topic_filter
+    group, _, inner = topic_filter[len(SHARE_PREFIX):].partition('/')
+    return group, inner
+
+
+def valid_filter(topic_filter):
+    """'+' seviyenin tamamı, '#' sadece son seviye olabilir; paylaşımlı grup adı joker içeremez."""
+    group, topic_filter = parse_shared(topic_filter)
+    if group is not None and (not group or '+' in group or '#' in group):
+        return False
+    if not topic_filter:
+        return False
+    levels = topic_filter.split('/')
+    for i, level in enumerate(levels):
+        if ('+' in level and level != '+') or ('#' in level and (level != '#' or i != len(levels) - 1)):
+            return False
+    return True
+
+
+def has_wildcard(topic_filter):
+    return '+' in topic_filter or '#' in topic_filter
+
+
+def topic_matches(topic_filter, topic):
+    """Topic'in filtreye uyup uymadığı; '$' ile başlayan topic'ler ilk seviyedeki jokerlerle eşleşmez."""
+    if topic.startswith('$') and topic_filter[:1] in ('+', '#'):
+        return False
+    f_levels = topic_filter.split('/')
+    t_levels = topic.split('/')
+    for i, f in enumerate(f_levels):
+        if f == '#':
+            return True
+        if i >= len(t_levels) or (f != '+' and f != t_levels[i]):
+            return False
+    return len(f_levels) == len(t_levels)
+
+
+def parse_publish(flags, body):
+    """PUBLISH gövdesini (topic, payload, qos, packet_id) olarak çözer (MQTT 3.1.1)."""
+    qos = (flags >> 1) & 0x03
+    (topic_len,) = struct.unpack_from('!H', body, 0)
+    topic = body[2:2 + topic_len].decode('utf-8')
+    pos = 2 + topic_len
+    packet_id = None
+    if qos:
+        (packet_id,) = struct.unpack_from('!H', body, pos)
+        pos += 2
+    return topic, body[pos:], qos, packet_id
+
+
+def decode_publish(flags, body, level=PROTOCOL_LEVEL_311):
+    """
+    Broker tarafı: PUBLISH'i (topic, payload, qos, packet_id, retain, properties)
+    olarak çözer; MQTT 5'te property bloğu ham bayt olarak döner.
+    """
+    qos = (flags >> 1) & 0x03
+    if qos == 3:
+        raise MQTTProtocolError("Geçersiz QoS")
+    topic, pos = decode_string(body, 0)
+    packet_id = None
+    if qos:
+        if pos + 2 > len(body):
+            raise MQTTProtocolError("Eksik paket kimliği")
+        (packet_id,) = struct.unpack_from('!H', body, pos)
+        pos += 2
+    properties = b""
+    if level >= PROTOCOL_LEVEL_5:
+        properties, pos = decode_properties(body, pos)
+    return topic, bytes(body[pos:]), qos, packet_id, bool(flags & 0x01), properties
+
+
+class PacketReader:
+    """Akıştan gelen baytları tam MQTT paketlerine (tip, bayraklar, gövde) ayırır."""
+
+    def __init__(self, max_packet_size=1024 * 1024):
+        self.max_packet_size = max_packet_size
+        self._buf = bytearray()
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+        packets = []
+        pos = 0
+        n = len(buf)
+        while n - pos >= 2:
+            # Remaining Length alanı 1-4 bayt uzunluğunda varint
+            length = 0
+            multiplier = 1
+            i = pos + 1
+            while True:
+                if i >= n:
+                    length = None
+                    break
+                byte = buf[i]
+                length += (byte & 0x7F) * multiplier
+                i += 1
+                if not byte & 0x80:
+                    break
+                multiplier *= 128
+                if multiplier > 128 ** 3:
+                    raise MQTTProtocolError("Geçersiz Remaining Length")
+            if length is None:
+                break
+            if length > self.max_packet_size:
+                raise MQTTProtocolError(f"Paket boyutu sınırı aşıldı: {length}")
+            if n - i < length:
+                break
+            header = buf[pos]
+            packets.append((header >> 4, header & 0x0F, bytes(buf[i:i + length])))
+            pos = i + length
+        if pos:
+            del buf[:pos]
+        return packets
@@ -0,0 +1,203 @@
+"""
+MQTT QoS politikası, in-flight penceresi ve teslim muhasebesi.
+
+Mesajlar iki sınıfa ayrılır ve her sınıfın QoS seviyesi ayrı seçilir:
+    telemetry  konum/durum mesajları
+    command    komutlar, ACK'ler ve register/register_ack (kontrol düzlemi)
+
+QoS 1/2 yayınlarda aynı anda onay (PUBACK/PUBCOMP) beklenen mesaj sayısı
+--max-inflight ile sınırlanır; pencere doluyken yayınlar istemci içinde
+kuyruklanır (--max-queued), kuyruk da doluysa yayın başarısız sayılır.
+
+DeliveryTracker her yayını on_publish geri çağrısıyla eşleştirir: yayından
+broker onayına kadar geçen süre (QoS 0'da sokete yazılma) sınıf başına
+'PublishComplete_<sınıf>' histogramına, yayınlanan/tamamlanan/başarısız
+sayıları sayaçlara yazılır; kapanışta hâlâ onay bekleyenler raporlanır.
+Komutların uçtan uca (ACK'e kadar) teslimi command_dispatch.py'de izlenir.
+"""
+import threading
+
+import clock
+
+TELEMETRY = 'telemetry'
+COMMAND = 'command'
+MESSAGE_CLASSES = (TELEMETRY, COMMAND)
+_TELEMETRY_TYPES = frozenset(('location', 'status'))
+
+DEFAULT_MAX_INFLIGHT = 20  # paho varsayılanı
+DEFAULT_MAX_QUEUED = 1000
+
+
+def message_class(msg_type):
+    return TELEMETRY if msg_type in _TELEMETRY_TYPES else COMMAND
+
+
+class QoSPolicy:
+    """Mesaj sınıfı başına QoS ve in-flight penceresi."""
+
+    def __init__(self, telemetry=0, command=0, max_inflight=DEFAULT_MAX_INFLIGHT, max_queued=DEFAULT_MAX_QUEUED):
+        for qos in (telemetry, command):
+            if qos not in (0, 1, 2):
+                raise ValueError(f"Geçersiz QoS: {qos}")
+        self.qos = {TELEMETRY: telemetry, COMMAND: command}
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+
+    def qos_for(self, msg_type):
+        return self.qos[message_class(msg_type)]
+
+    @property
+    def telemetry(self):
+        return self.qos[TELEMETRY]
+
+    @property
+    def command(self):
+        return self.qos[COMMAND]
+
+    def configure_client(self, client):
+        """paho istemcisine pencere ve kuyruk sınırlarını uygular."""
+        client.max_inflight_messages_set(self.max_inflight)
+        client.max_queued_messages_set(self.max_queued)
+
+    def describe(self):
+        return (f"QoS telemetri={self.telemetry}, komut={self.command} | "
+                f"in-flight={self.max_inflight}, kuyruk={self.max_queued}")
+
+
+class DeliveryTracker:
+    """
+    Yayın -> onay eşleştirmesi. Anahtar paho'da mid, fleet.py'de bağlantı
+    ve paket kimliğidir. on_publish, publish() dönmeden başka bir thread'de
+    çalışabildiği için erken gelen onaylar ayrıca tutulur; paho'nun kendi
+    kilitleriyle kilitlenmemek için publish() kilit dışında çağrılır.
+
+    Erken onaylar en fazla EARLY_MAX tane ve EARLY_TTL saniye tutulur:
+    reddedilen ya da izlenmeyen yayınların onayları birikmez. Yayından
+    (start_ns) önce gelmiş bir erken onay, 16 bitlik mid sarmasıyla aynı
+    anahtarı almış eski bir yayına aittir ve yok sayılır.
+    """
+
+    EARLY_MAX = 1024
+    EARLY_TTL = 5.0
+
+    def __init__(self, registry, policy=None, tracer=None):
+        self.policy = policy or QoSPolicy()
+        self.tracer = tracer  # Verilirse tamamlanmalar iz dosyasına 'publish_done' olayı olarak yazılır
+        self.latency = {c: registry.latency(f'PublishComplete_{c}') for c in MESSAGE_CLASSES}
+        self.published = {c: registry.counter(f'Published_{c}') for c in MESSAGE_CLASSES}
+        self.completed = {c: registry.counter(f'PublishCompleted_{c}') for c in MESSAGE_CLASSES}
+        self.failed = {c: registry.counter(f'PublishFailed_{c}') for c in MESSAGE_CLASSES}
+        self._pending = {}  # {anahtar: (sınıf, başlangıç ns, scooter id)}
+        self._early = {}  # {anahtar: (tamamlanma ns, başarılı mı)}; publish() dönmeden gelen onaylar
+        self._lock = threading.Lock()
+
+    def started(self, key, msg_type, start_ns, scooter_id=None):
+        cls = message_class(msg_type)
+        self.published[cls].add()
+        with self._lock:
+            early = self._early.pop(key, None)
+            if early is None or early[0] < start_ns:
+                self._pending[key] = (cls, start_ns, scooter_id)
+                return
+        done_ns, ok = early
+        if ok:
+            self._record(cls, start_ns, done_ns, scooter_id)
+        else:
+            self.failed[cls].add()
+
+    def rejected(self, msg_type, key=None):
+        """Yayın hiç kuyruğa alınamadı (bağlantı yok, kuyruk dolu); anahtarına gelmiş onay atılır."""
+        cls = message_class(msg_type)
+        self.published[cls].add()
+        self.failed[cls].add()
+        if key is not None:
+            with self._lock:
+                self._early.pop(key, None)
+
+    def done(self, key, ok=True):
+        done_ns = clock.now_ns()
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                self._remember_early(key, done_ns, ok)
+                return
+        cls, start_ns, scooter_id = entry
+        if ok:
+            self._record(cls, start_ns, done_ns, scooter_id)
+        else:
+            self.failed[cls].add()
+
+    def _remember_early(self, key, done_ns, ok):
+        """Erken onayı saklar, en eskiden başlayarak sınırı ya da süresi aşanları atar (kilit tutulurken)."""
+        early = self._early
+        early.pop(key, None)  # Sözlük sırası = geliş sırası
+        early[key] = (done_ns, ok)
+        ttl_ns = int(self.EARLY_TTL * 1e9)
+        while len(early) > 1:
+            oldest = next(iter(early))
+            if len(early) <= self.EARLY_MAX and done_ns - early[oldest][0] <= ttl_ns:
+                break
+            del early[oldest]
+
+    def _record(self, cls, start_ns, done_ns, scooter_id):
+        seconds = (done_ns - start_ns) / 1e9
+        self.latency[cls].record(seconds)
+        self.completed[cls].add()
+        if self.tracer is not None:
+            self.tracer.tx('publish_done', 0, scooter_id, seconds, ts_ns=done_ns)
+
+    # --- paho ---
+
+    def publish(self, client, topic, payload, msg_type, scooter_id=None, properties=None):
+        """Sınıfın QoS'u ile paho üzerinden yayınlar; sonucu on_publish ile eşlenir."""
+        qos = self.policy.qos_for(msg_type)
+        start_ns = clock.now_ns()
+        info = client.publish(topic, payload, qos=qos, properties=properties)
+        # Bağlantı yokken QoS 1/2 mesajlar paho'da tutulur ve yeniden bağlanınca gönderilir
+        if info.rc == 0 or (qos and info.rc == 4):  # MQTT_ERR_SUCCESS, MQTT_ERR_NO_CONN
+            self.started(info.mid, msg_type, start_ns, scooter_id)
+        else:
+            self.rejected(msg_type, info.mid)
+        return info
+
+    def on_publish(self, client, userdata, mid, reason_code=None, properties=None):
+        """paho Callback API V2 on_publish; MQTT 5'te 0x80 ve üstü reason code hatadır."""
+        self.done(mid, ok=reason_code is None or not getattr(reason_code, 'is_failure', False))
+
+    # --- Rapor ---
+
+    def pending(self):
+        with self._lock:
+            counts = dict.fromkeys(MESSAGE_CLASSES, 0)
+            for cls, _, _ in self._pending.values():
+                counts[cls] += 1
+        return counts
+
+    def summary_lines(self):
+        pending = self.pending()
+        lines = []
+        for cls in MESSAGE_CLASSES:
+            published = self.published[cls].value
+            if not published:
+                continue
+            lines.append(f"Teslim ({cls}, QoS {self.policy.qos[cls]}): yayınlanan {published} | "
+                         f"onaylanan {self.completed[cls].value} | başarısız {self.failed[cls].value} | "
+                         f"bekleyen {pending[cls]}")
+            if self.latency[cls]:
+                lines.append(self.latency[cls].format())
+        return lines
+
+
+def add_arguments(parser):
+    parser.add_argument('--qos-telemetry', type=int, choices=[0, 1, 2], default=0,
+                        help="Konum/durum mesajlarının QoS seviyesi")
+    parser.add_argument('--qos-command', type=int, choices=[0, 1, 2], default=0,
+                        help="Komut, ACK ve register mesajlarının QoS seviyesi")
+    parser.add_argument('--max-inflight', type=int, default=DEFAULT_MAX_INFLIGHT,
+                        help="Onayı beklenen en fazla QoS 1/2 yayın")
+    parser.add_argument('--max-queued', type=int, default=DEFAULT_MAX_QUEUED,
+                        help="Pencere doluyken istemcide bekletilen en fazla yayın (0: sınırsız)")
+
+
+def from_args(args):
+    return QoSPolicy(args.qos_telemetry, args.qos_command, args.max_inflight, args.max_queued)
@@ -1,69 +1,140 @@
 import paho.mqtt.client as mqtt
+import argparse
 import json
+import multiprocessing
+import queue
 import time
 import threading
 import logging
-import csv  # <-- 1. EKLENDİ
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+import clock
+import command_dispatch
+import event_trace
+import fleet_state
+import geo_index
+import log_config
+import metrics
+import mqtt5
+import mqtt_broker
+import mqtt_qos
+import mqtt_topics
+import results_writer
+import wire_format
+from log_config import msg_log
 
-latency_data = []  # RTT Verileri
-bandwidth_data = []  # Bant Genişliği Verileri
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
-def save_server_results():
-    """Sunucu kapandığında verileri CSV'ye yazar."""
-    filename = "results_mqtt_server.csv"
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency_RTT')  # RTT Verileri
+downlink_data = registry.latency('Latency_Downlink')  # Tek yönlü gecikmeler (bkz. clock.py)
+uplink_data = registry.latency('Latency_Uplink')
+telemetry_data = registry.latency('Latency_Telemetry')  # Açık döngü yükte planlanan gönderimden alışa
+bandwidth_data = registry.size('Bandwidth')  # Bant Genişliği Verileri
+tracer = event_trace.Tracer('mqtt', bandwidth=bandwidth_data, latency=latency_data,
+                            downlink=downlink_data, uplink=uplink_data, telemetry=telemetry_data)
 
-    global latency_data, bandwidth_data
+sid_registry = wire_format.SidRegistry()
+fleet = fleet_state.FleetState()  # Scooterların son konum/durumu (bkz. fleet_state.py)
+geo = geo_index.GridIndex(fleet)  # Konuma göre sorgular ve bölge hedefli komutlar (bkz. geo_index.py)
+dispatcher = command_dispatch.Dispatcher(registry, tracer)  # Komut kuyrukları, ACK eşleme ve yeniden deneme
 
-    if not latency_data and not bandwidth_data:
-        logging.warning("Hiç veri toplanmadı, yine de boş dosya oluşturuluyor.")
 
-    # Veri uzunluklarını eşitleme
-    max_len = max(len(latency_data), len(bandwidth_data)) if (latency_data or bandwidth_data) else 0
+def open_server_results(base="results_mqtt_server", **kwargs):
+    """Olayları çalışma boyunca koşu kimlikli, dönen (rotating) iz dosyalarına akıtır."""
+    return tracer.open(base, **kwargs)
 
-    rows = []
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rows.append([lat, bw])
 
-    try:
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Latency_RTT", "Bandwidth"])
-            writer.writerows(rows)
-        logging.info(f"✅ SONUÇLAR BAŞARIYLA KAYDEDİLDİ: {filename}")
-        import os
-        logging.info(f"Dosya Yolu: {os.path.abspath(filename)}")
-    except Exception as e:
-        logging.error(f"❌ CSV Kayıt hatası: {e}")
+def save_server_results(writer=None):
+    """Kapanışta metrik özetini loglar; bekleyen kayıtları yazıp dosyayı kapatır."""
+    registry.log_summary("SUNUCU METRİKLERİ")
+    logging.info(fleet.describe())
+    logging.info(geo.describe())
+    if writer is not None:
+        writer.close()
+
+
+# Sunucunun dinlediği topic türleri (kendi yayınladığı scooter/<id>/command hariç)
+SUBSCRIBED_KINDS = ('register', 'location', 'status', 'ack')
+# Çok worker'lı modda paylaşımlı abonelikle worker'lara dağıtılan türler. register/ack
+# komut dağıtıcısının (command_dispatch) ve grup üyeliklerinin tek proseste kalması için
+# sadece kontrol worker'ına gelir.
+SHARED_KINDS = ('location', 'status')
+DEFAULT_SHARE_GROUP = 'servers'
+
+
+BROADCAST_MODES = ('group', 'per-scooter')
 
 
 class MQTTServer:
-    def __init__(self, broker='localhost', port=1883):
+    def __init__(self, broker='localhost', port=1883, command_interval=15, qos=None, broadcast='group',
+                 command_target=mqtt_topics.FLEET, share_group=None, control=True, mqtt_version=mqtt5.MQTT_311,
+                 command_expiry=mqtt5.DEFAULT_COMMAND_EXPIRY, command_area=None, dispatch=None, max_scooters=None):
         self.broker = broker
         self.port = port
+        self.command_interval = command_interval
+        # 'group': hedef grubun topic'ine tek yayın (dağıtımı broker yapar), 'per-scooter': scooter başına yayın
+        self.broadcast = broadcast
+        self.command_target = command_target
+        # Verilirse komut konumu bu alanda olan scooterlara scooter başına yayınlanır (geo_index.Area);
+        # alan bir topic grubuna karşılık gelmediği için grup yayını kullanılamaz
+        self.command_area = command_area
+        self.qos = qos or mqtt_qos.QoSPolicy()
+        # Verilirse telemetri $share/<grup>/... ile aynı gruptaki worker'lar arasında paylaşılır (MQTT 5)
+        self.share_group = share_group
+        # Kontrol düzlemi (register, ACK, periyodik komut) bu sunucuda mı?
+        self.control = control
+        # MQTT 5'te komutlar ömürlü yayınlanır, damgalar user property'lerde taşınır (bkz. mqtt5.py)
+        self.v5 = mqtt_version == mqtt5.MQTT_5
+        self.command_expiry = command_expiry
         # Callback API V2 kullanımı
-        self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        protocol = mqtt.MQTTv5 if share_group or self.v5 else mqtt.MQTTv311
+        self.client = mqtt.Client(callback_api_version=mqtt.CallbackAPIVersion.VERSION2, protocol=protocol)
+        self.qos.configure_client(self.client)
+        # Yayın -> broker onayı (on_publish, bkz. mqtt_qos.py); komut -> ACK eşleştirmesi dispatcher'da
+        self.delivery = mqtt_qos.DeliveryTracker(registry, self.qos, tracer)
+        dispatcher.configure(**(dispatch or {}))
+        if max_scooters is not None:
+            fleet.reserve(max_scooters)  # paho callback thread'i ile komut thread'i aynı anda yazar; büyüme olmasın
         self.known_clients = set()
+        self.groups = {}  # {scooter id: register'da bildirilen {'zone', 'model'}}
+        self.received = 0  # Alınan mesaj sayısı ve ilk/son mesaj anı (alım hızı için)
+        self.first_rx_ns = self.last_rx_ns = None
         self.running = True
 
+    def subscriptions(self):
+        """(filtre, qos) listesi; paylaşımlı modda telemetri $share/<grup>/ önekiyle."""
+        subs = []
+        for kind in SUBSCRIBED_KINDS:
+            topic = f"scooter/+/{kind}"
+            if self.share_group and kind in SHARED_KINDS:
+                subs.append((f"$share/{self.share_group}/{topic}", self.qos.qos_for(kind)))
+            elif self.control:
+                subs.append((topic, self.qos.qos_for(kind)))
+        return subs
+
     def on_connect(self, client, userdata, flags, reason_code, properties=None):
         if reason_code == 0:
             logging.info(f"MQTT Broker'a Bağlandı (Port: {self.port})")
-            #tüm scooter topiclerini dinleme
-            client.subscribe("scooter/+/+")
+            # Scooter topic'leri, mesaj sınıfının QoS'u ile
+            client.subscribe(self.subscriptions())
         else:
             logging.error(f"Bağlantı hatası: {reason_code}")
 
     def on_message(self, client, userdata, msg):
         try:
+            ts_ns = clock.now_ns()
             payload_len = len(msg.payload)
-            bandwidth_data.append(payload_len)
+            self.received += 1
+            if self.first_rx_ns is None:
+                self.first_rx_ns = ts_ns
+            self.last_rx_ns = ts_ns
 
-            payload_str = msg.payload.decode()
-            data = json.loads(payload_str)
+            if wire_format.is_binary(msg.payload):
+                data = wire_format.decode(msg.payload, sid_registry)
+            else:
+                data = json.loads(msg.payload.decode())
+            if self.v5:
+                mqtt5.merge_stamps(data, mqtt5.paho_user_properties(msg))
 
             # Topic'ten ID'yi çeker
             topic_parts = msg.topic.split('/')
@@ -72,54 +143,118 @@ class MQTTServer:
                 self.known_clients.add(scooter_id)
             else:
                 scooter_id = "unknown"
+            fleet.update(data, ts_ns, scooter_id)
 
             msg_type = data.get('type')
+            rtt, downlink, uplink = clock.NO_DELAYS
 
             if msg_type == 'register':
-                logging.info(f"SERVER RX (Register) <- {scooter_id}")
+                msg_log.info("SERVER RX (Register) <- %s", scooter_id)
+                self.join_groups(scooter_id, data.get('groups') or {})
+
+                reg_ack = clock.stamp_register_ack(data, ts_ns, wire_format.negotiate(data, sid_registry))
+                if reg_ack:
+                    ack_json = json.dumps(reg_ack)
+                    self.delivery.publish(client, f"scooter/{scooter_id}/command", ack_json, 'register_ack',
+                                          scooter_id)
+                    tracer.tx('register_ack', len(ack_json), scooter_id)
+                    msg_log.info("SERVER TX (Register ACK) -> %s | Format: %s, sid=%s", scooter_id,
+                                 reg_ack.get('encoding', wire_format.ENCODING_JSON), reg_ack.get('sid'))
 
             elif msg_type == 'location':
-                logging.info(f"SERVER RX (Konum) <- {scooter_id}")
+                rtt = clock.telemetry_delay(data, ts_ns)
+                msg_log.info("SERVER RX (Konum) <- %s", scooter_id)
 
             elif msg_type == 'status':
-                logging.info(f"SERVER RX (Durum) <- {scooter_id}")
+                rtt = clock.telemetry_delay(data, ts_ns)
+                msg_log.info("SERVER RX (Durum) <- %s", scooter_id)
 
             elif msg_type == 'ack':
-                # RTT Hesaplama
-                send_time = data.get('send_time', 0)
-                if send_time:
-                    rtt = time.time() - send_time
-                    latency_data.append(rtt)
-                    logging.info(f"SERVER RX (ACK) <- {scooter_id} | RTT: {rtt:.6f}s")
+                # RTT ve (scooter saati senkronsa) tek yönlü gecikmeler
+                rtt, downlink, uplink = clock.ack_delays(data, ts_ns)
+                if not dispatcher.acknowledge(scooter_id, data, ts_ns):
+                    rtt = downlink = uplink = None  # QoS 1 tekrarı ya da geç ACK: RTT'ye yazılmaz
+                if rtt is not None and msg_log.enabled():
+                    msg_log.logger.info("SERVER RX (ACK) <- %s | %s", scooter_id,
+                                        clock.describe_delays(rtt, downlink, uplink))
+
+            tracer.rx(msg_type, payload_len, scooter_id, latency=rtt, ts_ns=ts_ns, downlink=downlink, uplink=uplink)
 
         except Exception as e:
             logging.error(f"Mesaj işleme hatası: {e}")
 
+    def join_groups(self, scooter_id, groups):
+        """Grup üyeliklerini günceller (yeniden register'da eskilerinin yerine geçer)."""
+        self.groups[scooter_id] = groups
+
     def broadcast_commands(self):
-        """Her 15 saniyede bir bilinen scooterlara komut atar"""
+        """Her command_interval saniyede bir hedef gruba komut atar"""
         while self.running:
-            time.sleep(15)
+            time.sleep(self.command_interval)
             if not self.known_clients: continue
 
-            cmd_dict = {
-                "command": "unlock",
-                "scooter_id": "server",
-                "send_time": time.time()
-            }
-            cmd_json = json.dumps(cmd_dict)
-
-            for s_id in list(self.known_clients):
-                topic = f"scooter/{s_id}/command"
-                try:
-                    self.client.publish(topic, cmd_json)
-                    bandwidth_data.append(len(cmd_json))
-                    logging.info(f"SERVER TX (Komut) -> {s_id} (Topic: {topic})")
-                except:
-                    pass
+            started_ns = clock.now_ns()
+            if self.command_area:
+                targets = self.command_area.select(geo)
+                dispatcher.submit_many([s_id for s_id in list(self.known_clients) if s_id in targets],
+                                       "unlock", scooter_id="server")
+            else:
+                members = [s_id for s_id in list(self.known_clients)
+                           if mqtt_topics.matches(self.command_target, self.groups.get(s_id))]
+                if self.broadcast == 'group':
+                    # Tek yayın, ACK'ler scooter başına beklenir; yeniden gönderimler scooter'ın kendi topic'ine
+                    dispatcher.fanout(members, "unlock", lambda cmd: self.send_group_command(
+                        cmd, self.command_target, len(members)), scooter_id="server")
+                else:
+                    dispatcher.submit_many(members, "unlock", scooter_id="server")
+            # Yayının tamamının paho'ya teslim süresi (scooter başına modda filo boyutuyla büyür)
+            tracer.tx('broadcast', 0, str(self.command_area or self.command_target),
+                      (clock.now_ns() - started_ns) / 1e9)
+
+    def encode_command(self, cmd):
+        """(JSON, paho properties); MQTT 5'te damgalar user property olarak ve komut ömürlü."""
+        if not self.v5:
+            return json.dumps(cmd), None
+        body, user = mqtt5.split_stamps(cmd)
+        return json.dumps(body), mqtt5.paho_properties(expiry=self.command_expiry, user=user)
 
-    def start(self):
+    def send_command(self, s_id, cmd):
+        """Dispatcher'ın gönderim fonksiyonu: tek scooter'a kendi topic'i üzerinden hedefli komut."""
+        topic = mqtt_topics.scooter_topic(s_id, 'command')
+        cmd_json, properties = self.encode_command(cmd)
+        try:
+            self.delivery.publish(self.client, topic, cmd_json, 'command', s_id, properties)
+            tracer.tx('command', len(cmd_json), s_id)
+            msg_log.info("SERVER TX (Komut) -> %s (Topic: %s)", s_id, topic)
+        except Exception as e:
+            logging.error(f"Komut yayınlama hatası ({s_id}): {e}")
+
+    def send_group_command(self, cmd, target, expected):
+        """Grup topic'ine tek yayın; scooterlara dağıtımı broker yapar."""
+        topic = mqtt_topics.group_topic(target)
+        cmd_json, properties = self.encode_command(cmd)
+        try:
+            self.delivery.publish(self.client, topic, cmd_json, 'command', target, properties)
+            tracer.tx('command', len(cmd_json), target)
+            msg_log.info("SERVER TX (Grup Komutu) -> %s (Topic: %s, %d scooter)", target, topic, expected)
+        except Exception as e:
+            logging.error(f"Grup komutu yayınlama hatası ({target}): {e}")
+
+    def log_delivery(self):
+        logging.info(f"--- MQTT TESLİM ({self.qos.describe()}) ---")
+        for line in self.delivery.summary_lines():
+            logging.info(line)
+        if self.control:
+            logging.info(dispatcher.summary_line())
+
+    def ingest_rate(self):
+        """İlk ve son mesaj arasındaki ortalama alım hızı (mesaj/sn)."""
+        return ingest_rate(self.received, self.first_rx_ns, self.last_rx_ns)
+
+    def start(self, stop_event=None):
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
+        self.client.on_publish = self.delivery.on_publish
 
         try:
             self.client.connect(self.broker, self.port, 60)
@@ -127,10 +262,13 @@ class MQTTServer:
 
             logging.info("MQTT Sunucusu Servisi Başlatıldı (Kapatmak için CTRL+C)")
 
-            t_broadcast = threading.Thread(target=self.broadcast_commands, daemon=True)
-            t_broadcast.start()
+            if self.control:
+                dispatcher.send = self.send_command
+                threading.Thread(target=dispatcher.run, args=(lambda: self.running,), daemon=True).start()
+                t_broadcast = threading.Thread(target=self.broadcast_commands, daemon=True)
+                t_broadcast.start()
 
-            while self.running:
+            while self.running and not (stop_event and stop_event.is_set()):
                 time.sleep(1)
 
         except KeyboardInterrupt:
@@ -140,14 +278,176 @@ class MQTTServer:
             self.client.loop_stop()
             self.client.disconnect()
             logging.info("MQTT bağlantısı kesildi.")
+            self.log_delivery()
+
+
+def ingest_rate(received, first_ns, last_ns):
+    if received < 2 or first_ns is None or last_ns <= first_ns:
+        return 0.0
+    return (received - 1) / ((last_ns - first_ns) / 1e9)
+
+
+def run_worker(worker_id, broker, port, stop_event, results, log_level=logging.INFO, server_kwargs=None,
+               results_base=None, run_id=None):
+    """
+    Paylaşımlı abonelik worker prosesi: kendi paho (MQTT 5) istemcisini açar,
+    olayları kendi iz dosyasına ('w<id>' parçaları) yazar, kapanışta
+    metriklerini ana prosese yollar. Kontrol düzlemi sadece worker 0'dadır.
+    """
+    log_config.after_fork()
+    logging.getLogger().setLevel(log_level)
+    writer = open_server_results(results_base, run_id=run_id, tag=f"w{worker_id}") if results_base else None
+    srv = MQTTServer(broker, port, control=worker_id == 0, **(server_kwargs or {}))
+    try:
+        srv.start(stop_event)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+        results.put({
+            'worker': worker_id,
+            'known_clients': len(srv.known_clients),
+            'fleet': fleet,
+            'metrics': registry.snapshot(),
+            'received': srv.received,
+            'first_rx_ns': srv.first_rx_ns,
+            'last_rx_ns': srv.last_rx_ns,
+        })
+
+
+class MQTTWorkerPool:
+    """
+    Aynı paylaşımlı abonelik grubuna ($share/<grup>/scooter/+/<tür>) bağlanan
+    N worker prosesi. Broker telemetriyi worker'lara sırayla dağıtır; her worker
+    kendi metriklerini tutar, kapanışta ana proseste birleştirilir ve worker
+    başına / toplam alım hızı raporlanır.
+    """
+
+    def __init__(self, broker='localhost', port=1883, workers=2, share_group=DEFAULT_SHARE_GROUP,
+                 log_level=logging.INFO, results_base=None, **server_kwargs):
+        self.broker = broker
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.server_kwargs = dict(server_kwargs, share_group=share_group)  # MQTTServer parametreleri
+        self.results_base = results_base  # Verilirse her worker kendi sonuç dosyasına yazar
+        self.run_id = results_writer.make_run_id()
+        self.stop_event = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.procs = []
+        self.worker_stats = []
+
+    def start(self):
+        for i in range(self.workers):
+            p = multiprocessing.Process(target=run_worker, args=(i, self.broker, self.port, self.stop_event,
+                                                                 self.results, self.log_level, self.server_kwargs,
+                                                                 self.results_base, self.run_id),
+                                        daemon=True)
+            p.start()
+            self.procs.append(p)
+        logging.info(f"MQTT worker havuzu başlatıldı: {self.workers} worker, "
+                     f"grup $share/{self.server_kwargs['share_group']}")
+        if self.server_kwargs.get('command_area'):
+            # Konumlar worker'lara paylaştırılır; alan seçimi yalnızca kontrol worker'ının gördükleriyle yapılır
+            logging.warning("--command-area çok worker'lı modda yalnızca 0 numaralı worker'ın "
+                            "konumunu aldığı scooterları hedefler")
+
+    def stop(self, timeout=10):
+        """Worker'ları durdurur, metrikleri birleştirir ve alım hızlarını raporlar."""
+        self.stop_event.set()
+        for _ in self.procs:
+            try:
+                res = self.results.get(timeout=timeout)
+            except queue.Empty:
+                logging.warning("Bir worker sonuç göndermedi.")
+                continue
+            registry.merge(res['metrics'])
+            fleet.merge(res['fleet'])
+            self.worker_stats.append({k: v for k, v in res.items() if k not in ('metrics', 'fleet')})
+        for p in self.procs:
+            p.join(timeout=timeout)
+        for st in sorted(self.worker_stats, key=lambda x: x['worker']):
+            rate = ingest_rate(st['received'], st['first_rx_ns'], st['last_rx_ns'])
+            logging.info(f"Worker {st['worker']}: {st['received']} mesaj, {rate:,.0f} mesaj/sn")
+        logging.info(f"Toplam alım: {sum(st['received'] for st in self.worker_stats)} mesaj, "
+                     f"{self.ingest_rate():,.0f} mesaj/sn")
+        return self.worker_stats
+
+    def ingest_rate(self):
+        """Tüm worker'ların toplam alım hızı (ilk ve son mesaj arasındaki ortak pencerede)."""
+        active = [st for st in self.worker_stats if st['first_rx_ns'] is not None]
+        if not active:
+            return 0.0
+        return ingest_rate(sum(st['received'] for st in active), min(st['first_rx_ns'] for st in active),
+                           max(st['last_rx_ns'] for st in active))
+
+
+def command_target_arg(target):
+    try:
+        mqtt_topics.parse_target(target)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return target
 
 
 if __name__ == "__main__":
-    srv = MQTTServer()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--broker', default='localhost')
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--command-interval', type=float, default=15, help="Komut yayın periyodu (sn)")
+    parser.add_argument('--embedded-broker', action='store_true',
+                        help="Harici broker yerine gömülü broker'ı (mqtt_broker.py) bu proseste başlatır")
+    parser.add_argument('--results-file', default="results_mqtt_server",
+                        help="Sonuç dosyası öneki (koşu kimliği ve parça numarası eklenir)")
+    parser.add_argument('--broadcast', choices=BROADCAST_MODES, default='group',
+                        help="'group': grup topic'ine tek yayın, 'per-scooter': her scooter'a ayrı yayın")
+    parser.add_argument('--command-target', type=command_target_arg, default=mqtt_topics.FLEET,
+                        help="Periyodik komutun hedefi: fleet | zone:<bölge> | model:<model>")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="1'den büyükse telemetri MQTT 5 paylaşımlı abonelikle worker proseslerine dağıtılır")
+    parser.add_argument('--share-group', default=DEFAULT_SHARE_GROUP, help="Paylaşımlı abonelik grubu adı")
+    mqtt5.add_arguments(parser)
+    parser.add_argument('--command-expiry', type=int, default=mqtt5.DEFAULT_COMMAND_EXPIRY,
+                        help="MQTT 5'te komutların Message Expiry Interval'ı (sn)")
+    mqtt_qos.add_arguments(parser)
+    fleet_state.add_arguments(parser)
+    geo_index.add_arguments(parser)
+    command_dispatch.add_arguments(parser)
+    log_config.add_arguments(parser)
+    args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
+    embedded = None
+    if args.embedded_broker:
+        embedded = mqtt_broker.start_in_thread('127.0.0.1', args.port, registry=registry)
+        args.broker = '127.0.0.1'
+    pool = None
+    writer = None
     try:
-        srv.start()
+        if args.workers > 1:
+            pool = MQTTWorkerPool(args.broker, args.port, args.workers, args.share_group,
+                                  results_base=args.results_file, command_interval=args.command_interval,
+                                  qos=mqtt_qos.from_args(args), broadcast=args.broadcast,
+                                  command_target=args.command_target, mqtt_version=args.mqtt_version,
+                                  command_expiry=args.command_expiry, command_area=args.command_area,
+                                  dispatch=command_dispatch.settings_from_args(args), max_scooters=args.max_scooters)
+            pool.start()
+            while True:
+                time.sleep(1)
+        else:
+            writer = open_server_results(args.results_file)
+            MQTTServer(args.broker, args.port, args.command_interval, mqtt_qos.from_args(args), args.broadcast,
+                       args.command_target, mqtt_version=args.mqtt_version, command_expiry=args.command_expiry,
+                       command_area=args.command_area, dispatch=command_dispatch.settings_from_args(args),
+                       max_scooters=args.max_scooters).start()
     except KeyboardInterrupt:
         pass
     finally:
+        if pool:
+            pool.stop()
         logging.info("Program sonlanıyor, veriler kaydediliyor...")
-        save_server_results()
\ No newline at end of file
+        if embedded is not None:
+            embedded.stop()
+        save_server_results(writer)
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""
+MQTT topic düzeni ve grup (broadcast) komut topic'leri.
+
+    scooter/<id>/<tür>              scooter -> sunucu (register, location, status, ack)
+    scooter/<id>/command            sunucu -> tek scooter (hedefli komut, register_ack)
+    fleet/all/command               sunucu -> tüm filo
+    fleet/zone/<bölge>/command      sunucu -> bir bölgedeki scooterlar
+    fleet/model/<model>/command     sunucu -> bir modeldeki scooterlar
+
+Scooterlar bağlanınca kendi topic'lerine ek olarak filo, bölge ve model
+topic'lerine abone olur ve register mesajında 'groups' ile bölge/modelini
+bildirir. Böylece filo geneli bir komut sunucudan tek bir PUBLISH olarak
+çıkar, scooterlara dağıtımı (fan-out) broker yapar.
+
+Komut hedefleri (--command-target): 'fleet', 'zone:<bölge>', 'model:<model>'.
+"""
+FLEET = 'fleet'
+ZONE = 'zone'
+MODEL = 'model'
+TARGET_KINDS = (FLEET, ZONE, MODEL)
+
+FLEET_TOPIC = "fleet/all/command"
+
+DEFAULT_ZONE = '0'
+DEFAULT_MODEL = 'standard'
+
+
+def scooter_topic(scooter_id, kind):
+    return f"scooter/{scooter_id}/{kind}"
+
+
+def group_topic(target):
+    """'fleet' / 'zone:<bölge>' / 'model:<model>' hedefinin komut topic'i."""
+    kind, _, name = parse_target(target)
+    if kind == FLEET:
+        return FLEET_TOPIC
+    return f"fleet/{kind}/{name}/command"
+
+
+def command_topics(scooter_id, zone=None, model=None):
+    """Scooter'ın komut alacağı tüm topic'ler (kendi topic'i ve grupları)."""
+    topics = [scooter_topic(scooter_id, 'command'), FLEET_TOPIC]
+    if zone is not None:
+        topics.append(group_topic(f"{ZONE}:{zone}"))
+    if model is not None:
+        topics.append(group_topic(f"{MODEL}:{model}"))
+    return topics
+
+
+def groups(zone=None, model=None):
+    """Register mesajına eklenecek grup bilgisi."""
+    return {key: str(value) for key, value in ((ZONE, zone), (MODEL, model)) if value is not None}
+
+
+def parse_target(target):
+    """'zone:3' -> ('zone', ':', '3'); geçersiz hedefte ValueError."""
+    kind, sep, name = str(target).partition(':')
+    if kind not in TARGET_KINDS or (kind == FLEET) != (not name) or '/' in name or '+' in name or '#' in name:
+        raise ValueError(f"Geçersiz komut hedefi: {target} (fleet | zone:<bölge> | model:<model>)")
+    return kind, sep, name
+
+
+def matches(target, scooter_groups):
+    """Register'da bildirilen gruplara göre scooter hedefe dahil mi?"""
+    kind, _, name = parse_target(target)
+    return kind == FLEET or (scooter_groups or {}).get(kind) == name
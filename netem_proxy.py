@@ -0,0 +1,560 @@
+"""
+Hücresel ağ koşullarını taklit eden kullanıcı alanı ağ bozma (impairment) proxy'si.
+
+Localhost'ta tüm protokoller aynı görünür ve %0 paket kaybı anlamsızdır. Bu
+proxy istemcilerle sunucu arasına girer ve trafiği profillerle bozar; özel
+donanım veya root yetkisi (tc/netem) gerekmez.
+    --mode tcp  TCP akışları: tcp_server.py, main.py (WebSocket) ve MQTT
+                (mqtt_broker.py / Mosquitto); WebSocket ve MQTT TCP üzerinde
+                çalıştığı için aynı proxy kullanılır
+    --mode udp  UDP datagramları: udp_server.py; her istemci adresi için
+                sunucuya ayrı bir kaynak port açılır
+
+Her istemci bağlantısı (UDP'de istemci adresi) kendi radyo bağlantısını temsil
+eder ve iki yönü (uplink: istemci -> sunucu, downlink: sunucu -> istemci) ayrı
+bozulur:
+  * bant genişliği: yön başına kbit/s, paketler sırayla seri hale getirilir;
+    UDP'de kuyruk gecikmesi queue_delay'i aşarsa paket düşer (tail drop)
+  * gecikme + jitter: tek yönlü gecikme, normal dağılımlı sapma
+  * kayıp: UDP'de paket düşer; TCP'de veri kaybolmaz, yeniden iletim süresi
+    (RTO, en az 200 ms) kadar gecikir ve arkasındaki veriler de bekler
+  * sıra bozma (reorder, sadece UDP): netem gibi, seçilen paket gecikme
+    uygulanmadan gönderilir ve önceki paketleri geçer
+  * bağlantı kopması (flap): ortalama flap_interval saniyede bir (üstel)
+    flap_duration süre bağlantı yoktur; UDP paketleri düşer, TCP verisi
+    bekler. flap_reset'te kopma anında TCP bağlantıları kapatılır (hücre
+    değişimi, IP değişimi)
+Eklenen gecikme yön başına 'ProxyDelay_up' / 'ProxyDelay_down' histogramlarına,
+iletilen/düşen/sırası bozulan paketler sayaçlara yazılır.
+
+Örnek:
+    python netem_proxy.py --list-profiles
+    python netem_proxy.py --mode tcp --listen-port 9765 --target 127.0.0.1:8765 --profile lte-urban
+    python netem_proxy.py --mode udp --listen-port 9766 --target 127.0.0.1:8766 --profile 3g --loss 0.05
+"""
+import argparse
+import asyncio
+import logging
+import random
+import threading
+
+import log_config
+import metrics
+import results_writer
+
+MIN_RTO = 0.2  # Linux TCP en küçük yeniden iletim süresi (sn)
+TCP_MAX_PENDING = 256 * 1024  # Yön başına teslim bekleyen en fazla bayt; aşılırsa kaynak okuması durur
+UDP_SESSION_TIMEOUT = 120.0  # Bu süre sessiz kalan UDP oturumu kapatılır (sn)
+
+
+class LinkProfile:
+    """Tek yönlü gecikme/jitter (sn), kayıp ve sıra bozma olasılığı, yön başına bant (kbit/s), kopmalar."""
+
+    FIELDS = ('latency', 'jitter', 'loss', 'reorder', 'uplink_kbps', 'downlink_kbps',
+              'flap_interval', 'flap_duration', 'flap_reset', 'queue_delay')
+
+    def __init__(self, name='custom', latency=0.0, jitter=0.0, loss=0.0, reorder=0.0, uplink_kbps=None,
+                 downlink_kbps=None, flap_interval=0.0, flap_duration=0.0, flap_reset=False, queue_delay=2.0,
+                 description=''):
+        for value in (loss, reorder):
+            if not 0 <= value <= 1:
+                raise ValueError(f"Olasılık 0 ile 1 arasında olmalı: {value}")
+        self.name = name
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.reorder = reorder
+        self.uplink_kbps = uplink_kbps
+        self.downlink_kbps = downlink_kbps
+        self.flap_interval = flap_interval
+        self.flap_duration = flap_duration
+        self.flap_reset = flap_reset
+        self.queue_delay = queue_delay
+        self.description = description
+
+    def replace(self, **overrides):
+        """Verilen alanları değiştirilmiş kopya (None olanlar profilden alınır)."""
+        values = {f: getattr(self, f) for f in self.FIELDS}
+        values.update({k: v for k, v in overrides.items() if v is not None})
+        changed = any(values[f] != getattr(self, f) for f in self.FIELDS)
+        return LinkProfile(f"{self.name}*" if changed else self.name, description=self.description, **values)
+
+    @property
+    def flaps(self):
+        return self.flap_interval > 0 and self.flap_duration > 0
+
+    def describe(self):
+        def kbps(value):
+            return "sınırsız" if not value else f"{value:g} kbit/s"
+        text = (f"{self.name}: gecikme {self.latency * 1000:g}±{self.jitter * 1000:g} ms | kayıp %{self.loss * 100:g} | "
+                f"sıra bozma %{self.reorder * 100:g} | up {kbps(self.uplink_kbps)} / down {kbps(self.downlink_kbps)}")
+        if self.flaps:
+            text += (f" | ~{self.flap_interval:g} sn'de bir {self.flap_duration:g} sn kopma"
+                     f"{' (TCP reset)' if self.flap_reset else ''}")
+        return text
+
+
+PROFILES = {p.name: p for p in (
+    LinkProfile('none', description="Bozma yok (doğrudan iletim)"),
+    LinkProfile('edge', latency=0.300, jitter=0.080, loss=0.03, reorder=0.01, uplink_kbps=100, downlink_kbps=200,
+                queue_delay=4.0, description="2G/EDGE kapsama kenarı"),
+    LinkProfile('3g', latency=0.150, jitter=0.040, loss=0.01, reorder=0.005, uplink_kbps=384, downlink_kbps=1500,
+                description="3G (HSPA)"),
+    LinkProfile('lte-urban', latency=0.035, jitter=0.015, loss=0.005, reorder=0.002, uplink_kbps=5000,
+                downlink_kbps=20000, flap_interval=120, flap_duration=0.3,
+                description="Şehir içi LTE; ara sıra hücre değişimi (handover)"),
+    LinkProfile('tunnel-dropout', latency=0.045, jitter=0.020, loss=0.01, reorder=0.002, uplink_kbps=2000,
+                downlink_kbps=8000, flap_interval=30, flap_duration=5, flap_reset=True,
+                description="LTE, tünel/otoparkta birkaç saniyelik kapsama kaybı ve yeniden bağlanma"),
+)}
+
+
+class Direction:
+    """Bağlantının tek yönü: seri hale getirme (bant), gecikme, kayıp ve sıra bozma."""
+
+    def __init__(self, link, name, kbps):
+        self.link = link
+        self.profile = link.profile
+        self.rng = link.rng
+        self.stats = link.stats
+        self.bytes_per_s = kbps * 125 if kbps else None
+        self.delay = link.stats.registry.latency(f'ProxyDelay_{name}')
+        self.busy_until = 0.0  # Bant sınırında bir önceki paketin seri hale getirilmesinin bittiği an
+        self.last_delivery = 0.0  # Sıralı teslim için son teslim anı
+
+    def schedule(self, nbytes, now, reliable):
+        """Teslim anı (loop zamanı); UDP'de (reliable=False) paket düşerse None."""
+        profile = self.profile
+        start = now
+        up_at = self.link.up_at(now)
+        if up_at is not None:
+            if not reliable:
+                self.stats.dropped.add()
+                return None
+            start = up_at  # TCP verisi bağlantı geri gelene kadar bekler
+        if self.bytes_per_s:
+            start = max(start, self.busy_until)
+            if not reliable and start - now > profile.queue_delay:
+                self.stats.dropped.add()  # Kuyruk taştı
+                return None
+            self.busy_until = start = start + nbytes / self.bytes_per_s
+        delay = profile.latency
+        if profile.jitter:
+            delay = max(delay + self.rng.gauss(0, profile.jitter), 0.0)
+        if profile.loss and self.rng.random() < profile.loss:
+            if not reliable:
+                self.stats.dropped.add()
+                return None
+            delay += max(MIN_RTO, 2 * profile.latency + 4 * profile.jitter)  # Yeniden iletim
+            self.stats.retransmits.add()
+        if not reliable and profile.reorder and self.rng.random() < profile.reorder:
+            at = start  # Gecikmesiz gönderilir, yoldaki önceki paketleri geçer
+            self.stats.reordered.add()
+        else:
+            at = max(start + delay, self.last_delivery)
+            self.last_delivery = at
+        self.delay.record(at - now)
+        self.stats.forwarded.add()
+        return at
+
+
+class Link:
+    """Bir istemcinin radyo bağlantısı: iki yön ve kopma (flap) zamanlaması."""
+
+    def __init__(self, proxy, on_down=None):
+        self.profile = proxy.profile
+        self.rng = proxy.rng
+        self.stats = proxy
+        self.loop = proxy.loop
+        self.on_down = on_down
+        self.down_until = None
+        self._handle = None
+        self.uplink = Direction(self, 'up', self.profile.uplink_kbps)
+        self.downlink = Direction(self, 'down', self.profile.downlink_kbps)
+        if self.profile.flaps:
+            self._schedule_down()
+
+    def _schedule_down(self):
+        self._handle = self.loop.call_later(self.rng.expovariate(1 / self.profile.flap_interval), self._go_down)
+
+    def _go_down(self):
+        self.down_until = self.loop.time() + self.profile.flap_duration
+        self.stats.flaps.add()
+        self._handle = self.loop.call_at(self.down_until, self._go_up)
+        if self.on_down is not None:
+            self.on_down()
+
+    def _go_up(self):
+        self.down_until = None
+        self._schedule_down()
+
+    def up_at(self, now):
+        """Bağlantı kopuksa geri geleceği an, değilse None."""
+        if self.down_until is not None and now < self.down_until:
+            return self.down_until
+        return None
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+
+
+# --- TCP ---
+
+class TCPSide(asyncio.Protocol):
+    """TCP oturumunun bir ucu (istemci veya sunucu tarafı)."""
+
+    def __init__(self, session, is_client):
+        self.session = session
+        self.is_client = is_client
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.is_client:
+            self.session.client_connected(self)
+
+    def data_received(self, data):
+        self.session.forward(self, data)
+
+    def eof_received(self):
+        self.session.close(graceful=True)
+
+    def connection_lost(self, exc):
+        self.session.close(graceful=exc is None)
+
+    def write(self, data):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(data)
+
+
+class TCPSession:
+    """İstemci bağlantısı ile sunucuya açılan bağlantı arasındaki bozulmuş akış çifti."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.loop = proxy.loop
+        self.client = None
+        self.upstream = None
+        self.pending = []  # Sunucu bağlantısı kurulana kadar istemciden gelenler
+        self.inflight = {True: 0, False: 0}  # Yön başına (istemciden mi) teslim bekleyen bayt
+        self.closed = False
+        self.link = Link(proxy, on_down=self._on_link_down)
+
+    def client_connected(self, side):
+        self.client = side
+        self.proxy.sessions.add(self)
+        self.loop.create_task(self._connect_upstream())
+
+    async def _connect_upstream(self):
+        try:
+            _, self.upstream = await self.loop.create_connection(lambda: TCPSide(self, False), *self.proxy.target)
+        except OSError as e:
+            logging.warning(f"PROXY: sunucuya bağlanılamadı {self.proxy.target}: {e}")
+            self.close()
+            return
+        for data in self.pending:
+            self.forward(self.client, data)
+        self.pending = []
+
+    def forward(self, src, data):
+        if self.closed:
+            return
+        from_client = src is self.client
+        if from_client and self.upstream is None:
+            self.pending.append(data)
+            return
+        direction = self.link.uplink if from_client else self.link.downlink
+        dst = self.upstream if from_client else self.client
+        at = direction.schedule(len(data), self.loop.time(), reliable=True)
+        self.inflight[from_client] += len(data)
+        if self.inflight[from_client] > TCP_MAX_PENDING:
+            src.transport.pause_reading()  # Bant dolu: kaynağı TCP akış kontrolüyle yavaşlat
+        self.loop.call_at(at, self._deliver, src, dst, from_client, data)
+
+    def _deliver(self, src, dst, from_client, data):
+        dst.write(data)
+        self.inflight[from_client] -= len(data)
+        if self.inflight[from_client] <= TCP_MAX_PENDING // 2 and src.transport is not None \
+                and not src.transport.is_closing():
+            src.transport.resume_reading()
+
+    def _on_link_down(self):
+        if self.proxy.profile.flap_reset:
+            self.proxy.resets.add()
+            self.close()
+
+    def close(self, graceful=False):
+        """Bağlantıları kapatır; düzgün kapanışta yoldaki veriler teslim edildikten sonra."""
+        if self.closed:
+            return
+        self.closed = True
+        self.link.close()
+        self.proxy.sessions.discard(self)
+        at = max(self.link.uplink.last_delivery, self.link.downlink.last_delivery) if graceful else 0
+        for side in (self.client, self.upstream):
+            if side is not None and side.transport is not None:
+                if graceful:
+                    self.loop.call_at(at, side.transport.close)
+                else:
+                    side.transport.abort()
+
+
+# --- UDP ---
+
+class UDPListener(asyncio.DatagramProtocol):
+    """İstemcilerin gönderdiği dinleme soketi; her istemci adresi bir UDPSession."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        session = self.proxy.udp_sessions.get(addr)
+        if session is None:
+            session = self.proxy.udp_sessions[addr] = UDPSession(self.proxy, self, addr)
+        session.from_client(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class UDPSession(asyncio.DatagramProtocol):
+    """Tek istemci adresi için sunucuya açılan soket ve bozulmuş iki yön."""
+
+    def __init__(self, proxy, listener, addr):
+        self.proxy = proxy
+        self.loop = proxy.loop
+        self.listener = listener
+        self.addr = addr
+        self.transport = None
+        self.pending = []
+        self.last_seen = self.loop.time()
+        self.link = Link(proxy)
+        self.loop.create_task(self._open())
+
+    async def _open(self):
+        await self.loop.create_datagram_endpoint(lambda: self, remote_addr=self.proxy.target)
+        for data in self.pending:
+            self.transport.sendto(data)
+        self.pending = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def from_client(self, data):
+        now = self.last_seen = self.loop.time()
+        at = self.link.uplink.schedule(len(data), now, reliable=False)
+        if at is not None:
+            self.loop.call_at(at, self._send_upstream, data)
+
+    def _send_upstream(self, data):
+        if self.transport is None:
+            self.pending.append(data)
+        elif not self.transport.is_closing():
+            self.transport.sendto(data)
+
+    def datagram_received(self, data, addr):
+        now = self.last_seen = self.loop.time()
+        at = self.link.downlink.schedule(len(data), now, reliable=False)
+        if at is not None:
+            self.loop.call_at(at, self.listener.transport.sendto, data, self.addr)
+
+    def error_received(self, exc):
+        pass
+
+    def close(self):
+        self.link.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+class NetemProxy:
+    """Tek bir dinleme portu -> hedef adres; profil tüm istemci bağlantılarına ayrı ayrı uygulanır."""
+
+    def __init__(self, mode, listen_port, target, profile=None, listen_host='127.0.0.1', seed=None, registry=None):
+        if mode not in ('tcp', 'udp'):
+            raise ValueError(f"Geçersiz mod: {mode}")
+        self.mode = mode
+        self.listen_host = listen_host
+        self.port = listen_port
+        self.target = target
+        self.profile = profile or PROFILES['none']
+        self.rng = random.Random(seed)
+        self.registry = registry if registry is not None else metrics.MetricsRegistry()
+        self.forwarded = self.registry.counter('ProxyForwarded')
+        self.dropped = self.registry.counter('ProxyDropped')
+        self.reordered = self.registry.counter('ProxyReordered')
+        self.retransmits = self.registry.counter('ProxyRetransmits')
+        self.flaps = self.registry.counter('ProxyFlaps')
+        self.resets = self.registry.counter('ProxyResets')
+        self.sessions = set()  # TCP oturumları
+        self.udp_sessions = {}  # {istemci adresi: UDPSession}
+        self.loop = None
+        self.server = None
+        self._sweeper = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.mode == 'tcp':
+            self.server = await self.loop.create_server(lambda: TCPSide(TCPSession(self), True),
+                                                        self.listen_host, self.port)
+            sockname = self.server.sockets[0].getsockname()
+        else:
+            self.server, _ = await self.loop.create_datagram_endpoint(lambda: UDPListener(self),
+                                                                      local_addr=(self.listen_host, self.port))
+            sockname = self.server.get_extra_info('sockname')
+            self._sweeper = self.loop.call_later(UDP_SESSION_TIMEOUT / 4, self._sweep_udp)
+        self.port = sockname[1]
+        logging.info(f"PROXY ({self.mode}) {self.listen_host}:{self.port} -> {self.target[0]}:{self.target[1]} | "
+                     f"{self.profile.describe()}")
+        return self
+
+    def _sweep_udp(self):
+        limit = self.loop.time() - UDP_SESSION_TIMEOUT
+        for addr, session in list(self.udp_sessions.items()):
+            if session.last_seen < limit:
+                session.close()
+                del self.udp_sessions[addr]
+        self._sweeper = self.loop.call_later(UDP_SESSION_TIMEOUT / 4, self._sweep_udp)
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        await asyncio.Future()
+
+    def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        if self.server is not None:
+            self.server.close()
+        for session in list(self.sessions):
+            session.close()
+        for session in self.udp_sessions.values():
+            session.close()
+        self.udp_sessions.clear()
+
+    def log_summary(self):
+        self.registry.log_summary(f"PROXY METRİKLERİ ({self.profile.name})")
+
+
+class ProxyThread:
+    """Proxy'yi aynı proseste, kendi event loop'u olan bir daemon thread'de çalıştırır."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._error = None
+        self.thread = threading.Thread(target=self._run, name='netem-proxy', daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.proxy.start())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self.proxy.close()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+
+    def start(self, timeout=5):
+        self.thread.start()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Proxy başlatılamadı")
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def stop(self, timeout=5):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+
+    @property
+    def port(self):
+        return self.proxy.port
+
+    @property
+    def registry(self):
+        return self.proxy.registry
+
+
+def start_in_thread(mode, target, profile=None, listen_port=0, **kwargs):
+    """Proxy'yi arka plan thread'inde başlatır (listen_port=0: boş bir port seçilir)."""
+    return ProxyThread(NetemProxy(mode, listen_port, target, profile, **kwargs)).start()
+
+
+def profile_arg(name):
+    if name not in PROFILES:
+        raise argparse.ArgumentTypeError(f"Bilinmeyen profil: {name} ({', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def target_arg(value):
+    host, sep, port = value.rpartition(':')
+    if not sep or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"Hedef host:port olmalı: {value}")
+    return host or '127.0.0.1', int(port)
+
+
+def add_profile_arguments(parser):
+    """Profil seçimi ve profil alanlarının tek tek ezilmesi."""
+    parser.add_argument('--profile', type=profile_arg, default=PROFILES['none'],
+                        help=f"Ağ profili: {' | '.join(PROFILES)}")
+    parser.add_argument('--latency-ms', type=float, default=None, help="Tek yönlü gecikme (ms)")
+    parser.add_argument('--jitter-ms', type=float, default=None, help="Gecikme sapması (ms)")
+    parser.add_argument('--loss', type=float, default=None, help="Kayıp olasılığı (0-1)")
+    parser.add_argument('--reorder', type=float, default=None, help="UDP sıra bozma olasılığı (0-1)")
+    parser.add_argument('--uplink-kbps', type=float, default=None)
+    parser.add_argument('--downlink-kbps', type=float, default=None)
+    parser.add_argument('--flap-interval', type=float, default=None, help="Kopmalar arası ortalama süre (sn)")
+    parser.add_argument('--flap-duration', type=float, default=None, help="Kopma süresi (sn)")
+    parser.add_argument('--flap-reset', action='store_true', default=None,
+                        help="Kopma anında TCP bağlantılarını kapat")
+
+
+def profile_from_args(args):
+    ms = lambda value: None if value is None else value / 1000
+    return args.profile.replace(latency=ms(args.latency_ms), jitter=ms(args.jitter_ms), loss=args.loss,
+                                reorder=args.reorder, uplink_kbps=args.uplink_kbps,
+                                downlink_kbps=args.downlink_kbps, flap_interval=args.flap_interval,
+                                flap_duration=args.flap_duration, flap_reset=args.flap_reset)
+
+
+if __name__ == "__main__":
+    log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description="Hücresel ağ koşullarını taklit eden TCP/UDP proxy")
+    parser.add_argument('--mode', choices=['tcp', 'udp'], default='tcp',
+                        help="tcp: TCP, WebSocket ve MQTT | udp: UDP datagramları")
+    parser.add_argument('--listen-host', default='127.0.0.1')
+    parser.add_argument('--listen-port', type=int, default=9765)
+    parser.add_argument('--target', type=target_arg, default=('127.0.0.1', 8765), help="Sunucu adresi host:port")
+    parser.add_argument('--seed', type=int, default=None, help="Tekrarlanabilir bozma için rastgele tohum")
+    parser.add_argument('--list-profiles', action='store_true', help="Profilleri listeler ve çıkar")
+    add_profile_arguments(parser)
+    log_config.add_arguments(parser)
+    args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    if args.list_profiles:
+        for p in PROFILES.values():
+            print(f"{p.describe()}\n    {p.description}")
+        raise SystemExit(0)
+
+    results_writer.install_sigterm_handler()
+    proxy = NetemProxy(args.mode, args.listen_port, args.target, profile_from_args(args),
+                       listen_host=args.listen_host, seed=args.seed)
+    try:
+        asyncio.run(proxy.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.log_summary()
@@ -0,0 +1,193 @@
+"""
+Çalışma sırasında sonuçları diske akıtan (streaming) CSV yazıcı.
+
+Ölçümler bir kuyruğa bırakılır; arka plan thread'i kayıtları gruplar halinde
+dosyaya ekler, 'flush_interval' saniyede bir işletim sistemine boşaltır ve
+dosya 'max_bytes' boyutuna ya da 'rotate_interval' yaşına ulaşınca yeni bir
+parçaya geçer. Böylece uzun koşularda bellek sınırlı kalır; proses çökse veya
+SIGTERM ile sonlansa bile en fazla son flush aralığındaki kayıtlar kaybolur.
+
+Dosya adları koşu kimliği (run id) içerir ve önceki koşuların üzerine yazmaz:
+
+    results_tcp.20261018-103640-4242.000.csv
+    results_udp_server.20261018-103640-4242.w1-000.csv   (worker prosesi)
+
+Koşu kimliği SCOOTER_RUN_ID ortam değişkeniyle dışarıdan verilebilir; böylece
+aynı benchmark'taki tüm prosesler aynı kimliği kullanır.
+
+Dosya biçimi _begin/_write_rows ile değiştirilebilir; olay izleri için
+event_trace.TraceWriter aynı kuyruk ve rotasyon mekanizmasını kullanır.
+"""
+import csv
+import glob
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+
+RUN_ID_ENV = 'SCOOTER_RUN_ID'
+
+_STOP = object()
+
+
+def make_run_id():
+    return os.environ.get(RUN_ID_ENV) or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class ResultsWriter:
+    extension = 'csv'
+    binary = False
+
+    def __init__(self, base, columns, run_id=None, tag=None, flush_interval=1.0, max_bytes=64 * 1024 * 1024,
+                 rotate_interval=3600, batch_size=1000, queue_size=100_000):
+        if base.endswith('.' + self.extension):
+            base = base[:-len(self.extension) - 1]
+        self.base = base
+        self.columns = list(columns)
+        self.run_id = run_id or make_run_id()
+        self.tag = tag  # Aynı koşuda birden çok proses yazıyorsa parça adına eklenir (ör. 'w1')
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        # SimpleQueue.put kilitsiz ve atomiktir: sinyal işleyicisinden yükselen
+        # KeyboardInterrupt kuyruğu kilitli bırakıp kapanışta kilitlenmeye yol açamaz
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._file = None
+        self._writer = None
+        self._opened_at = 0.0
+        self._part = 0
+        self.files = []
+        self.rows = 0
+        self.dropped = 0  # Kuyruk dolduğunda atılan kayıtlar
+        self.failed = 0  # Yazma hatası yüzünden diske ulaşmayan kayıtlar
+
+    def _path(self):
+        part = f"{self.tag}-{self._part:03d}" if self.tag else f"{self._part:03d}"
+        return f"{self.base}.{self.run_id}.{part}.{self.extension}"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"results-{os.path.basename(self.base)}",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def write(self, row):
+        """Kaydı kuyruğa bırakır; hiçbir zaman bloklamaz."""
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+        else:
+            self._queue.put(row)
+
+    def _open(self):
+        path = self._path()
+        self._file = open(path, 'wb') if self.binary else open(path, 'w', newline='')
+        self._begin()
+        self._opened_at = time.monotonic()
+        self.files.append(path)
+
+    def _begin(self):
+        """Yeni parça dosyasının başlığını yazar."""
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+
+    def _write_rows(self, batch):
+        self._writer.writerows(batch)
+
+    def _rotate_if_needed(self):
+        if (self._file.tell() >= self.max_bytes
+                or time.monotonic() - self._opened_at >= self.rotate_interval):
+            self._close_part()
+
+    def _close_part(self):
+        """Geçerli parçayı kapatır; sıradaki yazma yeni parça dosyası açar."""
+        file, self._file = self._file, None
+        self._part += 1
+        file.close()
+
+    def _run(self):
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if self._file is None:
+                    self._open()
+                if batch:
+                    self._write_rows(batch)
+                    self.rows += len(batch)
+                    batch = []
+                now = time.monotonic()
+                if stopping or now - last_flush >= self.flush_interval:
+                    self._file.flush()
+                    last_flush = now
+                    self._rotate_if_needed()
+            except (OSError, ValueError) as e:
+                # Thread ölmez: yarım kalan parça bırakılır, sonraki grup yeni parçaya yazılır
+                logging.error(f"Sonuç yazma hatası ({self.base}): {e}")
+                self.failed += len(batch)
+                if self._file is not None:
+                    try:
+                        self._close_part()
+                    except (OSError, ValueError):
+                        pass
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError as e:
+                logging.error(f"Sonuç yazma hatası ({self.base}): {e}")
+
+    def close(self, timeout=10):
+        """Kuyruktakileri yazar ve dosyayı kapatır (birden çok çağrılabilir)."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        self._queue.put(_STOP)
+        thread.join(timeout=timeout)
+        if self.dropped:
+            logging.warning(f"Yazma kuyruğu dolduğu için {self.dropped} kayıt atıldı ({self.base})")
+        if self.failed:
+            logging.warning(f"Yazma hatası yüzünden {self.failed} kayıt yazılamadı ({self.base})")
+        logging.info(f"✅ SONUÇLAR KAYDEDİLDİ: {self.rows} kayıt -> {', '.join(self.files)}")
+
+
+def install_sigterm_handler():
+    """SIGTERM'i KeyboardInterrupt'a çevirir; böylece CTRL+C ile aynı kapanış yolu çalışır."""
+    def handler(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, handler)
+
+
+def result_files(base, run_id=None, extension='csv'):
+    """
+    'base' (ör. 'results_tcp') için verilen ya da en son koşunun tüm parça
+    dosyaları. Koşu kimlikli dosya yoksa eski tek dosya ('results_tcp.csv') döner.
+    """
+    if base.endswith('.' + extension):
+        base = base[:-len(extension) - 1]
+    runs = {}
+    for path in glob.glob(f"{glob.escape(base)}.*.{extension}"):
+        rid = path[len(base) + 1:].split('.')[0]
+        runs.setdefault(rid, []).append(path)
+    if runs:
+        return sorted(runs.get(run_id or max(runs), []))
+    legacy = f"{base}.{extension}"
+    return [legacy] if os.path.exists(legacy) else []
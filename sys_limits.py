@@ -0,0 +1,17 @@
+"""
+Proses kaynak limitleri. Yan etkisi olmayan küçük yardımcılar: sunucular,
+yük üreticisi (fleet.py) ve benchmark'lar aynı fonksiyonu sunucu modüllerini
+import etmeden (log yapılandırması, modül seviyesi metrik/iz nesneleri) kullanır.
+"""
+
+
+def raise_nofile_limit():
+    """Açık dosya (soket) limitini hard limite çeker; on binlerce bağlantı için gereklidir."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        return hard
+    except (ImportError, ValueError, OSError):
+        return None
@@ -5,18 +5,31 @@ import random
 import logging
 import argparse
 import threading
-import csv
 
+import clock
+import command_exec
+import event_trace
+import log_config
+import metrics
+import results_writer
+import wire_format
+from framing import LineFramer
+from log_config import msg_log
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
-latency_data = []
-reconnect_time_data = []
-bandwidth_data = []
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency')
+reconnect_time_data = registry.latency('ReconnectTime')
+bandwidth_data = registry.size('Bandwidth')
+json_bandwidth_data = registry.size('JSONBandwidth')  # Aynı trafiğin JSON karşılığı (format karşılaştırması için)
+tracer = event_trace.Tracer('tcp', bandwidth=bandwidth_data, latency=latency_data,
+                            reconnect=reconnect_time_data, json_bandwidth=json_bandwidth_data)
 
 
 class TCPScooterClient:
-    def __init__(self, scooter_id, host='localhost', port=8765):
+    def __init__(self, scooter_id, host='localhost', port=8765, encoding=wire_format.ENCODING_JSON, executor=None):
         self.id = scooter_id
         self.host = host
         self.port = port
@@ -25,6 +38,11 @@ class TCPScooterClient:
         self.sock = None
         self.running = True
         self.current_scenario = 'all'
+        self.encoding = encoding
+        self.sid = None  # Sunucu ikili formatı onaylayınca atanır
+        self.clock = clock.ClockSync()  # register_ack'teki damgalarla sunucu saatine olan fark
+        self.executor = executor or command_exec.CommandExecutor()  # Komutlar dinleme thread'i dışında yürütülür
+        self.send_lock = threading.Lock()  # Konum, durum ve ACK'ler farklı thread'lerden aynı sokete yazar
 
     def connect(self):
         """Bağlantı ve Yeniden Bağlanma"""
@@ -32,36 +50,47 @@ class TCPScooterClient:
             try:
                 logging.info(f"Scooter sunucuya bağlanıyor: tcp://{self.host}:{self.port}")
 
-                start_time = time.time()
+                start_ns = clock.now_ns()
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.sock.connect((self.host, self.port))
 
                 # Yeniden bağlanma süresi kaydı
-                rec_time = time.time() - start_time
-                reconnect_time_data.append(rec_time)
+                rec_time = (clock.now_ns() - start_ns) / 1e9
+                tracer.connected(self.id, rec_time)
 
                 logging.info(f"Scooter bağlandı! (Süre: {rec_time:.4f}s)")
 
-                # Register mesajı
-                reg_msg = json.dumps({'type': 'register', 'scooter_id': self.id}) + '\n'
-                self.send_data(reg_msg)
+                # Register mesajı (ikili format talebi ve saat farkı ölçümü burada yapılır)
+                self.sid = None
+                reg_msg = json.dumps(wire_format.register_message(self.id, self.encoding, self.clock.request())) + '\n'
+                self.send_data(reg_msg, msg_type='register')
 
                 return True
             except Exception as e:
                 logging.warning(f"Bağlantı hatası: {e}. 5sn sonra tekrar denenecek...")
                 time.sleep(5)
 
-    def send_data(self, data_str):
-        """Veri gönderme ve bant genişliği ölçümü"""
+    def send_data(self, data_str, json_equiv=None, msg_type='other', latency=None):
+        """Veri gönderme ve bant genişliği ölçümü (str: JSON satırı, bytes: ikili çerçeve)"""
         try:
-            encoded_data = data_str.encode('utf-8')
-            bandwidth_data.append(len(encoded_data))  # TX Metriği
-            self.sock.sendall(encoded_data)
+            encoded_data = data_str.encode('utf-8') if isinstance(data_str, str) else data_str
+            tracer.tx(msg_type, len(encoded_data), self.id, latency, json_equiv)  # TX Metriği
+            with self.send_lock:
+                self.sock.sendall(encoded_data)
         except Exception as e:
             logging.error(f"Gönderme hatası: {e}")
             self.sock.close()
             raise e
 
+    def send_message(self, msg_dict):
+        """Konum/durum mesajını anlaşılan formatta gönderir; ikili format onaylanmadıysa JSON kullanır."""
+        json_msg = json.dumps(msg_dict) + '\n'
+        if self.sid is not None:
+            self.send_data(wire_format.encode_message(msg_dict, self.sid), json_equiv=len(json_msg.encode('utf-8')),
+                           msg_type=msg_dict['type'])
+        else:
+            self.send_data(json_msg, msg_type=msg_dict['type'])
+
     def task_location(self):
         while self.running and self.battery > 0:
             try:
@@ -75,10 +104,8 @@ class TCPScooterClient:
                     'location': self.location,
                     'battery': round(self.battery, 1)
                 }
-                msg = json.dumps(msg_dict) + '\n'
-
-                self.send_data(msg)
-                logging.info(f"SCOOTER TX (Konum): {json.dumps(msg_dict)}")
+                self.send_message(msg_dict)
+                msg_log.info("SCOOTER TX (Konum): %s", msg_dict)
                 time.sleep(10)
             except:
                 break
@@ -97,64 +124,75 @@ class TCPScooterClient:
                         'speed': 0 if is_locked else random.randint(0, 25)
                     }
                 }
-                msg = json.dumps(msg_dict) + '\n'
-
-                self.send_data(msg)
-                logging.info(f"SCOOTER TX (Durum): {json.dumps(msg_dict)}")
+                self.send_message(msg_dict)
+                msg_log.info("SCOOTER TX (Durum): %s", msg_dict)
                 time.sleep(5)
             except:
                 break
 
     def task_listen(self):
         """Sunucudan gelen komutları dinleme"""
-        buffer = ""
+        framer = LineFramer()
         while self.running:
             try:
                 data = self.sock.recv(4096)
                 if not data:
                     break
 
-                bandwidth_data.append(len(data))
-
-                buffer += data.decode()
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    if not line.strip(): continue
+                rx_ns = clock.now_ns()
+                for frame in framer.feed(data):
+                    msg = json.loads(frame)
+                    if msg.get('type') == 'register_ack':
+                        tracer.rx('register_ack', len(frame) + 1, self.id, ts_ns=rx_ns)
+                        self.sid = msg.get('sid')
+                        if msg.get('clock'):
+                            self.clock.update(msg['clock'], rx_ns)
+                        msg_log.info("SCOOTER RX (Register ACK): format=%s, sid=%s, saat: %s",
+                                     msg.get('encoding', wire_format.ENCODING_JSON), self.sid, self.clock.describe())
+                        continue
 
-                    msg = json.loads(line)
                     if msg.get('command'):
+                        tracer.rx('command', len(frame) + 1, self.id, ts_ns=rx_ns)
                         if self.current_scenario in ['command', 'all']:
-                            logging.info(f"SCOOTER RX (Komut): {json.dumps(msg)}")
-
-                        # Komut işleme simülasyonu ve ACK dönüşü
-                        process_start = time.time()
-                        time.sleep(0.1)  # İşlem süresi
-
-                        ack_msg = json.dumps({
-                            'type': 'ack',
-                            'ack': f"command '{msg['command']}' received",
-                            'send_time': msg.get('send_time')
-                        }) + '\n'
-
-                        self.send_data(ack_msg)
-
-                        if self.current_scenario in ['command', 'all']:
-                            logging.info(f"SCOOTER TX (ACK): command '{msg['command']}' received")
+                            msg_log.info("SCOOTER RX (Komut): %s", msg)
 
-                        latency_data.append(time.time() - process_start)
+                        # Komut worker'da yürütülür, ACK yürütme bitince gönderilir; dinleme devam eder
+                        self.executor.submit(msg, rx_ns, self.complete_command)
 
             except Exception as e:
                 logging.error(f"Dinleme hatası: {e}")
                 break
 
+    def complete_command(self, msg, rx_ns):
+        """Yürütülen komutun ACK'ini gönderir (worker thread'inde çağrılır)."""
+        stamps = self.clock.ack_fields(msg, rx_ns)
+        ack_msg = json.dumps(dict({
+            'type': 'ack',
+            'ack': f"command '{msg['command']}' received",
+        }, **stamps)) + '\n'
+
+        # Komutun alınmasından ACK'e kadar: kuyrukta bekleme + yürütme
+        process_latency = (clock.now_ns() - rx_ns) / 1e9
+        if self.sid is not None:
+            self.send_data(wire_format.encode_ack(self.sid, msg['command'], stamps['send_ns'],
+                                                  stamps.get('rx_ns'), stamps.get('tx_ns')),
+                           json_equiv=len(ack_msg.encode('utf-8')), msg_type='ack',
+                           latency=process_latency)
+        else:
+            self.send_data(ack_msg, msg_type='ack', latency=process_latency)
+
+        if self.current_scenario in ['command', 'all']:
+            msg_log.info("SCOOTER TX (ACK): command '%s' received", msg['command'])
+
     def run(self, scenario):
         self.current_scenario = scenario  # Senaryoyu kaydet
+        results = open_results("TCP", self.encoding)
 
         # Bağlanma işlemi
         if not self.connect():
             return
 
-        logging.info(f"ÇALIŞAN SENARYO: {scenario}")
+        logging.info(f"ÇALIŞAN SENARYO: {scenario} | {self.executor.describe()}")
         threads = []
 
         # Komut dinleme
@@ -180,56 +218,55 @@ class TCPScooterClient:
         except KeyboardInterrupt:
             self.running = False
             logging.info("Scooter kapatılıyor...")
+            self.executor.shutdown()
             if self.sock: self.sock.close()
-            print_metrics("TCP")
-            save_results_to_csv("TCP")
+            print_metrics("TCP", self.encoding)
+            results.close()
 
 
-def save_results_to_csv(protocol_name):
+def open_results(protocol_name, encoding=wire_format.ENCODING_JSON):
     """
-    Toplanan verileri analiz için CSV dosyasına kaydeder.
+    Olayları çalışma boyunca iz dosyasına akıtan yazıcıyı başlatır
+    (results_<protokol>[_binary].<koşu kimliği>.<parça>.trace).
     """
-    filename = f"results_{protocol_name.lower()}.csv"
-
-    rows = []
-    max_len = max(len(latency_data), len(bandwidth_data), len(reconnect_time_data))
-
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rec = reconnect_time_data[i] if i < len(reconnect_time_data) else None
-        rows.append([lat, bw, rec])
-
-    with open(filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Latency", "Bandwidth", "ReconnectTime"])  # Başlıklar
-        writer.writerows(rows)
+    suffix = "" if encoding == wire_format.ENCODING_JSON else f"_{encoding}"
+    return tracer.open(f"results_{protocol_name.lower()}{suffix}")
 
-    logging.info(f"Sonuçlar kaydedildi: {filename}")
 
-
-def print_metrics(protocol_name):
-    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}) ---")
+def print_metrics(protocol_name, encoding=wire_format.ENCODING_JSON):
+    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}, {encoding}) ---")
 
     # 1. Yeniden Bağlanma
     if reconnect_time_data:
-        avg_rec = sum(reconnect_time_data) / len(reconnect_time_data)
+        avg_rec = reconnect_time_data.mean()
         count = len(reconnect_time_data)
         logging.info(f"Ortalama Yeniden Bağlanma: {avg_rec:.4f} sn (Toplam {count} bağlantı)")
 
     # 2. Gecikme
     if latency_data:
-        avg_lat = sum(latency_data) / len(latency_data)
+        avg_lat = latency_data.mean()
         count = len(latency_data)
         logging.info(f"Ortalama Gecikme (Latency): {avg_lat:.4f} sn (Toplam {count} işlem)")
+        logging.info(latency_data.format())
 
     # 3. Bant Genişliği ve Ortalama Boyut
     if bandwidth_data:
-        total = sum(bandwidth_data)
+        total = bandwidth_data.total
         avg_size = total / len(bandwidth_data)
         logging.info(f"Toplam Veri Transferi: {total} bytes ({total / 1024:.2f} KB)")
         logging.info(f"Ortalama Mesaj Boyutu: {avg_size:.1f} bytes")
 
+        json_total = json_bandwidth_data.total
+        if json_total and encoding != wire_format.ENCODING_JSON:
+            logging.info(f"JSON Karşılığı: {json_total} bytes ({json_total / 1024:.2f} KB) | "
+                         f"{encoding}: {total} bytes | Tasarruf: %{(1 - total / json_total) * 100:.1f}")
+
+    # Komut kuyruğu ve yürütme süreleri (bkz. command_exec.py)
+    for name in ('CommandQueueDelay', 'CommandExecTime'):
+        hist = registry.get(name)
+        if hist:
+            logging.info(hist.format())
+
     # 4. Paket Kaybı
     logging.info(f"Paket Kayıp Oranı: %0.00")
     # 5. Footer
@@ -239,7 +276,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--scenario', choices=['status', 'location', 'command', 'all'], default='all')
     parser.add_argument('--id', default='scooter_tcp_1')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON, help="Telemetri formatı (register sırasında anlaşılır)")
+    command_exec.add_arguments(parser)
+    log_config.add_arguments(parser)
     args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
 
-    client = TCPScooterClient(args.id)
+    client = TCPScooterClient(args.id, args.host, args.port, encoding=args.encoding,
+                              executor=command_exec.from_args(args, registry))
     client.run(args.scenario)
\ No newline at end of file
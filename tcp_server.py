@@ -3,75 +3,150 @@ import json
 import threading
 import time
 import logging
-import csv
+import asyncio
+import argparse
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+import clock
+import command_dispatch
+import event_trace
+import fleet_state
+import geo_index
+import log_config
+import metrics
+import results_writer
+import wire_format
+from framing import LineFramer, FrameTooLarge
+from sys_limits import raise_nofile_limit
+from log_config import msg_log
 
-latency_data = []
-bandwidth_data = []
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s')
 
-def save_server_results():
-    """Sunucu kapandığında verileri CSV'ye yazar."""
-    filename = "results_tcp_server.csv"
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency_RTT')
+downlink_data = registry.latency('Latency_Downlink')  # Tek yönlü gecikmeler (bkz. clock.py)
+uplink_data = registry.latency('Latency_Uplink')
+telemetry_data = registry.latency('Latency_Telemetry')  # Açık döngü yükte planlanan gönderimden alışa
+bandwidth_data = registry.size('Bandwidth')
+tracer = event_trace.Tracer('tcp', bandwidth=bandwidth_data, latency=latency_data,
+                            downlink=downlink_data, uplink=uplink_data, telemetry=telemetry_data)
 
-    global latency_data, bandwidth_data
+sid_registry = wire_format.SidRegistry()
+fleet = fleet_state.FleetState()  # Scooterların son konum/durumu (bkz. fleet_state.py)
+geo = geo_index.GridIndex(fleet)  # Konuma göre sorgular ve bölge hedefli komutlar (bkz. geo_index.py)
+dispatcher = command_dispatch.Dispatcher(registry, tracer)  # Komut kuyrukları, ACK eşleme ve yeniden deneme
 
-    # Veri yoksa bile dosyayı oluşturmak için kontrol
-    if not latency_data and not bandwidth_data:
-        logging.warning("Hiç veri toplanmadı, yine de boş dosya oluşturuluyor.")
 
-    # Veri uzunluklarını eşitleme
-    max_len = max(len(latency_data), len(bandwidth_data)) if (latency_data or bandwidth_data) else 0
+def open_server_results(base="results_tcp_server", **kwargs):
+    """Olayları çalışma boyunca koşu kimlikli, dönen (rotating) iz dosyalarına akıtır."""
+    return tracer.open(base, **kwargs)
 
-    rows = []
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rows.append([lat, bw])
 
-    try:
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Latency_RTT", "Bandwidth"])
-            writer.writerows(rows)
-        logging.info(f"✅ SONUÇLAR BAŞARIYLA KAYDEDİLDİ: {filename}")
-        import os
-        logging.info(f"Dosya Yolu: {os.path.abspath(filename)}")
-    except Exception as e:
-        logging.error(f"❌ CSV Kayıt hatası: {e}")
+def save_server_results(writer=None):
+    """Kapanışta metrik özetini loglar; bekleyen kayıtları yazıp dosyayı kapatır."""
+    registry.log_summary("SUNUCU METRİKLERİ")
+    logging.info(dispatcher.summary_line())
+    logging.info(fleet.describe())
+    logging.info(geo.describe())
+    if writer is not None:
+        writer.close()
+
+
+def wire_size(frame):
+    """Çerçevenin hattaki boyutu (JSON satırlarında ayraç dahil)."""
+    return len(frame) if wire_format.is_binary(frame) else len(frame) + 1
+
+
+def parse_frame(frame):
+    """Çerçeveyi mesaj sözlüğüne çevirir; ikili çerçeveler sid üzerinden scooter id'sine eşlenir."""
+    if wire_format.is_binary(frame):
+        return wire_format.decode(frame, sid_registry)
+    return json.loads(frame)
+
+
+def handle_message(clients, msg, scooter_id, conn, send, framer, nbytes=0, ts_ns=None):
+    """
+    Tek bir mesajı işler (threaded ve asyncio sunucular ortak kullanır).
+    Kayıt mesajında scooter id'sini döndürür, diğer durumlarda mevcut id'yi korur.
+    İstemci ikili format veya saat farkı ölçümü talep ederse register_ack
+    gönderilir; ikili formatta çerçeveleyici karma moda alınır. 'nbytes'
+    mesajın hattaki boyutu, 'ts_ns' alındığı monotonik andır.
+    """
+    ts_ns = ts_ns or clock.now_ns()
+    if msg['type'] == 'register':
+        scooter_id = msg['scooter_id']
+        tracer.rx('register', nbytes, scooter_id, ts_ns=ts_ns)
+        clients[scooter_id] = conn
+        msg_log.info("Yeni Scooter Kaydedildi: %s", scooter_id)
+
+        reg_ack = clock.stamp_register_ack(msg, ts_ns, wire_format.negotiate(msg, sid_registry))
+        if reg_ack:
+            if 'sid' in reg_ack:
+                framer.fixed_sizes = wire_format.FRAME_SIZES
+            encoded = (json.dumps(reg_ack) + '\n').encode()
+            send(encoded)
+            tracer.tx('register_ack', len(encoded), scooter_id)
+            msg_log.info("SERVER TX (Register ACK) -> %s | Format: %s, sid=%s", scooter_id,
+                         reg_ack.get('encoding', wire_format.ENCODING_JSON), reg_ack.get('sid'))
+
+    elif msg['type'] == 'ack':
+        # RTT ve (scooter saati senkronsa) tek yönlü gecikmeler; sadece komutun ilk ACK'inde
+        # (tekrar ve süresi dolmuş komutun geç ACK'i gecikmeye yazılmaz, bkz. command_dispatch.py)
+        rtt, downlink, uplink = clock.NO_DELAYS
+        if dispatcher.acknowledge(scooter_id, msg, ts_ns):
+            rtt, downlink, uplink = clock.ack_delays(msg, ts_ns)
+        tracer.rx('ack', nbytes, scooter_id, latency=rtt, ts_ns=ts_ns, downlink=downlink, uplink=uplink)
+        if rtt is not None and msg_log.enabled():
+            msg_log.logger.info("SERVER RX (ACK) <- %s | %s", scooter_id, clock.describe_delays(rtt, downlink, uplink))
+
+    elif msg['type'] == 'location':
+        tracer.rx('location', nbytes, scooter_id, latency=clock.telemetry_delay(msg, ts_ns), ts_ns=ts_ns)
+        msg_log.info("SERVER RX (Konum) <- %s", scooter_id)
+
+    elif msg['type'] == 'status':
+        tracer.rx('status', nbytes, scooter_id, latency=clock.telemetry_delay(msg, ts_ns), ts_ns=ts_ns)
+        msg_log.info("SERVER RX (Durum) <- %s", scooter_id)
+
+    else:
+        tracer.rx(msg['type'], nbytes, scooter_id, ts_ns=ts_ns)
+
+    fleet.update(msg, ts_ns, scooter_id)
+    return scooter_id
 
 
 class TCPServer:
-    def __init__(self, port=8765):
+    def __init__(self, port=8765, command_interval=15, command_area=None):
         self.port = port
+        self.command_interval = command_interval
+        self.command_area = command_area  # Verilirse komut yalnızca bu alandaki scooterlara (geo_index.Area)
         self.clients = {}
         self.running = True
 
     def broadcast_commands(self):
         while self.running:
-            time.sleep(15)
+            time.sleep(self.command_interval)
             if not self.clients: continue
 
             try:
-                cmd = json.dumps({
-                    "command": "unlock",
-                    "send_time": time.time()
-                }) + '\n'
-
-                for s_id, client_sock in list(self.clients.items()):
-                    try:
-                        encoded_cmd = cmd.encode()
-                        client_sock.sendall(encoded_cmd)
-                        bandwidth_data.append(len(encoded_cmd))
-                        logging.info(f"SERVER TX (Komut) -> {s_id}")
-                    except:
-                        pass
+                targets = self.command_area.select(geo) if self.command_area else None
+                # Scooter başına kuyruğa alınır; gönderim, ACK eşleme ve yeniden deneme dispatcher'da
+                dispatcher.submit_many([s_id for s_id in list(self.clients)
+                                        if targets is None or s_id in targets], "unlock")
             except Exception as e:
                 logging.error(f"Broadcast hatası: {e}")
 
+    def send_command(self, s_id, cmd):
+        """Dispatcher'ın gönderim fonksiyonu: komutu scooter'ın soketine yazar."""
+        client_sock = self.clients.get(s_id)
+        if client_sock is None:
+            return
+        encoded_cmd = (json.dumps(cmd) + '\n').encode()
+        client_sock.sendall(encoded_cmd)
+        tracer.tx('command', len(encoded_cmd), s_id)
+        msg_log.info("SERVER TX (Komut) -> %s", s_id)
+
     def handle_client(self, client_sock, addr):
         scooter_id = None
-        buffer = ""
+        framer = LineFramer()
         try:
             while self.running:
                 try:
@@ -84,36 +159,17 @@ class TCPServer:
 
                 if not data: break
 
-                bandwidth_data.append(len(data))
-                buffer += data.decode()
-
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    if not line.strip(): continue
-
+                ts_ns = clock.now_ns()
+                for frame in framer.feed(data):
                     try:
-                        msg = json.loads(line)
-                        if msg['type'] == 'register':
-                            scooter_id = msg['scooter_id']
-                            self.clients[scooter_id] = client_sock
-                            logging.info(f"Yeni Scooter Kaydedildi: {scooter_id}")
-
-                        elif msg['type'] == 'ack':
-                            # RTT Hesaplama
-                            send_time = msg.get('send_time', 0)
-                            if send_time:
-                                rtt = time.time() - send_time
-                                latency_data.append(rtt)
-                                logging.info(f"SERVER RX (ACK) <- {scooter_id} | RTT: {rtt:.6f}s")
-
-                        elif msg['type'] == 'location':
-                            logging.info(f"SERVER RX (Konum) <- {scooter_id}")
-
-                        elif msg['type'] == 'status':
-                            logging.info(f"SERVER RX (Durum) <- {scooter_id}")
-                    except json.JSONDecodeError:
-                        pass
+                        msg = parse_frame(frame)
+                        scooter_id = handle_message(self.clients, msg, scooter_id, client_sock,
+                                                    client_sock.sendall, framer, wire_size(frame), ts_ns)
+                    except (ValueError, KeyError):
+                        pass  # Bozuk / 'type' alanı olmayan çerçeve atlanır; bağlantı açık kalır (async sunucuyla aynı)
 
+        except FrameTooLarge as e:
+            logging.warning(f"Bağlantı kapatılıyor ({scooter_id or addr}): {e}")
         except Exception as e:
             logging.error(f"Hata: {e}")
         finally:
@@ -131,6 +187,8 @@ class TCPServer:
         server.listen(5)
         server.settimeout(1.0)
 
+        dispatcher.send = self.send_command
+        threading.Thread(target=dispatcher.run, args=(lambda: self.running,), daemon=True).start()
         t_broadcast = threading.Thread(target=self.broadcast_commands, daemon=True)
         t_broadcast.start()
 
@@ -153,12 +211,126 @@ class TCPServer:
             logging.info("Sunucu kapatıldı.")
 
 
+class ScooterProtocol(asyncio.Protocol):
+    """
+    Tek bir scooter bağlantısı. Thread veya zamanlayıcı tutmaz; event loop
+    veri geldiğinde data_received'i çağırır, boşta bekleyen bağlantı CPU harcamaz.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.scooter_id = None
+        self.framer = LineFramer()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        ts_ns = clock.now_ns()
+        try:
+            frames = self.framer.feed(data)
+        except FrameTooLarge as e:
+            logging.warning(f"Bağlantı kapatılıyor ({self.scooter_id}): {e}")
+            self.transport.close()
+            return
+
+        for frame in frames:
+            try:
+                msg = parse_frame(frame)
+                self.scooter_id = handle_message(self.server.clients, msg, self.scooter_id, self.transport,
+                                                 self.transport.write, self.framer, wire_size(frame), ts_ns)
+            except (ValueError, KeyError):
+                pass
+
+    def connection_lost(self, exc):
+        if self.scooter_id and self.server.clients.get(self.scooter_id) is self.transport:
+            del self.server.clients[self.scooter_id]
+
+
+class AsyncTCPServer:
+    """
+    asyncio tabanlı TCP sunucusu. TCPServer ile aynı register/location/status/ack
+    semantiğini tek thread ve tek event loop üzerinde çalıştırır; bağlantı başına
+    thread açmadığı için tek proseste on binlerce scooter bağlantısı tutabilir.
+    """
+
+    def __init__(self, port=8765, command_interval=15, backlog=4096, command_area=None):
+        self.port = port
+        self.command_interval = command_interval
+        self.command_area = command_area
+        self.backlog = backlog
+        self.clients = {}  # {scooter_id: transport}
+        self.running = True
+
+    async def broadcast_commands(self):
+        while self.running:
+            await asyncio.sleep(self.command_interval)
+            if not self.clients: continue
+
+            targets = self.command_area.select(geo) if self.command_area else None
+            dispatcher.submit_many([s_id for s_id in self.clients if targets is None or s_id in targets], "unlock")
+
+    def send_command(self, s_id, cmd):
+        """Dispatcher'ın gönderim fonksiyonu (event loop'ta çağrılır)."""
+        # transport.write bloklamaz; yavaş istemcinin verisi kendi tamponunda bekler
+        transport = self.clients.get(s_id)
+        if transport is None or transport.is_closing():
+            return
+        encoded_cmd = (json.dumps(cmd) + '\n').encode()
+        transport.write(encoded_cmd)
+        tracer.tx('command', len(encoded_cmd), s_id)
+        msg_log.info("SERVER TX (Komut) -> %s", s_id)
+
+    async def start(self):
+        limit = raise_nofile_limit()
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: ScooterProtocol(self), '0.0.0.0', self.port,
+                                          reuse_address=True, backlog=self.backlog)
+
+        logging.info(f"Asenkron TCP Sunucusu Başlatılıyor: {self.port} (Soket limiti: {limit})")
+
+        dispatcher.send = self.send_command
+        t_dispatch = asyncio.create_task(dispatcher.run_async())
+        t_broadcast = asyncio.create_task(self.broadcast_commands())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.running = False
+            t_broadcast.cancel()
+            t_dispatch.cancel()
+            for transport in list(self.clients.values()):
+                transport.close()
+            logging.info("Sunucu kapatıldı.")
+
+
 if __name__ == "__main__":
-    srv = TCPServer()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded',
+                        help="'threaded': bağlantı başına thread, 'async': tek event loop")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--command-interval', type=float, default=15, help="Komut yayın periyodu (sn)")
+    parser.add_argument('--results-file', default="results_tcp_server",
+                        help="Sonuç dosyası öneki (koşu kimliği ve parça numarası eklenir)")
+    fleet_state.add_arguments(parser)
+    geo_index.add_arguments(parser)
+    command_dispatch.add_arguments(parser)
+    log_config.add_arguments(parser)
+    args = parser.parse_args()
+    log_config.configure_from_args(args)
+    dispatcher.configure(**command_dispatch.settings_from_args(args))
+    fleet.reserve(args.max_scooters)  # Threaded sunucuda istemci thread'leri aynı anda yazar; büyüme olmasın
+
+    results_writer.install_sigterm_handler()
+    writer = open_server_results(args.results_file)
     try:
-        srv.start()
+        if args.mode == 'async':
+            asyncio.run(AsyncTCPServer(args.port, args.command_interval, command_area=args.command_area).start())
+        else:
+            TCPServer(args.port, args.command_interval, args.command_area).start()
     except KeyboardInterrupt:
         pass
     finally:
         logging.info("Program sonlanıyor, veriler kaydediliyor...")
-        save_server_results()
\ No newline at end of file
+        save_server_results(writer)
\ No newline at end of file
@@ -5,16 +5,31 @@ import random
 import logging
 import argparse
 import threading
-import csv
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-
-latency_data = []
-reconnect_time_data = []
-bandwidth_data = []
+import clock
+import command_exec
+import event_trace
+import log_config
+import metrics
+import results_writer
+import wire_format
+import udp_reliability
+from log_config import msg_log
+
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency')
+reconnect_time_data = registry.latency('ReconnectTime')
+bandwidth_data = registry.size('Bandwidth')
+json_bandwidth_data = registry.size('JSONBandwidth')  # Aynı trafiğin JSON karşılığı (format karşılaştırması için)
+tracer = event_trace.Tracer('udp', bandwidth=bandwidth_data, latency=latency_data,
+                            reconnect=reconnect_time_data, json_bandwidth=json_bandwidth_data)
+rx_sequence = udp_reliability.SequenceTracker()  # Sunucudan gelen datagramların kayıp/sıra takibi
 
 class UDPScooterClient:
-    def __init__(self, scooter_id, host='localhost', port=8766):  # UDP Portu
+    def __init__(self, scooter_id, host='localhost', port=8766, encoding=wire_format.ENCODING_JSON,
+                 executor=None):  # UDP Portu
         self.id = scooter_id
         self.host = host
         self.port = port
@@ -23,6 +38,12 @@ class UDPScooterClient:
         self.sock = None
         self.running = True
         self.current_scenario = 'all'
+        self.encoding = encoding
+        self.sid = None  # Sunucu ikili formatı onaylayınca atanır
+        self.clock = clock.ClockSync()  # register_ack'teki damgalarla sunucu saatine olan fark
+        self.executor = executor or command_exec.CommandExecutor()  # Komutlar dinleme thread'i dışında yürütülür
+        self.tx_seq = 0  # Her datagrama eklenen sıra numarası
+        self.seq_lock = threading.Lock()
 
     def connect(self):
         """UDP Bağlantısızdır ama rapor bütünlüğü için bağlantı simülasyonu yapar"""
@@ -30,37 +51,50 @@ class UDPScooterClient:
             try:
                 logging.info(f"Scooter sunucuya bağlanıyor: udp://{self.host}:{self.port}")
 
-                start_time = time.time()
+                start_ns = clock.now_ns()
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
                 # UDP'de connect olmaz ama socket oluşturma süresini alır
                 # Ayrıca sunucuya Register paketi atılması lazım, adresin bilinmesi için
 
                 # Yeniden bağlanma süresi kaydı
-                rec_time = time.time() - start_time
-                reconnect_time_data.append(rec_time)
+                rec_time = (clock.now_ns() - start_ns) / 1e9
+                tracer.connected(self.id, rec_time)
 
                 logging.info(f"Scooter bağlandı! (Süre: {rec_time:.4f}s)")
 
-                # Register mesajı
-                reg_msg = json.dumps({'type': 'register', 'scooter_id': self.id})
-                self.send_data(reg_msg)
+                # Register mesajı (ikili format talebi ve saat farkı ölçümü burada yapılır)
+                self.sid = None
+                reg_msg = json.dumps(wire_format.register_message(self.id, self.encoding, self.clock.request()))
+                self.send_data(reg_msg, msg_type='register')
 
                 return True
             except Exception as e:
                 logging.warning(f"Hata: {e}. 5sn sonra tekrar denenecek...")
                 time.sleep(5)
 
-    def send_data(self, data_str):
-        """Veri gönderme"""
+    def send_data(self, data_str, json_equiv=None, ack_seq=None, msg_type='other', latency=None):
+        """Veri gönderme (str: JSON, bytes: ikili çerçeve); her datagrama sıra numarası eklenir"""
         try:
-            encoded_data = data_str.encode('utf-8')
-            bandwidth_data.append(len(encoded_data))  # TX Metriği
+            with self.seq_lock:
+                data_str = udp_reliability.add_seq(data_str, self.tx_seq, ack_seq)
+                self.tx_seq += 1
+            encoded_data = data_str.encode('utf-8') if isinstance(data_str, str) else data_str
+            tracer.tx(msg_type, len(encoded_data), self.id, latency, json_equiv)  # TX Metriği
             # UDP, sendto kullanır
             self.sock.sendto(encoded_data, (self.host, self.port))
         except Exception as e:
             logging.error(f"Gönderme hatası: {e}")
 
+    def send_message(self, msg_dict):
+        """Konum/durum mesajını anlaşılan formatta gönderir; ikili format onaylanmadıysa JSON kullanır."""
+        json_msg = json.dumps(msg_dict)
+        if self.sid is not None:
+            self.send_data(wire_format.encode_message(msg_dict, self.sid), json_equiv=len(json_msg.encode('utf-8')),
+                           msg_type=msg_dict['type'])
+        else:
+            self.send_data(json_msg, msg_type=msg_dict['type'])
+
     def task_location(self):
         while self.running and self.battery > 0:
             try:
@@ -74,10 +108,8 @@ class UDPScooterClient:
                     'location': self.location,
                     'battery': round(self.battery, 1)
                 }
-                msg = json.dumps(msg_dict)
-
-                self.send_data(msg)
-                logging.info(f"SCOOTER TX (Konum): {json.dumps(msg_dict)}")
+                self.send_message(msg_dict)
+                msg_log.info("SCOOTER TX (Konum): %s", msg_dict)
                 time.sleep(10)
             except:
                 break
@@ -96,42 +128,69 @@ class UDPScooterClient:
                         'speed': 0 if is_locked else random.randint(0, 25)
                     }
                 }
-                msg = json.dumps(msg_dict)
-
-                self.send_data(msg)
-                logging.info(f"SCOOTER TX (Durum): {json.dumps(msg_dict)}")
+                self.send_message(msg_dict)
+                msg_log.info("SCOOTER TX (Durum): %s", msg_dict)
                 time.sleep(5)
             except:
                 break
 
+    def send_ack(self, msg, rx_ns, latency=None):
+        """Komut ACK'i; 'ack_seq' ile hangi komutun onaylandığı belirtilir, 'rx_ns' komutun alındığı andır."""
+        stamps = self.clock.ack_fields(msg, rx_ns)
+        # ACK mesajına 'scooter_id' eklendi
+        ack_msg = json.dumps(dict({
+            'type': 'ack',
+            'scooter_id': self.id,  # <-- EKLENDİ
+            'ack': f"command '{msg['command']}' received",
+        }, **stamps))
+
+        if self.sid is not None:
+            self.send_data(wire_format.encode_ack(self.sid, msg['command'], stamps['send_ns'],
+                                                  stamps.get('rx_ns'), stamps.get('tx_ns')),
+                           json_equiv=len(ack_msg.encode('utf-8')), ack_seq=msg.get('seq'), msg_type='ack',
+                           latency=latency)
+        else:
+            self.send_data(ack_msg, ack_seq=msg.get('seq'), msg_type='ack', latency=latency)
+
+    def complete_command(self, msg, rx_ns):
+        """Yürütülen komutun ACK'ini gönderir (worker thread'inde çağrılır)."""
+        logged = self.current_scenario in ['command', 'all']
+        self.send_ack(msg, rx_ns, latency=(clock.now_ns() - rx_ns) / 1e9 if logged else None)
+
+        if logged:
+            msg_log.info("SCOOTER RX (Komut): %s", msg)
+            msg_log.info("SCOOTER TX (ACK): command '%s' received", msg['command'])
+
     def task_listen(self):
         """Sunucudan gelen komutları dinleme"""
         while self.running:
             try:
                 data, addr = self.sock.recvfrom(4096)
                 if not data: continue
+                rx_ns = clock.now_ns()
 
-                bandwidth_data.append(len(data))
                 msg = json.loads(data.decode())
+                tracer.rx('command' if msg.get('command') else msg.get('type'), len(data), self.id, ts_ns=rx_ns)
+
+                seq = msg.get('seq')
+                if seq is not None and not rx_sequence.observe(seq):
+                    # Sunucu ACK alamadığı komutu yeniden göndermiş: komut tekrar işlenmez, ACK yenilenir
+                    if msg.get('command'):
+                        self.send_ack(msg, rx_ns)
+                        msg_log.info("SCOOTER TX (ACK tekrarı): seq=%s", seq)
+                    continue
+
+                if msg.get('type') == 'register_ack':
+                    self.sid = msg.get('sid')
+                    if msg.get('clock'):
+                        self.clock.update(msg['clock'], rx_ns)
+                    msg_log.info("SCOOTER RX (Register ACK): format=%s, sid=%s, saat: %s",
+                                 msg.get('encoding', wire_format.ENCODING_JSON), self.sid, self.clock.describe())
+                    continue
 
                 if msg.get('command'):
-                    process_start = time.time()
-                    time.sleep(0.1)
-
-                    # ACK mesajına 'scooter_id' eklendi
-                    ack_msg = json.dumps({
-                        'type': 'ack',
-                        'scooter_id': self.id,  # <-- EKLENDİ
-                        'ack': f"command '{msg['command']}' received",
-                        'send_time': msg.get('send_time')
-                    })
-
-                    self.send_data(ack_msg)
-
-                    if self.current_scenario in ['command', 'all']:
-                        logging.info(f"SCOOTER RX (Komut): {json.dumps(msg)}")
-                        logging.info(f"SCOOTER TX (ACK): command '{msg['command']}' received")
-                        latency_data.append(time.time() - process_start)
+                    # Komut worker'da yürütülür, ACK yürütme bitince gönderilir; dinleme devam eder
+                    self.executor.submit(msg, rx_ns, self.complete_command)
 
             except OSError:
                 break
@@ -141,9 +200,10 @@ class UDPScooterClient:
 
     def run(self, scenario):
         self.current_scenario = scenario
+        results = open_results("UDP", self.encoding)
         if not self.connect(): return
 
-        logging.info(f"ÇALIŞAN SENARYO: {scenario}")
+        logging.info(f"ÇALIŞAN SENARYO: {scenario} | {self.executor.describe()}")
 
         threads = []
 
@@ -170,53 +230,53 @@ class UDPScooterClient:
         except KeyboardInterrupt:
             self.running = False
             logging.info("Scooter kapatılıyor...")
+            self.executor.shutdown()
             if self.sock: self.sock.close()
-            print_metrics("UDP")
-            save_results_to_csv("UDP")
+            print_metrics("UDP", self.encoding)
+            results.close()
 
-def save_results_to_csv(protocol_name):
+def open_results(protocol_name, encoding=wire_format.ENCODING_JSON):
     """
-    Toplanan verileri analiz için CSV dosyasına kaydeder.
+    Olayları çalışma boyunca iz dosyasına akıtan yazıcıyı başlatır
+    (results_<protokol>[_binary].<koşu kimliği>.<parça>.trace).
     """
-    filename = f"results_{protocol_name.lower()}.csv"
+    suffix = "" if encoding == wire_format.ENCODING_JSON else f"_{encoding}"
+    return tracer.open(f"results_{protocol_name.lower()}{suffix}")
 
-    rows = []
-    max_len = max(len(latency_data), len(bandwidth_data), len(reconnect_time_data))
 
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rec = reconnect_time_data[i] if i < len(reconnect_time_data) else None
-        rows.append([lat, bw, rec])
-
-    with open(filename, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Latency", "Bandwidth", "ReconnectTime"])  # Başlıklar
-        writer.writerows(rows)
-
-    logging.info(f"Sonuçlar kaydedildi: {filename}")
-
-
-def print_metrics(protocol_name):
-    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}) ---")
+def print_metrics(protocol_name, encoding=wire_format.ENCODING_JSON):
+    logging.info(f"--- SİMÜLASYON SONUÇLARI ({protocol_name}, {encoding}) ---")
 
     if reconnect_time_data:
-        avg_rec = sum(reconnect_time_data) / len(reconnect_time_data)
+        avg_rec = reconnect_time_data.mean()
         count = len(reconnect_time_data)
         logging.info(f"Ortalama Yeniden Bağlanma: {avg_rec:.4f} sn (Toplam {count} bağlantı)")
 
     if latency_data:
-        avg_lat = sum(latency_data) / len(latency_data)
+        avg_lat = latency_data.mean()
         count = len(latency_data)
         logging.info(f"Ortalama Gecikme (Latency): {avg_lat:.4f} sn (Toplam {count} işlem)")
+        logging.info(latency_data.format())
 
     if bandwidth_data:
-        total = sum(bandwidth_data)
+        total = bandwidth_data.total
         avg_size = total / len(bandwidth_data)
         logging.info(f"Toplam Veri Transferi: {total} bytes ({total / 1024:.2f} KB)")
         logging.info(f"Ortalama Mesaj Boyutu: {avg_size:.1f} bytes")
 
-    logging.info(f"Paket Kayıp Oranı: %0.00 (Localhost Testi)")
+        json_total = json_bandwidth_data.total
+        if json_total and encoding != wire_format.ENCODING_JSON:
+            logging.info(f"JSON Karşılığı: {json_total} bytes ({json_total / 1024:.2f} KB) | "
+                         f"{encoding}: {total} bytes | Tasarruf: %{(1 - total / json_total) * 100:.1f}")
+
+    # Komut kuyruğu ve yürütme süreleri (bkz. command_exec.py)
+    for name in ('CommandQueueDelay', 'CommandExecTime'):
+        hist = registry.get(name)
+        if hist:
+            logging.info(hist.format())
+
+    # Sunucu -> scooter yönü burada, scooter -> sunucu yönü sunucu kapanışında raporlanır
+    logging.info(f"Sunucu → Scooter {udp_reliability.format_loss(rx_sequence.summary())}")
 
     logging.info("--- METRİKLER (Ham Veri Özeti) ---")
 
@@ -225,7 +285,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--scenario', choices=['status', 'location', 'command', 'all'], default='all')
     parser.add_argument('--id', default='scooter_udp_1')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--encoding', choices=[wire_format.ENCODING_JSON, wire_format.ENCODING_BINARY],
+                        default=wire_format.ENCODING_JSON, help="Telemetri formatı (register sırasında anlaşılır)")
+    command_exec.add_arguments(parser)
+    log_config.add_arguments(parser)
     args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
 
-    client = UDPScooterClient(args.id)
+    client = UDPScooterClient(args.id, args.host, args.port, encoding=args.encoding,
+                              executor=command_exec.from_args(args, registry))
     client.run(args.scenario)
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""
+UDP için sıra numarası, kayıp/sıra dışı istatistikleri ve komut yeniden gönderimi.
+
+Her datagram gönderenin kendi sayacından bir sıra numarası (seq) taşır:
+  * JSON mesajlarında 'seq' alanı (ACK'lerde ayrıca onaylanan komutun 'ack_seq' alanı)
+  * ikili çerçevelerde (bkz. wire_format) sabit boyutlu çerçevenin sonuna eklenen
+    küçük bir kuyruk: '<I' seq, ACK çerçevelerinde '<II' seq + ack_seq
+
+Çerçeve boyutu tip baytından bilindiği için kuyruğun varlığı datagram
+uzunluğundan anlaşılır; seq taşımayan eski istemciler de çalışmaya devam eder.
+
+Alıcı taraf SequenceTracker ile kayıp, sıra dışı ve tekrar eden datagramları
+sayar. Numaralar 2^32'de sarar; karşılaştırmalar sıra numarası aritmetiğiyle
+(RFC 1982, seq_delta) yapılır. Sunucu, ACK bekleyen komutları PendingCommands ile izler ve ölçülen
+RTT'den RFC 6298'e göre hesaplanan zaman aşımı (RTO) dolunca yeniden gönderir.
+"""
+import json
+import struct
+import threading
+import time
+
+import wire_format
+
+SEQ_TRAILER = struct.Struct('<I')
+ACK_TRAILER = struct.Struct('<II')
+SEQ_MOD = 1 << 32
+
+
+def seq_delta(a, b):
+    """a - b, 2^32 modunda işaretli fark: sarma noktasının iki yanındaki numaralar da doğru sıralanır."""
+    return (a - b + (SEQ_MOD >> 1)) % SEQ_MOD - (SEQ_MOD >> 1)
+
+
+def add_seq(payload, seq, ack_seq=None):
+    """
+    JSON metnine (str) veya ikili çerçeveye (bytes) sıra numarası ekler.
+    JSON metni json.dumps çıktısı olduğundan son '}' öncesine alan eklenir.
+    """
+    seq %= SEQ_MOD
+    if isinstance(payload, str):
+        extra = f', "seq": {seq}' if ack_seq is None else f', "seq": {seq}, "ack_seq": {ack_seq}'
+        return payload[:-1] + extra + '}' if payload != '{}' else '{' + extra[2:] + '}'
+    if ack_seq is None:
+        return payload + SEQ_TRAILER.pack(seq)
+    return payload + ACK_TRAILER.pack(seq, ack_seq % SEQ_MOD)
+
+
+def strip_seq(frame):
+    """İkili datagramı (çerçeve, seq, ack_seq) olarak ayırır; kuyruk yoksa seq None döner."""
+    size = wire_format.FRAME_SIZES.get(frame[0])
+    if size is None or len(frame) == size:
+        return frame, None, None
+    extra = len(frame) - size
+    if extra == SEQ_TRAILER.size:
+        return frame[:size], SEQ_TRAILER.unpack_from(frame, size)[0], None
+    if extra == ACK_TRAILER.size:
+        seq, ack_seq = ACK_TRAILER.unpack_from(frame, size)
+        return frame[:size], seq, ack_seq
+    raise ValueError(f"Geçersiz datagram boyutu: {len(frame)}")
+
+
+def parse_datagram(data, registry=None):
+    """Datagramı (mesaj, seq, ack_seq) olarak çözer; JSON ve ikili formatları destekler."""
+    if wire_format.is_binary(data):
+        frame, seq, ack_seq = strip_seq(data)
+        return wire_format.decode(frame, registry), seq, ack_seq
+    msg = json.loads(data.decode())
+    return msg, msg.get('seq'), msg.get('ack_seq')
+
+
+class SequenceTracker:
+    """
+    Bir göndericiden gelen sıra numaralarını izler. İlk görülen seq taban kabul
+    edilir; tabandan en yükseğe kadar olup hiç gelmeyen numaralar kayıp sayılır.
+    Gelen numara en yükseğe göre seq_delta ile açılır (unwrap), içeride sarmayan
+    tamsayılarla çalışılır. Gönderici yeniden başladıysa (sayaç sıfırlandı)
+    sunucu takipçiyi yenisiyle değiştirir.
+    """
+
+    WINDOW = 4096  # Tekrar tespiti için hatırlanan son numaralar
+
+    def __init__(self):
+        self.first = None
+        self.highest = None
+        self.received = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.session = None  # Akışı açan register'ın oturum damgası (sunucu, bkz. udp_server.py)
+        self._seen = set()
+
+    def observe(self, seq):
+        """Numarayı kaydeder; datagram yeni ise True, tekrar ise False döner."""
+        if self.first is None:
+            self.first = self.highest = seq
+            self.received = 1
+            self._seen.add(seq)
+            return True
+        seq = self.highest + seq_delta(seq, self.highest)
+
+        if seq in self._seen or seq < self.highest - self.WINDOW:
+            self.duplicates += 1
+            return False
+
+        self._seen.add(seq)
+        self.received += 1
+        if seq > self.highest:
+            self.highest = seq
+            if len(self._seen) > 2 * self.WINDOW:
+                floor = self.highest - self.WINDOW
+                self._seen = {s for s in self._seen if s >= floor}
+        else:
+            self.reordered += 1
+            if seq < self.first:
+                self.first = seq
+        return True
+
+    def expected(self):
+        return 0 if self.first is None else self.highest - self.first + 1
+
+    def lost(self):
+        return max(0, self.expected() - self.received)
+
+    def summary(self):
+        return {
+            'expected': self.expected(),
+            'received': self.received,
+            'lost': self.lost(),
+            'reordered': self.reordered,
+            'duplicates': self.duplicates,
+        }
+
+
+def merge_summaries(summaries):
+    """Birden çok SequenceTracker (veya worker) özetini toplar."""
+    total = {'expected': 0, 'received': 0, 'lost': 0, 'reordered': 0, 'duplicates': 0}
+    for s in summaries:
+        for key in total:
+            total[key] += s.get(key, 0)
+    return total
+
+
+def format_loss(summary):
+    expected = summary['expected']
+    rate = summary['lost'] / expected * 100 if expected else 0.0
+    reorder = summary['reordered'] / expected * 100 if expected else 0.0
+    return (f"Paket Kayıp Oranı: %{rate:.2f} ({summary['lost']}/{expected}) | "
+            f"Sıra Dışı: {summary['reordered']} (%{reorder:.2f}) | Tekrar: {summary['duplicates']}")
+
+
+class RTOEstimator:
+    """RFC 6298 yeniden gönderim zaman aşımı: SRTT + max(G, 4 * RTTVAR)."""
+
+    def __init__(self, initial=1.0, min_rto=0.2, max_rto=60.0, granularity=0.001):
+        self.srtt = None
+        self.rttvar = None
+        self.rto = initial
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.granularity = granularity
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(self.max_rto, max(self.min_rto, self.srtt + max(self.granularity, 4 * self.rttvar)))
+
+
+class PendingCommand:
+    __slots__ = ('addr', 'payload', 'first_sent', 'last_sent', 'deadline', 'retries')
+
+    def __init__(self, addr, payload, now, rto):
+        self.addr = addr
+        self.payload = payload
+        self.first_sent = now
+        self.last_sent = now
+        self.deadline = now + rto
+        self.retries = 0
+
+
+class PendingCommands:
+    """
+    ACK bekleyen komutlar (thread-safe). RTO her scooter için ayrı tutulur;
+    yeniden gönderilen komutların ACK'leri RTT örneği olarak kullanılmaz
+    (Karn algoritması) ve her denemede zaman aşımı iki katına çıkar.
+    """
+
+    def __init__(self, max_retries=5, **rto_kwargs):
+        self.max_retries = max_retries
+        self._rto_kwargs = rto_kwargs
+        self._lock = threading.Lock()
+        self._pending = {}  # {(scooter_id, seq): PendingCommand}
+        self._rto = {}  # {scooter_id: RTOEstimator}
+        self.sent = 0
+        self.acked = 0
+        self.retransmits = 0
+        self.expired = 0
+        self.duplicate_acks = 0
+
+    def _estimator(self, scooter_id):
+        est = self._rto.get(scooter_id)
+        if est is None:
+            est = self._rto[scooter_id] = RTOEstimator(**self._rto_kwargs)
+        return est
+
+    def add(self, scooter_id, seq, addr, payload, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            rto = self._estimator(scooter_id).rto
+            self._pending[(scooter_id, seq)] = PendingCommand(addr, payload, now, rto)
+            self.sent += 1
+
+    def acknowledge(self, scooter_id, seq, now=None):
+        """Komutu onaylar; ilk onay ise True döner."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._pending.pop((scooter_id, seq), None)
+            if entry is None:
+                self.duplicate_acks += 1
+                return False
+            self.acked += 1
+            if entry.retries == 0:
+                self._estimator(scooter_id).sample(now - entry.last_sent)
+            return True
+
+    def due(self, now=None):
+        """Zaman aşımı dolan komutları [(scooter_id, addr, payload)] olarak döndürür."""
+        now = time.monotonic() if now is None else now
+        resend = []
+        with self._lock:
+            for key, entry in list(self._pending.items()):
+                if entry.deadline > now:
+                    continue
+                if entry.retries >= self.max_retries:
+                    del self._pending[key]
+                    self.expired += 1
+                    continue
+                entry.retries += 1
+                entry.last_sent = now
+                est = self._estimator(key[0])
+                entry.deadline = now + min(est.max_rto, est.rto * (2 ** entry.retries))
+                self.retransmits += 1
+                resend.append((key[0], entry.addr, entry.payload))
+        return resend
+
+    def rto(self, scooter_id):
+        with self._lock:
+            return self._estimator(scooter_id).rto
+
+    def summary(self):
+        with self._lock:
+            rtos = [e.rto for e in self._rto.values() if e.srtt is not None]
+            return {
+                'sent': self.sent,
+                'acked': self.acked,
+                'retransmits': self.retransmits,
+                'expired': self.expired,
+                'in_flight': len(self._pending),
+                'duplicate_acks': self.duplicate_acks,
+                'avg_rto': sum(rtos) / len(rtos) if rtos else None,
+            }
+
+
+def format_commands(summary):
+    sent = summary['sent']
+    delivery = summary['acked'] / sent * 100 if sent else 0.0
+    avg_rto = f"{summary['avg_rto'] * 1000:.1f} ms" if summary.get('avg_rto') else "-"
+    return (f"Komut: gönderilen {sent}, onaylanan {summary['acked']} (%{delivery:.2f}), "
+            f"yeniden gönderim {summary['retransmits']}, vazgeçilen {summary['expired']}, "
+            f"bekleyen {summary['in_flight']} | Ortalama RTO: {avg_rto}")
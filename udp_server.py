@@ -1,132 +1,272 @@
 import socket
+import struct
 import json
 import threading
 import time
 import logging
-import csv
+import select
+import argparse
+import multiprocessing
+import queue
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+import clock
+import command_dispatch
+import event_trace
+import fleet_state
+import geo_index
+import log_config
+import metrics
+import results_writer
+import wire_format
+import udp_reliability
+from log_config import msg_log
 
-latency_data = []
-bandwidth_data = []
+log_config.configure(format='%(asctime)s [%(levelname)s] %(message)s')
 
-def save_server_results():
-    """Sunucu kapandığında verileri CSV'ye yazar."""
-    filename = "results_udp_server.csv"
+registry = metrics.MetricsRegistry()  # Sabit bellekli histogramlar (bkz. metrics.py)
+latency_data = registry.latency('Latency_RTT')
+downlink_data = registry.latency('Latency_Downlink')  # Tek yönlü gecikmeler (bkz. clock.py)
+uplink_data = registry.latency('Latency_Uplink')
+telemetry_data = registry.latency('Latency_Telemetry')  # Açık döngü yükte planlanan gönderimden alışa
+bandwidth_data = registry.size('Bandwidth')
+tracer = event_trace.Tracer('udp', bandwidth=bandwidth_data, latency=latency_data,
+                            downlink=downlink_data, uplink=uplink_data, telemetry=telemetry_data)
 
-    global latency_data, bandwidth_data
+sid_registry = wire_format.SidRegistry()
+fleet = fleet_state.FleetState()  # Scooterların son konum/durumu (bkz. fleet_state.py)
+geo = geo_index.GridIndex(fleet)  # Konuma göre sorgular ve bölge hedefli komutlar (bkz. geo_index.py)
+dispatcher = command_dispatch.Dispatcher(registry, tracer)  # Komut kuyrukları, ACK eşleme ve yeniden deneme
 
-    # Veri yoksa uyarı ver
-    if not latency_data and not bandwidth_data:
-        logging.warning("Hiç veri toplanmadı, yine de boş dosya oluşturuluyor.")
 
-    # Veri uzunluklarını eşitleme
-    max_len = max(len(latency_data), len(bandwidth_data)) if (latency_data or bandwidth_data) else 0
+def open_server_results(base="results_udp_server", **kwargs):
+    """Olayları çalışma boyunca koşu kimlikli, dönen (rotating) iz dosyalarına akıtır."""
+    return tracer.open(base, **kwargs)
 
-    rows = []
-    for i in range(max_len):
-        lat = latency_data[i] if i < len(latency_data) else None
-        bw = bandwidth_data[i] if i < len(bandwidth_data) else None
-        rows.append([lat, bw])
 
-    try:
-        with open(filename, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Latency_RTT", "Bandwidth"])
-            writer.writerows(rows)
-        logging.info(f"✅ SONUÇLAR BAŞARIYLA KAYDEDİLDİ: {filename}")
-        import os
-        logging.info(f"Dosya Yolu: {os.path.abspath(filename)}")
-    except Exception as e:
-        logging.error(f"❌ CSV Kayıt hatası: {e}")
+def save_server_results(writer=None):
+    """Kapanışta metrik özetini loglar; bekleyen kayıtları yazıp dosyayı kapatır."""
+    registry.log_summary("SUNUCU METRİKLERİ")
+    logging.info(dispatcher.summary_line())
+    logging.info(fleet.describe())
+    logging.info(geo.describe())
+    if writer is not None:
+        writer.close()
 
 
 class UDPServer:
-    def __init__(self, port=8766):
+    def __init__(self, port=8766, batch_size=64, reuse_port=False, command_interval=15, rcvbuf=None,
+                 reliable=False, max_retries=5, command_area=None, dispatch=None, max_scooters=None):
         self.port = port
+        # Komut dağıtım ayarları (command_dispatch.settings_from_args); worker'lara server_kwargs ile geçer
+        dispatcher.configure(**(dispatch or {}))
+        if max_scooters is not None:
+            fleet.reserve(max_scooters)  # Alım ve komut thread'leri aynı anda yazar; büyüme olmasın
         self.sock = None
         self.known_clients = {}  # {scooter_id: (ip, port)}
         self.running = True
+        self.batch_size = batch_size  # Her uyanışta tampondan okunacak en fazla datagram
+        self.reuse_port = reuse_port
+        self.command_interval = command_interval
+        self.command_area = command_area  # Verilirse komut yalnızca bu alandaki scooterlara (geo_index.Area)
+        self.rcvbuf = rcvbuf  # SO_RCVBUF (byte); None ise çekirdek varsayılanı
+        self.datagrams = 0
+        self.batches = 0
+
+        # Sıra numaraları: scooter başına giden sayaç ve gelen datagram takibi
+        self.tx_seq = {}
+        self.rx_seq = {}  # {scooter_id: SequenceTracker}
+        self.rx_closed = udp_reliability.merge_summaries([])  # Yeni oturum açan scooterların eski akış toplamları
+        self.seq_lock = threading.Lock()
+        # reliable=True ise ACK gelmeyen komutlar adaptif RTO ile yeniden gönderilir
+        self.reliable = reliable
+        self.pending = udp_reliability.PendingCommands(max_retries=max_retries)
+
+    def next_seq(self, scooter_id):
+        with self.seq_lock:
+            seq = self.tx_seq.get(scooter_id, 0)
+            self.tx_seq[scooter_id] = seq + 1
+            return seq
+
+    def send_command(self, scooter_id, cmd):
+        """
+        Dispatcher'ın gönderim fonksiyonu: komutu scooter'ın son adresine özel sıra
+        numarasıyla gönderir ve (reliable modda) datagram ACK'ini beklemeye alır.
+        """
+        addr = self.known_clients.get(scooter_id)
+        if addr is None:
+            return
+        seq = self.next_seq(scooter_id)
+        encoded_cmd = udp_reliability.add_seq(json.dumps(cmd), seq).encode()
+        if self.reliable:
+            self.pending.add(scooter_id, seq, addr, encoded_cmd)
+        self.sock.sendto(encoded_cmd, addr)
+        tracer.tx('command', len(encoded_cmd), scooter_id)
+        msg_log.info("SERVER TX (Komut) -> %s (%s)", scooter_id, addr)
+
+    def retransmit_loop(self):
+        """RTO'su dolan komutları yeniden gönderir."""
+        while self.running:
+            time.sleep(0.02)
+            for s_id, addr, payload in self.pending.due():
+                try:
+                    self.sock.sendto(payload, addr)
+                    tracer.tx('command', len(payload), s_id)
+                    msg_log.info("SERVER TX (Yeniden Gönderim) -> %s | RTO: %.3fs", s_id, self.pending.rto(s_id))
+                except Exception as e:
+                    logging.error(f"Yeniden gönderim hatası: {e}")
+
+    def reliability_summary(self):
+        return {
+            'rx': udp_reliability.merge_summaries(
+                [self.rx_closed] + [t.summary() for t in list(self.rx_seq.values())]),
+            'commands': self.pending.summary(),
+        }
 
     def broadcast_commands(self):
         """Periyodik Unlock komutu gönderir"""
         while self.running:
-            time.sleep(15)  # 15 saniyede bir komut
+            time.sleep(self.command_interval)  # 15 saniyede bir komut
             if not self.known_clients: continue
 
             try:
-                cmd = json.dumps({
-                    "command": "unlock",
-                    "scooter_id": "broadcast",
-                    "send_time": time.time()
-                })
-
-                # Kayıtlı tüm scooterlara gönder
-                for s_id, addr in list(self.known_clients.items()):
-                    try:
-                        encoded_cmd = cmd.encode()
-                        self.sock.sendto(encoded_cmd, addr)
-                        bandwidth_data.append(len(encoded_cmd))
-                        logging.info(f"SERVER TX (Komut) -> {s_id} ({addr})")
-                    except Exception as e:
-                        logging.error(f"Komut gönderme hatası: {e}")
+                # Kayıtlı tüm scooterların (ya da alandakilerin) kuyruğuna; gönderim, ACK eşleme ve
+                # yeniden deneme dispatcher'da (sıra numarası scooter başına)
+                targets = self.command_area.select(geo) if self.command_area else None
+                dispatcher.submit_many([s_id for s_id in list(self.known_clients)
+                                        if targets is None or s_id in targets], "unlock", scooter_id="broadcast")
             except Exception as e:
                 logging.error(f"Broadcast döngü hatası: {e}")
 
-    def start(self):
+    def handle_datagram(self, data, addr):
+        """Datagramı çözer, işler ve alım olayını (tekrar edenler dahil) ize yazar."""
+        ts_ns = clock.now_ns()
+        try:
+            msg, seq, ack_seq = udp_reliability.parse_datagram(data, sid_registry)
+        except (ValueError, struct.error):
+            tracer.rx('other', len(data), ts_ns=ts_ns)
+            return
+
+        rtt, downlink, uplink = self.handle_message(msg, seq, ack_seq, addr, ts_ns)
+        if msg.get('type') in event_trace.TELEMETRY_TYPES:
+            rtt = clock.telemetry_delay(msg, ts_ns)
+        tracer.rx(msg.get('type'), len(data), msg.get('scooter_id'), latency=rtt, ts_ns=ts_ns,
+                  downlink=downlink, uplink=uplink)
+
+    def handle_message(self, msg, seq, ack_seq, addr, ts_ns):
+        """
+        Çözülmüş mesajı işler; ilk kez onaylanan komutun ACK'inde (rtt, downlink,
+        uplink) gecikmelerini, diğer durumlarda clock.NO_DELAYS döndürür.
+        """
+        scooter_id = msg.get('scooter_id', 'unknown')
+
+        # Kayıp / sıra dışı takibi; ağda çoğalan (tekrar) datagramlar işlenmez
+        if seq is not None and scooter_id != 'unknown':
+            tracker = self.rx_seq.get(scooter_id)
+            register = msg.get('type') == 'register'
+            if tracker is not None and register and seq == 0 and \
+                    (msg.get('clock') is None or msg.get('clock') != tracker.session):
+                # Yeniden başlayan istemci sayacına 0'dan başlar; eski akışın numaralarıyla karşılaştırılmaz.
+                # Ağda çoğalan / tekrar gelen register aynı t0'ı taşır ve tekrar olarak atlanır.
+                self.rx_closed = udp_reliability.merge_summaries([self.rx_closed, tracker.summary()])
+                tracker = None
+            if tracker is None:
+                tracker = self.rx_seq[scooter_id] = udp_reliability.SequenceTracker()
+                tracker.session = msg.get('clock') if register else None
+            if not tracker.observe(seq):
+                return clock.NO_DELAYS
+
+        # Scooter ID 'unknown' değilse listeye kaydet/güncelle
+        if scooter_id != 'unknown':
+            if scooter_id not in self.known_clients:
+                self.known_clients[scooter_id] = addr
+                msg_log.info("Yeni Scooter Kaydedildi (UDP): %s @ %s", scooter_id, addr)
+            else:
+                # Adres değişmiş olabilir (NAT vs), güncelle
+                self.known_clients[scooter_id] = addr
+            fleet.update(msg, ts_ns, scooter_id)
+
+        # Mesaj Tiplerine Göre Loglama
+        msg_type = msg.get('type')
+        if msg_type == 'register':
+            msg_log.info("SERVER RX (Register) <- %s", scooter_id)
+
+            reg_ack = clock.stamp_register_ack(msg, ts_ns, wire_format.negotiate(msg, sid_registry))
+            if reg_ack:
+                encoded = udp_reliability.add_seq(json.dumps(reg_ack), self.next_seq(scooter_id)).encode()
+                self.sock.sendto(encoded, addr)
+                tracer.tx('register_ack', len(encoded), scooter_id)
+                msg_log.info("SERVER TX (Register ACK) -> %s | Format: %s, sid=%s", scooter_id,
+                             reg_ack.get('encoding', wire_format.ENCODING_JSON), reg_ack.get('sid'))
+
+        elif msg_type == 'ack':
+            # Yeniden gönderilen datagramın ikinci ACK'i ve komutun tekrar / geç ACK'leri
+            # (bkz. command_dispatch.py) gecikmeye yazılmaz
+            if self.reliable and ack_seq is not None and not self.pending.acknowledge(scooter_id, ack_seq):
+                return clock.NO_DELAYS
+            if not dispatcher.acknowledge(scooter_id, msg, ts_ns):
+                return clock.NO_DELAYS
+
+            # RTT ve tek yönlü gecikmeler (yeniden gönderimde ilk gönderimden itibaren ölçülür)
+            delays = clock.ack_delays(msg, ts_ns)
+            if delays[0] is not None and msg_log.enabled():
+                msg_log.logger.info("SERVER RX (ACK) <- %s | %s", scooter_id, clock.describe_delays(*delays))
+            return delays
+
+        elif msg_type == 'location':
+            msg_log.info("SERVER RX (Konum) <- %s", scooter_id)
+
+        elif msg_type == 'status':
+            msg_log.info("SERVER RX (Durum) <- %s", scooter_id)
+        return clock.NO_DELAYS
+
+    def receive_batch(self, poller):
+        """
+        Soket okunabilir olana kadar (en fazla 1 sn, CTRL+C için) bekler, ardından
+        tamponda biriken datagramları bloklamadan batch_size adede kadar okur.
+        """
+        if not poller.poll(1000):
+            return []
+        batch = []
+        recvfrom = self.sock.recvfrom
+        for _ in range(self.batch_size):
+            try:
+                batch.append(recvfrom(4096))
+            except BlockingIOError:
+                break
+        return batch
+
+    def start(self, stop_event=None):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.reuse_port:
+            # Aynı portu dinleyen worker'lar arasında çekirdek, datagramları 4-tuple hash'ine göre dağıtır
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if self.rcvbuf:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
         self.sock.bind(('0.0.0.0', self.port))
-        self.sock.settimeout(1.0)  # CTRL+C yakalamak için timeout
+        self.sock.setblocking(False)
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN)
 
-        # Komut thread'ini başlatır
+        # Komut thread'lerini başlatır
+        dispatcher.send = self.send_command
+        threading.Thread(target=dispatcher.run, args=(lambda: self.running,), daemon=True).start()
         t_broadcast = threading.Thread(target=self.broadcast_commands, daemon=True)
         t_broadcast.start()
+        if self.reliable:
+            threading.Thread(target=self.retransmit_loop, daemon=True).start()
 
         logging.info(f"UDP Sunucusu Başlatıldı: {self.port} (Kapatmak için CTRL+C)")
 
         try:
-            while self.running:
+            while self.running and not (stop_event and stop_event.is_set()):
                 try:
-                    data, addr = self.sock.recvfrom(4096)
-
-                    bandwidth_data.append(len(data))
-                    try:
-                        msg = json.loads(data.decode())
-                    except json.JSONDecodeError:
+                    batch = self.receive_batch(poller)
+                    if not batch:
                         continue
-
-                    scooter_id = msg.get('scooter_id', 'unknown')
-
-                    # Scooter ID 'unknown' değilse listeye kaydet/güncelle
-                    if scooter_id != 'unknown':
-                        if scooter_id not in self.known_clients:
-                            self.known_clients[scooter_id] = addr
-                            logging.info(f"Yeni Scooter Kaydedildi (UDP): {scooter_id} @ {addr}")
-                        else:
-                            # Adres değişmiş olabilir (NAT vs), güncelle
-                            self.known_clients[scooter_id] = addr
-
-                    # Mesaj Tiplerine Göre Loglama
-                    msg_type = msg.get('type')
-                    if msg_type == 'register':
-                        logging.info(f"SERVER RX (Register) <- {scooter_id}")
-
-                    elif msg_type == 'ack':
-                        # RTT Hesaplama
-                        send_time = msg.get('send_time', 0)
-                        if send_time:
-                            rtt = time.time() - send_time
-                            latency_data.append(rtt)
-                            logging.info(f"SERVER RX (ACK) <- {scooter_id} | RTT: {rtt:.6f}s")
-
-                    elif msg_type == 'location':
-                        logging.info(f"SERVER RX (Konum) <- {scooter_id}")
-
-                    elif msg_type == 'status':
-                        logging.info(f"SERVER RX (Durum) <- {scooter_id}")
-
-                except socket.timeout:
-                    continue
+                    self.batches += 1
+                    self.datagrams += len(batch)
+                    for data, addr in batch:
+                        self.handle_datagram(data, addr)
                 except Exception as e:
                     logging.error(f"Hata: {e}")
 
@@ -137,14 +277,160 @@ class UDPServer:
             if self.sock:
                 self.sock.close()
             logging.info("UDP soketi kapatıldı.")
+            summary = self.reliability_summary()
+            logging.info(udp_reliability.format_loss(summary['rx']))
+            if self.reliable:
+                logging.info(udp_reliability.format_commands(summary['commands']))
+
+
+def run_worker(worker_id, port, stop_event, results, log_level=logging.INFO, server_kwargs=None,
+               results_base=None, run_id=None):
+    """
+    SO_REUSEPORT worker prosesi: kendi soketini açar, olayları kendi iz
+    dosyasına ('w<id>' parçaları) yazar, kapanışta metriklerini ana prosese yollar.
+    """
+    log_config.after_fork()
+    logging.getLogger().setLevel(log_level)
+    writer = open_server_results(results_base, run_id=run_id, tag=f"w{worker_id}") if results_base else None
+    srv = UDPServer(port, reuse_port=True, **(server_kwargs or {}))
+    try:
+        srv.start(stop_event)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+        results.put({
+            'worker': worker_id,
+            'known_clients': srv.known_clients,
+            'fleet': fleet,
+            'metrics': registry.snapshot(),
+            'datagrams': srv.datagrams,
+            'batches': srv.batches,
+            'reliability': srv.reliability_summary(),
+        })
+
+
+class UDPWorkerPool:
+    """
+    Aynı portu SO_REUSEPORT ile paylaşan N worker prosesi. Her worker kendi
+    scooterlarını (çekirdeğin 4-tuple dağıtımına göre) bilir ve onlara komut
+    yollar; kapanışta known_clients ve metrikler ana proseste birleştirilir.
+    """
+
+    def __init__(self, port=8766, workers=2, batch_size=64, log_level=logging.INFO, results_base=None,
+                 **server_kwargs):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("Bu platform SO_REUSEPORT desteklemiyor")
+        self.port = port
+        self.workers = workers
+        self.batch_size = batch_size
+        self.log_level = log_level
+        self.server_kwargs = dict(server_kwargs, batch_size=batch_size)  # UDPServer parametreleri
+        self.results_base = results_base  # Verilirse her worker kendi sonuç dosyasına yazar
+        self.run_id = results_writer.make_run_id()
+        self.stop_event = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.procs = []
+        self.known_clients = {}
+        self.worker_stats = []
+        self.rx_loss = None
+        self.command_stats = None
+
+    def start(self):
+        for i in range(self.workers):
+            p = multiprocessing.Process(target=run_worker, args=(i, self.port, self.stop_event, self.results,
+                                                                 self.log_level, self.server_kwargs,
+                                                                 self.results_base, self.run_id),
+                                        daemon=True)
+            p.start()
+            self.procs.append(p)
+        logging.info(f"UDP worker havuzu başlatıldı: {self.workers} worker, port {self.port}")
+
+    def stop(self, timeout=10):
+        """Worker'ları durdurur, known_clients ve metrikleri birleştirir."""
+        self.stop_event.set()
+        reliability = []
+        for _ in self.procs:
+            try:
+                res = self.results.get(timeout=timeout)
+            except queue.Empty:
+                logging.warning("Bir worker sonuç göndermedi.")
+                continue
+            self.known_clients.update(res['known_clients'])
+            fleet.merge(res['fleet'])
+            registry.merge(res['metrics'])
+            self.worker_stats.append({k: res[k] for k in ('worker', 'datagrams', 'batches')})
+            reliability.append(res['reliability'])
+        for p in self.procs:
+            p.join(timeout=timeout)
+        for st in sorted(self.worker_stats, key=lambda x: x['worker']):
+            avg_batch = st['datagrams'] / st['batches'] if st['batches'] else 0
+            logging.info(f"Worker {st['worker']}: {st['datagrams']} datagram, ortalama batch {avg_batch:.1f}")
+        logging.info(f"Toplam bilinen scooter: {len(self.known_clients)}")
+
+        self.rx_loss = udp_reliability.merge_summaries(r['rx'] for r in reliability)
+        self.command_stats = merge_command_summaries(r['commands'] for r in reliability)
+        logging.info(udp_reliability.format_loss(self.rx_loss))
+        if self.server_kwargs.get('reliable'):
+            logging.info(udp_reliability.format_commands(self.command_stats))
+        return self.worker_stats
+
+
+def merge_command_summaries(summaries):
+    """Worker'ların PendingCommands özetlerini toplar (RTO, komut ağırlıklı ortalama alınır)."""
+    total = {'sent': 0, 'acked': 0, 'retransmits': 0, 'expired': 0, 'in_flight': 0, 'duplicate_acks': 0}
+    rto_sum = rto_weight = 0
+    for s in summaries:
+        for key in total:
+            total[key] += s[key]
+        if s['avg_rto'] is not None:
+            rto_sum += s['avg_rto'] * s['sent']
+            rto_weight += s['sent']
+    total['avg_rto'] = rto_sum / rto_weight if rto_weight else None
+    return total
 
 
 if __name__ == "__main__":
-    srv = UDPServer()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--workers', type=int, default=1, help="1'den büyükse SO_REUSEPORT worker prosesleri açılır")
+    parser.add_argument('--batch-size', type=int, default=64, help="Uyanış başına okunacak en fazla datagram")
+    parser.add_argument('--rcvbuf', type=int, default=None, help="Soket alma tamponu (byte)")
+    parser.add_argument('--reliable', action='store_true', help="ACK gelmeyen komutları adaptif RTO ile yeniden gönder")
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--command-interval', type=float, default=15, help="Komut yayın periyodu (sn)")
+    parser.add_argument('--results-file', default="results_udp_server",
+                        help="Sonuç dosyası öneki (koşu kimliği ve parça numarası eklenir)")
+    fleet_state.add_arguments(parser)
+    geo_index.add_arguments(parser)
+    command_dispatch.add_arguments(parser)
+    log_config.add_arguments(parser)
+    args = parser.parse_args()
+    log_config.configure_from_args(args)
+
+    results_writer.install_sigterm_handler()
+    pool = None
+    writer = None
     try:
-        srv.start()
+        if args.workers > 1:
+            pool = UDPWorkerPool(args.port, args.workers, args.batch_size, results_base=args.results_file,
+                                 rcvbuf=args.rcvbuf, reliable=args.reliable, max_retries=args.max_retries,
+                                 command_interval=args.command_interval, command_area=args.command_area,
+                                 dispatch=command_dispatch.settings_from_args(args), max_scooters=args.max_scooters)
+            pool.start()
+            while True:
+                time.sleep(1)
+        else:
+            writer = open_server_results(args.results_file)
+            UDPServer(args.port, batch_size=args.batch_size, rcvbuf=args.rcvbuf,
+                      reliable=args.reliable, max_retries=args.max_retries,
+                      command_interval=args.command_interval, command_area=args.command_area,
+                      dispatch=command_dispatch.settings_from_args(args), max_scooters=args.max_scooters).start()
     except KeyboardInterrupt:
         pass
     finally:
+        if pool:
+            pool.stop()
         logging.info("Program sonlanıyor, veriler kaydediliyor...")
-        save_server_results()
\ No newline at end of file
+        save_server_results(writer)
@@ -1,43 +1,86 @@
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 import seaborn as sns
-import os
+
+import event_trace
+from results_writer import result_files
 
 sns.set_theme(style="whitegrid")
 
-# Dosya isimleri
+# Dosya önekleri: her protokol için JSON ve ikili (binary) format sonuçları.
+# Her önek için en son koşunun iz parçaları (results_tcp.<koşu>.<parça>.trace) okunur;
+# iz yoksa eski CSV sonuçlarına (results_tcp.csv) düşülür.
 files = {
-    'MQTT': 'results_mqtt.csv',
-    'TCP': 'results_tcp.csv',
-    'UDP': 'results_udp.csv',
-    'WebSocket': 'results_websocket.csv'
+    'MQTT': {'JSON': ['results_mqtt'], 'Binary': ['results_mqtt_binary']},
+    'TCP': {'JSON': ['results_tcp'], 'Binary': ['results_tcp_binary']},
+    'UDP': {'JSON': ['results_udp'], 'Binary': ['results_udp_binary']},
+    'WebSocket': {'JSON': ['results_websocket', 'results_websocket_client'],
+                  'Binary': ['results_websocket_binary', 'results_websocket_client_binary']}
 }
 
+
+def load_trace(paths):
+    """İz dosyalarından (gecikme, mesaj boyutu, bağlanma süresi) dizileri; filtreler vektörel."""
+    trace = event_trace.load(paths)
+    connect = trace.mask(msg_type='connect')
+    message = ~connect & ~trace.mask(msg_type=event_trace.STAT_TYPES)
+    latency = trace['latency']
+    has_latency = ~np.isnan(latency)
+    return (latency[has_latency & message].astype(float),
+            trace['wire_bytes'][message].astype(float),
+            latency[has_latency & connect].astype(float))
+
+
+def load_csv(paths):
+    """Eski CSV sonuçları: her sütun kendi boş olmayan değerleriyle ayrı okunur."""
+    df = pd.concat([pd.read_csv(p) for p in paths], ignore_index=True)
+    return tuple(df[col].dropna().to_numpy() if col in df else np.empty(0)
+                 for col in ('Latency', 'Bandwidth', 'ReconnectTime'))
+
+
+def find_results(candidates):
+    for base in candidates:
+        paths = event_trace.trace_files(base)
+        if paths:
+            return load_trace, paths
+    for base in candidates:
+        paths = result_files(base)
+        if paths:
+            return load_csv, paths
+    return None, None
+
+
+def frame(column, values, protocol, encoding):
+    return pd.DataFrame({column: values, 'Protocol': protocol, 'Encoding': encoding})
+
+
 data_frames = []
+bandwidth_frames = []
+reconnect_frames = []
 
-# --- 1. CSV DOSYALARINI OKUMA ---
+# --- 1. SONUÇ DOSYALARINI OKUMA ---
 print("Veriler yükleniyor...")
-for protocol, filename in files.items():
-    if os.path.exists(filename):
+for protocol, encodings in files.items():
+    for encoding, candidates in encodings.items():
+        loader, paths = find_results(candidates)
+        if loader is None:
+            if encoding == 'JSON':
+                print(f"⚠️ Uyarı: {candidates[0]} sonuçları bulunamadı! Simülasyonu çalıştırdın mı?")
+            continue
         try:
-            # CSV'yi oku
-            df = pd.read_csv(filename)
-
-            # Protokol ismini bir sütun olarak ekle (Gruplama için gerekli)
-            df['Protocol'] = protocol
-
-            # Veri temizliği: Boş satırları veya None olanları temizle
-            df = df.dropna(subset=['Latency', 'Bandwidth'])
+            latency, sizes, reconnect = loader(paths)
 
             # Sadece Latency > 0 olanları al (Hatalı ölçümleri elemek için)
-            df = df[df['Latency'] > 0]
+            latency = latency[latency > 0]
 
-            data_frames.append(df)
-            print(f"✅ {protocol} verileri yüklendi: {len(df)} kayıt.")
+            # Her ölçüm türü kendi olaylarından gelir; bant genişliği tüm mesajları kullanır
+            data_frames.append(frame('Latency', latency, protocol, encoding))
+            bandwidth_frames.append(frame('Bandwidth', sizes, protocol, encoding))
+            reconnect_frames.append(frame('ReconnectTime', reconnect, protocol, encoding))
+            print(f"✅ {protocol} ({encoding}) verileri yüklendi: {len(latency)} gecikme, {len(sizes)} mesaj.")
         except Exception as e:
-            print(f"❌ Hata ({protocol}): {e}")
-    else:
-        print(f"⚠️ Uyarı: {filename} bulunamadı! Simülasyonu çalıştırdın mı?")
+            print(f"❌ Hata ({protocol}, {encoding}): {e}")
 
 if not data_frames:
     print("Hiçbir veri dosyası bulunamadı. Lütfen önce simülasyonları çalıştırın.")
@@ -45,6 +88,13 @@ if not data_frames:
 
 # Tüm verileri tek bir tabloda birleştir
 full_data = pd.concat(data_frames, ignore_index=True)
+bandwidth_data = pd.concat(bandwidth_frames, ignore_index=True)
+reconnect_data = pd.concat(reconnect_frames, ignore_index=True)
+
+# --- 2. FORMAT KARŞILAŞTIRMASI (JSON vs Binary) ---
+summary = bandwidth_data.groupby(['Protocol', 'Encoding'])['Bandwidth'].agg(['count', 'mean', 'sum'])
+print("\nMesaj boyutu özeti (byte):")
+print(summary.rename(columns={'count': 'Mesaj', 'mean': 'Ortalama', 'sum': 'Toplam'}).round(1).to_string())
 
 #GRAFİK ÇİZME
 
@@ -52,23 +102,24 @@ fig, axes = plt.subplots(2, 2, figsize=(16, 12))
 fig.suptitle('IoT Scooter Protokolleri - Gerçek Performans Analizi', fontsize=18, fontweight='bold')
 
 #Ortalama Gecikme (Latency)
-sns.barplot(ax=axes[0, 0], x="Protocol", y="Latency", data=full_data, errorbar="sd", palette="viridis")
+sns.barplot(ax=axes[0, 0], x="Protocol", y="Latency", hue="Encoding", data=full_data, errorbar="sd", palette="viridis")
 axes[0, 0].set_title("Ortalama Gecikme (Latency) ve Standart Sapma", fontsize=14)
 axes[0, 0].set_ylabel("Saniye (s)")
 axes[0, 0].grid(axis='y', linestyle='--', alpha=0.7)
 
 #Mesaj Boyutu / Bant Genişliği
-sns.boxplot(ax=axes[0, 1], x="Protocol", y="Bandwidth", data=full_data, palette="rocket")
-axes[0, 1].set_title("Bant Genişliği Tüketimi (Mesaj Boyutu)", fontsize=14)
+sns.boxplot(ax=axes[0, 1], x="Protocol", y="Bandwidth", hue="Encoding", data=bandwidth_data, palette="rocket")
+axes[0, 1].set_title("Bant Genişliği Tüketimi (Mesaj Boyutu, JSON vs Binary)", fontsize=14)
 axes[0, 1].set_ylabel("Byte")
 
 #Gecikme Dağılımı
-sns.violinplot(ax=axes[1, 0], x="Protocol", y="Latency", data=full_data, palette="mako", inner="quartile")
+sns.violinplot(ax=axes[1, 0], x="Protocol", y="Latency", hue="Encoding", data=full_data, palette="mako",
+               inner="quartile")
 axes[1, 0].set_title("Gecikme Kararlılığı (Yoğunluk Analizi)", fontsize=14)
 axes[1, 0].set_ylabel("Saniye (s)")
 
 #Yeniden Bağlanma Süresi
-reconnect_data = full_data[full_data['ReconnectTime'] > 0]
+reconnect_data = reconnect_data[reconnect_data['ReconnectTime'] > 0]
 
 if not reconnect_data.empty:
     sns.barplot(ax=axes[1, 1], x="Protocol", y="ReconnectTime", data=reconnect_data, palette="coolwarm")
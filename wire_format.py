@@ -0,0 +1,187 @@
+"""
+Sabit yerleşimli (fixed-layout) ikili mesaj formatı.
+
+Scooter'lar register mesajında 'encodings': ['binary', 'json'] göndererek bu
+formatı talep eder. Sunucu kabul ederse scooter id'sini 32 bitlik bir sayıya
+(sid) eşler ve 'register_ack' ile döner; scooter bundan sonra konum, durum ve
+ACK mesajlarını ikili gönderir. Onay gelmeden veya sunucu desteklemiyorsa
+JSON kullanılmaya devam edilir.
+
+Tüm ikili çerçeveler >= 0x80 olan bir tip baytı ile başlar, JSON mesajları ise
+'{' (0x7B) ile başladığı için aynı kanalda ikisi ayırt edilebilir. Çerçeve
+boyutları tip baytından bilinir, bu yüzden TCP akışında ayraç gerekmez.
+
+    location: tip(B) sid(I) lat(i, 1e-7 derece) lon(i, 1e-7 derece) pil(H, %0.1)        15 byte
+    status:   tip(B) sid(I) pil(H, %0.1) bayraklar(B, bit0=kilitli) hız(B, km/s)         9 byte
+    ack:      tip(B) sid(I) komut(B) send_ns(q) downlink(i, µs) işlem(i, µs)             22 byte
+
+ACK'teki send_ns sunucunun komuta koyduğu monotonik damgadır; downlink ve
+işlem süreleri scooter saat farkını ölçtüyse doludur (bkz. clock.py), aksi
+halde UNKNOWN_US taşır.
+"""
+import json
+import struct
+import threading
+
+ENCODING_JSON = 'json'
+ENCODING_BINARY = 'binary'
+
+TAG_LOCATION = 0x81
+TAG_STATUS = 0x82
+TAG_ACK = 0x83
+
+LOCATION = struct.Struct('<BIiiH')
+STATUS = struct.Struct('<BIHBB')
+ACK = struct.Struct('<BIBqii')
+
+FRAME_SIZES = {
+    TAG_LOCATION: LOCATION.size,
+    TAG_STATUS: STATUS.size,
+    TAG_ACK: ACK.size,
+}
+
+COORD_SCALE = 10_000_000
+BATTERY_UNKNOWN = 0xFFFF
+FLAG_LOCKED = 0x01
+UNKNOWN_US = -2 ** 31
+_US_MAX = 2 ** 31 - 1
+
+# Komut isimleri ACK içinde tek bayt olarak taşınır
+COMMANDS = ('unknown', 'unlock', 'lock')
+COMMAND_CODES = {name: i for i, name in enumerate(COMMANDS)}
+
+
+class SidRegistry:
+    """Sunucu tarafında scooter id <-> sid eşlemesi (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_sid = []
+
+    def intern(self, scooter_id):
+        sid = self._by_id.get(scooter_id)
+        if sid is not None:
+            return sid
+        with self._lock:
+            sid = self._by_id.get(scooter_id)
+            if sid is None:
+                sid = len(self._by_sid)
+                self._by_sid.append(scooter_id)
+                self._by_id[scooter_id] = sid
+        return sid
+
+    def lookup(self, sid):
+        if 0 <= sid < len(self._by_sid):
+            return self._by_sid[sid]
+        return 'unknown'
+
+
+def register_message(scooter_id, encoding=ENCODING_JSON, clock_ns=None, groups=None):
+    """
+    İstemcilerin gönderdiği register mesajı; ikili talep edilirse desteklenen
+    formatlar, saat farkı ölçülecekse gönderim anı (t0), grup komutları için
+    bölge/model (bkz. mqtt_topics.py) eklenir.
+    """
+    msg = {'type': 'register', 'scooter_id': scooter_id}
+    if encoding == ENCODING_BINARY:
+        msg['encodings'] = [ENCODING_BINARY, ENCODING_JSON]
+    if clock_ns is not None:
+        msg['clock'] = clock_ns
+    if groups:
+        msg['groups'] = groups
+    return msg
+
+
+def negotiate(msg, registry):
+    """
+    Register mesajına göre formatı belirler. İkili format kabul edilirse
+    istemciye gönderilecek 'register_ack' sözlüğünü, aksi halde None döndürür.
+    """
+    if ENCODING_BINARY not in (msg.get('encodings') or ()):
+        return None
+    return {
+        'type': 'register_ack',
+        'encoding': ENCODING_BINARY,
+        'sid': registry.intern(msg['scooter_id'])
+    }
+
+
+def is_binary(frame):
+    return len(frame) > 0 and frame[0] >= 0x80
+
+
+def _battery_field(value):
+    if value is None:
+        return BATTERY_UNKNOWN
+    return max(0, min(int(round(value * 10)), BATTERY_UNKNOWN - 1))
+
+
+def encode_message(msg, sid):
+    """
+    JSON için kullanılan konum/durum sözlüğünü ikili çerçeveye çevirir. Formatı
+    olmayan mesajlar (register vb.) için None döner; çağıran JSON'a geri düşer.
+    """
+    if 'location' in msg:
+        loc = msg['location']
+        return LOCATION.pack(TAG_LOCATION, sid,
+                             int(round(loc['lat'] * COORD_SCALE)),
+                             int(round(loc['lon'] * COORD_SCALE)),
+                             _battery_field(msg.get('battery')))
+    if 'status' in msg:
+        st = msg['status']
+        return STATUS.pack(TAG_STATUS, sid,
+                           _battery_field(st.get('battery_level')),
+                           FLAG_LOCKED if st.get('is_locked') else 0,
+                           max(0, min(int(st.get('speed') or 0), 255)))
+    return None
+
+
+def _us_field(ns):
+    if ns is None:
+        return UNKNOWN_US
+    return max(UNKNOWN_US + 1, min(ns // 1000, _US_MAX))
+
+
+def encode_ack(sid, command, send_ns, rx_ns=None, tx_ns=None):
+    """rx_ns/tx_ns (sunucu saatinde) send_ns'e göre µs farkı olarak taşınır."""
+    send_ns = send_ns or 0
+    return ACK.pack(TAG_ACK, sid, COMMAND_CODES.get(command, 0), send_ns,
+                    _us_field(None if rx_ns is None else rx_ns - send_ns),
+                    _us_field(None if tx_ns is None or rx_ns is None else tx_ns - rx_ns))
+
+
+def decode(frame, registry=None):
+    """İkili çerçeveyi JSON mesajlarıyla aynı yapıda bir sözlüğe çevirir."""
+    tag = frame[0]
+    if tag == TAG_LOCATION:
+        _, sid, lat, lon, battery = LOCATION.unpack(frame)
+        msg = {'type': 'location',
+               'location': {'lat': lat / COORD_SCALE, 'lon': lon / COORD_SCALE}}
+        if battery != BATTERY_UNKNOWN:
+            msg['battery'] = battery / 10
+    elif tag == TAG_STATUS:
+        _, sid, battery, flags, speed = STATUS.unpack(frame)
+        msg = {'type': 'status',
+               'status': {'battery_level': None if battery == BATTERY_UNKNOWN else battery / 10,
+                          'is_locked': bool(flags & FLAG_LOCKED),
+                          'speed': speed}}
+    elif tag == TAG_ACK:
+        _, sid, command, send_ns, downlink_us, process_us = ACK.unpack(frame)
+        name = COMMANDS[command] if command < len(COMMANDS) else COMMANDS[0]
+        msg = {'type': 'ack', 'ack': f"command '{name}' received", 'send_ns': send_ns or None}
+        if send_ns and downlink_us != UNKNOWN_US:
+            msg['rx_ns'] = send_ns + downlink_us * 1000
+            if process_us != UNKNOWN_US:
+                msg['tx_ns'] = msg['rx_ns'] + process_us * 1000
+    else:
+        raise ValueError(f"Bilinmeyen ikili mesaj tipi: {tag:#x}")
+
+    msg['sid'] = sid
+    msg['scooter_id'] = registry.lookup(sid) if registry is not None else 'unknown'
+    return msg
+
+
+def json_size(msg):
+    """Aynı mesajın JSON olarak kaç byte tutacağı (bant genişliği karşılaştırması için)."""
+    return len(json.dumps(msg).encode('utf-8'))